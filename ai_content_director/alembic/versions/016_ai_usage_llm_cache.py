@@ -0,0 +1,28 @@
+# ai_usage_logs: cache_hit + tokens_saved (LLM response cache)
+# Revision ID: 016  Revises: 015
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "016"
+down_revision: Union[str, None] = "015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "ai_usage_logs",
+        sa.Column("cache_hit", sa.Boolean(), server_default=sa.text("false"), nullable=False),
+    )
+    op.add_column(
+        "ai_usage_logs",
+        sa.Column("tokens_saved", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("ai_usage_logs", "tokens_saved")
+    op.drop_column("ai_usage_logs", "cache_hit")
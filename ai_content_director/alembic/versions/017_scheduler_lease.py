@@ -0,0 +1,28 @@
+# content_items: lease cho scheduler worker (locked_until, locked_by)
+# Revision ID: 017  Revises: 016
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "017"
+down_revision: Union[str, None] = "016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "content_items",
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.add_column(
+        "content_items",
+        sa.Column("locked_by", sa.String(length=128), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("content_items", "locked_by")
+    op.drop_column("content_items", "locked_until")
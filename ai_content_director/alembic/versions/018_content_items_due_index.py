@@ -0,0 +1,34 @@
+# content_items: partial index cho scheduler (item due + lease publishing)
+# Revision ID: 018  Revises: 017
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "018"
+down_revision: Union[str, None] = "017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_content_items_due",
+        "content_items",
+        ["scheduled_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'approved' AND schedule_status = 'scheduled'"),
+    )
+    op.create_index(
+        "ix_content_items_publishing_lease",
+        "content_items",
+        ["locked_until"],
+        unique=False,
+        postgresql_where=sa.text("status = 'approved' AND schedule_status = 'publishing'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_content_items_publishing_lease", table_name="content_items")
+    op.drop_index("ix_content_items_due", table_name="content_items")
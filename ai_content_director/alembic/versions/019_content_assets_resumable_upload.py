@@ -0,0 +1,27 @@
+# content_assets: session resumable video upload (Graph) + offset đã gửi
+# Revision ID: 019  Revises: 018
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "019"
+down_revision: Union[str, None] = "018"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("content_assets", sa.Column("fb_upload_session_id", sa.String(length=64), nullable=True))
+    op.add_column("content_assets", sa.Column("fb_upload_video_id", sa.String(length=64), nullable=True))
+    op.add_column(
+        "content_assets",
+        sa.Column("fb_upload_offset", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("content_assets", "fb_upload_offset")
+    op.drop_column("content_assets", "fb_upload_video_id")
+    op.drop_column("content_assets", "fb_upload_session_id")
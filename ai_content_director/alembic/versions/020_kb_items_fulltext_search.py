@@ -0,0 +1,48 @@
+# kb_items: full-text search (tsvector generated + GIN) + trigram trên title, bỏ dấu bằng unaccent
+# Revision ID: 020  Revises: 019
+#
+# unaccent() chỉ STABLE nên không dùng trực tiếp trong generated column / index:
+# bọc bằng kb_unaccent() IMMUTABLE (chỉ định rõ dictionary 'public.unaccent').
+# btree_gin cho phép GIN composite (tenant_id, ...) -> lọc tenant + match trong 1 index.
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "020"
+down_revision: Union[str, None] = "019"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION kb_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$
+        """
+    )
+    op.execute(
+        """
+        ALTER TABLE kb_items ADD COLUMN search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', kb_unaccent(coalesce(title, ''))), 'A') ||
+            setweight(to_tsvector('simple', kb_unaccent(coalesce(content, ''))), 'B')
+        ) STORED
+        """
+    )
+    op.execute("CREATE INDEX ix_kb_items_tenant_search_tsv ON kb_items USING gin (tenant_id, search_tsv)")
+    op.execute(
+        "CREATE INDEX ix_kb_items_tenant_title_trgm ON kb_items USING gin (tenant_id, kb_unaccent(title) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_kb_items_tenant_title_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_kb_items_tenant_search_tsv")
+    op.execute("ALTER TABLE kb_items DROP COLUMN IF EXISTS search_tsv")
+    op.execute("DROP FUNCTION IF EXISTS kb_unaccent(text)")
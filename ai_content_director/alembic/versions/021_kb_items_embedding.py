@@ -0,0 +1,21 @@
+# kb_items: embedding (float32 bytes) cho semantic retrieval in-process
+# Revision ID: 021  Revises: 020
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "021"
+down_revision: Union[str, None] = "020"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Item cũ để NULL: embedding tính khi load index lần đầu và ghi lại
+    op.add_column("kb_items", sa.Column("embedding", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("kb_items", "embedding")
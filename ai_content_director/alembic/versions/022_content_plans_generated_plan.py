@@ -0,0 +1,41 @@
+# content_plans: generated_plan_id + unique (generated_plan_id, day_number) cho materialize idempotent
+# Revision ID: 022  Revises: 021
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "022"
+down_revision: Union[str, None] = "021"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "content_plans",
+        sa.Column("generated_plan_id", postgresql.UUID(as_uuid=True), nullable=True),
+    )
+    op.create_foreign_key(
+        "fk_content_plans_generated_plan_id",
+        "content_plans",
+        "generated_plans",
+        ["generated_plan_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    # Dòng cũ generated_plan_id NULL: không đụng unique (NULL khác nhau)
+    op.create_index(
+        "ux_content_plans_generated_plan_day",
+        "content_plans",
+        ["generated_plan_id", "day_number"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_content_plans_generated_plan_day", table_name="content_plans")
+    op.drop_constraint("fk_content_plans_generated_plan_id", "content_plans", type_="foreignkey")
+    op.drop_column("content_plans", "generated_plan_id")
@@ -0,0 +1,38 @@
+# content_items, content_assets, lead_signals, approval_events: index (tenant_id, created_at DESC, id DESC) cho phân trang keyset
+# Revision ID: 023  Revises: 022
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "023"
+down_revision: Union[str, None] = "022"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TABLES = ("content_items", "content_assets", "lead_signals", "approval_events")
+
+
+def upgrade() -> None:
+    for table in _TABLES:
+        op.create_index(
+            f"ix_{table}_tenant_created_id",
+            table,
+            ["tenant_id", "created_at", "id"],
+            unique=False,
+            postgresql_ops={"created_at": "DESC", "id": "DESC"},
+        )
+    # (tenant_id, created_at) cũ là prefix của index mới
+    op.drop_index("ix_lead_signals_tenant_created", table_name="lead_signals")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_lead_signals_tenant_created",
+        "lead_signals",
+        ["tenant_id", "created_at"],
+        unique=False,
+        postgresql_ops={"created_at": "DESC"},
+    )
+    for table in reversed(_TABLES):
+        op.drop_index(f"ix_{table}_tenant_created_id", table_name=table)
@@ -0,0 +1,25 @@
+# post_metrics: index (tenant_id, publish_log_id, fetched_at DESC) cho KPI summary (DISTINCT ON snapshot mới nhất)
+# Revision ID: 024  Revises: 023
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "024"
+down_revision: Union[str, None] = "023"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_post_metrics_tenant_log_fetched",
+        "post_metrics",
+        ["tenant_id", "publish_log_id", "fetched_at"],
+        unique=False,
+        postgresql_ops={"fetched_at": "DESC"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_post_metrics_tenant_log_fetched", table_name="post_metrics")
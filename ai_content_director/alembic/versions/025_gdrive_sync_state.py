@@ -0,0 +1,29 @@
+# gdrive_sync_state: start page token (Drive Changes API) theo tenant + folder cho ingest incremental
+# Revision ID: 025  Revises: 024
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "025"
+down_revision: Union[str, None] = "024"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gdrive_sync_state",
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("folder_id", sa.String(128), nullable=False),
+        sa.Column("start_page_token", sa.String(255), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("tenant_id", "folder_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("gdrive_sync_state")
@@ -0,0 +1,28 @@
+# content_assets: content_sha256 (dedup nội dung media giữa các drive_file_id) + index theo tenant
+# Revision ID: 026  Revises: 025
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "026"
+down_revision: Union[str, None] = "025"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("content_assets", sa.Column("content_sha256", sa.String(64), nullable=True))
+    op.create_index(
+        "ix_content_assets_tenant_sha256",
+        "content_assets",
+        ["tenant_id", "content_sha256"],
+        unique=False,
+        postgresql_where=sa.text("content_sha256 IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_content_assets_tenant_sha256", table_name="content_assets")
+    op.drop_column("content_assets", "content_sha256")
@@ -0,0 +1,53 @@
+# gdrive_ingest_jobs: job ingest Drive chạy nền, tối đa 1 job queued/running mỗi tenant
+# Revision ID: 027  Revises: 026
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "027"
+down_revision: Union[str, None] = "026"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gdrive_ingest_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("mode", sa.String(16), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False, server_default="queued"),
+        sa.Column("files_total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("files_done", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("count_ingested", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("count_invalid", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("count_skipped", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("bytes_downloaded", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("locked_by", sa.String(128), nullable=True),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["tenant_id"], ["tenants.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # Coalesce: INSERT ... ON CONFLICT DO NOTHING khi tenant đã có job đang chạy
+    op.create_index(
+        "ux_gdrive_ingest_jobs_tenant_active",
+        "gdrive_ingest_jobs",
+        ["tenant_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+    op.create_index("ix_gdrive_ingest_jobs_tenant_created", "gdrive_ingest_jobs", ["tenant_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_gdrive_ingest_jobs_tenant_created", table_name="gdrive_ingest_jobs")
+    op.drop_index("ux_gdrive_ingest_jobs_tenant_active", table_name="gdrive_ingest_jobs")
+    op.drop_table("gdrive_ingest_jobs")
@@ -33,18 +33,71 @@ class Settings(BaseSettings):
     openai_max_retries: int = Field(default=2, alias="OPENAI_MAX_RETRIES")
     openai_temperature: float = Field(default=0.7, alias="OPENAI_TEMPERATURE")
     openai_vision_model: str = Field(default="gpt-4o-mini", alias="OPENAI_VISION_MODEL")
+    # AsyncOpenAI dùng chung: pool HTTP keep-alive + giới hạn số call đồng thời (global / mỗi tenant).
+    openai_max_connections: int = Field(default=50, alias="OPENAI_MAX_CONNECTIONS")
+    openai_max_keepalive_connections: int = Field(default=20, alias="OPENAI_MAX_KEEPALIVE_CONNECTIONS")
+    openai_max_concurrency: int = Field(default=20, alias="OPENAI_MAX_CONCURRENCY")
+    openai_max_concurrency_per_tenant: int = Field(default=5, alias="OPENAI_MAX_CONCURRENCY_PER_TENANT")
+    # Cache response LLM theo hash (model, messages, temperature) - opt-in. Hit không tính token vào budget.
+    llm_cache_enabled: bool = Field(default=False, alias="LLM_CACHE_ENABLED")
+    llm_cache_ttl_seconds: int = Field(default=86400, alias="LLM_CACHE_TTL_SECONDS")
+    llm_cache_max_entries: int = Field(default=5000, alias="LLM_CACHE_MAX_ENTRIES")
+    # KB retrieval cho content generator: fulltext (tsvector + trigram) | semantic (vector in-process) | hybrid (gộp RRF).
+    kb_retrieval_mode: str = Field(default="hybrid", alias="KB_RETRIEVAL_MODE")
+    # Vector index KB theo tenant giữ trong RAM: đồng bộ lại sau TTL; bỏ tenant ít dùng nhất (LRU) khi vượt
+    # tổng bộ nhớ (MB, ~4KB / item) hoặc số tenant.
+    kb_vector_index_ttl_seconds: int = Field(default=600, alias="KB_VECTOR_INDEX_TTL_SECONDS")
+    kb_vector_index_max_mb: int = Field(default=512, alias="KB_VECTOR_INDEX_MAX_MB")
+    kb_vector_index_max_tenants: int = Field(default=200, alias="KB_VECTOR_INDEX_MAX_TENANTS")
     # Cost guard: daily budget per tenant (USD). Vượt → fallback template, không gọi OpenAI.
     daily_budget_usd: float = Field(default=2.0, alias="DAILY_BUDGET_USD")
+    # Token ước tính giữ chỗ trước mỗi call LLM (tính theo giá output); quyết toán lại theo usage thật.
+    budget_reserve_tokens: int = Field(default=4000, alias="BUDGET_RESERVE_TOKENS")
     # Giá USD / 1M tokens (tùy chọn; không set thì dùng DEFAULT_*).
     openai_input_price_per_1m: Optional[float] = Field(default=None, alias="OPENAI_INPUT_PRICE_PER_1M")
     openai_output_price_per_1m: Optional[float] = Field(default=None, alias="OPENAI_OUTPUT_PRICE_PER_1M")
     # Rate limit: requests per minute per tenant (hoặc api_key). Cần REDIS_URL.
     rate_limit_per_min: int = Field(default=60, alias="RATE_LIMIT_PER_MIN")
+    # Override dạng "prefix=limit,...": route (vd "/webhooks/facebook=600,/content/generate-samples=10")
+    # và tenant (vd "<tenant_uuid>=300"). limit <= 0 = không giới hạn.
+    rate_limit_route_overrides: str = Field(default="", alias="RATE_LIMIT_ROUTE_OVERRIDES")
+    rate_limit_tenant_overrides: str = Field(default="", alias="RATE_LIMIT_TENANT_OVERRIDES")
+    # Redis chậm hơn ngưỡng này (ms) thì dùng limiter local trong process.
+    rate_limit_redis_timeout_ms: int = Field(default=50, alias="RATE_LIMIT_REDIS_TIMEOUT_MS")
+    # Scheduler worker pool: số publish đồng thời (global / mỗi tenant) + lease claim (giây).
+    scheduler_concurrency: int = Field(default=4, alias="SCHEDULER_CONCURRENCY")
+    scheduler_concurrency_per_tenant: int = Field(default=1, alias="SCHEDULER_CONCURRENCY_PER_TENANT")
+    scheduler_lease_seconds: int = Field(default=120, alias="SCHEDULER_LEASE_SECONDS")
+    # Shutdown: chờ publish đang chạy xong tối đa số giây này rồi mới huỷ (lease giữ tới khi hết hạn).
+    scheduler_shutdown_drain_seconds: float = Field(default=30.0, alias="SCHEDULER_SHUTDOWN_DRAIN_SECONDS")
+    # httpx client dùng chung theo upstream (Graph API, n8n): pool keep-alive + HTTP/2 (cần httpx[http2]).
+    http_max_connections: int = Field(default=100, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(default=20, alias="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry_seconds: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    http_http2: bool = Field(default=True, alias="HTTP_HTTP2")
     # Facebook Graph API (chỉ đăng bài đã approved).
     facebook_page_id: Optional[str] = Field(default=None, alias="FACEBOOK_PAGE_ID")
     facebook_access_token: Optional[str] = Field(default=None, alias="FACEBOOK_ACCESS_TOKEN")
     facebook_api_version: str = Field(default="v20.0", alias="FACEBOOK_API_VERSION")
+    # Video upload resumable: kích thước chunk (MB) mỗi lần transfer.
+    facebook_video_chunk_mb: int = Field(default=8, alias="FACEBOOK_VIDEO_CHUNK_MB")
+    # Thu thập metrics: số Graph batch request (50 post/batch) chạy song song.
+    facebook_metrics_batch_concurrency: int = Field(default=4, alias="FACEBOOK_METRICS_BATCH_CONCURRENCY")
+    # Write-behind audit / usage log: gom approval_events + ai_usage_logs, ghi 1 INSERT nhiều dòng lúc commit;
+    # event SYSTEM qua batcher nền (queue giới hạn, ghi theo lô).
+    write_behind_enabled: bool = Field(default=False, alias="WRITE_BEHIND_ENABLED")
+    write_behind_queue_max: int = Field(default=10000, alias="WRITE_BEHIND_QUEUE_MAX")
+    write_behind_batch_size: int = Field(default=500, alias="WRITE_BEHIND_BATCH_SIZE")
+    write_behind_flush_interval_seconds: float = Field(default=1.0, alias="WRITE_BEHIND_FLUSH_INTERVAL_SECONDS")
     redis_url: Optional[str] = Field(default=None, alias="REDIS_URL")
+    # Redis pool dùng chung cả process (mở/đóng trong lifespan).
+    redis_max_connections: int = Field(default=50, alias="REDIS_MAX_CONNECTIONS")
+    redis_socket_timeout_seconds: float = Field(default=2.0, alias="REDIS_SOCKET_TIMEOUT_SECONDS")
+    # Circuit breaker: lệnh Redis lỗi/timeout -> bỏ qua Redis (dùng fallback) trong số giây này.
+    redis_circuit_open_seconds: float = Field(default=5.0, alias="REDIS_CIRCUIT_OPEN_SECONDS")
+    # Cache tầng 1 trong process (LRU + TTL). TTL ngắn vì delete ở replica khác không xóa được tầng này.
+    redis_cache_local_max_items: int = Field(default=2048, alias="REDIS_CACHE_LOCAL_MAX_ITEMS")
+    redis_cache_local_ttl_seconds: int = Field(default=60, alias="REDIS_CACHE_LOCAL_TTL_SECONDS")
 
     # Google Drive dropzone (Service Account JSON path)
     gdrive_sa_json_path: Optional[str] = Field(default=None, alias="GDRIVE_SA_JSON_PATH")
@@ -55,6 +108,13 @@ class Settings(BaseSettings):
     local_media_dir: str = Field(default="/opt/aiplatform/media_cache", alias="LOCAL_MEDIA_DIR")
     asset_max_image_mb: int = Field(default=10, alias="ASSET_MAX_IMAGE_MB")
     asset_max_video_mb: int = Field(default=200, alias="ASSET_MAX_VIDEO_MB")
+    # Ingest Drive: full = liệt kê cả folder READY mỗi lần; incremental = changes.list từ token lưu theo tenant + folder
+    gdrive_sync_mode: str = Field(default="full", alias="GDRIVE_SYNC_MODE")
+    # Tải file Drive: số file tải song song (thread riêng, không chặn event loop) + kích thước chunk MB
+    gdrive_download_concurrency: int = Field(default=4, alias="GDRIVE_DOWNLOAD_CONCURRENCY")
+    gdrive_download_chunk_mb: int = Field(default=8, alias="GDRIVE_DOWNLOAD_CHUNK_MB")
+    # Job ingest nền (POST /api/gdrive/ingest): lease giây, gia hạn mỗi lease/3; process chết -> job hết lease bị đóng
+    gdrive_ingest_job_lease_seconds: int = Field(default=300, alias="GDRIVE_INGEST_JOB_LEASE_SECONDS")
 
     # AI Lead System: n8n webhook khi priority=high (follow-up task)
     webhook_n8n_url: Optional[str] = Field(default=None, alias="WEBHOOK_URL")
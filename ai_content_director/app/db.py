@@ -5,8 +5,11 @@ from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_asyn
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import get_settings
+from app.infrastructure.write_behind import get_session_stats
+from app.logging_config import get_logger
 
 settings = get_settings()
+logger = get_logger(__name__)
 
 # Async engine; use same URL as Alembic (postgresql+asyncpg://...)
 engine = create_async_engine(
@@ -31,7 +34,7 @@ class Base(DeclarativeBase):
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency that yields an async session; close after request."""
+    """Dependency that yields an async session; close after request (log flush count / write-behind rows)."""
     async with async_session_factory() as session:
         try:
             yield session
@@ -40,4 +43,7 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback()
             raise
         finally:
+            stats = get_session_stats(session)
+            if stats["flush_count"] or stats["write_behind_rows"]:
+                logger.info("db.session_stats", **stats)
             await session.close()
@@ -0,0 +1,117 @@
+"""
+Drive API client dùng chung toàn process (gdrive_dropzone: list / changes / download / move, publish: move_file).
+- Credentials Service Account đọc 1 lần, cache theo (path, mtime): thay file SA thì tự tạo lại client.
+- Discovery document drive v3 lấy 1 lần từ bản tĩnh đóng gói trong google-api-python-client
+  (build_from_document): không gọi mạng, không parse lại JSON mỗi call.
+- httplib2 không thread-safe: mỗi thread (asyncio.to_thread khi tải song song) dùng AuthorizedHttp riêng,
+  gắn vào request qua requestBuilder; AuthorizedHttp tự refresh access token khi hết hạn.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DRIVE_SCOPES = [
+    "https://www.googleapis.com/auth/drive.readonly",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive",
+]
+HTTP_TIMEOUT_SECONDS = 60
+
+_lock = threading.RLock()
+_local = threading.local()
+_discovery_doc: Optional[str] = None
+# ((path, mtime), credentials, service) – gán 1 lần (atomic) để đọc không cần lock
+_cached: Optional[Tuple[Tuple[str, float], Any, "DriveClient"]] = None
+_stats = {"builds": 0, "thread_http_created": 0}
+
+
+def _load_discovery_doc() -> str:
+    global _discovery_doc
+    if _discovery_doc is None:
+        doc = get_static_doc("drive", "v3")
+        if doc is None:
+            raise RuntimeError("drive_v3_static_discovery_doc_missing")
+        _discovery_doc = doc
+    return _discovery_doc
+
+
+def _thread_http(credentials: Any) -> google_auth_httplib2.AuthorizedHttp:
+    """AuthorizedHttp của thread hiện tại (giữ keep-alive giữa các call trong cùng thread)."""
+    http = getattr(_local, "http", None)
+    if http is None or http.credentials is not credentials:
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+        _local.http = http
+        with _lock:
+            _stats["thread_http_created"] += 1
+    return http
+
+
+class DriveClient:
+    """
+    Service Drive + resource files / changes dựng sẵn: service.files() dựng lại resource động
+    (parse discovery) mỗi lần gọi, ~3ms. Resource không giữ state theo request nên dùng chung giữa thread được.
+    """
+
+    def __init__(self, service: Any) -> None:
+        self.service = service
+        self._files = service.files()
+        self._changes = service.changes()
+
+    def files(self) -> Any:
+        return self._files
+
+    def changes(self) -> Any:
+        return self._changes
+
+
+def _build_service(path: str) -> Tuple[Any, DriveClient]:
+    credentials = service_account.Credentials.from_service_account_file(path, scopes=DRIVE_SCOPES)
+
+    def _request_builder(_http: Any, *args: Any, **kwargs: Any) -> HttpRequest:
+        return HttpRequest(_thread_http(credentials), *args, **kwargs)
+
+    service = build_from_document(
+        _load_discovery_doc(),
+        http=_thread_http(credentials),
+        requestBuilder=_request_builder,
+    )
+    return credentials, DriveClient(service)
+
+
+def get_drive_service(sa_json_path: str) -> DriveClient:
+    """Drive v3 client dùng chung (an toàn khi gọi từ nhiều thread): .files(), .changes() như service gốc."""
+    global _cached
+    key = (sa_json_path, os.path.getmtime(sa_json_path))
+    cached = _cached
+    if cached is not None and cached[0] == key:
+        return cached[2]
+    with _lock:
+        if _cached is None or _cached[0] != key:
+            credentials, service = _build_service(sa_json_path)
+            _cached = (key, credentials, service)
+            _stats["builds"] += 1
+            logger.info("gdrive_client.built", sa_json_path=sa_json_path)
+        return _cached[2]
+
+
+def reset_drive_service() -> None:
+    """Bỏ client đã cache (test / đổi cấu hình lúc chạy)."""
+    global _cached
+    with _lock:
+        _cached = None
+    _local.__dict__.pop("http", None)
+
+
+def get_drive_client_stats() -> Dict[str, Any]:
+    return {"cached": _cached is not None, **_stats}
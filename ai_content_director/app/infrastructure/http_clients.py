@@ -0,0 +1,103 @@
+"""
+httpx.AsyncClient dùng chung theo upstream (graph = Facebook Graph API, n8n = webhook follow-up).
+- Mỗi upstream 1 client có pool keep-alive (HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE_CONNECTIONS),
+  HTTP/2 khi HTTP_HTTP2=true và đã cài h2 (httpx[http2]); thiếu h2 thì dùng HTTP/1.1.
+- Tạo trong lifespan (init_http_clients), đóng khi shutdown (close_http_clients). Gọi trước lifespan thì lazy init.
+- Timeout mặc định theo client; caller truyền timeout= theo operation (vd upload video 300s).
+- Số liệu pool (connections / idle / active) qua get_http_pool_stats() -> GET /api/metrics.
+"""
+from typing import Any, Dict
+
+import httpx
+
+from app.config import get_settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+UPSTREAM_GRAPH = "graph"
+UPSTREAM_N8N = "n8n"
+UPSTREAMS = (UPSTREAM_GRAPH, UPSTREAM_N8N)
+
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _create_client(upstream: str) -> httpx.AsyncClient:
+    settings = get_settings()
+    http2 = bool(settings.http_http2) and _http2_available()
+    if settings.http_http2 and not http2:
+        logger.warning("http_clients.http2_unavailable", upstream=upstream, hint="pip install httpx[http2]")
+    client = httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(DEFAULT_TIMEOUT_SECONDS, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+    )
+    logger.info(
+        "http_clients.created",
+        upstream=upstream,
+        http2=http2,
+        max_connections=settings.http_max_connections,
+    )
+    return client
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """Client dùng chung cho upstream (UPSTREAM_GRAPH / UPSTREAM_N8N). Không đóng client này trong caller."""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _clients[upstream] = _create_client(upstream)
+    return client
+
+
+def init_http_clients() -> None:
+    """Tạo sẵn client cho mọi upstream (lifespan startup) để request đầu không phải chờ khởi tạo."""
+    for upstream in UPSTREAMS:
+        get_http_client(upstream)
+
+
+async def close_http_clients() -> None:
+    """Đóng toàn bộ client + pool (lifespan shutdown)."""
+    for upstream, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("http_clients.close_error", upstream=upstream, error=str(e))
+    _clients.clear()
+
+
+def get_http_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Số connection trong pool mỗi upstream: total / idle / active / http2, và số request đang xử lý."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for upstream, client in sorted(_clients.items()):
+        stats: Dict[str, Any] = {"closed": client.is_closed}
+        try:
+            pool = client._transport._pool  # httpcore.AsyncConnectionPool (không có API public cho stats)
+            connections = list(pool.connections)
+            idle = sum(1 for c in connections if c.is_idle())
+            stats.update(
+                {
+                    "connections": len(connections),
+                    "idle": idle,
+                    "active": len(connections) - idle,
+                    "http2_connections": sum(1 for c in connections if "HTTP/2" in repr(c)),
+                    "requests_in_flight": len(getattr(pool, "_requests", [])),
+                }
+            )
+        except Exception as e:
+            stats["error"] = str(e)
+        out[upstream] = stats
+    return out
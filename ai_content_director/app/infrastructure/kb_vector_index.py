@@ -0,0 +1,230 @@
+"""
+Vector index in-process cho KB (semantic retrieval, không gọi service ngoài).
+- Embedding: hashing trick (blake2b -> bucket + dấu) trên từ + bigram từ, bỏ dấu tiếng Việt, TF log-sublinear,
+  chuẩn hoá L2. Không cần vocabulary nên tính được ngay khi tạo KbItem, lưu vào kb_items.embedding (float32).
+- IDF theo từng tenant: df (số dòng khác 0 ở mỗi bucket) cập nhật incremental khi thêm item; trọng số IDF áp
+  lúc search (query x idf^2, chia norm có trọng số của từng dòng) -> không giữ bản sao ma trận đã nhân IDF,
+  thêm item không build lại gì (norm các dòng tính lại 1 lượt ở lần search kế tiếp, không cấp phát n x DIM).
+- Mỗi tenant 1 ma trận NumPy (n x EMBEDDING_DIM), top-k cosine bằng 1 phép nhân ma trận + argpartition.
+  Thêm item chỉ append dòng (tăng capacity gấp đôi), không build lại toàn bộ.
+- Tổng bộ nhớ các index giới hạn bởi KB_VECTOR_INDEX_MAX_MB (và tối đa KB_VECTOR_INDEX_MAX_TENANTS tenant):
+  vượt thì bỏ tenant ít dùng nhất (LRU). Index quá KB_VECTOR_INDEX_TTL_SECONDS thì đồng bộ lại với DB
+  (chỉ đọc id, load embedding của item mới -> item tạo ở replica khác xuất hiện sau lần đồng bộ).
+"""
+import asyncio
+import hashlib
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from app.config import get_settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Đổi DIM thì vector cũ trong DB bị bỏ qua (sai độ dài) và tính lại lúc load index
+EMBEDDING_DIM = 1024
+# Title lặp lại để có trọng số cao hơn content
+TITLE_REPEAT = 2
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fold_text(text: str) -> str:
+    """Lower + bỏ dấu tiếng Việt (NFD, xoá combining mark, đ -> d)."""
+    decomposed = unicodedata.normalize("NFD", (text or "").lower())
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.replace("đ", "d")
+
+
+def tokenize(text: str) -> List[str]:
+    """Từ (không dấu) + bigram từ liền kề (tiếng Việt: 1 từ thường gồm 2 âm tiết)."""
+    words = _WORD_RE.findall(fold_text(text))
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(token: str, dim: int) -> Tuple[int, float]:
+    """Bucket + dấu ổn định giữa các process (không dùng hash() vì bị random theo PYTHONHASHSEED)."""
+    h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, (1.0 if (h >> 63) == 0 else -1.0)
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Vector float32 đã chuẩn hoá L2; text rỗng -> vector 0."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for token, count in Counter(tokenize(text)).items():
+        idx, sign = _bucket(token, dim)
+        vec[idx] += sign * (1.0 + math.log(count))
+    norm = float(np.linalg.norm(vec))
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+def embed_kb_item(title: str, content: str) -> np.ndarray:
+    return embed_text(" ".join([title or ""] * TITLE_REPEAT + [content or ""]))
+
+
+def vector_to_bytes(vec: np.ndarray) -> bytes:
+    return np.asarray(vec, dtype="<f4").tobytes()
+
+
+def vector_from_bytes(raw: Optional[bytes], dim: int = EMBEDDING_DIM) -> Optional[np.ndarray]:
+    """Bytes (float32 little-endian) -> vector; sai kích thước (DIM cũ) -> None để caller tính lại."""
+    if not raw or len(raw) != dim * 4:
+        return None
+    return np.frombuffer(raw, dtype="<f4").astype(np.float32)
+
+
+class TenantVectorIndex:
+    """Ma trận embedding của 1 tenant + id tương ứng từng dòng. Chỉ dùng trong event loop (không thread-safe)."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM) -> None:
+        self.dim = dim
+        self.ids: List[UUID] = []
+        self._pos: Dict[UUID, int] = {}
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        # df[j] = số dòng có bucket j khác 0 (cập nhật khi add)
+        self._df = np.zeros(dim, dtype=np.int64)
+        # Norm có trọng số IDF của từng dòng; None = tính lại ở lần search kế tiếp
+        self._norms: Optional[np.ndarray] = None
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._pos
+
+    def is_stale(self, ttl_seconds: int) -> bool:
+        return ttl_seconds > 0 and time.monotonic() - self.loaded_at > ttl_seconds
+
+    def mark_synced(self) -> None:
+        self.loaded_at = time.monotonic()
+
+    def add(self, ids: Sequence[UUID], vectors: Iterable[np.ndarray]) -> None:
+        """Thêm (hoặc thay) vector theo id. Append vào buffer, tăng capacity gấp đôi khi đầy; cập nhật df."""
+        for item_id, vec in zip(ids, vectors):
+            pos = self._pos.get(item_id)
+            if pos is None:
+                pos = len(self.ids)
+                if pos >= self._matrix.shape[0]:
+                    grown = np.zeros((max(16, pos * 2), self.dim), dtype=np.float32)
+                    grown[:pos] = self._matrix[:pos]
+                    self._matrix = grown
+                self.ids.append(item_id)
+                self._pos[item_id] = pos
+            else:
+                self._df -= self._matrix[pos] != 0
+            self._matrix[pos] = vec
+            self._df += self._matrix[pos] != 0
+        self._norms = None
+
+    def _idf(self) -> np.ndarray:
+        """IDF smooth theo bucket từ df hiện tại (O(DIM))."""
+        n = len(self.ids)
+        return (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+
+    def search(self, query_vec: np.ndarray, top_k: int) -> List[Tuple[UUID, float]]:
+        """Top-k (id, cosine giữa vector đã nhân IDF) giảm dần; bỏ kết quả score <= 0."""
+        n = len(self.ids)
+        if n == 0 or top_k <= 0:
+            return []
+        raw = self._matrix[:n]
+        idf = self._idf()
+        idf_sq = idf * idf
+        q_norm = float(np.linalg.norm(query_vec * idf))
+        if q_norm == 0:
+            return []
+        if self._norms is None:
+            # ||x_i * idf|| cho mọi dòng, không tạo ma trận trung gian n x DIM
+            norms = np.sqrt(np.einsum("ij,ij,j->i", raw, raw, idf_sq))
+            norms[norms == 0] = 1.0
+            self._norms = norms.astype(np.float32)
+        scores = (raw @ (query_vec * idf_sq)) / (self._norms * q_norm)
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def memory_bytes(self) -> int:
+        extra = self._norms.nbytes if self._norms is not None else 0
+        return int(self._matrix.nbytes + self._df.nbytes + extra)
+
+
+_indexes: "OrderedDict[UUID, TenantVectorIndex]" = OrderedDict()
+_build_locks: Dict[UUID, asyncio.Lock] = {}
+
+
+def get_index(tenant_id: UUID) -> Optional[TenantVectorIndex]:
+    """Index đã load (kể cả quá TTL: caller kiểm tra is_stale và đồng bộ lại với DB), hoặc None."""
+    index = _indexes.get(tenant_id)
+    if index is not None:
+        _indexes.move_to_end(tenant_id)
+    return index
+
+
+def _enforce_limits(tenant_id: UUID) -> None:
+    """
+    Bỏ tenant ít dùng nhất tới khi tổng bộ nhớ <= KB_VECTOR_INDEX_MAX_MB và số tenant <= KB_VECTOR_INDEX_MAX_TENANTS.
+    tenant_id (vừa dùng, ở cuối LRU) không bị bỏ: 1 tenant lớn hơn cả trần vẫn được giữ để phục vụ search, có log.
+    """
+    settings = get_settings()
+    max_bytes = max(1, settings.kb_vector_index_max_mb) * 1024 * 1024
+    max_tenants = max(1, settings.kb_vector_index_max_tenants)
+    total = sum(i.memory_bytes() for i in _indexes.values())
+    while len(_indexes) > 1 and (total > max_bytes or len(_indexes) > max_tenants):
+        evicted_id, evicted = _indexes.popitem(last=False)
+        total -= evicted.memory_bytes()
+        logger.info("kb.vector_index_evicted", tenant_id=str(evicted_id), vectors=len(evicted), total_bytes=total)
+    if total > max_bytes:
+        logger.warning("kb.vector_index_over_budget", tenant_id=str(tenant_id), total_bytes=total, max_bytes=max_bytes)
+
+
+def put_index(tenant_id: UUID, index: TenantVectorIndex) -> None:
+    """Lưu index tenant rồi bỏ tenant ít dùng nhất nếu vượt trần bộ nhớ / số tenant."""
+    _indexes[tenant_id] = index
+    _indexes.move_to_end(tenant_id)
+    _enforce_limits(tenant_id)
+
+
+def add_vectors(tenant_id: UUID, ids: Sequence[UUID], vectors: Sequence[np.ndarray]) -> None:
+    """Cập nhật incremental khi tạo KbItem; tenant chưa load index thì bỏ qua (lần search đầu sẽ load từ DB)."""
+    index = _indexes.get(tenant_id)
+    if index is not None and ids:
+        index.add(ids, vectors)
+        _indexes.move_to_end(tenant_id)
+        _enforce_limits(tenant_id)
+
+
+def build_lock(tenant_id: UUID) -> asyncio.Lock:
+    """Lock theo tenant: nhiều request search đồng thời chỉ load index 1 lần."""
+    lock = _build_locks.get(tenant_id)
+    if lock is None:
+        lock = _build_locks[tenant_id] = asyncio.Lock()
+    return lock
+
+
+def invalidate(tenant_id: Optional[UUID] = None) -> None:
+    """Bỏ index 1 tenant (hoặc tất cả nếu None)."""
+    if tenant_id is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(tenant_id, None)
+
+
+def get_vector_index_stats() -> Dict[str, Any]:
+    """Số tenant đang giữ index, tổng số vector, bộ nhớ ma trận (bytes) và trần bộ nhớ."""
+    return {
+        "tenants": len(_indexes),
+        "vectors": sum(len(i) for i in _indexes.values()),
+        "memory_bytes": sum(i.memory_bytes() for i in _indexes.values()),
+        "max_bytes": max(1, get_settings().kb_vector_index_max_mb) * 1024 * 1024,
+        "dim": EMBEDDING_DIM,
+    }
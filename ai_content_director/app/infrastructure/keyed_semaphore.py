@@ -0,0 +1,34 @@
+"""
+Semaphore theo key (tenant) dùng chung: llm_slot (openai_client) và worker pool scheduler.
+Semaphore của key tạo khi có người cần, xoá khi không còn ai giữ / chờ -> số entry không phình
+theo tổng số tenant từng chạy trong process (chỉ theo số tenant đang hoạt động).
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, List
+
+
+class KeyedSemaphore:
+    """Mỗi key 1 asyncio.Semaphore(limit); entry đếm số task đang giữ + đang chờ, về 0 thì bỏ."""
+
+    def __init__(self) -> None:
+        # key -> [semaphore, số task đang giữ hoặc chờ]
+        self._entries: Dict[Hashable, List] = {}
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, limit: int) -> AsyncIterator[None]:
+        """Giữ 1 slot của key (limit chỉ dùng khi tạo semaphore mới cho key)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [asyncio.Semaphore(max(1, limit)), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
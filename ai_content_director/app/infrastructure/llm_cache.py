@@ -0,0 +1,102 @@
+"""
+Cache response LLM theo nội dung (content-addressed), opt-in qua LLM_CACHE_ENABLED.
+- Key = sha256(model + messages đã chuẩn hoá + tham số sinh: temperature, ...): cùng prompt -> cùng key,
+  bất kể tenant (nhiều tenant chung industry/brand context dùng lại được kết quả).
+- Lưu qua cache 2 tầng (redis_cache): LRU local + Redis, TTL = LLM_CACHE_TTL_SECONDS.
+- Giới hạn số entry trên Redis (LLM_CACHE_MAX_ENTRIES): sorted set index theo thời điểm ghi, vượt thì xoá entry cũ nhất.
+Chỉ cache response parse được (caller gọi store sau khi validate), không cache lỗi.
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import get_settings
+from app.infrastructure.redis_cache import (
+    CACHE_PREFIX,
+    cache_get,
+    cache_set,
+    get_local_cache,
+    get_redis_if_available,
+    mark_redis_failure,
+)
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+LLM_CACHE_KEY_PREFIX = "llm:"
+LLM_CACHE_INDEX_KEY = "llm_cache:index"
+
+
+def _normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Chuẩn hoá messages: role lower, content gộp khoảng trắng thừa (khác biệt whitespace không tạo key mới)."""
+    out = []
+    for m in messages:
+        content = m.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, sort_keys=True)
+        out.append({"role": str(m.get("role") or "").lower(), "content": " ".join(content.split())})
+    return out
+
+
+def build_cache_key(model: str, messages: List[Dict[str, Any]], **params: Any) -> str:
+    """Key cache: sha256 của payload chuẩn hoá (model, messages, params sort theo tên)."""
+    payload = {
+        "model": model,
+        "messages": _normalize_messages(messages),
+        "params": {k: params[k] for k in sorted(params) if params[k] is not None},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return LLM_CACHE_KEY_PREFIX + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_enabled() -> bool:
+    return bool(get_settings().llm_cache_enabled)
+
+
+async def lookup(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Tìm response đã cache: {"content": str, "usage": {...}, "model": str} hoặc None.
+    Lỗi Redis / dữ liệu hỏng -> None (gọi LLM như bình thường).
+    """
+    raw = await cache_get(key)
+    if raw is None:
+        return None
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("content"), str):
+        return None
+    return data
+
+
+async def store(key: str, content: str, usage: Dict[str, int], model: str) -> None:
+    """Lưu response (content thô từ LLM + usage lúc gọi thật) và cắt bớt entry cũ nếu vượt LLM_CACHE_MAX_ENTRIES."""
+    settings = get_settings()
+    value = json.dumps({"content": content, "usage": usage, "model": model}, ensure_ascii=False)
+    await cache_set(key, value, ttl_seconds=settings.llm_cache_ttl_seconds)
+    await _enforce_max_entries(key, settings.llm_cache_max_entries)
+
+
+async def _enforce_max_entries(key: str, max_entries: int) -> None:
+    """Ghi key vào index (score = thời điểm ghi); vượt max_entries thì xoá các entry cũ nhất khỏi Redis + local."""
+    client = get_redis_if_available()
+    if client is None or max_entries <= 0:
+        return
+    try:
+        await client.zadd(LLM_CACHE_INDEX_KEY, {key: time.time()})
+        overflow = await client.zcard(LLM_CACHE_INDEX_KEY) - max_entries
+        if overflow <= 0:
+            return
+        evicted = await client.zpopmin(LLM_CACHE_INDEX_KEY, overflow)
+        old_keys = [k.decode() if isinstance(k, bytes) else k for k, _score in evicted]
+        if old_keys:
+            await client.delete(*[CACHE_PREFIX + k for k in old_keys])
+            local = get_local_cache()
+            for k in old_keys:
+                local.delete(k)
+            logger.info("llm_cache.evicted", count=len(old_keys))
+    except Exception as e:
+        logger.warning("llm_cache.index_error", error=str(e))
+        mark_redis_failure(e)
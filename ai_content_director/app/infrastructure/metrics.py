@@ -0,0 +1,78 @@
+"""
+Metrics in-process đơn giản (không phụ thuộc Prometheus): histogram latency theo operation.
+Đọc qua GET /api/metrics. Số liệu theo từng process, reset khi restart.
+"""
+import bisect
+from typing import Any, Dict, List, Optional, Sequence
+
+# Biên bucket (ms) mặc định cho call ra ngoài (LLM, Graph API, ...)
+DEFAULT_LATENCY_BUCKETS_MS: Sequence[float] = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    """Histogram latency (ms): đếm theo bucket, tổng, số lỗi; ước lượng p50/p95/p99 theo biên bucket."""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS) -> None:
+        self.buckets_ms: List[float] = sorted(buckets_ms)
+        self.counts: List[int] = [0] * (len(self.buckets_ms) + 1)  # bucket cuối = +Inf
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms: float, ok: bool = True) -> None:
+        """Ghi một lần đo."""
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        if not ok:
+            self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Biên trên của bucket chứa quantile q (None nếu chưa có dữ liệu; max_ms nếu rơi vào +Inf)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for idx, c in enumerate(self.counts):
+            running += c
+            if running >= target:
+                return self.buckets_ms[idx] if idx < len(self.buckets_ms) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Dict cho log/API."""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.sum_ms / self.count, 1) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets_ms": {
+                **{f"le_{int(b)}": c for b, c in zip(self.buckets_ms, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class HistogramRegistry:
+    """Nhóm histogram theo tên operation (vd llm.planner, llm.samples)."""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, name: str, latency_ms: float, ok: bool = True) -> None:
+        hist = self._histograms.get(name)
+        if hist is None:
+            hist = self._histograms[name] = LatencyHistogram()
+        hist.observe(latency_ms, ok)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: h.snapshot() for name, h in sorted(self._histograms.items())}
+
+
+# Registry dùng chung cả process
+latency_histograms = HistogramRegistry()
@@ -0,0 +1,120 @@
+"""
+OpenAI AsyncClient dùng chung cả process + giới hạn concurrency.
+- Một AsyncOpenAI với httpx pool keep-alive (OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE_CONNECTIONS),
+  không còn sync client + asyncio.to_thread (không chiếm thread pool, không mở TLS mới mỗi request).
+- Semaphore global (OPENAI_MAX_CONCURRENCY) + per-tenant (OPENAI_MAX_CONCURRENCY_PER_TENANT);
+  semaphore tenant bị bỏ khi không còn call nào giữ / chờ (KeyedSemaphore).
+- Latency mỗi call ghi vào histogram "llm.<operation>" (xem GET /api/metrics).
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+from uuid import UUID
+
+from app.config import get_settings
+from app.infrastructure.keyed_semaphore import KeyedSemaphore
+from app.infrastructure.metrics import latency_histograms
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_client: Any = None
+_global_semaphore: Optional[asyncio.Semaphore] = None
+_tenant_semaphores = KeyedSemaphore()
+
+
+def get_async_openai() -> Any:
+    """
+    AsyncOpenAI dùng chung (lazy init). None nếu chưa có OPENAI_API_KEY hoặc chưa cài openai.
+    Đóng bằng close_async_openai() trong lifespan shutdown.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    settings = get_settings()
+    if not settings.openai_api_key:
+        return None
+    try:
+        import httpx
+        from openai import AsyncOpenAI
+    except ImportError as e:
+        logger.warning("openai_client.import_failed", error=str(e))
+        return None
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(float(settings.openai_timeout_seconds), connect=10.0),
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=60.0,
+        ),
+    )
+    _client = AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        timeout=float(settings.openai_timeout_seconds),
+        max_retries=settings.openai_max_retries,
+        http_client=http_client,
+    )
+    logger.info(
+        "openai_client.created",
+        max_connections=settings.openai_max_connections,
+        max_concurrency=settings.openai_max_concurrency,
+    )
+    return _client
+
+
+async def close_async_openai() -> None:
+    """Đóng client + pool (lifespan shutdown)."""
+    global _client
+    if _client is None:
+        return
+    try:
+        await _client.close()
+    except Exception as e:
+        logger.warning("openai_client.close_error", error=str(e))
+    _client = None
+
+
+def _get_global_semaphore() -> asyncio.Semaphore:
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(max(1, get_settings().openai_max_concurrency))
+    return _global_semaphore
+
+
+@asynccontextmanager
+async def llm_slot(tenant_id: Optional[UUID] = None) -> AsyncIterator[None]:
+    """
+    Giữ 1 slot gọi LLM: slot tenant trước (tenant ồn ào không chiếm hết slot global), rồi slot global.
+    tenant_id None (vd job hệ thống) chỉ dùng slot global.
+    """
+    if tenant_id is None:
+        async with _get_global_semaphore():
+            yield
+        return
+    async with _tenant_semaphores.slot(str(tenant_id), get_settings().openai_max_concurrency_per_tenant):
+        async with _get_global_semaphore():
+            yield
+
+
+async def create_chat_completion(
+    operation: str,
+    tenant_id: Optional[UUID] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Gọi chat.completions.create qua client dùng chung, trong llm_slot, đo latency vào histogram.
+    Raise ValueError("openai_not_configured") nếu chưa có client; lỗi OpenAI raise nguyên trạng.
+    """
+    client = get_async_openai()
+    if client is None:
+        raise ValueError("openai_not_configured")
+    async with llm_slot(tenant_id):
+        start = time.perf_counter()
+        ok = False
+        try:
+            resp = await client.chat.completions.create(**kwargs)
+            ok = True
+            return resp
+        finally:
+            latency_histograms.observe(f"llm.{operation}", (time.perf_counter() - start) * 1000, ok=ok)
@@ -1,9 +1,14 @@
 """
-Redis cache placeholder: get/set/delete. Dung cho foundation stack.
-Khi khong co REDIS_URL thi no-op (tra None get, set/delete khong lam gi).
-Rate limit van dung Redis trong middleware; module nay la placeholder cho cache dung chung.
+Redis cache 2 tang: LRU/TTL trong process (tang 1) + Redis (tang 2).
+- Mot Redis client dung chung (connection pool) cho ca process, mo/dong trong app.main.lifespan.
+- Tang local gioi han so key (REDIS_CACHE_LOCAL_MAX_ITEMS), TTL rieng, co dem hit/miss.
+- Circuit breaker: lenh Redis loi/timeout -> get_redis_if_available() tra None trong REDIS_CIRCUIT_OPEN_SECONDS,
+  cac lookup (cache, rate limit, budget) di thang fallback thay vi moi request cho het socket timeout.
+Khi khong co REDIS_URL thi chi dung tang local (get tra None neu chua co, set/delete chi tac dong local).
 """
-from typing import Any, Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
 from app.config import get_settings
 from app.logging_config import get_logger
@@ -14,54 +19,220 @@ CACHE_PREFIX = "cache:"
 DEFAULT_TTL_SECONDS = 300
 
 
-async def cache_get(key: str) -> Optional[str]:
-    """Lay gia tri tu cache. Tra None neu khong co REDIS_URL hoac key khong ton tai."""
+class LocalLRUCache:
+    """
+    Cache LRU trong process, moi key co han TTL.
+    Vuot max_items thi loai key it dung nhat. Dem hit/miss/eviction de log va health.
+    Chi dung trong event loop (khong thread-safe), khong can lock.
+    """
+
+    def __init__(self, max_items: int, ttl_seconds: int) -> None:
+        self.max_items = max(1, max_items)
+        self.ttl_seconds = max(1, ttl_seconds)
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Lay value neu con han; het han thi xoa va tinh la miss."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[int] = None) -> None:
+        """Ghi value; TTL local khong vuot qua ttl_seconds cua cache."""
+        ttl = min(ttl_seconds or self.ttl_seconds, self.ttl_seconds)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Xoa key (khong loi neu khong co)."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Xoa het key va reset counter."""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """So lieu cho log/health: size, hits, misses, evictions, hit_ratio."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_items": self.max_items,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Trang thai process-wide: Redis client dung chung + cache local
+_redis_client: Any = None
+_local_cache: Optional[LocalLRUCache] = None
+# Circuit breaker: truoc moc nay (time.monotonic) khong goi Redis
+_circuit_open_until = 0.0
+
+
+def get_local_cache() -> LocalLRUCache:
+    """Tang local (lazy init tu settings)."""
+    global _local_cache
+    if _local_cache is None:
+        settings = get_settings()
+        _local_cache = LocalLRUCache(
+            max_items=settings.redis_cache_local_max_items,
+            ttl_seconds=settings.redis_cache_local_ttl_seconds,
+        )
+    return _local_cache
+
+
+def get_redis() -> Any:
+    """
+    Tra ve Redis client dung chung (connection pool), None neu khong co REDIS_URL.
+    Binh thuong client duoc tao trong init_redis() (lifespan); goi truoc lifespan thi lazy init.
+    """
+    global _redis_client
+    if _redis_client is not None:
+        return _redis_client
     settings = get_settings()
     if not settings.redis_url:
         return None
     try:
         from redis.asyncio import Redis
-        client = Redis.from_url(settings.redis_url, decode_responses=True)
-        try:
-            return await client.get(CACHE_PREFIX + key)
-        finally:
-            await client.aclose()
+    except ImportError:
+        logger.warning("redis_cache.redis_not_installed")
+        return None
+    _redis_client = Redis.from_url(
+        settings.redis_url,
+        decode_responses=True,
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout_seconds,
+        socket_connect_timeout=settings.redis_socket_timeout_seconds,
+        health_check_interval=30,
+    )
+    return _redis_client
+
+
+def redis_circuit_open() -> bool:
+    """True neu Redis vua loi va dang trong thoi gian bo qua."""
+    return _circuit_open_until > time.monotonic()
+
+
+def get_redis_if_available() -> Any:
+    """Nhu get_redis() nhung tra None khi circuit dang mo (goi tu cac lookup co fallback)."""
+    if redis_circuit_open():
+        return None
+    return get_redis()
+
+
+def mark_redis_failure(error: BaseException) -> None:
+    """Lenh Redis loi/timeout: mo circuit REDIS_CIRCUIT_OPEN_SECONDS (het han thi lookup ke tiep thu lai)."""
+    global _circuit_open_until
+    seconds = get_settings().redis_circuit_open_seconds
+    if seconds <= 0:
+        return
+    if not redis_circuit_open():
+        logger.warning("redis_cache.circuit_open", seconds=seconds, error=str(error) or type(error).__name__)
+    _circuit_open_until = time.monotonic() + seconds
+
+
+async def init_redis() -> None:
+    """Startup (lifespan): tao pool va ping thu. Loi Redis chi log, app van chay."""
+    client = get_redis()
+    get_local_cache()
+    if client is None:
+        logger.info("redis_cache.disabled", reason="REDIS_URL_not_set")
+        return
+    try:
+        await client.ping()
+        logger.info("redis_cache.pool_started", max_connections=get_settings().redis_max_connections)
+    except Exception as e:
+        logger.warning("redis_cache.ping_failed", error=str(e))
+
+
+async def close_redis() -> None:
+    """Shutdown (lifespan): dong pool, log thong ke cache local."""
+    global _redis_client
+    if _local_cache is not None:
+        logger.info("redis_cache.local_stats", **_local_cache.stats())
+    if _redis_client is None:
+        return
+    try:
+        await _redis_client.aclose()
+    except Exception as e:
+        logger.warning("redis_cache.close_error", error=str(e))
+    _redis_client = None
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Thong ke cache: local (hit/miss/eviction) + redis co bat hay khong."""
+    return {
+        "local": get_local_cache().stats(),
+        "redis_enabled": get_redis() is not None,
+        "redis_circuit_open": redis_circuit_open(),
+    }
+
+
+async def cache_get(key: str) -> Optional[str]:
+    """Lay gia tri: tang local truoc, roi Redis (hit Redis thi nap lai vao local). Tra None neu khong co."""
+    local = get_local_cache()
+    value = local.get(key)
+    if value is not None:
+        return value
+    client = get_redis_if_available()
+    if client is None:
+        return None
+    try:
+        value = await client.get(CACHE_PREFIX + key)
     except Exception as e:
         logger.warning("cache_get.error", key=key, error=str(e))
+        mark_redis_failure(e)
         return None
+    if value is not None:
+        local.set(key, value)
+    return value
 
 
 async def cache_set(key: str, value: str, ttl_seconds: int = DEFAULT_TTL_SECONDS) -> bool:
-    """Luu vao cache. Tra False neu khong co REDIS_URL hoac loi."""
-    settings = get_settings()
-    if not settings.redis_url:
+    """Luu vao ca 2 tang. Tra False neu khong co REDIS_URL, circuit mo hoac loi Redis (tang local van duoc ghi)."""
+    get_local_cache().set(key, value, ttl_seconds)
+    client = get_redis_if_available()
+    if client is None:
         return False
     try:
-        from redis.asyncio import Redis
-        client = Redis.from_url(settings.redis_url, decode_responses=True)
-        try:
-            await client.setex(CACHE_PREFIX + key, ttl_seconds, value)
-            return True
-        finally:
-            await client.aclose()
+        await client.setex(CACHE_PREFIX + key, ttl_seconds, value)
+        return True
     except Exception as e:
         logger.warning("cache_set.error", key=key, error=str(e))
+        mark_redis_failure(e)
         return False
 
 
 async def cache_delete(key: str) -> bool:
-    """Xoa key khoi cache. Tra False neu khong co REDIS_URL hoac loi."""
-    settings = get_settings()
-    if not settings.redis_url:
+    """Xoa key khoi ca 2 tang. Tra False neu khong co REDIS_URL hoac loi."""
+    get_local_cache().delete(key)
+    client = get_redis_if_available()
+    if client is None:
         return False
     try:
-        from redis.asyncio import Redis
-        client = Redis.from_url(settings.redis_url, decode_responses=True)
-        try:
-            await client.delete(CACHE_PREFIX + key)
-            return True
-        finally:
-            await client.aclose()
+        await client.delete(CACHE_PREFIX + key)
+        return True
     except Exception as e:
         logger.warning("cache_delete.error", key=key, error=str(e))
+        mark_redis_failure(e)
         return False
@@ -0,0 +1,240 @@
+"""
+Write-behind cho các bảng log ghi nhiều (approval_events, ai_usage_logs), bật bằng WRITE_BEHIND_ENABLED.
+- Trong request: buffer_row() xếp dòng vào session.info, không flush; trước commit (before_commit) flush ORM
+  rồi ghi cả buffer bằng 1 INSERT nhiều dòng / bảng. Rollback -> bỏ buffer. Dòng trong buffer chưa query được
+  trong cùng transaction (chỉ thấy sau commit).
+- Event SYSTEM (scheduler / publish / metrics) không cần nằm chung transaction: BackgroundBatcher gom qua
+  asyncio.Queue có giới hạn, ghi theo lô bằng session riêng; queue đầy -> caller ghi vào session như thường.
+  Lỗi DB tạm thời -> retry lô với backoff; shutdown ghi nốt lô đang ghi + queue (không mất dòng đã nhận).
+- Đếm flush mỗi session (after_flush) + số dòng write-behind -> get_db log "db.session_stats" cuối request.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_BUFFER_KEY = "write_behind_rows"
+_FLUSH_COUNT_KEY = "flush_count"
+_WRITTEN_KEY = "write_behind_written"
+
+# BackgroundBatcher: lô lỗi tạm thời retry với backoff (giây, nhân đôi tới MAX); đang shutdown chỉ thử N lần
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_BACKOFF_MAX_SECONDS = 30.0
+SHUTDOWN_WRITE_ATTEMPTS = 3
+STOP_TIMEOUT_SECONDS = 10.0
+_STOP = object()  # sentinel trong queue: task ghi nốt rồi thoát
+
+
+def is_enabled() -> bool:
+    return bool(get_settings().write_behind_enabled)
+
+
+def buffer_row(db: AsyncSession, model: type, values: Dict[str, Any]) -> bool:
+    """
+    Xếp 1 dòng (key = tên attribute ORM, đã có id) vào buffer của session; ghi lúc commit.
+    False nếu write-behind tắt (caller tự db.add + flush).
+    """
+    if not is_enabled():
+        return False
+    db.sync_session.info.setdefault(_BUFFER_KEY, []).append((model, values))
+    return True
+
+
+def _group_rows(rows: List[Tuple[type, Dict[str, Any]]]) -> Dict[type, List[Dict[str, Any]]]:
+    grouped: Dict[type, List[Dict[str, Any]]] = defaultdict(list)
+    for model, values in rows:
+        grouped[model].append(values)
+    return grouped
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_buffer_before_commit(session: Session) -> None:
+    # Chạy trong greenlet của AsyncSession nên execute sync được. Flush trước để FK (content_items...) đã có.
+    rows = session.info.pop(_BUFFER_KEY, None)
+    if not rows:
+        return
+    session.flush()
+    for model, params in _group_rows(rows).items():
+        session.execute(insert(model), params)
+    session.info[_WRITTEN_KEY] = session.info.get(_WRITTEN_KEY, 0) + len(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_buffer_on_rollback(session: Session) -> None:
+    dropped = session.info.pop(_BUFFER_KEY, None)
+    if dropped:
+        logger.warning("write_behind.dropped_on_rollback", rows=len(dropped))
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flush(session: Session, flush_context: Any) -> None:
+    session.info[_FLUSH_COUNT_KEY] = session.info.get(_FLUSH_COUNT_KEY, 0) + 1
+
+
+def get_session_stats(db: AsyncSession) -> Dict[str, int]:
+    """Số flush ORM + số dòng write-behind đã ghi / còn trong buffer của session."""
+    info = db.sync_session.info
+    return {
+        "flush_count": info.get(_FLUSH_COUNT_KEY, 0),
+        "write_behind_rows": info.get(_WRITTEN_KEY, 0),
+        "write_behind_pending": len(info.get(_BUFFER_KEY) or []),
+    }
+
+
+class BackgroundBatcher:
+    """
+    Queue có giới hạn + 1 task ghi theo lô (tối đa batch_size dòng hoặc mỗi interval giây).
+    Lô lỗi dữ liệu (IntegrityError / DataError, vd FK tới content đã xoá) -> ghi lại từng dòng, chỉ bỏ dòng lỗi.
+    Lỗi khác (DB mất kết nối...) -> retry cả lô với backoff, không bỏ dòng; queue đầy thì caller ghi inline.
+    stop(): ngừng nhận dòng mới, task ghi nốt lô đang ghi + phần còn trong queue rồi mới thoát.
+    """
+
+    def __init__(self) -> None:
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    def start(self) -> None:
+        if not is_enabled() or self.running:
+            return
+        settings = get_settings()
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=max(1, settings.write_behind_queue_max))
+        self._task = asyncio.create_task(self._run(), name="write_behind_batcher")
+        logger.info("write_behind.batcher_started", queue_max=settings.write_behind_queue_max)
+
+    async def stop(self) -> None:
+        """Dừng nhận dòng mới, chờ task ghi hết (lô đang ghi + queue) tối đa STOP_TIMEOUT_SECONDS (shutdown)."""
+        if self._task is None:
+            return
+        self._stopping = True
+
+        async def _finish() -> None:
+            await self._queue.put(_STOP)
+            await self._task
+
+        try:
+            await asyncio.wait_for(_finish(), STOP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("write_behind.stop_timeout", queued=self._queue.qsize())
+        self._task = None
+
+    def submit(self, model: type, values: Dict[str, Any]) -> bool:
+        """Đưa 1 dòng vào queue; False nếu batcher không chạy / đang dừng hoặc queue đầy (caller ghi inline)."""
+        if not self.running or self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((model, values))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        return True
+
+    async def _run(self) -> None:
+        settings = get_settings()
+        interval = max(0.05, settings.write_behind_flush_interval_seconds)
+        stop = False
+        while not stop:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + interval
+            while len(batch) < settings.write_behind_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+        await self._drain()
+
+    async def _drain(self) -> None:
+        if self._queue is None:
+            return
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+        if batch:
+            await self._write(batch)
+
+    async def _insert(self, batch: List[Tuple[type, Dict[str, Any]]]) -> None:
+        from app.db import async_session_factory
+
+        async with async_session_factory() as db:
+            for model, params in _group_rows(batch).items():
+                await db.execute(insert(model), params)
+            await db.commit()
+
+    async def _write(self, batch: List[Tuple[type, Dict[str, Any]]]) -> None:
+        pending = batch
+        attempt = 0
+        while pending:
+            try:
+                await self._insert(pending)
+                self.written += len(pending)
+                return
+            except (IntegrityError, DataError) as e:
+                logger.warning("write_behind.batch_failed", rows=len(pending), error=str(e))
+                pending = await self._write_rows(pending)
+                if not pending:
+                    return
+            except Exception as e:
+                logger.warning("write_behind.batch_retry", rows=len(pending), attempt=attempt + 1, error=str(e))
+            attempt += 1
+            if self._stopping and attempt >= SHUTDOWN_WRITE_ATTEMPTS:
+                self.dropped += len(pending)
+                logger.warning("write_behind.batch_dropped", rows=len(pending), attempts=attempt)
+                return
+            await asyncio.sleep(min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+
+    async def _write_rows(self, batch: List[Tuple[type, Dict[str, Any]]]) -> List[Tuple[type, Dict[str, Any]]]:
+        """Ghi từng dòng, bỏ dòng lỗi dữ liệu; gặp lỗi khác thì trả phần chưa ghi để retry cả lô."""
+        for idx, (model, values) in enumerate(batch):
+            try:
+                await self._insert([(model, values)])
+                self.written += 1
+            except (IntegrityError, DataError) as e:
+                self.dropped += 1
+                logger.warning("write_behind.row_dropped", table=model.__tablename__, error=str(e))
+            except Exception as e:
+                logger.warning("write_behind.row_retry", table=model.__tablename__, error=str(e))
+                return batch[idx:]
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+system_event_batcher = BackgroundBatcher()
@@ -4,6 +4,10 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app import __version__
+from app.infrastructure.http_clients import close_http_clients, init_http_clients
+from app.infrastructure.openai_client import close_async_openai
+from app.infrastructure.redis_cache import close_redis, init_redis
+from app.infrastructure.write_behind import system_event_batcher
 from app.logging_config import configure_logging, get_logger
 from app.middleware.correlation_id import CorrelationIdMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
@@ -32,13 +36,22 @@ logger = get_logger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Startup/shutdown: logging, scheduler worker, teardown."""
+    """Startup/shutdown: logging, Redis pool, HTTP clients, write-behind batcher, scheduler worker, Drive ingest jobs, teardown."""
     configure_logging()
     logger.info("app_started", version=__version__)
+    await init_redis()
+    init_http_clients()
+    system_event_batcher.start()
     from app.services.scheduler_service import start_scheduler, stop_scheduler
+    from app.services.gdrive_ingest_jobs import stop_ingest_jobs
     await start_scheduler(app)
     yield
     await stop_scheduler()
+    await stop_ingest_jobs()
+    await system_event_batcher.stop()
+    await close_async_openai()
+    await close_http_clients()
+    await close_redis()
     logger.info("app_shutdown")
 
 
@@ -1,9 +1,10 @@
 # Correlation-ID middleware: doc X-Correlation-ID tu header hoac tao moi, gan vao context va response header.
+# Pure ASGI (khong dung BaseHTTPMiddleware): khong tao task/stream trung gian, khong boc body -> streaming response giu nguyen.
 import uuid
-from typing import Callable
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+import structlog.contextvars
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.logging_config import get_logger
 
@@ -12,17 +13,26 @@ logger = get_logger(__name__)
 HEADER_CORRELATION_ID = "X-Correlation-ID"
 
 
-class CorrelationIdMiddleware(BaseHTTPMiddleware):
+class CorrelationIdMiddleware:
     """Gan correlation_id vao request context va response header."""
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        correlation_id = request.headers.get(HEADER_CORRELATION_ID, "").strip()
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        correlation_id = Headers(scope=scope).get(HEADER_CORRELATION_ID, "").strip()
         if not correlation_id:
             correlation_id = str(uuid.uuid4())
-        import structlog.contextvars
         structlog.contextvars.clear_contextvars()
         structlog.contextvars.bind_contextvars(correlation_id=correlation_id)
 
-        response = await call_next(request)
-        response.headers[HEADER_CORRELATION_ID] = correlation_id
-        return response
+        async def send_with_header(message: Message) -> None:
+            # Chi sua header o http.response.start; body di thang xuong send goc
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[HEADER_CORRELATION_ID] = correlation_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_header)
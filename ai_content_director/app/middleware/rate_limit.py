@@ -1,81 +1,201 @@
 """
-Rate limit middleware: Redis sliding window, key theo X-Tenant-ID hoặc X-API-Key.
+Rate limit middleware: token bucket (Lua, 1 round-trip Redis), key theo X-Tenant-ID hoặc X-API-Key.
+- Mỗi key chỉ lưu 1 hash {tokens, ts} trong Redis (O(1) bộ nhớ, không phụ thuộc limit).
+- Dùng Redis client dùng chung (pool) từ app.infrastructure.redis_cache.
+- Redis lỗi/chậm quá RATE_LIMIT_REDIS_TIMEOUT_MS: fallback token bucket trong process (xấp xỉ, theo từng replica)
+  và mở circuit breaker của redis_cache -> các request kế tiếp dùng fallback ngay, không chờ timeout.
+- Override theo route (RATE_LIMIT_ROUTE_OVERRIDES) và theo tenant (RATE_LIMIT_TENANT_OVERRIDES).
 Default 60 req/min/tenant. Khi không có REDIS_URL thì bỏ qua (không block).
 """
+import asyncio
+import math
 import time
-import uuid
-from typing import Callable, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.config import get_settings
+from app.infrastructure.redis_cache import get_redis_if_available, mark_redis_failure
 from app.logging_config import get_logger
 
 logger = get_logger(__name__)
 
 REDIS_KEY_PREFIX = "rl:"
 WINDOW_SECONDS = 60
+# Số bucket tối đa giữ trong fallback local (LRU), tránh phình bộ nhớ khi Redis down lâu.
+LOCAL_MAX_BUCKETS = 10_000
+
+# Token bucket: refill liên tục rate token/giây, tối đa capacity. Dùng TIME của Redis để mọi replica cùng đồng hồ.
+# Trả về {allowed (0/1), tokens còn lại (string vì Lua number -> integer khi trả về)}.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+if tokens == nil or ts == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_script: Any = None
+_script_client: Any = None
+
+
+class LocalTokenBucket:
+    """
+    Token bucket trong process, dùng khi Redis lỗi/chậm.
+    Xấp xỉ: mỗi replica đếm riêng. Giữ tối đa max_buckets key (LRU).
+    """
+
+    def __init__(self, max_buckets: int = LOCAL_MAX_BUCKETS) -> None:
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, capacity: int, rate: float) -> Tuple[bool, float]:
+        """Lấy 1 token. Trả về (allowed, tokens còn lại)."""
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key, (float(capacity), now))
+        tokens = min(float(capacity), tokens + max(0.0, now - ts) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+_local_bucket = LocalTokenBucket()
+
+
+@lru_cache(maxsize=8)
+def _parse_overrides(raw: str) -> Dict[str, int]:
+    """Parse 'a=10,b=20' -> {'a': 10, 'b': 20}. Bỏ qua phần tử sai định dạng."""
+    out: Dict[str, int] = {}
+    for part in (raw or "").split(","):
+        name, sep, value = part.strip().rpartition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            out[name.strip()] = int(value)
+        except ValueError:
+            logger.warning("rate_limit.invalid_override", entry=part)
+    return out
 
 
-def _rate_limit_key(request: Request) -> Optional[str]:
+def _rate_limit_key(headers: Headers) -> Optional[str]:
     """Lấy key cho rate limit: X-Tenant-ID hoặc X-API-Key (nếu có)."""
-    tenant = request.headers.get("X-Tenant-ID", "").strip()
+    tenant = headers.get("X-Tenant-ID", "").strip()
     if tenant:
         return f"tenant:{tenant}"
-    api_key = request.headers.get("X-API-Key", "").strip()
+    api_key = headers.get("X-API-Key", "").strip()
     if api_key:
         return f"key:{api_key[:32]}"
     return None
 
 
-async def _check_sliding_window(redis_url: str, key: str, limit: int) -> bool:
+def resolve_limit(path: str, key: str) -> Tuple[int, str]:
     """
-    Sliding window: ZADD now, ZREMRANGEBYSCORE -inf (now-60), ZCARD.
-    Returns True nếu cho phép request (dưới limit), False nếu vượt.
+    Chọn limit (req/phút) và bucket cho request.
+    - Route override (prefix dài nhất khớp path): bucket riêng cho route đó.
+    - Không có route override: tenant override (theo tenant id) hoặc RATE_LIMIT_PER_MIN.
+    Trả về (limit, bucket_key).
     """
-    try:
-        from redis.asyncio import Redis
-    except ImportError:
-        logger.warning("rate_limit.redis_not_installed")
-        return True
-    now = time.time()
-    rkey = REDIS_KEY_PREFIX + key
-    try:
-        client = Redis.from_url(redis_url, decode_responses=True)
+    settings = get_settings()
+    routes = _parse_overrides(settings.rate_limit_route_overrides)
+    matches = [prefix for prefix in routes if path.startswith(prefix)]
+    if matches:
+        prefix = max(matches, key=len)
+        return routes[prefix], f"{key}:{prefix}"
+    tenants = _parse_overrides(settings.rate_limit_tenant_overrides)
+    tenant_id = key.split(":", 1)[1] if key.startswith("tenant:") else None
+    if tenant_id and tenant_id in tenants:
+        return tenants[tenant_id], key
+    return settings.rate_limit_per_min, key
+
+
+def _get_script(client: Any) -> Any:
+    """register_script một lần cho client dùng chung (EVALSHA, tự nạp lại khi NOSCRIPT)."""
+    global _script, _script_client
+    if _script is None or _script_client is not client:
+        _script = client.register_script(TOKEN_BUCKET_LUA)
+        _script_client = client
+    return _script
+
+
+async def _check_token_bucket(bucket: str, limit: int) -> Tuple[bool, float]:
+    """
+    Token bucket: capacity = limit, refill limit/60 token mỗi giây.
+    Redis lỗi, quá timeout hoặc circuit đang mở -> fallback LocalTokenBucket (không fail-open).
+    Trả về (allowed, tokens còn lại).
+    """
+    settings = get_settings()
+    capacity = max(1, limit)
+    rate = capacity / WINDOW_SECONDS
+    client = get_redis_if_available()
+    if client is not None:
         try:
-            pipe = client.pipeline()
-            pipe.zadd(rkey, {str(uuid.uuid4()): now})
-            pipe.zremrangebyscore(rkey, "-inf", now - WINDOW_SECONDS)
-            pipe.zcard(rkey)
-            pipe.expire(rkey, WINDOW_SECONDS + 10)
-            results = await pipe.execute()
-            count = results[2] if len(results) > 2 else 0
-            return count <= limit
-        finally:
-            await client.aclose()
-    except Exception as e:
-        logger.warning("rate_limit.redis_error", key=key, error=str(e))
-        return True
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware: rate limit theo tenant_id hoặc api_key header (Redis sliding window)."""
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        settings = get_settings()
-        if not settings.redis_url:
-            return await call_next(request)
-        key = _rate_limit_key(request)
+            script = _get_script(client)
+            allowed, tokens = await asyncio.wait_for(
+                script(keys=[REDIS_KEY_PREFIX + bucket], args=[capacity, rate]),
+                timeout=settings.rate_limit_redis_timeout_ms / 1000,
+            )
+            return bool(int(allowed)), float(tokens)
+        except Exception as e:
+            logger.warning("rate_limit.redis_fallback_local", key=bucket, error=str(e) or type(e).__name__)
+            mark_redis_failure(e)
+    return _local_bucket.take(bucket, capacity, rate)
+
+
+class RateLimitMiddleware:
+    """
+    Middleware: rate limit theo tenant_id hoặc api_key header (token bucket Redis, fallback local).
+    Pure ASGI: request được phép thì chuyển thẳng scope/receive/send, không bọc response.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not get_settings().redis_url:
+            await self.app(scope, receive, send)
+            return
+        key = _rate_limit_key(Headers(scope=scope))
         if not key:
-            return await call_next(request)
-        limit = settings.rate_limit_per_min
-        allowed = await _check_sliding_window(settings.redis_url, key, limit)
+            await self.app(scope, receive, send)
+            return
+        limit, bucket = resolve_limit(scope["path"], key)
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+        allowed, tokens = await _check_token_bucket(bucket, limit)
         if not allowed:
-            logger.info("rate_limit.exceeded", key=key, limit=limit)
-            return Response(
+            retry_after = max(1, math.ceil((1 - tokens) * WINDOW_SECONDS / limit))
+            logger.info("rate_limit.exceeded", key=bucket, limit=limit)
+            response = Response(
                 content='{"detail":"Rate limit exceeded (per tenant/key)."}',
                 status_code=429,
                 media_type="application/json",
+                headers={"Retry-After": str(retry_after)},
             )
-        return await call_next(request)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -14,6 +14,8 @@ from app.models.ai_usage_log import AiUsageLog
 from app.models.lead_signal import LeadSignal
 from app.models.content_asset import ContentAsset
 from app.models.asset_summary import AssetSummary
+from app.models.gdrive_sync_state import GdriveSyncState
+from app.models.gdrive_ingest_job import GdriveIngestJob
 
 __all__ = [
     "Tenant",
@@ -31,4 +33,6 @@ __all__ = [
     "LeadSignal",
     "ContentAsset",
     "AssetSummary",
+    "GdriveSyncState",
+    "GdriveIngestJob",
 ]
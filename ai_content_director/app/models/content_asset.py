@@ -45,6 +45,12 @@ class ContentAsset(Base):
     fb_media_fbid: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     fb_video_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     error_reason: Mapped[Optional[str]] = mapped_column(Text(), nullable=True)
+    # SHA-256 nội dung file (hex): file giống nhau dưới drive_file_id khác dùng chung blob + summary
+    content_sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # Resumable video upload (Graph): session đang dở + offset đã gửi; xoá khi upload xong
+    fb_upload_session_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    fb_upload_video_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    fb_upload_offset: Mapped[int] = mapped_column(BigInteger(), default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -48,6 +48,9 @@ class ContentItem(Base):
     publish_attempts: Mapped[int] = mapped_column(default=0, nullable=False)
     last_publish_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     last_publish_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Lease scheduler: worker giữ item publishing đến locked_until (heartbeat gia hạn); hết hạn thì claim lại
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    locked_by: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
     require_media: Mapped[bool] = mapped_column(default=True, nullable=False)
     primary_asset_type: Mapped[str] = mapped_column(String(16), default="image", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
@@ -1,6 +1,7 @@
 """Content plan model (30-day planner)."""
 import uuid
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
 from sqlalchemy.dialects.postgresql import UUID
@@ -24,6 +25,12 @@ class ContentPlan(Base):
         ForeignKey("tenants.id", ondelete="CASCADE"),
         nullable=False,
     )
+    # Nguồn materialize (generated_plans); unique (generated_plan_id, day_number) chống materialize trùng
+    generated_plan_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("generated_plans.id", ondelete="SET NULL"),
+        nullable=True,
+    )
     day_number: Mapped[int] = mapped_column(Integer, nullable=False)
     topic: Mapped[str] = mapped_column(String(512), nullable=False)
     content_angle: Mapped[str] = mapped_column(Text, nullable=True)
@@ -0,0 +1,52 @@
+"""Google Drive ingest job – ingest chạy nền (POST /api/gdrive/ingest), tiến độ theo file."""
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import Base
+
+
+class GdriveIngestJob(Base):
+    """
+    Một lần ingest dropzone của tenant. status: queued | running | succeeded | failed.
+    Tối đa 1 job queued/running mỗi tenant (partial unique index): ingest thứ 2 gộp vào job đang chạy.
+    locked_by / locked_until: lease của process đang chạy job; hết lease (process chết) -> job bị đóng failed.
+    """
+
+    __tablename__ = "gdrive_ingest_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    tenant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("tenants.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    mode: Mapped[str] = mapped_column(String(16), nullable=False)  # full | incremental
+    status: Mapped[str] = mapped_column(String(16), default="queued", nullable=False)
+    files_total: Mapped[int] = mapped_column(Integer(), default=0, server_default="0", nullable=False)
+    files_done: Mapped[int] = mapped_column(Integer(), default=0, server_default="0", nullable=False)
+    count_ingested: Mapped[int] = mapped_column(Integer(), default=0, server_default="0", nullable=False)
+    count_invalid: Mapped[int] = mapped_column(Integer(), default=0, server_default="0", nullable=False)
+    count_skipped: Mapped[int] = mapped_column(Integer(), default=0, server_default="0", nullable=False)
+    bytes_downloaded: Mapped[int] = mapped_column(BigInteger(), default=0, server_default="0", nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text(), nullable=True)
+    locked_by: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
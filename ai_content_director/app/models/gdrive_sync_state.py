@@ -0,0 +1,30 @@
+"""Google Drive sync state – start page token (Changes API) theo tenant + folder READY."""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import Base
+
+
+class GdriveSyncState(Base):
+    """
+    Token changes.list đã xử lý tới đâu cho (tenant, folder).
+    Ingest incremental đọc token, lấy các thay đổi sau token, lưu newStartPageToken.
+    """
+
+    __tablename__ = "gdrive_sync_state"
+
+    tenant_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("tenants.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    folder_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    start_page_token: Mapped[str] = mapped_column(String(255), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
@@ -2,12 +2,19 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Text, func
-from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy import Computed, DateTime, ForeignKey, LargeBinary, Text, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db import Base
 
+# tsvector sinh tự động (migration 020): bỏ dấu tiếng Việt (kb_unaccent), config 'simple' (không stem),
+# title trọng số A, content trọng số B.
+KB_SEARCH_TSV_SQL = (
+    "setweight(to_tsvector('simple', kb_unaccent(coalesce(title, ''))), 'A') || "
+    "setweight(to_tsvector('simple', kb_unaccent(coalesce(content, ''))), 'B')"
+)
+
 
 class KbItem(Base):
     """
@@ -30,6 +37,15 @@ class KbItem(Base):
     title: Mapped[str] = mapped_column(Text, nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     tags: Mapped[list | None] = mapped_column(JSONB, nullable=True)  # ["tag1", "tag2"]
+    # Full-text search (GIN); cột generated, không ghi từ app, không load mặc định
+    search_tsv: Mapped[str | None] = mapped_column(
+        TSVECTOR,
+        Computed(KB_SEARCH_TSV_SQL, persisted=True),
+        deferred=True,
+        nullable=True,
+    )
+    # Embedding hashing TF (float32 x EMBEDDING_DIM, kb_vector_index) cho semantic search; NULL = tính lúc load index
+    embedding: Mapped[bytes | None] = mapped_column(LargeBinary, deferred=True, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
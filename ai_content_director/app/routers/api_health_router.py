@@ -1,11 +1,16 @@
 # Foundation health: /api/healthz (liveness), /api/readyz (readiness). readyz check DB + Redis.
+# /api/metrics: so lieu in-process (cache hit/miss, pool HTTP, histogram latency call ra ngoai).
 from fastapi import APIRouter, Depends
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.config import get_settings
+from app.infrastructure.http_clients import get_http_pool_stats
+from app.infrastructure.kb_vector_index import get_vector_index_stats
+from app.infrastructure.metrics import latency_histograms
+from app.infrastructure.redis_cache import get_cache_stats, get_redis
+from app.infrastructure.write_behind import system_event_batcher
 from app.logging_config import get_logger
 
 router = APIRouter(prefix="/api", tags=["health"])
@@ -30,13 +35,10 @@ async def readyz(db: AsyncSession = Depends(get_db)):
             content={"status": "unhealthy", "db": "fail"},
         )
 
-    settings = get_settings()
-    if settings.redis_url:
+    client = get_redis()
+    if client is not None:
         try:
-            from redis.asyncio import Redis
-            client = Redis.from_url(settings.redis_url, decode_responses=True)
             await client.ping()
-            await client.aclose()
         except Exception as e:
             logger.warning("readyz.redis_fail", error=str(e))
             return JSONResponse(
@@ -45,3 +47,15 @@ async def readyz(db: AsyncSession = Depends(get_db)):
             )
 
     return {"status": "ok", "db": "ok", "redis": "ok"}
+
+
+@router.get("/metrics")
+def metrics() -> dict:
+    """So lieu in-process cua replica nay: cache (local/Redis), pool HTTP theo upstream, vector index KB, latency histogram."""
+    return {
+        "cache": get_cache_stats(),
+        "http_pools": get_http_pool_stats(),
+        "kb_vector_index": get_vector_index_stats(),
+        "write_behind": system_event_batcher.stats(),
+        "latency": latency_histograms.snapshot(),
+    }
@@ -1,12 +1,13 @@
 """Audit log API: liệt kê events (GENERATE_PLAN, GENERATE_CONTENT, APPROVED, ...)."""
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.schemas.audit import AuditEventOut, AuditEventsResponse
+from app.schemas.audit import AuditEventsResponse
 from app.services.approval_service import list_audit_events
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
 
 router = APIRouter(prefix="/audit", tags=["audit"])
 
@@ -14,21 +15,13 @@ router = APIRouter(prefix="/audit", tags=["audit"])
 @router.get("/events", response_model=AuditEventsResponse)
 async def get_audit_events(
     tenant_id: UUID = Query(..., description="Tenant UUID"),
-    limit: int = Query(50, ge=1, le=200, description="Số dòng tối đa"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT, description="Số dòng tối đa"),
+    cursor: str | None = Query(None, description="next_cursor của trang trước"),
     db: AsyncSession = Depends(get_db),
 ) -> AuditEventsResponse:
-    """Lấy audit log của tenant (mới nhất trước)."""
-    events = await list_audit_events(db, tenant_id=tenant_id, limit=limit)
-    out = [
-        AuditEventOut(
-            id=ev.id,
-            tenant_id=ev.tenant_id,
-            content_id=ev.content_id,
-            event_type=ev.event_type,
-            actor=ev.actor,
-            metadata=ev.metadata_,
-            created_at=ev.created_at,
-        )
-        for ev in events
-    ]
-    return AuditEventsResponse(tenant_id=tenant_id, events=out)
+    """Lấy audit log của tenant (mới nhất trước), phân trang bằng cursor."""
+    try:
+        events, next_cursor = await list_audit_events(db, tenant_id=tenant_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return AuditEventsResponse(tenant_id=tenant_id, events=events, next_cursor=next_cursor)
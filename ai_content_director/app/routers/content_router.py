@@ -20,6 +20,7 @@ from app.schemas.content import (
 )
 from app.services.content_service import generate_sample_posts, list_content, schedule_content, unschedule_content
 from app.services.approval_service import approve_content, reject_content
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
 from app.utils.query_params import ensure_bool_query
 
 router = APIRouter(prefix="/content", tags=["content"])
@@ -76,12 +77,17 @@ async def post_content_generate_samples(
 @router.get("/list", response_model=ContentListResponse)
 async def get_content_list(
     tenant_id: UUID = Query(..., description="Tenant UUID"),
-    status: str | None = Query(None, description="Lọc theo status: draft | approved | published"),
+    status_filter: str | None = Query(None, alias="status", description="Lọc theo status: draft | approved | published"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT, description="Số dòng tối đa mỗi trang"),
+    cursor: str | None = Query(None, description="next_cursor của trang trước"),
     db: AsyncSession = Depends(get_db),
 ) -> ContentListResponse:
-    """Liệt kê content items của tenant. Có thể lọc theo status."""
-    items = await list_content(db, tenant_id=tenant_id, status=status)
-    return ContentListResponse(tenant_id=tenant_id, items=items)
+    """Liệt kê content items của tenant (mới nhất trước). Có thể lọc theo status; phân trang bằng cursor."""
+    try:
+        items, next_cursor = await list_content(db, tenant_id=tenant_id, status=status_filter, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return ContentListResponse(tenant_id=tenant_id, items=items, next_cursor=next_cursor)
 
 
 @router.post("/{content_id}/approve")
@@ -1,8 +1,9 @@
-"""Google Drive ingest + danh sách content assets."""
+"""Google Drive ingest (job chạy nền) + danh sách content assets."""
 from uuid import UUID
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -11,27 +12,37 @@ from app.models import ContentAsset
 from app.schemas.gdrive_assets import (
     AssetsListResponse,
     ContentAssetOut,
+    GdriveIngestJobOut,
     GdriveIngestRequest,
-    GdriveIngestResponse,
 )
-from app.services.gdrive_dropzone import ingest_ready_assets
+from app.services.gdrive_dropzone import resolve_ingest_mode
+from app.services.gdrive_ingest_jobs import (
+    enqueue_ingest_job,
+    get_job,
+    iter_job_progress,
+    job_to_out,
+    wait_for_job,
+)
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, keyset_page, split_page
 
 router = APIRouter(prefix="/api", tags=["gdrive", "assets"])
 
 
-@router.post("/gdrive/ingest", response_model=GdriveIngestResponse)
+@router.post("/gdrive/ingest", response_model=GdriveIngestJobOut, status_code=status.HTTP_202_ACCEPTED)
 async def post_gdrive_ingest(
     payload: GdriveIngestRequest,
+    response: Response,
+    wait: bool = Query(False, description="true: chờ job xong rồi trả kết quả (200)"),
     db: AsyncSession = Depends(get_db),
-) -> GdriveIngestResponse:
+) -> GdriveIngestJobOut:
     """
-    Quét thư mục READY (images/videos) trên Google Drive, tải về local, ghi content_assets.
-    Trả về count_ingested, count_invalid.
+    Tạo job ingest chạy nền (quét READY images/videos trên Google Drive, tải về local, ghi content_assets), trả 202 + job_id.
+    Tenant đã có job đang chạy -> trả job đó (coalesced=true), không quét lần 2.
+    mode=incremental: chỉ xử lý file thay đổi từ lần ingest trước (Drive Changes API).
+    Tiến độ: GET /api/gdrive/ingest/jobs/{job_id} hoặc .../stream (NDJSON).
     """
     try:
-        count_ingested, count_invalid, count_skipped = await ingest_ready_assets(
-            db, tenant_id=payload.tenant_id
-        )
+        mode = resolve_ingest_mode(payload.mode)
     except ValueError as e:
         err = str(e)
         if "GDRIVE_SA_JSON_PATH" in err or "GDRIVE_READY" in err or "GDRIVE_PROCESSED" in err or "GDRIVE_REJECTED" in err:
@@ -40,47 +51,71 @@ async def post_gdrive_ingest(
                 detail="Cấu hình Google Drive chưa đủ (GDRIVE_SA_JSON_PATH, folder IDs).",
             )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=err)
-    return GdriveIngestResponse(
-        tenant_id=payload.tenant_id,
-        count_ingested=count_ingested,
-        count_invalid=count_invalid,
-        count_skipped=count_skipped,
-    )
+    job, coalesced = await enqueue_ingest_job(db, payload.tenant_id, mode)
+    if wait:
+        done = await wait_for_job(payload.tenant_id, job.id)
+        if done is not None:
+            response.status_code = status.HTTP_200_OK
+            return done.model_copy(update={"coalesced": coalesced})
+    return job_to_out(job, coalesced=coalesced)
+
+
+@router.get("/gdrive/ingest/jobs/{job_id}", response_model=GdriveIngestJobOut)
+async def get_gdrive_ingest_job(
+    job_id: UUID,
+    tenant_id: UUID = Query(..., description="Tenant UUID"),
+    db: AsyncSession = Depends(get_db),
+) -> GdriveIngestJobOut:
+    """Trạng thái + tiến độ job ingest: số file, counts, bytes, thông lượng."""
+    job = await get_job(db, tenant_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="job_not_found")
+    return job_to_out(job)
+
+
+@router.get("/gdrive/ingest/jobs/{job_id}/stream")
+async def stream_gdrive_ingest_job(
+    job_id: UUID,
+    tenant_id: UUID = Query(..., description="Tenant UUID"),
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Stream tiến độ job (application/x-ndjson): mỗi dòng 1 GdriveIngestJobOut khi tiến độ đổi,
+    đóng stream sau dòng succeeded/failed.
+    """
+    if await get_job(db, tenant_id, job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="job_not_found")
+
+    async def _lines() -> AsyncIterator[str]:
+        async for out in iter_job_progress(tenant_id, job_id):
+            yield out.model_dump_json() + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+# Projection cho GET /api/assets: đúng các cột của ContentAssetOut
+_ASSET_LIST_COLUMNS = [getattr(ContentAsset, name) for name in ContentAssetOut.model_fields]
 
 
 @router.get("/assets", response_model=AssetsListResponse)
 async def get_assets(
     tenant_id: UUID = Query(..., description="Tenant UUID"),
     status_filter: Optional[str] = Query(None, alias="status", description="Lọc theo status: ready|cached|invalid|uploaded"),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT, description="Số dòng tối đa mỗi trang"),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
     db: AsyncSession = Depends(get_db),
 ) -> AssetsListResponse:
-    """Lấy danh sách content assets của tenant, có thể lọc theo status."""
-    q = select(ContentAsset).where(ContentAsset.tenant_id == tenant_id).order_by(ContentAsset.created_at.desc())
+    """Lấy danh sách content assets của tenant (mới nhất trước), có thể lọc theo status; phân trang bằng cursor."""
+    q = select(*_ASSET_LIST_COLUMNS).where(ContentAsset.tenant_id == tenant_id)
     if status_filter:
         q = q.where(ContentAsset.status == status_filter)
-    r = await db.execute(q)
-    assets = list(r.scalars().all())
+    try:
+        q = keyset_page(q, ContentAsset.created_at, ContentAsset.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    rows, next_cursor = split_page((await db.execute(q)).all(), limit)
     return AssetsListResponse(
         tenant_id=tenant_id,
-        assets=[
-            ContentAssetOut(
-                id=a.id,
-                tenant_id=a.tenant_id,
-                content_id=a.content_id,
-                asset_type=a.asset_type,
-                drive_file_id=a.drive_file_id,
-                file_name=a.file_name,
-                mime_type=a.mime_type,
-                size_bytes=a.size_bytes,
-                storage_url=a.storage_url,
-                local_path=a.local_path,
-                status=a.status,
-                fb_media_fbid=a.fb_media_fbid,
-                fb_video_id=a.fb_video_id,
-                error_reason=a.error_reason,
-                created_at=a.created_at,
-                updated_at=a.updated_at,
-            )
-            for a in assets
-        ],
+        assets=[ContentAssetOut(**row._mapping) for row in rows],
+        next_cursor=next_cursor,
     )
@@ -1,7 +1,10 @@
-"""KB (Knowledge Base) API: items CRUD + query ILIKE."""
+"""KB (Knowledge Base) API: items CRUD + query xếp hạng (full-text / semantic / hybrid)."""
+from typing import Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
@@ -14,11 +17,13 @@ from app.schemas.kb import (
     KbQueryResponse,
     KbQueryItem,
 )
+from app.services.kb_import import import_format_for, parse_kb_upload
 from app.services.kb_service import (
     create_kb_item,
     bulk_create_kb_items,
+    bulk_create_kb_items_stream,
     list_kb_items,
-    query_kb_ilike,
+    retrieve_kb,
 )
 
 router = APIRouter(prefix="/kb", tags=["kb"])
@@ -40,15 +45,69 @@ async def post_kb_item(
     return KbItemOut.model_validate(item)
 
 
-@router.post("/items/bulk", response_model=KbBulkResponse, status_code=status.HTTP_201_CREATED)
+def _inline_schema(model: type) -> dict:
+    """JSON schema của model với $defs đã thay vào chỗ $ref (openapi_extra không tự đăng ký components)."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return resolve(defs[ref.split("/")[-1]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    return resolve(schema)
+
+
+_KB_BULK_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": _inline_schema(KbBulkRequest)},
+            "application/x-ndjson": {"schema": {"type": "string", "description": "Mỗi dòng 1 KbBulkItem (JSON)"}},
+            "text/csv": {"schema": {"type": "string", "description": "Header title,content,tags (tags ngăn bởi |)"}},
+        },
+    }
+}
+
+
+@router.post(
+    "/items/bulk",
+    response_model=KbBulkResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=_KB_BULK_OPENAPI,
+)
 async def post_kb_bulk(
-    payload: KbBulkRequest,
+    request: Request,
+    tenant_id: Optional[UUID] = Query(None, description="Bắt buộc khi upload NDJSON / CSV"),
     db: AsyncSession = Depends(get_db),
 ) -> KbBulkResponse:
-    """Bulk ingest nhiều mục KB."""
-    items = [{"title": i.title, "content": i.content, "tags": i.tags} for i in payload.items]
-    ids = await bulk_create_kb_items(db, tenant_id=payload.tenant_id, items=items)
-    return KbBulkResponse(tenant_id=payload.tenant_id, created=len(ids), ids=ids)
+    """
+    Bulk ingest nhiều mục KB.
+    - application/json: KbBulkRequest (tối đa 500 items).
+    - application/x-ndjson | text/csv + ?tenant_id=: đọc body dạng stream, insert theo chunk; lỗi 1 dòng -> 400, không lưu gì.
+    """
+    fmt = import_format_for(request.headers.get("content-type"))
+    if fmt is None:
+        try:
+            payload = KbBulkRequest.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        items = [{"title": i.title, "content": i.content, "tags": i.tags} for i in payload.items]
+        ids = await bulk_create_kb_items(db, tenant_id=payload.tenant_id, items=items)
+        return KbBulkResponse(tenant_id=payload.tenant_id, created=len(ids), ids=ids)
+
+    if tenant_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="tenant_id query param required")
+    try:
+        ids = await bulk_create_kb_items_stream(db, tenant_id=tenant_id, rows=parse_kb_upload(request.stream(), fmt))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return KbBulkResponse(tenant_id=tenant_id, created=len(ids), ids=ids)
 
 
 @router.get("/items", response_model=list[KbItemOut])
@@ -66,12 +125,13 @@ async def post_kb_query(
     payload: KbQueryRequest,
     db: AsyncSession = Depends(get_db),
 ) -> KbQueryResponse:
-    """Tìm KB theo query (ILIKE trên title + content), trả về top N."""
-    items = await query_kb_ilike(
+    """Tìm KB theo query (+ terms bổ sung), mode fulltext / semantic / hybrid, bỏ dấu; trả về top N theo relevance."""
+    items = await retrieve_kb(
         db,
         tenant_id=payload.tenant_id,
-        query=payload.query,
+        terms=[payload.query, *payload.terms],
         top_k=payload.top_k,
+        mode=payload.mode,
     )
     return KbQueryResponse(
         tenant_id=payload.tenant_id,
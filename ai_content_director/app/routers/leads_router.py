@@ -3,12 +3,13 @@ API lead signals: GET /api/leads (list theo tenant, filter status).
 """
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status as http_status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
 from app.schemas.leads import LeadListResponse
 from app.services.lead_service import list_leads
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT
 
 router = APIRouter(prefix="/api", tags=["leads"])
 
@@ -17,9 +18,13 @@ router = APIRouter(prefix="/api", tags=["leads"])
 async def get_leads(
     tenant_id: UUID = Query(..., description="Tenant UUID"),
     status: str | None = Query(None, description="Lọc theo status (vd: new_auto, new_draft)"),
-    limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    offset: int = Query(0, ge=0, deprecated=True, description="Dùng cursor thay thế"),
+    cursor: str | None = Query(None, description="next_cursor của trang trước"),
     db: AsyncSession = Depends(get_db),
 ) -> LeadListResponse:
-    """Danh sách lead signals của tenant, mới nhất trước."""
-    return await list_leads(db, tenant_id=tenant_id, status=status, limit=limit, offset=offset)
+    """Danh sách lead signals của tenant, mới nhất trước (phân trang bằng cursor)."""
+    try:
+        return await list_leads(db, tenant_id=tenant_id, status=status, limit=limit, offset=offset, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
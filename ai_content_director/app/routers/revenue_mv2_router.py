@@ -7,12 +7,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
 from app.schemas.revenue_mv2 import (
+    ContentGenerateBatchRequest,
+    ContentGenerateBatchResponse,
     ContentGenerateRequest,
     ContentGenerateResponse,
     ContentItemOut,
 )
 from app.services.content_service_mv2 import (
     generate_content,
+    generate_content_batch,
     get_content_by_id,
     get_content_by_plan_id,
 )
@@ -66,6 +69,50 @@ async def post_content_generate(
         raise
 
 
+@router.post(
+    "/content/generate-batch",
+    response_model=ContentGenerateBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def post_content_generate_batch(
+    payload: ContentGenerateBatchRequest,
+    db: AsyncSession = Depends(get_db),
+) -> ContentGenerateBatchResponse:
+    """
+    Generate content items cho dải ngày day_from..day_to (tối đa 30) trong 1 request.
+    Ngày nào LLM lỗi thì dùng template (liệt kê trong fallback_days).
+    """
+    try:
+        items, fallback_days = await generate_content_batch(
+            db,
+            tenant_id=payload.tenant_id,
+            plan_id=payload.plan_id,
+            day_from=payload.day_from,
+            day_to=payload.day_to,
+        )
+        return ContentGenerateBatchResponse(
+            contents=[ContentItemOut.model_validate(i) for i in items],
+            fallback_days=fallback_days,
+        )
+    except ValueError as e:
+        if str(e) in ("plan_not_found", "tenant_not_found"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e).replace("_", " "),
+            ) from e
+        if str(e) == "day_not_in_plan":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Day not found in plan",
+            ) from e
+        if str(e) in ("day_out_of_range", "batch_too_large"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="day_from..day_to must be within 1..30",
+            ) from e
+        raise
+
+
 @router.get("/content/{content_id}", response_model=ContentItemOut)
 async def get_content(
     content_id: UUID,
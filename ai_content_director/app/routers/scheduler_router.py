@@ -13,11 +13,13 @@ router = APIRouter(prefix="/scheduler", tags=["scheduler"])
 async def get_scheduler_status(
     db: AsyncSession = Depends(get_db),
 ) -> SchedulerStatusResponse:
-    """Trạng thái worker scheduler: enabled, interval, last_tick_at, pending_count."""
+    """Trạng thái worker scheduler: enabled, interval, last_tick_at, pending_count, worker_id, inflight_count."""
     status = await get_scheduler_status_with_pending(db)
     return SchedulerStatusResponse(
         enabled=status["enabled"],
         interval_seconds=status["interval_seconds"],
         last_tick_at=status["last_tick_at"],
         pending_count=status["pending_count"],
+        worker_id=status["worker_id"],
+        inflight_count=status["inflight_count"],
     )
@@ -23,3 +23,4 @@ class AuditEventsResponse(BaseModel):
 
     tenant_id: UUID
     events: List[AuditEventOut]
+    next_cursor: Optional[str] = None
@@ -53,6 +53,7 @@ class ContentListResponse(BaseModel):
 
     tenant_id: UUID
     items: List[ContentItemOut]
+    next_cursor: Optional[str] = None
 
 
 class ApproveRequest(BaseModel):
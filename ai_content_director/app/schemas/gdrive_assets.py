@@ -1,6 +1,6 @@
 """Schema cho Google Drive ingest và content assets."""
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -10,15 +10,32 @@ class GdriveIngestRequest(BaseModel):
     """Body cho POST /api/gdrive/ingest."""
 
     tenant_id: UUID = Field(..., description="Tenant UUID")
+    mode: Optional[Literal["full", "incremental"]] = Field(
+        None, description="full | incremental (Changes API). Mặc định GDRIVE_SYNC_MODE"
+    )
 
 
-class GdriveIngestResponse(BaseModel):
-    """Response sau khi ingest."""
+class GdriveIngestJobOut(BaseModel):
+    """Job ingest (POST /api/gdrive/ingest, GET /api/gdrive/ingest/jobs/{job_id}): trạng thái + tiến độ."""
 
+    job_id: UUID
     tenant_id: UUID
-    count_ingested: int = Field(..., description="Số asset đã tải và ghi cached")
-    count_invalid: int = Field(..., description="Số file không hợp lệ (đã chuyển REJECTED)")
+    mode: str
+    status: str = Field(..., description="queued | running | succeeded | failed")
+    coalesced: bool = Field(False, description="True nếu gộp vào job đang chạy của tenant")
+    files_total: int = Field(0, description="Số file cần xử lý (sau khi quét Drive)")
+    files_done: int = Field(0, description="Số file đã xử lý")
+    count_ingested: int = Field(0, description="Số asset đã tải và ghi cached")
+    count_invalid: int = Field(0, description="Số file không hợp lệ (đã chuyển REJECTED)")
     count_skipped: int = Field(0, description="Số file bị bỏ qua do trùng/existing")
+    bytes_downloaded: int = Field(0, description="Tổng bytes đã tải từ Drive")
+    elapsed_seconds: float = 0.0
+    bytes_per_sec: float = 0.0
+    files_per_sec: float = 0.0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 
 class ContentAssetOut(BaseModel):
@@ -38,6 +55,7 @@ class ContentAssetOut(BaseModel):
     fb_media_fbid: Optional[str] = None
     fb_video_id: Optional[str] = None
     error_reason: Optional[str] = None
+    content_sha256: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -47,3 +65,4 @@ class AssetsListResponse(BaseModel):
 
     tenant_id: UUID
     assets: List[ContentAssetOut]
+    next_cursor: Optional[str] = None
@@ -1,6 +1,6 @@
 """KB (Knowledge Base) request/response schemas."""
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -52,10 +52,14 @@ class KbBulkResponse(BaseModel):
 
 
 class KbQueryRequest(BaseModel):
-    """Body cho POST /kb/query (ILIKE search)."""
+    """Body cho POST /kb/query (full-text / semantic / hybrid, xếp hạng, không phân biệt dấu)."""
 
     tenant_id: UUID = Field(..., description="Tenant UUID")
     query: str = Field(..., min_length=1, max_length=500)
+    terms: List[str] = Field(default_factory=list, max_length=19, description="Term bổ sung (OR với query)")
+    mode: Optional[Literal["fulltext", "semantic", "hybrid"]] = Field(
+        default=None, description="Mặc định theo KB_RETRIEVAL_MODE"
+    )
     top_k: int = Field(10, ge=1, le=50, description="Số kết quả tối đa")
 
 
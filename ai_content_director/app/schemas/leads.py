@@ -83,4 +83,5 @@ class LeadListResponse(BaseModel):
     """Response cho GET /api/leads."""
     tenant_id: UUID
     leads: List[LeadSignalOut]
-    total: int
+    total: Optional[int] = None  # chỉ có ở trang đầu (không cursor)
+    next_cursor: Optional[str] = None
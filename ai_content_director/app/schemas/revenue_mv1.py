@@ -104,3 +104,4 @@ class PlanMaterializeResponse(BaseModel):
     plan_id: str = Field(..., description="Generated plan UUID")
     content_plans_created: int = Field(..., ge=0)
     content_items_created: int = Field(..., ge=0)
+    content_plans_skipped: int = Field(default=0, ge=0, description="Ngày đã materialize trước đó (bỏ qua)")
@@ -4,7 +4,7 @@ from enum import Enum
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class ContentTypeEnum(str, Enum):
@@ -35,6 +35,25 @@ class ContentGenerateRequest(BaseModel):
     model_config = {"extra": "forbid"}
 
 
+# --- POST /api/content/generate-batch ---
+class ContentGenerateBatchRequest(BaseModel):
+    """Request body for POST /api/content/generate-batch (dải ngày day_from..day_to)."""
+
+    tenant_id: UUID = Field(..., description="Tenant UUID")
+    plan_id: UUID = Field(..., description="Generated plan UUID")
+    day_from: int = Field(..., ge=1, le=30, description="Ngày bắt đầu (1..30)")
+    day_to: int = Field(..., ge=1, le=30, description="Ngày kết thúc (1..30, >= day_from)")
+
+    model_config = {"extra": "forbid"}
+
+    @model_validator(mode="after")
+    def day_range_order(self) -> "ContentGenerateBatchRequest":
+        """day_to phải >= day_from."""
+        if self.day_to < self.day_from:
+            raise ValueError("day_to must be >= day_from")
+        return self
+
+
 class ContentItemOut(BaseModel):
     """Content item in API response. hashtags: list[str] length 5..30."""
 
@@ -73,3 +92,10 @@ class ContentGenerateResponse(BaseModel):
     """Response for POST /api/content/generate (201)."""
 
     content: ContentItemOut
+
+
+class ContentGenerateBatchResponse(BaseModel):
+    """Response for POST /api/content/generate-batch (201)."""
+
+    contents: List[ContentItemOut]
+    fallback_days: List[int] = Field(default_factory=list, description="Ngày dùng template do LLM lỗi")
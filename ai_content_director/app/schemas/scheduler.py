@@ -11,3 +11,5 @@ class SchedulerStatusResponse(BaseModel):
     interval_seconds: int
     last_tick_at: Optional[str] = None
     pending_count: Optional[int] = None
+    worker_id: Optional[str] = None
+    inflight_count: Optional[int] = None
@@ -1,22 +1,106 @@
-"""AI usage logging + daily budget check (cost guard)."""
-from datetime import datetime, timezone
+"""
+AI usage logging + daily budget check (cost guard).
+Chi tiêu trong ngày (UTC) mỗi tenant giữ ở Redis, tách 2 key:
+- budget:spend:<tenant>:<YYYYMMDD> (INCRBYFLOAT): chỉ cost của dòng ai_usage_logs đã commit.
+- budget:reserved:<tenant>:<YYYYMMDD> (ZSET, member "<id>:<usd>", score = hạn giữ chỗ): chi phí ước tính của
+  các call LLM đang chạy; member quá BUDGET_RESERVATION_TTL_SECONDS (process chết giữa chừng) tự bị bỏ.
+- is_over_budget: 1 Lua script (spend + reserved) thay vì SUM(ai_usage_logs) mỗi lần gọi LLM.
+- reserve_budget: kiểm tra spend + reserved + ước tính rồi ZADD trong 1 Lua script (atomic) -> 2 request đồng thời
+  không cùng lọt qua khi chỉ còn đủ budget cho 1. Lỗi / không log -> release_budget (ZREM).
+- log_usage không cộng counter ngay: sau khi session commit (after_commit) mới ZREM reservation + cộng cost thật;
+  rollback -> chỉ trả lại reservation. Counter không bao giờ chứa cost của giao dịch bị rollback.
+- Counter spend thiếu (cold start / Redis mất dữ liệu / hết hạn resync) -> dựng lại từ SUM Postgres (SET NX).
+  Reservation nằm ở key riêng nên dựng lại giữa chừng không làm mất phần đang giữ chỗ. Dựng lại đúng lúc giữa
+  commit và bước cộng sau commit có thể đếm dư 1 khoản (không bao giờ thiếu); counter hết hạn lúc 0h UTC và
+  tối đa BUDGET_COUNTER_RESYNC_SECONDS nên lệch tự sửa.
+Không có REDIS_URL, Redis lỗi hoặc circuit breaker đang mở -> SUM Postgres như cũ (không có reservation).
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional, Set, Tuple
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import event, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from app.config import (
     get_settings,
     DEFAULT_OPENAI_INPUT_PRICE_PER_1M,
     DEFAULT_OPENAI_OUTPUT_PRICE_PER_1M,
 )
+from app.infrastructure import write_behind
+from app.infrastructure.redis_cache import get_redis_if_available, mark_redis_failure
 from app.logging_config import get_logger
 from app.models import AiUsageLog
 
 logger = get_logger(__name__)
 
+BUDGET_KEY_PREFIX = "budget:spend:"
+BUDGET_RESERVED_KEY_PREFIX = "budget:reserved:"
+BUDGET_COUNTER_RESYNC_SECONDS = 3600
+# Giữ chỗ quá hạn này (call LLM treo / process chết trước release) không còn tính vào budget
+BUDGET_RESERVATION_TTL_SECONDS = 600
+
+_PENDING_KEY = "budget_pending_settlements"
+
+# Tổng đã dùng = spend + reservation còn hạn. KEYS: spend, reserved; ARGV: now. Chưa có counter spend -> false
+_SPEND_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if not cur then return false end
+local held = 0
+for _, m in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], ARGV[1], '+inf')) do
+  held = held + tonumber(string.match(m, ':([^:]+)$'))
+end
+return tostring(tonumber(cur) + held)
+"""
+# KEYS: spend, reserved; ARGV: amount, limit, member, now, ttl. -1 = chưa có counter, 0 = vượt budget, 1 = đã giữ chỗ
+_RESERVE_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if not cur then return -1 end
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+local held = 0
+for _, m in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+  held = held + tonumber(string.match(m, ':([^:]+)$'))
+end
+if tonumber(cur) + held + tonumber(ARGV[1]) > tonumber(ARGV[2]) then return 0 end
+redis.call('ZADD', KEYS[2], tonumber(ARGV[4]) + tonumber(ARGV[5]), ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 1
+"""
+# Quyết toán sau commit: bỏ reservation (nếu có) + cộng cost thật nếu counter spend đã được dựng
+# (tránh tạo counter chỉ chứa 1 khoản, thiếu tổng từ DB). KEYS: spend, reserved; ARGV: member ('' = không có), cost
+_SETTLE_LUA = """
+if ARGV[1] ~= '' then redis.call('ZREM', KEYS[2], ARGV[1]) end
+if tonumber(ARGV[2]) ~= 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+  return redis.call('INCRBYFLOAT', KEYS[1], ARGV[2])
+end
+return false
+"""
+
+# Task quyết toán chạy sau commit: giữ tham chiếu để không bị GC giữa chừng
+_settle_tasks: Set[asyncio.Task] = set()
+
+
+@dataclass
+class BudgetReservation:
+    """Chi phí ước tính đang giữ chỗ trên Redis; log_usage (sau commit) / release_budget quyết toán đúng 1 lần."""
+    tenant_id: UUID
+    day: str
+    amount_usd: Decimal
+    counted: bool  # False = không giữ chỗ được trên Redis (fallback DB), quyết toán là no-op
+    settled: bool = False
+    reservation_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def member(self) -> str:
+        """Member trong ZSET reserved: id + số tiền (Lua cộng tổng giữ chỗ từ phần sau dấu ':')."""
+        return f"{self.reservation_id}:{self.amount_usd}"
+
 
 def compute_cost_usd(
     prompt_tokens: int,
@@ -33,6 +117,133 @@ def compute_cost_usd(
     return Decimal(str(prompt_tokens * in_p + completion_tokens * out_p)).quantize(Decimal("0.000001"))
 
 
+def _utc_day(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y%m%d")
+
+
+def _budget_key(tenant_id: UUID, day: str) -> str:
+    return f"{BUDGET_KEY_PREFIX}{tenant_id}:{day}"
+
+
+def _reserved_key(tenant_id: UUID, day: str) -> str:
+    return f"{BUDGET_RESERVED_KEY_PREFIX}{tenant_id}:{day}"
+
+
+def _counter_ttl_seconds(now: Optional[datetime] = None) -> int:
+    """Tới 0h UTC kế tiếp (counter ngày mới bắt đầu từ 0), tối đa BUDGET_COUNTER_RESYNC_SECONDS."""
+    now = now or datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, min(BUDGET_COUNTER_RESYNC_SECONDS, int((midnight - now).total_seconds())))
+
+
+async def _ensure_counter(client, db: AsyncSession, tenant_id: UUID, day: str) -> None:
+    """Counter chưa có -> dựng từ SUM(cost_usd) trong ngày. SET NX: nhiều replica cùng dựng thì chỉ 1 bản được ghi."""
+    key = _budget_key(tenant_id, day)
+    if await client.exists(key):
+        return
+    total = await get_daily_total_usd(db, tenant_id)
+    if await client.set(key, str(total), nx=True, ex=_counter_ttl_seconds()):
+        logger.info("ai_usage.budget_counter_rebuilt", tenant_id=str(tenant_id), total_usd=str(total))
+
+
+async def _settle(tenant_id: UUID, day: str, member: str, amount_usd: Decimal) -> None:
+    """Bỏ reservation member (nếu có) + cộng amount_usd vào counter spend. Lỗi Redis chỉ log (reservation tự hết hạn)."""
+    client = get_redis_if_available()
+    if client is None or (not member and amount_usd == 0):
+        return
+    try:
+        await client.eval(
+            _SETTLE_LUA, 2, _budget_key(tenant_id, day), _reserved_key(tenant_id, day), member, str(amount_usd)
+        )
+    except Exception as e:
+        logger.warning("ai_usage.budget_counter_error", tenant_id=str(tenant_id), error=str(e))
+        mark_redis_failure(e)
+
+
+async def _apply_settlements(items: List[Tuple[UUID, str, str, Decimal]]) -> None:
+    for tenant_id, day, member, amount_usd in items:
+        await _settle(tenant_id, day, member, amount_usd)
+
+
+def _schedule_settlements(items: List[Tuple[UUID, str, str, Decimal]]) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Session sync ngoài event loop: không quyết toán được, reservation tự hết hạn / counter tự resync
+    task = loop.create_task(_apply_settlements(items))
+    _settle_tasks.add(task)
+    task.add_done_callback(_settle_tasks.discard)
+
+
+@event.listens_for(Session, "after_commit")
+def _settle_after_commit(session: Session) -> None:
+    # Dòng usage đã commit: bỏ reservation, cộng cost thật vào counter
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _schedule_settlements(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _release_after_rollback(session: Session) -> None:
+    # Dòng usage bị rollback: chỉ trả lại reservation, không cộng cost
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _schedule_settlements([(t, d, m, Decimal("0")) for t, d, m, _ in pending if m])
+
+
+def estimate_call_cost_usd() -> Decimal:
+    """Chi phí ước tính 1 call LLM để giữ chỗ: BUDGET_RESERVE_TOKENS tính theo giá output (trần trên)."""
+    settings = get_settings()
+    return compute_cost_usd(0, settings.budget_reserve_tokens)
+
+
+async def reserve_budget(
+    db: AsyncSession,
+    tenant_id: UUID,
+    estimated_usd: Optional[Decimal] = None,
+) -> BudgetReservation:
+    """
+    Giữ chỗ chi phí ước tính trước khi gọi LLM. Không đủ budget -> ValueError("budget_exceeded").
+    Sau call: log_usage(..., reservation=) quyết toán theo cost thật khi commit; lỗi / không log -> release_budget().
+    """
+    settings = get_settings()
+    amount = estimated_usd if estimated_usd is not None else estimate_call_cost_usd()
+    day = _utc_day()
+    client = get_redis_if_available()
+    if client is not None:
+        reservation = BudgetReservation(tenant_id=tenant_id, day=day, amount_usd=amount, counted=True)
+        keys = (_budget_key(tenant_id, day), _reserved_key(tenant_id, day))
+        limit = str(Decimal(str(settings.daily_budget_usd)))
+        try:
+            for _ in range(2):
+                result = int(await client.eval(
+                    _RESERVE_LUA, 2, *keys,
+                    str(amount), limit, reservation.member, str(int(time.time())), str(BUDGET_RESERVATION_TTL_SECONDS),
+                ))
+                if result == 1:
+                    return reservation
+                if result == 0:
+                    raise ValueError("budget_exceeded")
+                await _ensure_counter(client, db, tenant_id, day)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.warning("ai_usage.budget_counter_error", tenant_id=str(tenant_id), error=str(e))
+            mark_redis_failure(e)
+    if await _is_over_budget_db(db, tenant_id):
+        raise ValueError("budget_exceeded")
+    return BudgetReservation(tenant_id=tenant_id, day=day, amount_usd=amount, counted=False)
+
+
+async def release_budget(reservation: Optional[BudgetReservation]) -> None:
+    """Trả lại phần giữ chỗ khi call LLM lỗi / không ghi usage. Đã quyết toán (hoặc giao cho log_usage) thì no-op."""
+    if reservation is None or reservation.settled:
+        return
+    reservation.settled = True
+    if reservation.counted:
+        await _settle(reservation.tenant_id, reservation.day, reservation.member, Decimal("0"))
+
+
 async def log_usage(
     db: AsyncSession,
     tenant_id: UUID,
@@ -41,23 +252,44 @@ async def log_usage(
     prompt_tokens: int,
     completion_tokens: int,
     total_tokens: int,
+    cache_hit: bool = False,
+    tokens_saved: int = 0,
+    reservation: Optional[BudgetReservation] = None,
 ) -> AiUsageLog:
     """
     Ghi một dòng ai_usage_logs và trả về record.
     cost_usd tính từ compute_cost_usd. Caller đảm bảo commit.
+    cache_hit / tokens_saved: response lấy từ LLM cache (token = 0, tokens_saved = token tiết kiệm được).
+    Counter budget Redis chỉ cập nhật sau khi session commit (cộng cost, bỏ reservation); rollback -> trả reservation.
+    WRITE_BEHIND_ENABLED: không flush, dòng được ghi lúc session commit.
     """
     cost = compute_cost_usd(prompt_tokens, completion_tokens, model)
-    log = AiUsageLog(
-        tenant_id=tenant_id,
-        feature=feature,
-        model=model or "",
-        prompt_tokens=prompt_tokens,
-        completion_tokens=completion_tokens,
-        total_tokens=total_tokens,
-        cost_usd=cost,
-    )
-    db.add(log)
-    await db.flush()
+    values = {
+        "tenant_id": tenant_id,
+        "feature": feature,
+        "model": model or "",
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": total_tokens,
+        "cost_usd": cost,
+        "cache_hit": cache_hit,
+        "tokens_saved": tokens_saved,
+    }
+    if write_behind.is_enabled():
+        # Write-behind: ghi cùng các log khác lúc commit (1 INSERT nhiều dòng), không flush ở đây
+        values.update(id=uuid.uuid4(), created_at=datetime.now(timezone.utc))
+        write_behind.buffer_row(db, AiUsageLog, values)
+        log = AiUsageLog(**values)
+    else:
+        log = AiUsageLog(**values)
+        db.add(log)
+        await db.flush()
+    day, member = _utc_day(), ""
+    if reservation is not None and not reservation.settled:
+        reservation.settled = True
+        if reservation.counted:
+            day, member = reservation.day, reservation.member
+    db.sync_session.info.setdefault(_PENDING_KEY, []).append((tenant_id, day, member, cost))
     logger.info(
         "ai_usage.logged",
         tenant_id=str(tenant_id),
@@ -65,6 +297,8 @@ async def log_usage(
         model=model,
         total_tokens=total_tokens,
         cost_usd=str(cost),
+        cache_hit=cache_hit,
+        tokens_saved=tokens_saved,
     )
     return log
 
@@ -83,11 +317,35 @@ async def get_daily_total_usd(db: AsyncSession, tenant_id: UUID) -> Decimal:
     return val if isinstance(val, Decimal) else Decimal("0")
 
 
+async def _is_over_budget_db(db: AsyncSession, tenant_id: UUID) -> bool:
+    settings = get_settings()
+    total = await get_daily_total_usd(db, tenant_id)
+    return total >= Decimal(str(settings.daily_budget_usd))
+
+
+async def get_daily_spend_usd(db: AsyncSession, tenant_id: UUID) -> Decimal:
+    """Chi tiêu trong ngày (đã commit + phần đang giữ chỗ) từ Redis; không có Redis -> SUM Postgres."""
+    client = get_redis_if_available()
+    if client is not None:
+        day = _utc_day()
+        keys = (_budget_key(tenant_id, day), _reserved_key(tenant_id, day))
+        try:
+            for _ in range(2):
+                raw = await client.eval(_SPEND_LUA, 2, *keys, str(int(time.time())))
+                if raw is not None:
+                    return Decimal(raw.decode() if isinstance(raw, bytes) else str(raw)).quantize(Decimal("0.000001"))
+                await _ensure_counter(client, db, tenant_id, day)
+        except Exception as e:
+            logger.warning("ai_usage.budget_counter_error", tenant_id=str(tenant_id), error=str(e))
+            mark_redis_failure(e)
+    return await get_daily_total_usd(db, tenant_id)
+
+
 async def is_over_budget(db: AsyncSession, tenant_id: UUID) -> bool:
     """
-    True nếu tenant đã vượt DAILY_BUDGET_USD trong ngày.
-    Khi True, caller nên fallback template (không gọi OpenAI).
+    True nếu tenant đã vượt DAILY_BUDGET_USD trong ngày (O(1) qua counter Redis).
+    Khi True, caller nên fallback template (không gọi OpenAI). Trước call LLM nên dùng reserve_budget (chống race).
     """
     settings = get_settings()
-    total = await get_daily_total_usd(db, tenant_id)
+    total = await get_daily_spend_usd(db, tenant_id)
     return total >= Decimal(str(settings.daily_budget_usd))
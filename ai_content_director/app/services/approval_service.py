@@ -3,15 +3,19 @@ HITL Approval workflow + audit log.
 - Ghi audit event (GENERATE_PLAN, GENERATE_CONTENT, AUTO_APPROVED, NEEDS_REVIEW, ESCALATED, APPROVED, REJECTED).
 - approve_content / reject_content cho duyệt thủ công.
 """
+import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.infrastructure import write_behind
 from app.logging_config import get_logger
 from app.models import ApprovalEvent, ContentItem
+from app.schemas.audit import AuditEventOut
+from app.utils.pagination import keyset_page, split_page
 
 logger = get_logger(__name__)
 
@@ -43,18 +47,28 @@ async def log_audit_event(
     actor: str,
     content_id: Optional[UUID] = None,
     metadata_: Optional[Dict[str, Any]] = None,
+    background: bool = False,
 ) -> ApprovalEvent:
     """
     Ghi một dòng audit (approval_events).
     event_type: GENERATE_PLAN | GENERATE_CONTENT | AUTO_APPROVED | NEEDS_REVIEW | ESCALATED | APPROVED | REJECTED.
+    WRITE_BEHIND_ENABLED: không flush, ghi lúc commit (1 INSERT nhiều dòng); background=True (event SYSTEM trên
+    content đã commit) -> batcher nền, không phụ thuộc transaction của caller. Object trả về khi đó chưa gắn session.
     """
-    ev = ApprovalEvent(
-        tenant_id=tenant_id,
-        content_id=content_id,
-        event_type=event_type,
-        actor=actor,
-        metadata_=metadata_ or {},
-    )
+    values = {
+        "id": uuid.uuid4(),
+        "tenant_id": tenant_id,
+        "content_id": content_id,
+        "event_type": event_type,
+        "actor": actor,
+        "metadata_": metadata_ or {},
+        "created_at": datetime.now(timezone.utc),
+    }
+    if background and write_behind.system_event_batcher.submit(ApprovalEvent, values):
+        return ApprovalEvent(**values)
+    if write_behind.buffer_row(db, ApprovalEvent, values):
+        return ApprovalEvent(**values)
+    ev = ApprovalEvent(**{k: v for k, v in values.items() if k not in ("id", "created_at")})
     db.add(ev)
     await db.flush()
     return ev
@@ -145,13 +159,21 @@ async def list_audit_events(
     db: AsyncSession,
     tenant_id: UUID,
     limit: int = 50,
-) -> List[ApprovalEvent]:
-    """Lấy danh sách audit events của tenant, mới nhất trước."""
-    q = (
-        select(ApprovalEvent)
-        .where(ApprovalEvent.tenant_id == tenant_id)
-        .order_by(ApprovalEvent.created_at.desc())
-        .limit(limit)
-    )
-    r = await db.execute(q)
-    return list(r.scalars().all())
+    cursor: Optional[str] = None,
+) -> Tuple[List[AuditEventOut], Optional[str]]:
+    """
+    Lấy audit events của tenant, mới nhất trước (projection thẳng sang AuditEventOut).
+    Phân trang keyset: trả (events, next_cursor). Cursor sai -> ValueError("invalid_cursor").
+    """
+    q = select(
+        ApprovalEvent.id,
+        ApprovalEvent.tenant_id,
+        ApprovalEvent.content_id,
+        ApprovalEvent.event_type,
+        ApprovalEvent.actor,
+        ApprovalEvent.metadata_.label("metadata"),
+        ApprovalEvent.created_at,
+    ).where(ApprovalEvent.tenant_id == tenant_id)
+    q = keyset_page(q, ApprovalEvent.created_at, ApprovalEvent.id, cursor, limit)
+    rows, next_cursor = split_page((await db.execute(q)).all(), limit)
+    return [AuditEventOut(**row._mapping) for row in rows], next_cursor
@@ -1,5 +1,4 @@
 """Service tạo/lấy asset summary từ content_assets."""
-import asyncio
 import base64
 import json
 import mimetypes
@@ -12,6 +11,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
+from app.infrastructure.openai_client import create_chat_completion
 from app.logging_config import get_logger
 from app.models import AssetSummary, ContentAsset
 from app.services.ai_usage_service import log_usage
@@ -109,14 +109,7 @@ async def _generate_summary_with_openai(
     if not settings.openai_api_key:
         raise ValueError("openai_not_configured")
 
-    from openai import OpenAI
-
     model = settings.openai_vision_model or settings.openai_model
-    client = OpenAI(
-        api_key=settings.openai_api_key,
-        timeout=float(settings.openai_timeout_seconds),
-        max_retries=settings.openai_max_retries,
-    )
 
     system_prompt = (
         "Bạn là chuyên gia phân tích media cho content marketing B2B. "
@@ -159,8 +152,9 @@ async def _generate_summary_with_openai(
             {"role": "user", "content": user_text},
         ]
 
-    resp = await asyncio.to_thread(
-        client.chat.completions.create,
+    resp = await create_chat_completion(
+        "media_summary",
+        tenant_id=tenant_id,
         model=model,
         messages=messages,
         temperature=0.2,
@@ -182,6 +176,60 @@ async def _generate_summary_with_openai(
     }
 
 
+async def _get_summary(db: AsyncSession, *, tenant_id: UUID, asset_id: UUID) -> Optional[AssetSummary]:
+    r = await db.execute(
+        select(AssetSummary).where(
+            AssetSummary.tenant_id == tenant_id,
+            AssetSummary.asset_id == asset_id,
+        )
+    )
+    return r.scalar_one_or_none()
+
+
+async def _find_summary_by_content(
+    db: AsyncSession,
+    *,
+    tenant_id: UUID,
+    asset: ContentAsset,
+) -> Optional[AssetSummary]:
+    """
+    Summary (do model sinh, không phải template) của asset khác cùng tenant có cùng content_sha256:
+    cùng nội dung file thì dùng lại, không gọi vision model lần nữa.
+    """
+    if not asset.content_sha256:
+        return None
+    r = await db.execute(
+        select(AssetSummary)
+        .join(ContentAsset, ContentAsset.id == AssetSummary.asset_id)
+        .where(
+            AssetSummary.tenant_id == tenant_id,
+            ContentAsset.tenant_id == tenant_id,
+            ContentAsset.content_sha256 == asset.content_sha256,
+            ContentAsset.id != asset.id,
+            AssetSummary.model.is_not(None),
+            AssetSummary.model != "template_fallback",
+        )
+        .order_by(AssetSummary.created_at.desc())
+        .limit(1)
+    )
+    return r.scalar_one_or_none()
+
+
+def _copy_summary(src: AssetSummary, *, asset_id: UUID) -> AssetSummary:
+    return AssetSummary(
+        tenant_id=src.tenant_id,
+        asset_id=asset_id,
+        model=src.model,
+        summary=src.summary,
+        detected_text=src.detected_text,
+        objects_json=src.objects_json,
+        insights_json=src.insights_json,
+        suggested_angle=src.suggested_angle,
+        suggested_tone=src.suggested_tone,
+        confidence_score=src.confidence_score,
+    )
+
+
 async def get_or_create_asset_summary(
     db: AsyncSession,
     *,
@@ -189,18 +237,13 @@ async def get_or_create_asset_summary(
     asset_id: UUID,
 ) -> Tuple[AssetSummary, bool]:
     """
-    Lấy cache asset summary nếu đã có, nếu chưa thì generate và lưu.
+    Lấy cache asset summary nếu đã có; asset khác cùng tenant cùng content_sha256 đã có summary thì chép lại;
+    nếu chưa thì generate và lưu.
 
     Returns:
       (summary_row, cached)
     """
-    existing_q = await db.execute(
-        select(AssetSummary).where(
-            AssetSummary.tenant_id == tenant_id,
-            AssetSummary.asset_id == asset_id,
-        )
-    )
-    existing = existing_q.scalar_one_or_none()
+    existing = await _get_summary(db, tenant_id=tenant_id, asset_id=asset_id)
     if existing:
         return existing, True
 
@@ -214,6 +257,26 @@ async def get_or_create_asset_summary(
     if not asset:
         raise ValueError("asset_not_found")
 
+    reused = await _find_summary_by_content(db, tenant_id=tenant_id, asset=asset)
+    if reused is not None:
+        row = _copy_summary(reused, asset_id=asset_id)
+        db.add(row)
+        try:
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            raced = await _get_summary(db, tenant_id=tenant_id, asset_id=asset_id)
+            if raced:
+                return raced, True
+            raise
+        logger.info(
+            "asset_summary.reused_by_content",
+            tenant_id=str(tenant_id),
+            asset_id=str(asset_id),
+            source_summary_id=str(reused.id),
+        )
+        return row, True
+
     source_uri, mime_type = _resolve_source(asset)
 
     try:
@@ -253,13 +316,7 @@ async def get_or_create_asset_summary(
         await db.flush()
     except IntegrityError:
         await db.rollback()
-        re_q = await db.execute(
-            select(AssetSummary).where(
-                AssetSummary.tenant_id == tenant_id,
-                AssetSummary.asset_id == asset_id,
-            )
-        )
-        raced = re_q.scalar_one_or_none()
+        raced = await _get_summary(db, tenant_id=tenant_id, asset_id=asset_id)
         if raced:
             return raced, True
         raise
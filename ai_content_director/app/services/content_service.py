@@ -1,20 +1,24 @@
 """Content generation service: sample posts (OpenAI + deterministic fallback)."""
 import json
+import uuid
 from datetime import datetime, timezone
 from typing import List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
 from app.logging_config import get_logger
-from app.models import ContentItem, ContentPlan, Tenant, BrandProfile
+from app.models import ApprovalEvent, ContentItem, ContentPlan
 from app.schemas.content import ContentGenerateSamplesRequest, ContentItemOut
-from app.services.ai_usage_service import is_over_budget, log_usage
+from app.services.ai_usage_service import log_usage, release_budget, reserve_budget
 from app.services.approval_service import log_audit_event, review_state_from_confidence
-from app.services.kb_service import query_kb_ilike, build_kb_context_string
+from app.services.kb_service import retrieve_kb, build_kb_context_string
 from app.services.llm_service import LLMService
+from app.services.profile_cache_service import get_brand_profile_snapshot, get_tenant_snapshot
+from app.services.scheduler_service import notify_scheduler
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, keyset_page, split_page
 
 logger = get_logger(__name__)
 
@@ -38,6 +42,101 @@ def _make_sample_post(
     return title, caption, hashtags
 
 
+# review_state -> event audit HITL ghi cùng lúc tạo item
+HITL_EVENT_BY_REVIEW_STATE = {
+    "auto_approved": "AUTO_APPROVED",
+    "needs_review": "NEEDS_REVIEW",
+    "escalate_required": "ESCALATED",
+}
+
+
+async def _insert_samples_with_audit(
+    db: AsyncSession,
+    tenant_id: UUID,
+    posts_data: List[Tuple[Optional[UUID], int, str, str, str, float]],
+    model_used: Optional[str],
+    used_fallback: bool,
+) -> List[ContentItemOut]:
+    """
+    Tạo content_items + audit HITL bằng 2 statement: INSERT ... RETURNING cho items (id sinh ở client),
+    1 INSERT nhiều dòng cho event AUTO_APPROVED / NEEDS_REVIEW / ESCALATED + GENERATE_CONTENT của batch.
+    """
+    now_utc = datetime.now(timezone.utc)
+    item_rows: List[dict] = []
+    event_rows: List[dict] = []
+    for plan_id, _day_num, title, caption, hashtags, confidence in posts_data:
+        item_id = uuid.uuid4()
+        # HITL: review_state theo confidence; auto_approved -> status=approved
+        review_state = review_state_from_confidence(confidence)
+        auto = review_state == "auto_approved"
+        item_rows.append(
+            {
+                "id": item_id,
+                "tenant_id": tenant_id,
+                "plan_id": plan_id,
+                "title": title,
+                "caption": caption,
+                "hashtags": hashtags,
+                "status": "approved" if auto else "draft",
+                "confidence_score": confidence,
+                "review_state": review_state,
+                "approved_at": now_utc if auto else None,
+            }
+        )
+        event_rows.append(
+            {
+                "id": uuid.uuid4(),
+                "tenant_id": tenant_id,
+                "content_id": item_id,
+                "event_type": HITL_EVENT_BY_REVIEW_STATE[review_state],
+                "actor": "SYSTEM",
+                "metadata_": {"confidence_score": confidence},
+            }
+        )
+    # Audit: một event GENERATE_CONTENT cho cả batch
+    event_rows.append(
+        {
+            "id": uuid.uuid4(),
+            "tenant_id": tenant_id,
+            "content_id": None,
+            "event_type": "GENERATE_CONTENT",
+            "actor": "SYSTEM",
+            "metadata_": {"count": len(item_rows), "model": model_used, "used_fallback": used_fallback},
+        }
+    )
+
+    items: List[ContentItem] = []
+    if item_rows:
+        result = await db.scalars(
+            insert(ContentItem).returning(ContentItem, sort_by_parameter_order=True),
+            item_rows,
+        )
+        items = list(result.all())
+    await db.execute(insert(ApprovalEvent), event_rows)
+
+    return [
+        ContentItemOut(
+            id=item.id,
+            title=item.title,
+            caption=item.caption,
+            hashtags=item.hashtags,
+            status=item.status,
+            confidence_score=item.confidence_score,
+            review_state=item.review_state,
+            approved_at=item.approved_at,
+            rejected_at=item.rejected_at,
+            scheduled_at=item.scheduled_at,
+            schedule_status=item.schedule_status,
+            publish_attempts=item.publish_attempts,
+            last_publish_error=item.last_publish_error,
+            last_publish_at=item.last_publish_at,
+            require_media=getattr(item, "require_media", True),
+            primary_asset_type=getattr(item, "primary_asset_type", "image"),
+        )
+        for item in items
+    ]
+
+
 async def generate_sample_posts(
     db: AsyncSession,
     request: ContentGenerateSamplesRequest,
@@ -57,12 +156,10 @@ async def generate_sample_posts(
     if count > 20:
         raise ValueError("count_exceeded")
 
-    q_tenant = select(Tenant).where(Tenant.id == tenant_id)
-    r = await db.execute(q_tenant)
-    tenant = r.scalar_one_or_none()
+    tenant = await get_tenant_snapshot(db, tenant_id)
     if not tenant:
         raise ValueError("tenant_not_found")
-    industry = tenant.industry
+    industry = tenant["industry"]
 
     count_q = select(func.count(ContentItem.id)).where(ContentItem.tenant_id == tenant_id)
     r = await db.execute(count_q)
@@ -97,17 +194,16 @@ async def generate_sample_posts(
     posts_data: List[Tuple[Optional[UUID], int, str, str, str, float]] = []
 
     if use_ai is True and settings.openai_api_key:
+        reservation = None
         try:
-            if await is_over_budget(db, tenant_id):
-                raise ValueError("budget_exceeded")
-            llm = LLMService(settings)
-            q_profile = select(BrandProfile).where(BrandProfile.tenant_id == tenant_id)
-            rp = await db.execute(q_profile)
-            profile = rp.scalar_one_or_none()
+            # Giữ chỗ chi phí ước tính (atomic trên Redis); quyết toán ở log_usage, lỗi thì release ở finally
+            reservation = await reserve_budget(db, tenant_id)
+            llm = LLMService(settings, tenant_id=tenant_id)
+            profile = await get_brand_profile_snapshot(db, tenant_id)
             brand_context = {
                 "industry": industry,
-                "brand_tone": (profile.brand_tone or "") if profile else "",
-                "cta_style": (profile.cta_style or "") if profile else "",
+                "brand_tone": profile["brand_tone"] if profile else "",
+                "cta_style": profile["cta_style"] if profile else "",
             }
             plan_items = [
                 {"day_number": p.day_number, "topic": p.topic, "content_angle": p.content_angle or ""}
@@ -122,10 +218,11 @@ async def generate_sample_posts(
             kb_context_str = ""
             kb_hit_count = 0
             kb_chars_used = 0
-            search_parts = list(set(topics)) + [industry]
-            if profile and getattr(profile, "main_services", None):
+            # Mỗi topic / industry / dịch vụ là 1 term riêng (OR), không ghép thành 1 chuỗi dài
+            search_parts = list(dict.fromkeys(topics)) + [industry]
+            if profile and profile.get("main_services"):
                 try:
-                    ms = profile.main_services
+                    ms = profile["main_services"]
                     if isinstance(ms, str):
                         arr = json.loads(ms) if ms.strip().startswith("[") else []
                     else:
@@ -133,9 +230,9 @@ async def generate_sample_posts(
                     search_parts.extend(arr)
                 except Exception:
                     pass
-            query_str = " ".join(str(x) for x in search_parts if x)[:300]
-            if query_str:
-                kb_items = await query_kb_ilike(db, tenant_id=tenant_id, query=query_str, top_k=10)
+            kb_terms = [str(x) for x in search_parts if x]
+            if kb_terms:
+                kb_items = await retrieve_kb(db, tenant_id=tenant_id, terms=kb_terms, top_k=10)
                 kb_context_str, kb_hit_count, kb_chars_used = build_kb_context_string(kb_items)
                 logger.info(
                     "content.kb_context",
@@ -156,6 +253,9 @@ async def generate_sample_posts(
                 prompt_tokens=usage_info.get("prompt_tokens", 0),
                 completion_tokens=usage_info.get("completion_tokens", 0),
                 total_tokens=usage_info.get("total_tokens", 0),
+                cache_hit=bool(usage_info.get("cache_hit")),
+                tokens_saved=usage_info.get("tokens_saved", 0),
+                reservation=reservation,
             )
             for i, row in enumerate(raw):
                 conf = row.get("confidence_score", 0.75)
@@ -194,6 +294,8 @@ async def generate_sample_posts(
                 topic = topics[i]
                 title, caption, hashtags = _make_sample_post(day_number, topic, industry, i)
                 posts_data.append((plan_id, day_number, title, caption, hashtags, DEFAULT_CONFIDENCE))
+        finally:
+            await release_budget(reservation)
     elif use_ai is True and not settings.openai_api_key:
         used_fallback = True
         for i in range(count):
@@ -210,84 +312,8 @@ async def generate_sample_posts(
             title, caption, hashtags = _make_sample_post(day_number, topic, industry, i)
             posts_data.append((plan_id, day_number, title, caption, hashtags, DEFAULT_CONFIDENCE))
 
-    created_items: List[ContentItemOut] = []
-    now_utc = datetime.now(timezone.utc)
-    for plan_id, _day_num, title, caption, hashtags, confidence in posts_data:
-        item = ContentItem(
-            tenant_id=tenant_id,
-            plan_id=plan_id,
-            title=title,
-            caption=caption,
-            hashtags=hashtags,
-            status="draft",
-            confidence_score=confidence,
-        )
-        db.add(item)
-        await db.flush()
-
-        # HITL: review_state theo confidence; auto_approved -> status=approved
-        review_state = review_state_from_confidence(confidence)
-        item.review_state = review_state
-        if review_state == "auto_approved":
-            item.status = "approved"
-            item.approved_at = now_utc
-            await log_audit_event(
-                db,
-                tenant_id=tenant_id,
-                content_id=item.id,
-                event_type="AUTO_APPROVED",
-                actor="SYSTEM",
-                metadata_={"confidence_score": confidence},
-            )
-        elif review_state == "needs_review":
-            await log_audit_event(
-                db,
-                tenant_id=tenant_id,
-                content_id=item.id,
-                event_type="NEEDS_REVIEW",
-                actor="SYSTEM",
-                metadata_={"confidence_score": confidence},
-            )
-        else:
-            await log_audit_event(
-                db,
-                tenant_id=tenant_id,
-                content_id=item.id,
-                event_type="ESCALATED",
-                actor="SYSTEM",
-                metadata_={"confidence_score": confidence},
-            )
-        await db.flush()
-
-        created_items.append(
-            ContentItemOut(
-                id=item.id,
-                title=item.title,
-                caption=item.caption,
-                hashtags=item.hashtags,
-                status=item.status,
-                confidence_score=item.confidence_score,
-                review_state=item.review_state,
-                approved_at=item.approved_at,
-                rejected_at=item.rejected_at,
-                scheduled_at=item.scheduled_at,
-                schedule_status=item.schedule_status,
-                publish_attempts=item.publish_attempts,
-                last_publish_error=item.last_publish_error,
-                last_publish_at=item.last_publish_at,
-                require_media=getattr(item, "require_media", True),
-                primary_asset_type=getattr(item, "primary_asset_type", "image"),
-            )
-        )
-
-    # Audit: một event GENERATE_CONTENT cho cả batch
-    await log_audit_event(
-        db,
-        tenant_id=tenant_id,
-        event_type="GENERATE_CONTENT",
-        actor="SYSTEM",
-        content_id=None,
-        metadata_={"count": len(created_items), "model": model_used, "used_fallback": used_fallback},
+    created_items = await _insert_samples_with_audit(
+        db, tenant_id, posts_data, model_used=model_used, used_fallback=used_fallback
     )
 
     logger.info(
@@ -300,40 +326,27 @@ async def generate_sample_posts(
     return len(created_items), created_items, used_ai, used_fallback, model_used
 
 
+# Projection cho GET /content/list: đúng các cột của ContentItemOut (+ created_at cho cursor)
+_CONTENT_LIST_COLUMNS = [getattr(ContentItem, name) for name in ContentItemOut.model_fields] + [ContentItem.created_at]
+
+
 async def list_content(
     db: AsyncSession,
     tenant_id: UUID,
     status: Optional[str] = None,
-) -> List[ContentItemOut]:
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+) -> Tuple[List[ContentItemOut], Optional[str]]:
     """
-    Liệt kê content items của tenant, có thể lọc theo status (draft | approved | published).
+    Liệt kê content items của tenant (mới nhất trước), có thể lọc theo status (draft | approved | published).
+    Phân trang keyset: trả (items, next_cursor); next_cursor=None khi hết. Cursor sai -> ValueError("invalid_cursor").
     """
-    q = select(ContentItem).where(ContentItem.tenant_id == tenant_id).order_by(ContentItem.created_at.desc())
+    q = select(*_CONTENT_LIST_COLUMNS).where(ContentItem.tenant_id == tenant_id)
     if status:
         q = q.where(ContentItem.status == status)
-    r = await db.execute(q)
-    items = list(r.scalars().all())
-    return [
-        ContentItemOut(
-            id=it.id,
-            title=it.title,
-            caption=it.caption,
-            hashtags=it.hashtags,
-            status=it.status,
-            confidence_score=it.confidence_score,
-            review_state=it.review_state,
-            approved_at=it.approved_at,
-            rejected_at=it.rejected_at,
-            scheduled_at=it.scheduled_at,
-            schedule_status=it.schedule_status,
-            publish_attempts=it.publish_attempts,
-            last_publish_error=it.last_publish_error,
-            last_publish_at=it.last_publish_at,
-            require_media=getattr(it, "require_media", True),
-            primary_asset_type=getattr(it, "primary_asset_type", "image"),
-        )
-        for it in items
-    ]
+    q = keyset_page(q, ContentItem.created_at, ContentItem.id, cursor, limit)
+    rows, next_cursor = split_page((await db.execute(q)).all(), limit)
+    return [ContentItemOut(**row._mapping) for row in rows], next_cursor
 
 
 async def schedule_content(
@@ -346,6 +359,7 @@ async def schedule_content(
     """
     Đặt lịch đăng: chỉ với content đã approved.
     Set scheduled_at, schedule_status='scheduled'. Ghi audit SCHEDULE_SET.
+    pg_notify đánh thức scheduler khi commit (không chờ vòng poll).
     """
     r = await db.execute(
         select(ContentItem).where(
@@ -369,6 +383,7 @@ async def schedule_content(
         actor=actor,
         metadata_={"scheduled_at": scheduled_at.isoformat()},
     )
+    await notify_scheduler(db)
     logger.info("content.scheduled", content_id=str(content_id), scheduled_at=scheduled_at.isoformat())
     return item
 
@@ -400,5 +415,6 @@ async def unschedule_content(
         actor=actor,
         metadata_={},
     )
+    await notify_scheduler(db)
     logger.info("content.unscheduled", content_id=str(content_id))
     return item
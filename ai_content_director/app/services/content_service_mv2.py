@@ -2,26 +2,31 @@
 Revenue MVP Module 2: Content Generator.
 From generated_plan (plan_json.days) generate content item (title, caption, hashtags, content_type).
 HITL by confidence. Log ai_usage_logs. Fallback when no OPENAI_API_KEY.
+Batch mode (generate_content_batch): một dải ngày, load plan/profile 1 lần, LLM song song
+(giới hạn bởi semaphore tenant/global của openai_client), bulk insert, fallback template theo từng ngày.
 """
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
 from app.logging_config import get_logger
-from app.models import GeneratedPlan, RevenueContentItem, Tenant
+from app.models import GeneratedPlan, RevenueContentItem
 from app.services.asset_summary_service import get_or_create_asset_summary
 from app.services.ai_usage_service import log_usage
 from app.services.llm_service import LLMService
-from app.services.onboarding_industry_service import get_industry_profile_by_tenant
+from app.services.profile_cache_service import get_industry_profile_snapshot, get_tenant_snapshot
 
 logger = get_logger(__name__)
 
 # HITL: same as Module 1
 HITL_APPROVED_MIN = 0.85
 HITL_DRAFT_MIN = 0.70
+# Batch: tối đa số ngày mỗi request (= độ dài plan 30 ngày)
+MAX_BATCH_DAYS = 30
 
 
 def approval_status_from_confidence(confidence: float) -> str:
@@ -33,10 +38,10 @@ def approval_status_from_confidence(confidence: float) -> str:
     return "ESCALATE"
 
 
-def _build_brand_context(tenant: Tenant, industry_name: str, industry_desc: Optional[str]) -> Dict[str, Any]:
-    """Build context for LLM from tenant + industry_profile."""
+def _build_brand_context(industry: str, industry_name: str, industry_desc: Optional[str]) -> Dict[str, Any]:
+    """Build context for LLM from tenant industry + industry_profile."""
     return {
-        "industry": tenant.industry,
+        "industry": industry,
         "industry_profile_name": industry_name,
         "industry_profile_description": industry_desc or "",
         "main_services": [],
@@ -69,6 +74,50 @@ def _find_day_in_plan_json(plan_json: Dict[str, Any], day: int) -> Optional[Dict
     return None
 
 
+def _normalize_output(out: Dict[str, Any]) -> Dict[str, Any]:
+    """Chuẩn hoá output LLM/template thành các cột của RevenueContentItem (hashtags 5..30, confidence, HITL)."""
+    hashtags = out.get("hashtags") or []
+    if not isinstance(hashtags, list):
+        hashtags = [str(hashtags)]
+    hashtags = [str(h).strip() for h in hashtags if str(h).strip()][:30]
+    if len(hashtags) < 5:
+        hashtags = hashtags + ["#tag" + str(i) for i in range(5 - len(hashtags))]
+
+    confidence = float(out.get("confidence_score", 0.75))
+    confidence = max(0.0, min(1.0, confidence))
+
+    content_type = (out.get("content_type") or "POST").strip().upper() or "POST"
+    if content_type not in ("POST", "REEL", "CAROUSEL"):
+        content_type = "POST"
+    return {
+        "content_type": content_type,
+        "title": (out.get("title") or "").strip() or "Untitled",
+        "caption": (out.get("caption") or "").strip() or "",
+        "hashtags": hashtags,
+        "confidence_score": confidence,
+        "approval_status": approval_status_from_confidence(confidence),
+    }
+
+
+async def _generate_day_output(
+    llm: LLMService,
+    brand_context: Dict[str, Any],
+    topic: str,
+    content_angle: str,
+    effective_content_angle: str,
+    log_ctx: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Optional[Dict[str, int]]]:
+    """
+    Sinh nội dung 1 ngày qua LLM; lỗi bất kỳ -> template (usage_info None).
+    Trả (out, usage_info).
+    """
+    try:
+        return await llm.generate_single_content(brand_context, topic, effective_content_angle)
+    except (ValueError, Exception) as e:
+        logger.warning("content_mv2.llm_fallback", error=str(e), **log_ctx)
+        return _template_content(topic, content_angle), None
+
+
 async def generate_content(
     db: AsyncSession,
     tenant_id: UUID,
@@ -88,8 +137,7 @@ async def generate_content(
     if not plan or plan.tenant_id != tenant_id:
         raise ValueError("plan_not_found")
 
-    tenant_result = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
-    tenant = tenant_result.scalar_one_or_none()
+    tenant = await get_tenant_snapshot(db, tenant_id)
     if not tenant:
         raise ValueError("tenant_not_found")
 
@@ -100,17 +148,19 @@ async def generate_content(
     topic = (day_data.get("topic") or "").strip() or f"Day {day}"
     content_angle = (day_data.get("content_angle") or "").strip() or ""
 
-    profile = await get_industry_profile_by_tenant(db, tenant_id)
-    industry_name = profile.name if profile else tenant.industry
-    industry_desc = profile.description if profile else None
-    brand_context = _build_brand_context(tenant, industry_name, industry_desc)
+    profile = await get_industry_profile_snapshot(db, tenant_id)
+    industry_name = profile["name"] if profile else tenant["industry"]
+    industry_desc = profile["description"] if profile else None
+    brand_context = _build_brand_context(tenant["industry"], industry_name, industry_desc)
 
     prompt_tokens = 0
     completion_tokens = 0
     total_tokens = 0
+    cache_hit = False
+    tokens_saved = 0
     model_used: Optional[str] = None
     settings = get_settings()
-    llm = LLMService(settings)
+    llm = LLMService(settings, tenant_id=tenant_id)
     summary_row = None
     media_summary_context: Optional[str] = None
 
@@ -122,38 +172,31 @@ async def generate_content(
         )
         media_summary_context = summary_row.summary
 
-    try:
-        effective_content_angle = content_angle
-        if media_summary_context:
-            # Bắt buộc generator phải có ngữ cảnh media trước khi viết nội dung.
-            effective_content_angle = (
-                f"{content_angle}\n"
-                f"[MEDIA SUMMARY CONTEXT] {media_summary_context}"
-            ).strip()
-        out, usage_info = await llm.generate_single_content(
-            brand_context,
-            topic,
-            effective_content_angle,
-        )
+    effective_content_angle = content_angle
+    if media_summary_context:
+        # Bắt buộc generator phải có ngữ cảnh media trước khi viết nội dung.
+        effective_content_angle = (
+            f"{content_angle}\n"
+            f"[MEDIA SUMMARY CONTEXT] {media_summary_context}"
+        ).strip()
+    out, usage_info = await _generate_day_output(
+        llm,
+        brand_context,
+        topic,
+        content_angle,
+        effective_content_angle,
+        {"tenant_id": str(tenant_id), "plan_id": str(plan_id), "day": day},
+    )
+    if usage_info is not None:
         prompt_tokens = usage_info.get("prompt_tokens", 0)
         completion_tokens = usage_info.get("completion_tokens", 0)
         total_tokens = usage_info.get("total_tokens", 0)
+        cache_hit = bool(usage_info.get("cache_hit"))
+        tokens_saved = usage_info.get("tokens_saved", 0)
         model_used = settings.openai_model
-    except (ValueError, Exception) as e:
-        logger.warning("content_mv2.llm_fallback", tenant_id=str(tenant_id), plan_id=str(plan_id), day=day, error=str(e))
-        out = _template_content(topic, content_angle)
-        total_tokens = 0
 
-    hashtags = out.get("hashtags") or []
-    if not isinstance(hashtags, list):
-        hashtags = [str(hashtags)]
-    hashtags = [str(h).strip() for h in hashtags if str(h).strip()][:30]
-    if len(hashtags) < 5:
-        hashtags = hashtags + ["#tag" + str(i) for i in range(5 - len(hashtags))]
-
-    confidence = float(out.get("confidence_score", 0.75))
-    confidence = max(0.0, min(1.0, confidence))
-    approval_status = approval_status_from_confidence(confidence)
+    fields = _normalize_output(out)
+    approval_status = fields["approval_status"]
 
     item = RevenueContentItem(
         tenant_id=tenant_id,
@@ -161,12 +204,7 @@ async def generate_content(
         day=day,
         topic=topic,
         content_angle=content_angle,
-        content_type=(out.get("content_type") or "POST").strip().upper() or "POST",
-        title=(out.get("title") or "").strip() or "Untitled",
-        caption=(out.get("caption") or "").strip() or "",
-        hashtags=hashtags,
-        confidence_score=confidence,
-        approval_status=approval_status,
+        **fields,
         asset_id=asset_id,
         summary_id=(summary_row.id if summary_row else None),
         summary_snapshot_json=(
@@ -182,9 +220,6 @@ async def generate_content(
             else None
         ),
     )
-    if item.content_type not in ("POST", "REEL", "CAROUSEL"):
-        item.content_type = "POST"
-
     db.add(item)
     await db.flush()
     await db.refresh(item)
@@ -197,6 +232,8 @@ async def generate_content(
         prompt_tokens=prompt_tokens,
         completion_tokens=completion_tokens,
         total_tokens=total_tokens,
+        cache_hit=cache_hit,
+        tokens_saved=tokens_saved,
     )
 
     logger.info(
@@ -210,6 +247,120 @@ async def generate_content(
     return item
 
 
+async def generate_content_batch(
+    db: AsyncSession,
+    tenant_id: UUID,
+    plan_id: UUID,
+    day_from: int,
+    day_to: int,
+) -> Tuple[List[RevenueContentItem], List[int]]:
+    """
+    Generate content items cho dải ngày day_from..day_to của plan trong 1 request.
+    Plan / tenant / industry profile load 1 lần; mỗi ngày 1 completion, chạy song song
+    (số call đồng thời do semaphore tenant/global của openai_client giới hạn).
+    Ngày nào LLM lỗi thì fallback template riêng ngày đó. Bulk insert 1 câu INSERT ... RETURNING,
+    1 dòng ai_usage_logs tổng cho cả batch.
+    Returns (items theo thứ tự ngày, danh sách ngày dùng template).
+    """
+    if day_from < 1 or day_to > 30 or day_from > day_to:
+        raise ValueError("day_out_of_range")
+    if day_to - day_from + 1 > MAX_BATCH_DAYS:
+        raise ValueError("batch_too_large")
+
+    plan_result = await db.execute(select(GeneratedPlan).where(GeneratedPlan.id == plan_id))
+    plan = plan_result.scalar_one_or_none()
+    if not plan or plan.tenant_id != tenant_id:
+        raise ValueError("plan_not_found")
+
+    tenant = await get_tenant_snapshot(db, tenant_id)
+    if not tenant:
+        raise ValueError("tenant_not_found")
+
+    day_topics: List[Tuple[int, str, str]] = []
+    for day in range(day_from, day_to + 1):
+        day_data = _find_day_in_plan_json(plan.plan_json, day)
+        if not day_data:
+            raise ValueError("day_not_in_plan")
+        topic = (day_data.get("topic") or "").strip() or f"Day {day}"
+        content_angle = (day_data.get("content_angle") or "").strip() or ""
+        day_topics.append((day, topic, content_angle))
+
+    profile = await get_industry_profile_snapshot(db, tenant_id)
+    industry_name = profile["name"] if profile else tenant["industry"]
+    industry_desc = profile["description"] if profile else None
+    brand_context = _build_brand_context(tenant["industry"], industry_name, industry_desc)
+
+    settings = get_settings()
+    llm = LLMService(settings, tenant_id=tenant_id)
+    results = await asyncio.gather(
+        *[
+            _generate_day_output(
+                llm,
+                brand_context,
+                topic,
+                content_angle,
+                content_angle,
+                {"tenant_id": str(tenant_id), "plan_id": str(plan_id), "day": day},
+            )
+            for day, topic, content_angle in day_topics
+        ]
+    )
+
+    rows: List[Dict[str, Any]] = []
+    fallback_days: List[int] = []
+    prompt_tokens = completion_tokens = total_tokens = tokens_saved = 0
+    ai_days = cache_hit_days = 0
+    for (day, topic, content_angle), (out, usage_info) in zip(day_topics, results):
+        if usage_info is None:
+            fallback_days.append(day)
+        else:
+            ai_days += 1
+            prompt_tokens += usage_info.get("prompt_tokens", 0)
+            completion_tokens += usage_info.get("completion_tokens", 0)
+            total_tokens += usage_info.get("total_tokens", 0)
+            tokens_saved += usage_info.get("tokens_saved", 0)
+            cache_hit_days += 1 if usage_info.get("cache_hit") else 0
+        rows.append(
+            {
+                "tenant_id": tenant_id,
+                "plan_id": plan_id,
+                "day": day,
+                "topic": topic,
+                "content_angle": content_angle,
+                **_normalize_output(out),
+            }
+        )
+
+    result = await db.scalars(
+        insert(RevenueContentItem).returning(RevenueContentItem, sort_by_parameter_order=True),
+        rows,
+    )
+    items = list(result.all())
+
+    await log_usage(
+        db,
+        tenant_id=tenant_id,
+        feature="content_generator_batch",
+        model=settings.openai_model if ai_days else "gpt-4o-mini",
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+        cache_hit=ai_days > 0 and cache_hit_days == ai_days,
+        tokens_saved=tokens_saved,
+    )
+
+    logger.info(
+        "content_mv2.batch_generated",
+        tenant_id=str(tenant_id),
+        plan_id=str(plan_id),
+        day_from=day_from,
+        day_to=day_to,
+        count=len(items),
+        fallback_days=fallback_days,
+    )
+    return (items, fallback_days)
+
+
 async def get_content_by_id(
     db: AsyncSession,
     content_id: UUID,
@@ -1,18 +1,24 @@
 """
 Thu thập metrics (reach, impressions, reactions, comments, shares) từ Facebook Graph API.
 Lưu vào post_metrics; xử lý thiếu quyền hoặc lỗi (log + raw).
+Thu thập hàng loạt (collect_metrics): gom post_id thành Graph batch request (tối đa 50 sub-request),
+chạy song song FACEBOOK_METRICS_BATCH_CONCURRENCY batch, mỗi batch 1 bulk insert post_metrics + audit.
 """
+import asyncio
+import json
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
 from uuid import UUID
 
 import httpx
-from sqlalchemy import select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
+from app.infrastructure.http_clients import UPSTREAM_GRAPH, get_http_client
 from app.logging_config import get_logger
-from app.models import ContentItem, PublishLog, PostMetrics
+from app.models import ApprovalEvent, ContentItem, PublishLog, PostMetrics
 from app.services.approval_service import log_audit_event
 
 logger = get_logger(__name__)
@@ -20,9 +26,16 @@ logger = get_logger(__name__)
 PLATFORM_FACEBOOK = "facebook"
 GRAPH_BASE = "https://graph.facebook.com"
 HTTP_TIMEOUT = 15.0
+BATCH_HTTP_TIMEOUT = 60.0
+# Graph API: tối đa 50 sub-request mỗi batch
+GRAPH_BATCH_SIZE = 50
 
 # Insights metrics (Page post). Một số cần pages_read_engagement / pages_read_user_content.
 INSIGHTS_METRICS = "post_impressions,post_impressions_unique,post_reactions_by_type_total,post_clicks"
+METRICS_FIELDS = f"id,insights.metric({INSIGHTS_METRICS}),reactions.summary(total_count),comments.summary(total_count)"
+
+# (tenant_id, content_id, publish_log_id, post_id) - xem get_recent_success_publish_logs
+PublishLogRow = Tuple[UUID, UUID, UUID, str]
 
 
 async def fetch_metrics_for_post(post_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
@@ -36,11 +49,10 @@ async def fetch_metrics_for_post(post_id: str) -> Tuple[Optional[Dict[str, Any]]
     url = f"{GRAPH_BASE}/{settings.facebook_api_version}/{post_id}"
     params = {
         "access_token": settings.facebook_access_token,
-        "fields": f"id,insights.metric({INSIGHTS_METRICS}),reactions.summary(total_count),comments.summary(total_count)",
+        "fields": METRICS_FIELDS,
     }
     try:
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-            resp = await client.get(url, params=params)
+        resp = await get_http_client(UPSTREAM_GRAPH).get(url, params=params, timeout=HTTP_TIMEOUT)
     except httpx.RequestError as e:
         return None, str(e)
     try:
@@ -54,6 +66,58 @@ async def fetch_metrics_for_post(post_id: str) -> Tuple[Optional[Dict[str, Any]]
     return data, None
 
 
+async def fetch_metrics_batch(post_ids: Sequence[str]) -> Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Một Graph batch request (POST /?batch=[...]) cho tối đa GRAPH_BATCH_SIZE post_id.
+    Trả về {post_id: (data_dict, error_message)} như fetch_metrics_for_post; lỗi cả batch -> mọi post cùng lỗi.
+    """
+    settings = get_settings()
+    if not settings.facebook_access_token:
+        return {pid: (None, "facebook_not_configured") for pid in post_ids}
+    if len(post_ids) > GRAPH_BATCH_SIZE:
+        raise ValueError("graph_batch_too_large")
+    url = f"{GRAPH_BASE}/{settings.facebook_api_version}/"
+    fields = quote(METRICS_FIELDS, safe=",()")
+    batch = [{"method": "GET", "relative_url": f"{pid}?fields={fields}"} for pid in post_ids]
+    try:
+        resp = await get_http_client(UPSTREAM_GRAPH).post(
+            url,
+            data={
+                "access_token": settings.facebook_access_token,
+                "batch": json.dumps(batch),
+                "include_headers": "false",
+            },
+            timeout=BATCH_HTTP_TIMEOUT,
+        )
+        payload = resp.json()
+    except httpx.RequestError as e:
+        return {pid: (None, str(e)) for pid in post_ids}
+    except Exception as e:
+        return {pid: (None, f"json_error: {e}") for pid in post_ids}
+    if resp.status_code != 200 or not isinstance(payload, list):
+        err = payload.get("error", {}) if isinstance(payload, dict) else {}
+        msg = err.get("message") or resp.text or f"HTTP {resp.status_code}"
+        return {pid: (payload if isinstance(payload, dict) else None, msg) for pid in post_ids}
+
+    out: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]] = {}
+    for pid, sub in zip(post_ids, payload):
+        if not isinstance(sub, dict):
+            # Graph trả null cho sub-request chưa xử lý xong (timeout trong batch)
+            out[pid] = (None, "batch_item_timeout")
+            continue
+        try:
+            data = json.loads(sub.get("body") or "{}")
+        except (TypeError, ValueError) as e:
+            out[pid] = (None, f"json_error: {e}")
+            continue
+        if sub.get("code") != 200:
+            err = data.get("error", {}) if isinstance(data, dict) else {}
+            out[pid] = (data, err.get("message") or f"HTTP {sub.get('code')}")
+            continue
+        out[pid] = (data, None)
+    return out
+
+
 def _parse_metrics_from_response(data: Dict[str, Any]) -> Dict[str, Optional[int]]:
     """Trích reach, impressions, reactions, comments, shares từ response Graph API."""
     out: Dict[str, Optional[int]] = {
@@ -122,6 +186,7 @@ async def fetch_and_store_metrics(
             event_type="METRICS_FETCH_FAIL",
             actor="SYSTEM",
             metadata_=log_metadata,
+            background=True,
         )
         logger.warning("facebook_metrics.fetch_fail", post_id=post_id, error=error)
     else:
@@ -132,6 +197,7 @@ async def fetch_and_store_metrics(
             event_type="METRICS_FETCH_SUCCESS",
             actor="SYSTEM",
             metadata_={"post_id": post_id, "reach": parsed.get("reach"), "impressions": parsed.get("impressions")},
+            background=True,
         )
         logger.info("facebook_metrics.fetch_ok", post_id=post_id)
     row = PostMetrics(
@@ -152,6 +218,99 @@ async def fetch_and_store_metrics(
     return row, error is None
 
 
+async def _store_metrics_batch(
+    db: AsyncSession,
+    rows: Sequence[PublishLogRow],
+    results: Dict[str, Tuple[Optional[Dict[str, Any]], Optional[str]]],
+    platform: str = PLATFORM_FACEBOOK,
+) -> Tuple[int, int]:
+    """Bulk insert post_metrics + audit METRICS_FETCH_* cho 1 batch. Trả về (success, fail). Caller commit."""
+    now = datetime.now(timezone.utc)
+    metric_rows: List[Dict[str, Any]] = []
+    audit_rows: List[Dict[str, Any]] = []
+    success = 0
+    for tenant_id, content_id, publish_log_id, post_id in rows:
+        data, error = results.get(post_id, (None, "batch_item_missing"))
+        parsed = _parse_metrics_from_response(data) if data else {}
+        raw: Optional[Dict[str, Any]] = data
+        if error:
+            raw = (data or {}) | {"_error": error, "_status": "fail"}
+            event_type = "METRICS_FETCH_FAIL"
+            metadata: Dict[str, Any] = {"post_id": post_id, "error": error}
+            logger.warning("facebook_metrics.fetch_fail", post_id=post_id, error=error)
+        else:
+            success += 1
+            event_type = "METRICS_FETCH_SUCCESS"
+            metadata = {"post_id": post_id, "reach": parsed.get("reach"), "impressions": parsed.get("impressions")}
+        metric_rows.append(
+            {
+                "tenant_id": tenant_id,
+                "content_id": content_id,
+                "publish_log_id": publish_log_id,
+                "platform": platform,
+                "fetched_at": now,
+                "reach": parsed.get("reach"),
+                "impressions": parsed.get("impressions"),
+                "reactions": parsed.get("reactions"),
+                "comments": parsed.get("comments"),
+                "shares": parsed.get("shares"),
+                "raw": raw,
+            }
+        )
+        audit_rows.append(
+            {
+                "tenant_id": tenant_id,
+                "content_id": content_id,
+                "event_type": event_type,
+                "actor": "SYSTEM",
+                "metadata_": metadata,
+            }
+        )
+    if metric_rows:
+        await db.execute(insert(PostMetrics), metric_rows)
+        await db.execute(insert(ApprovalEvent), audit_rows)
+    return success, len(rows) - success
+
+
+async def collect_metrics(db: AsyncSession, rows: Sequence[PublishLogRow]) -> Tuple[int, int, int]:
+    """
+    Thu thập metrics cho rows: chia batch GRAPH_BATCH_SIZE, gọi Graph song song tối đa
+    FACEBOOK_METRICS_BATCH_CONCURRENCY batch; batch nào về trước ghi trước (bulk insert + commit từng batch,
+    lỗi ghi 1 batch không mất các batch khác). Trả về (fetched, success, fail).
+    """
+    if not rows:
+        return 0, 0, 0
+    settings = get_settings()
+    sem = asyncio.Semaphore(max(1, settings.facebook_metrics_batch_concurrency))
+    chunks = [list(rows[i : i + GRAPH_BATCH_SIZE]) for i in range(0, len(rows), GRAPH_BATCH_SIZE)]
+
+    async def _fetch(chunk: List[PublishLogRow]):  # noqa: ANN202
+        async with sem:
+            return chunk, await fetch_metrics_batch([r[3] for r in chunk])
+
+    success = 0
+    fail = 0
+    for next_done in asyncio.as_completed([_fetch(c) for c in chunks]):
+        chunk, results = await next_done
+        try:
+            ok, bad = await _store_metrics_batch(db, chunk, results)
+            await db.commit()
+            success += ok
+            fail += bad
+        except Exception as e:
+            logger.warning("facebook_metrics.store_batch_error", size=len(chunk), error=str(e))
+            await db.rollback()
+            fail += len(chunk)
+    logger.info(
+        "facebook_metrics.collected",
+        fetched=len(rows),
+        batches=len(chunks),
+        success=success,
+        fail=fail,
+    )
+    return len(rows), success, fail
+
+
 # Giới hạn an toàn cho fetch-now thủ công
 FETCH_NOW_MAX_DAYS = 30
 FETCH_NOW_MAX_LIMIT = 50
@@ -176,26 +335,7 @@ async def fetch_now_metrics(
         tenant_id=tenant_id,
         limit=limit,
     )
-    success = 0
-    fail = 0
-    for tid, content_id, publish_log_id, post_id in rows:
-        try:
-            _, ok = await fetch_and_store_metrics(
-                db,
-                tenant_id=tid,
-                content_id=content_id,
-                publish_log_id=publish_log_id,
-                post_id=post_id,
-            )
-            if ok:
-                success += 1
-            else:
-                fail += 1
-        except Exception as e:
-            logger.warning("facebook_metrics.fetch_now_one_error", post_id=post_id, error=str(e))
-            fail += 1
-        await db.commit()
-    return len(rows), success, fail
+    return await collect_metrics(db, rows)
 
 
 async def get_recent_success_publish_logs(
@@ -203,7 +343,7 @@ async def get_recent_success_publish_logs(
     within_days: int = 7,
     tenant_id: Optional[UUID] = None,
     limit: Optional[int] = None,
-) -> list[Tuple[UUID, UUID, UUID, str]]:
+) -> list[PublishLogRow]:
     """
     Lấy các publish_log có status=success, published_at trong within_days gần đây.
     Nếu tenant_id: chỉ tenant đó. Nếu limit: giới hạn số dòng.
@@ -231,6 +371,36 @@ async def get_recent_success_publish_logs(
     return [(tid, pl.content_id, pl.id, pl.post_id) for (pl, tid) in rows if pl.post_id]
 
 
+KPI_METRIC_FIELDS = ("reach", "impressions", "reactions", "comments", "shares")
+
+
+def _kpi_summary_query(tenant_id: UUID, since: datetime):
+    """
+    1 câu SQL: DISTINCT ON (publish_log_id) lấy snapshot mới nhất mỗi post (không đọc cột raw),
+    SUM() OVER () tính tổng trên các snapshot đó -> mỗi dòng = 1 post + tổng (lặp lại).
+    """
+    latest = (
+        select(
+            PostMetrics.publish_log_id,
+            PostMetrics.fetched_at,
+            *[getattr(PostMetrics, f) for f in KPI_METRIC_FIELDS],
+            PublishLog.post_id,
+        )
+        .join(PublishLog, PublishLog.id == PostMetrics.publish_log_id)
+        .where(
+            PostMetrics.tenant_id == tenant_id,
+            PostMetrics.fetched_at >= since,
+        )
+        .distinct(PostMetrics.publish_log_id)
+        .order_by(PostMetrics.publish_log_id, PostMetrics.fetched_at.desc(), PostMetrics.id.desc())
+        .subquery("latest")
+    )
+    totals = [
+        func.coalesce(func.sum(latest.c[f]).over(), 0).label(f"total_{f}") for f in KPI_METRIC_FIELDS
+    ]
+    return select(latest, *totals).order_by(latest.c.fetched_at.desc())
+
+
 async def get_kpi_summary(
     db: AsyncSession,
     tenant_id: UUID,
@@ -238,48 +408,21 @@ async def get_kpi_summary(
 ) -> Tuple[Dict[str, int], list[Dict[str, Any]]]:
     """
     Tổng hợp KPI từ post_metrics trong `days` gần đây (theo fetched_at).
-    Lấy bản ghi mới nhất theo publish_log_id cho mỗi post; tổng và danh sách post.
+    Lấy bản ghi mới nhất theo publish_log_id cho mỗi post (chọn + cộng tổng trong SQL, xem _kpi_summary_query).
     Trả về (totals_dict, posts_list). totals: reach, impressions, reactions, comments, shares.
     """
     from datetime import timedelta
 
     since = datetime.now(timezone.utc) - timedelta(days=days)
-    q = (
-        select(PostMetrics, PublishLog.post_id)
-        .join(PublishLog, PublishLog.id == PostMetrics.publish_log_id)
-        .where(
-            PostMetrics.tenant_id == tenant_id,
-            PostMetrics.fetched_at >= since,
-        )
-        .order_by(PostMetrics.fetched_at.desc())
-    )
-    r = await db.execute(q)
-    rows = r.all()
-    # Lấy bản ghi mới nhất theo publish_log_id
-    by_log: Dict[UUID, Any] = {}
-    for pm, post_id in rows:
-        if pm.publish_log_id not in by_log:
-            by_log[pm.publish_log_id] = (pm, post_id)
-    totals = {"reach": 0, "impressions": 0, "reactions": 0, "comments": 0, "shares": 0}
-    posts: list[Dict[str, Any]] = []
-    for (pm, post_id) in by_log.values():
-        if pm.reach is not None:
-            totals["reach"] += pm.reach
-        if pm.impressions is not None:
-            totals["impressions"] += pm.impressions
-        if pm.reactions is not None:
-            totals["reactions"] += pm.reactions
-        if pm.comments is not None:
-            totals["comments"] += pm.comments
-        if pm.shares is not None:
-            totals["shares"] += pm.shares
-        posts.append({
-            "post_id": post_id,
-            "fetched_at": pm.fetched_at.isoformat() if pm.fetched_at else None,
-            "reach": pm.reach,
-            "impressions": pm.impressions,
-            "reactions": pm.reactions,
-            "comments": pm.comments,
-            "shares": pm.shares,
-        })
+    r = await db.execute(_kpi_summary_query(tenant_id, since))
+    rows = r.mappings().all()
+    totals = {f: int(rows[0][f"total_{f}"]) if rows else 0 for f in KPI_METRIC_FIELDS}
+    posts: list[Dict[str, Any]] = [
+        {
+            "post_id": row["post_id"],
+            "fetched_at": row["fetched_at"].isoformat() if row["fetched_at"] else None,
+            **{f: row[f] for f in KPI_METRIC_FIELDS},
+        }
+        for row in rows
+    ]
     return totals, posts
@@ -2,19 +2,23 @@
 Đăng bài đã APPROVED lên Facebook Page qua Graph API.
 - Nếu content.require_media: bắt buộc có ít nhất 1 asset (ready/cached); không có thì 400 media_required.
 - Image: upload /{page_id}/photos published=false -> media_fbid, rồi tạo feed post với attached_media.
-- Video: upload /{page_id}/videos với description -> lưu video_id/post_id.
+- Video: resumable upload /{page_id}/videos (start/transfer/finish, chunk từ đĩa, offset lưu trên content_assets).
 - Cập nhật content_assets (fb_media_fbid/fb_video_id, status=uploaded); di chuyển file Drive sang PROCESSED/REJECTED.
 """
+import asyncio
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, Tuple
 from uuid import UUID
 
 import httpx
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
+from app.db import async_session_factory
+from app.infrastructure.http_clients import UPSTREAM_GRAPH, get_http_client
 from app.logging_config import get_logger
 from app.models import ContentAsset, ContentItem, PublishLog
 from app.services.approval_service import log_audit_event
@@ -25,7 +29,7 @@ logger = get_logger(__name__)
 PLATFORM_FACEBOOK = "facebook"
 GRAPH_BASE = "https://graph.facebook.com"
 HTTP_TIMEOUT = 30.0
-VIDEO_UPLOAD_TIMEOUT = 300.0  # Video có thể upload lâu
+VIDEO_CHUNK_TIMEOUT = 120.0  # Mỗi chunk video (resumable upload)
 MAX_RETRIES = 2
 
 ASSET_STATUS_READY = "ready"
@@ -99,7 +103,7 @@ async def publish_post(
     Đăng một content_item lên Facebook Page (chỉ khi status == "approved").
     - Nếu require_media: cần ít nhất 1 asset (ready/cached); không có -> ValueError("media_required").
     - Image: upload photos published=false -> media_fbid, rồi POST feed với attached_media.
-    - Video: upload videos với description -> post_id.
+    - Video: resumable upload (start/transfer/finish), retry tiếp tục từ offset đã lưu -> video_id.
     - Cập nhật content_assets (fb_media_fbid/fb_video_id, status=uploaded); move Drive file PROCESSED/REJECTED.
     Trả về (publish_log, error_message). error_message chỉ có khi fail.
     """
@@ -138,6 +142,7 @@ async def publish_post(
         content_id=content_id,
         event_type="PUBLISH_REQUESTED",
         actor=actor,
+        background=actor == "SYSTEM",
         metadata_={"platform": PLATFORM_FACEBOOK},
     )
 
@@ -156,6 +161,7 @@ async def publish_post(
                 content_id=content_id,
                 event_type="PUBLISH_FAIL",
                 actor=actor,
+                background=actor == "SYSTEM",
                 metadata_={"platform": PLATFORM_FACEBOOK, "error": "media_required"},
             )
             logger.warning("facebook_publish.media_required", content_id=str(content_id))
@@ -170,7 +176,7 @@ async def publish_post(
         if asset.asset_type == "video":
             endpoint = f"{GRAPH_BASE}/{settings.facebook_api_version}/{settings.facebook_page_id}/videos"
             logger.info("facebook_publish.calling", endpoint=endpoint, content_id=str(content_id))
-            # Upload video: POST /{page_id}/videos, description=message
+            # Upload video resumable: POST /{page_id}/videos upload_phase=start|transfer|finish
             post_id, last_error, http_status = await _publish_video(
                 settings.facebook_page_id,
                 settings.facebook_access_token,
@@ -195,10 +201,9 @@ async def publish_post(
             _move_asset_to_processed_or_rejected(asset, success=False, error_reason=last_error)
         else:
             asset.status = ASSET_STATUS_UPLOADED
-            if asset.asset_type == "video":
-                asset.fb_video_id = post_id  # Graph trả về id có thể là video id hoặc post id
-            else:
+            if asset.asset_type != "video":
                 asset.fb_media_fbid = post_id  # photo id
+            # video: _publish_video đã ghi asset.fb_video_id = video id, post_id là id bài viết trên page
             if asset.content_id is None:
                 asset.content_id = content_id
             await db.flush()
@@ -211,10 +216,10 @@ async def publish_post(
             "message": message,
             "access_token": settings.facebook_access_token,
         }
+        client = get_http_client(UPSTREAM_GRAPH)
         for attempt in range(MAX_RETRIES + 1):
             try:
-                async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                    resp = await client.post(url, data=payload)
+                resp = await client.post(url, data=payload, timeout=HTTP_TIMEOUT)
                 http_status = resp.status_code
                 if resp.status_code == 200:
                     data = resp.json()
@@ -246,6 +251,7 @@ async def publish_post(
             content_id=content_id,
             event_type="PUBLISH_FAIL",
             actor=actor,
+            background=actor == "SYSTEM",
             metadata_={
                 "platform": PLATFORM_FACEBOOK,
                 "http_status": http_status,
@@ -273,6 +279,7 @@ async def publish_post(
         content_id=content_id,
         event_type="PUBLISH_SUCCESS",
         actor=actor,
+        background=actor == "SYSTEM",
         metadata_={"platform": PLATFORM_FACEBOOK, "post_id": post_id, "http_status": http_status or 200},
     )
     logger.info(
@@ -303,11 +310,11 @@ async def _publish_photo(
     url = f"{GRAPH_BASE}/{api_version}/{page_id}/photos"
     data = {"access_token": access_token, "published": "false"}
 
+    client = get_http_client(UPSTREAM_GRAPH)
     try:
         with open(local_path, "rb") as f:
             files = {"source": (asset.file_name or "image", f, asset.mime_type or "image/jpeg")}
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                resp = await client.post(url, data=data, files=files)
+            resp = await client.post(url, data=data, files=files, timeout=HTTP_TIMEOUT)
         if resp.status_code != 200:
             try:
                 err_body = resp.json()
@@ -329,8 +336,8 @@ async def _publish_photo(
             "access_token": access_token,
             "attached_media": [{"media_fbid": photo_id}],
         }
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-            feed_resp = await client.post(feed_url, data=feed_payload)
+        # Cùng client (connection keep-alive) với bước upload ảnh
+        feed_resp = await client.post(feed_url, data=feed_payload, timeout=HTTP_TIMEOUT)
         if feed_resp.status_code != 200:
             try:
                 err_body = feed_resp.json()
@@ -349,6 +356,64 @@ async def _publish_photo(
         return None, str(e), None
 
 
+def _graph_error(resp: httpx.Response) -> str:
+    """Message lỗi từ response Graph (error.message) hoặc text/HTTP status."""
+    try:
+        err_body = resp.json()
+        return err_body.get("error", {}).get("message", resp.text) or resp.text
+    except Exception:
+        return resp.text or f"HTTP {resp.status_code}"
+
+
+async def _save_upload_progress(
+    asset: ContentAsset,
+    session_id: Optional[str],
+    video_id: Optional[str],
+    offset: int,
+) -> None:
+    """
+    Lưu session upload + offset đã gửi vào content_assets bằng session DB riêng (commit ngay),
+    để lần retry sau (kể cả sau khi process chết) tiếp tục từ offset thay vì upload lại từ đầu.
+    """
+    asset.fb_upload_session_id = session_id
+    asset.fb_upload_video_id = video_id
+    asset.fb_upload_offset = offset
+    try:
+        async with async_session_factory() as db:
+            await db.execute(
+                update(ContentAsset)
+                .where(ContentAsset.id == asset.id)
+                .values(fb_upload_session_id=session_id, fb_upload_video_id=video_id, fb_upload_offset=offset)
+            )
+            await db.commit()
+    except Exception as e:
+        logger.warning("facebook_publish.upload_progress_save_failed", asset_id=str(asset.id), error=str(e))
+
+
+def _read_chunk(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+async def _fetch_video_post_id(client: httpx.AsyncClient, api_version: str, video_id: str, access_token: str) -> Optional[str]:
+    """Post id trên page của video (GET /{video_id}?fields=post_id); finish chỉ trả success. Lỗi -> None."""
+    try:
+        resp = await client.get(
+            f"{GRAPH_BASE}/{api_version}/{video_id}",
+            params={"fields": "post_id", "access_token": access_token},
+            timeout=HTTP_TIMEOUT,
+        )
+        if resp.status_code == 200:
+            post_id = resp.json().get("post_id")
+            if post_id:
+                return str(post_id)
+        logger.warning("facebook_publish.video_post_id_missing", video_id=video_id, http_status=resp.status_code)
+    except httpx.RequestError as e:
+        logger.warning("facebook_publish.video_post_id_missing", video_id=video_id, error=str(e))
+    return None
+
+
 async def _publish_video(
     page_id: str,
     access_token: str,
@@ -357,36 +422,147 @@ async def _publish_video(
     message: str,
 ) -> Tuple[Optional[str], Optional[str], Optional[int]]:
     """
-    Upload video lên page với description=message. Graph trả về id (video/post).
-    Trả về (post_id hoặc video_id, error, http_status).
+    Upload video theo giao thức resumable của Graph: start -> transfer (từng chunk) -> finish (description=message).
+    - Chunk tối đa FACEBOOK_VIDEO_CHUNK_MB đọc từ đĩa (không nạp cả file vào RAM), mỗi chunk retry tại chỗ.
+    - Session + offset lưu vào content_assets sau mỗi chunk: retry publish tiếp tục từ offset đã lưu;
+      session lấy từ DB mà Graph từ chối (hết hạn / không hợp lệ, kể cả offset 0) thì xoá và bắt đầu session mới.
+    - Xong: asset.fb_video_id = video_id; trả post id của page (GET /{video_id}?fields=post_id, thiếu thì video_id)
+      để publish_logs.post_id / metrics dùng id bài viết.
+    - Log throughput (MB/s) khi xong.
+    Trả về (post_id, error, http_status).
     """
     local_path = asset.local_path
     if not local_path or not Path(local_path).is_file():
         return None, "asset_local_file_missing", None
 
+    settings = get_settings()
+    chunk_size = max(1, settings.facebook_video_chunk_mb) * 1024 * 1024
+    file_size = Path(local_path).stat().st_size
     url = f"{GRAPH_BASE}/{api_version}/{page_id}/videos"
-    data = {
-        "access_token": access_token,
-        "description": message,
-    }
+    client = get_http_client(UPSTREAM_GRAPH)
+
+    session_id = asset.fb_upload_session_id
+    video_id = asset.fb_upload_video_id
+    offset = int(asset.fb_upload_offset or 0) if session_id else 0
+    resumed_from = offset
+    # Session lưu từ lần publish trước (có thể đã hết hạn phía Graph)
+    stored_session = bool(session_id)
+    started = time.perf_counter()
+    sent_bytes = 0
+    http_status: Optional[int] = None
+
     try:
-        with open(local_path, "rb") as f:
-            files = {"source": (asset.file_name or "video", f, asset.mime_type or "video/mp4")}
-            async with httpx.AsyncClient(timeout=VIDEO_UPLOAD_TIMEOUT) as client:
-                resp = await client.post(url, data=data, files=files)
-        if resp.status_code != 200:
-            try:
-                err_body = resp.json()
-                err_msg = err_body.get("error", {}).get("message", resp.text) or resp.text
-            except Exception:
-                err_msg = resp.text or f"HTTP {resp.status_code}"
-            return None, err_msg, resp.status_code
-        data_res = resp.json()
-        # Video upload có thể trả về "id" (video) và "post_id" (bài đăng trên page)
-        post_id = data_res.get("post_id") or data_res.get("id")
-        if not post_id and "id" in data_res:
-            post_id = str(data_res["id"])
-        return post_id, None, resp.status_code
+        for _session_attempt in range(2):
+            failed: Optional[httpx.Response] = None
+            if not session_id:
+                # Phase start: Graph trả upload_session_id, video_id và khoảng offset chunk đầu
+                resp = await client.post(
+                    url,
+                    data={"access_token": access_token, "upload_phase": "start", "file_size": str(file_size)},
+                    timeout=HTTP_TIMEOUT,
+                )
+                http_status = resp.status_code
+                if resp.status_code != 200:
+                    return None, _graph_error(resp), resp.status_code
+                start_data = resp.json()
+                session_id = str(start_data.get("upload_session_id") or "")
+                video_id = str(start_data.get("video_id") or "") or None
+                if not session_id:
+                    return None, "video_upload_no_session", resp.status_code
+                offset = int(start_data.get("start_offset") or 0)
+                end_offset = int(start_data.get("end_offset") or min(file_size, chunk_size))
+                await _save_upload_progress(asset, session_id, video_id, offset)
+            else:
+                end_offset = min(file_size, offset + chunk_size)
+                logger.info(
+                    "facebook_publish.video_resume",
+                    asset_id=str(asset.id),
+                    offset=offset,
+                    file_size=file_size,
+                )
+
+            # Phase transfer: gửi [offset, end_offset) (tối đa chunk_size), Graph trả offset kế tiếp
+            while offset < end_offset:
+                length = min(chunk_size, end_offset - offset)
+                chunk = await asyncio.to_thread(_read_chunk, local_path, offset, length)
+                resp = None
+                for attempt in range(MAX_RETRIES + 1):
+                    try:
+                        resp = await client.post(
+                            url,
+                            data={
+                                "access_token": access_token,
+                                "upload_phase": "transfer",
+                                "upload_session_id": session_id,
+                                "start_offset": str(offset),
+                            },
+                            files={"video_file_chunk": (asset.file_name or "video", chunk, "application/octet-stream")},
+                            timeout=VIDEO_CHUNK_TIMEOUT,
+                        )
+                        if resp.status_code < 500:
+                            break
+                    except httpx.RequestError as e:
+                        if attempt >= MAX_RETRIES:
+                            raise
+                        logger.warning("facebook_publish.video_chunk_retry", offset=offset, attempt=attempt + 1, error=str(e))
+                http_status = resp.status_code
+                if resp.status_code != 200:
+                    failed = resp
+                    break
+                sent_bytes += len(chunk)
+                transfer_data = resp.json()
+                offset = int(transfer_data.get("start_offset", offset + len(chunk)))
+                end_offset = int(transfer_data.get("end_offset", offset))
+                await _save_upload_progress(asset, session_id, video_id, offset)
+
+            if failed is None:
+                # Phase finish: publish video với description
+                resp = await client.post(
+                    url,
+                    data={
+                        "access_token": access_token,
+                        "upload_phase": "finish",
+                        "upload_session_id": session_id,
+                        "description": message,
+                    },
+                    timeout=HTTP_TIMEOUT,
+                )
+                http_status = resp.status_code
+                if resp.status_code == 200:
+                    if not resp.json().get("success", True):
+                        return None, "video_upload_finish_failed", resp.status_code
+                    break
+                failed = resp
+
+            if not stored_session:
+                return None, _graph_error(failed), failed.status_code
+            # Session lấy từ DB không dùng được nữa: bỏ (kể cả khi dừng ở offset 0), bắt đầu session mới từ 0
+            logger.warning(
+                "facebook_publish.video_session_expired",
+                asset_id=str(asset.id),
+                offset=offset,
+                error=_graph_error(failed),
+            )
+            session_id, video_id, offset, resumed_from, stored_session = None, None, 0, 0, False
+            await _save_upload_progress(asset, None, None, 0)
+        else:
+            return None, "video_upload_session_failed", http_status
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "facebook_publish.video_uploaded",
+            asset_id=str(asset.id),
+            video_id=video_id,
+            file_size=file_size,
+            sent_bytes=sent_bytes,
+            resumed_from=resumed_from,
+            elapsed_s=round(elapsed, 2),
+            throughput_mbps=round(sent_bytes / 1024 / 1024 / elapsed, 2) if elapsed > 0 else None,
+        )
+        await _save_upload_progress(asset, None, None, 0)
+        asset.fb_video_id = video_id
+        post_id = await _fetch_video_post_id(client, api_version, video_id, access_token) if video_id else None
+        return post_id or video_id, None, http_status
     except httpx.TimeoutException as e:
         return None, f"Timeout: {e}", None
     except httpx.RequestError as e:
@@ -1,26 +1,39 @@
 """
 Google Drive Dropzone: quet thu muc READY (images/videos), tai ve local, ghi content_assets.
 Idempotent ingest:
-- Query (tenant_id, drive_file_id) truoc khi download.
+- Query (tenant_id, drive_file_id) theo lo (1 query / trang file) truoc khi download.
 - Neu da ton tai va local file hop le -> skip (khong download lai).
 - Neu row cu invalid/download_failed hoac local file hu -> retry download va update row cu.
+Che do quet (GDRIVE_SYNC_MODE hoac tham so mode):
+- full: liet ke toan bo folder READY (theo het nextPageToken).
+- incremental: Drive Changes API tu start page token luu trong gdrive_sync_state (tenant + folder).
+  Khong co thay doi -> 1 API call, khong query content_assets. Chua co token / token loi -> full + lay token moi.
+  Folder co file tai loi (download_failed) -> giu token cu, lan sau doc lai thay doi va tai lai file do.
+Job nen (app.services.gdrive_ingest_jobs): ingest_ready_assets(progress=...) bao tien do sau moi file
+va checkpoint sau moi trang (job commit phan da xu ly).
+Dedup noi dung: SHA-256 tinh trong luc tai, luu content_assets.content_sha256; moi noi dung 1 blob
+({LOCAL_MEDIA_DIR}/blobs), file cua tenant la hardlink. Drive co sha256Checksum trung blob -> khong tai lai.
 """
 
+import asyncio
+import hashlib
 import logging
 import os
+import time
 import uuid
+from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app.models import ContentAsset
+from app.infrastructure.gdrive_client import get_drive_service
+from app.models import ContentAsset, GdriveSyncState
 
 logger = logging.getLogger(__name__)
 
@@ -34,36 +47,90 @@ ASSET_TYPE_VIDEO = "video"
 STATUS_INVALID = "invalid"
 STATUS_CACHED = "cached"
 
+SYNC_MODE_FULL = "full"
+SYNC_MODE_INCREMENTAL = "incremental"
+SYNC_MODES = (SYNC_MODE_FULL, SYNC_MODE_INCREMENTAL)
+
+# pageSize toi da cua files.list / changes.list; cung la kich thuoc lo khi kiem tra asset da ton tai
+DRIVE_PAGE_SIZE = 1000
+_DRIVE_FILE_FIELDS = "id, name, mimeType, size, parents, sha256Checksum"
+# Kho noi dung theo hash: {LOCAL_MEDIA_DIR}/blobs/<sha[:2]>/<sha>; file cua tenant la hardlink toi blob
+BLOB_DIR_NAME = "blobs"
+
+# progress(counts, checkpoint): counts = ingested/invalid/skipped/files_total/files_done/bytes_downloaded;
+# checkpoint=True sau moi trang (moi file cua trang da ghi DB)
+IngestProgress = Callable[[Dict[str, int], bool], Awaitable[None]]
+
 
 def _get_drive_service():
-    """Tao Drive API client tu Service Account JSON."""
+    """Drive API client dung chung (cache toan process, xem app.infrastructure.gdrive_client)."""
     settings = get_settings()
     path = settings.gdrive_sa_json_path
     if not path or not os.path.isfile(path):
         raise ValueError("GDRIVE_SA_JSON_PATH khong hop le hoac file khong ton tai")
-    scopes = [
-        "https://www.googleapis.com/auth/drive.readonly",
-        "https://www.googleapis.com/auth/drive.file",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = service_account.Credentials.from_service_account_file(path, scopes=scopes)
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    return get_drive_service(path)
 
 
 def list_files(folder_id: str) -> List[Dict[str, Any]]:
-    """Liet ke file trong thu muc Drive (khong de quy)."""
+    """Liet ke toan bo file trong thu muc Drive (khong de quy), theo het nextPageToken."""
     drive = _get_drive_service()
     q = f"'{folder_id}' in parents and trashed = false"
-    results = (
-        drive.files()
-        .list(
-            q=q,
-            pageSize=100,
-            fields="files(id, name, mimeType, size, parents)",
+    files: List[Dict[str, Any]] = []
+    page_token: Optional[str] = None
+    while True:
+        results = (
+            drive.files()
+            .list(
+                q=q,
+                pageSize=DRIVE_PAGE_SIZE,
+                pageToken=page_token,
+                fields=f"nextPageToken, files({_DRIVE_FILE_FIELDS})",
+            )
+            .execute()
         )
-        .execute()
-    )
-    return results.get("files", [])
+        files.extend(results.get("files", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def get_start_page_token() -> str:
+    """Token hien tai cua Changes API (moi thay doi sau thoi diem nay se co trong changes.list)."""
+    drive = _get_drive_service()
+    return drive.changes().getStartPageToken().execute()["startPageToken"]
+
+
+def list_changes(page_token: str) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Cac file thay doi sau page_token (changes.list, theo het nextPageToken).
+    Tra ve (files con ton tai - bo removed/trashed, moi file 1 lan; newStartPageToken).
+    """
+    drive = _get_drive_service()
+    files: Dict[str, Dict[str, Any]] = {}
+    while True:
+        results = (
+            drive.changes()
+            .list(
+                pageToken=page_token,
+                pageSize=DRIVE_PAGE_SIZE,
+                spaces="drive",
+                fields=(
+                    "nextPageToken, newStartPageToken, "
+                    f"changes(fileId, removed, file({_DRIVE_FILE_FIELDS}, trashed))"
+                ),
+            )
+            .execute()
+        )
+        for change in results.get("changes", []):
+            meta = change.get("file")
+            file_id = change.get("fileId")
+            if change.get("removed") or not meta or meta.get("trashed"):
+                files.pop(file_id, None)
+                continue
+            files[file_id] = meta
+        if results.get("newStartPageToken"):
+            return list(files.values()), results["newStartPageToken"]
+        page_token = results["nextPageToken"]
 
 
 def validate_file(meta: Dict[str, Any]) -> Tuple[bool, Optional[str], Optional[str]]:
@@ -95,17 +162,112 @@ def validate_file(meta: Dict[str, Any]) -> Tuple[bool, Optional[str], Optional[s
     return True, asset_type, None
 
 
+class _HashingWriter:
+    """Boc file object: tinh SHA-256 tung chunk MediaIoBaseDownload ghi xuong (khong doc lai file)."""
+
+    def __init__(self, f: Any) -> None:
+        self._f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._f, name)
+
+
+def _blob_path(sha256: str) -> Path:
+    return Path(get_settings().local_media_dir) / BLOB_DIR_NAME / sha256[:2] / sha256
+
+
+def _link_to_dest(src: Path, dest: Path) -> None:
+    """Hardlink src -> dest (atomic qua ten tam + os.replace)."""
+    link_tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.link")
+    os.link(src, link_tmp)
+    os.replace(link_tmp, dest)
+
+
+def _store_downloaded(tmp_path: Path, dest: Path, sha256: str) -> None:
+    """
+    Dua file vua tai (tmp_path) vao kho theo hash va dat o dest.
+    Blob da co -> bo ban vua tai, dest la hardlink toi blob. Chua co -> file vua tai thanh blob (cung inode voi dest).
+    Khong hardlink duoc (khac filesystem / FS khong ho tro) -> dest la ban rieng.
+    """
+    blob = _blob_path(sha256)
+    try:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        if blob.is_file():
+            _link_to_dest(blob, dest)
+            tmp_path.unlink(missing_ok=True)
+            return
+        os.link(tmp_path, blob)
+    except OSError as e:
+        logger.info("gdrive_dropzone.blob_store_skipped sha256=%s error=%s", sha256, e)
+    os.replace(tmp_path, dest)
+
+
+def link_from_store(sha256: str, dest_path: str) -> bool:
+    """Noi dung sha256 da co trong kho -> hardlink toi dest_path, khong can tai. False neu chua co / link loi."""
+    blob = _blob_path(sha256)
+    if not blob.is_file():
+        return False
+    dest = Path(dest_path)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        _link_to_dest(blob, dest)
+    except OSError as e:
+        logger.info("gdrive_dropzone.blob_link_failed sha256=%s error=%s", sha256, e)
+        return False
+    return True
+
+
 def download_file(file_id: str, dest_path: str) -> str:
-    """Tai file Drive xuong dest_path."""
+    """
+    Tai file Drive xuong dest_path (blocking - goi qua asyncio.to_thread), tra SHA-256 (hex) cua noi dung.
+    Ghi vao file tam cung thu muc (tinh hash trong luc ghi) roi dua vao kho theo hash + dat o dest_path:
+    loi giua chung khong de lai file do dang o dest_path.
+    """
+    settings = get_settings()
     drive = _get_drive_service()
-    Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
+    dest = Path(dest_path)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.part")
     request = drive.files().get_media(fileId=file_id)
-    with open(dest_path, "wb") as f:
-        downloader = MediaIoBaseDownload(f, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
-    return dest_path
+    chunk_size = max(1, settings.gdrive_download_chunk_mb) * 1024 * 1024
+    start = time.perf_counter()
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = _HashingWriter(f)
+            downloader = MediaIoBaseDownload(writer, request, chunksize=chunk_size)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+        sha256 = writer.sha256.hexdigest()
+        _store_downloaded(tmp_path, dest, sha256)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    size = dest.stat().st_size
+    logger.info(
+        "gdrive_dropzone.downloaded file_id=%s bytes=%s seconds=%.2f bytes_per_sec=%.0f",
+        file_id,
+        size,
+        elapsed,
+        size / elapsed,
+    )
+    return sha256
+
+
+def fetch_file(file_id: str, dest_path: str, sha256: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Dat noi dung file Drive o dest_path: Drive da cho sha256Checksum va kho co blob -> hardlink, khong tai.
+    Tra (sha256, da_tai_qua_mang).
+    """
+    if sha256 and link_from_store(sha256, dest_path):
+        return sha256, False
+    return download_file(file_id, dest_path), True
 
 
 def move_file(file_id: str, target_folder_id: str) -> None:
@@ -125,25 +287,61 @@ def _storage_url(file_id: str) -> str:
     return f"gdrive://{file_id}"
 
 
-async def _get_existing_asset(
+async def _get_existing_assets(
     db: AsyncSession,
     tenant_id: uuid.UUID,
-    drive_file_id: str,
-) -> Optional[ContentAsset]:
-    """Lay 1 asset theo (tenant_id, drive_file_id)."""
-    q = (
-        select(ContentAsset)
-        .where(
-            ContentAsset.tenant_id == tenant_id,
-            ContentAsset.drive_file_id == drive_file_id,
-        )
-        .limit(1)
+    drive_file_ids: List[str],
+) -> Dict[str, Any]:
+    """
+    1 query cho ca lo: drive_file_id -> row (id, status, error_reason, local_path, size_bytes).
+    Tra row thuong (khong phai ORM) nen van dung duoc sau rollback cua _flush_with_duplicate_guard.
+    """
+    if not drive_file_ids:
+        return {}
+    q = select(
+        ContentAsset.id,
+        ContentAsset.drive_file_id,
+        ContentAsset.status,
+        ContentAsset.error_reason,
+        ContentAsset.local_path,
+        ContentAsset.size_bytes,
+    ).where(
+        ContentAsset.tenant_id == tenant_id,
+        ContentAsset.drive_file_id.in_(drive_file_ids),
     )
     r = await db.execute(q)
-    return r.scalar_one_or_none()
+    return {row.drive_file_id: row for row in r.all()}
+
+
+async def _load_sync_tokens(
+    db: AsyncSession,
+    tenant_id: uuid.UUID,
+    folder_ids: List[str],
+) -> Dict[str, str]:
+    """folder_id -> start_page_token da luu (lookup theo PK)."""
+    q = select(GdriveSyncState.folder_id, GdriveSyncState.start_page_token).where(
+        GdriveSyncState.tenant_id == tenant_id,
+        GdriveSyncState.folder_id.in_(folder_ids),
+    )
+    r = await db.execute(q)
+    return {row.folder_id: row.start_page_token for row in r.all()}
+
+
+async def _save_sync_tokens(db: AsyncSession, tenant_id: uuid.UUID, tokens: Dict[str, str]) -> None:
+    """Upsert token moi cho cac folder (commit cung transaction ingest)."""
+    if not tokens:
+        return
+    stmt = pg_insert(GdriveSyncState).values(
+        [{"tenant_id": tenant_id, "folder_id": f, "start_page_token": t} for f, t in tokens.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GdriveSyncState.tenant_id, GdriveSyncState.folder_id],
+        set_={"start_page_token": stmt.excluded.start_page_token, "updated_at": func.now()},
+    )
+    await db.execute(stmt)
 
 
-def _is_failed_status(existing: ContentAsset) -> bool:
+def _is_failed_status(existing: Any) -> bool:
     """True neu row dang invalid hoac co dau hieu download_failed."""
     if existing.status == STATUS_INVALID:
         return True
@@ -152,7 +350,7 @@ def _is_failed_status(existing: ContentAsset) -> bool:
     return False
 
 
-def _is_local_file_valid(existing: ContentAsset) -> bool:
+def _is_local_file_valid(existing: Any) -> bool:
     """
     Local file hop le khi:
     - local_path ton tai tren disk
@@ -206,246 +404,430 @@ async def _flush_with_duplicate_guard(
         raise
 
 
-async def ingest_ready_assets(db: AsyncSession, tenant_id: uuid.UUID) -> Tuple[int, int, int]:
+def _batches(items: List[Dict[str, Any]], size: int) -> Iterable[List[Dict[str, Any]]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _local_dest(tenant_dir: Path, meta: Dict[str, Any]) -> Path:
+    """Duong dan local mac dinh: {tenant_dir}/{file_id}_{ten da lam sach}."""
+    name = meta.get("name") or "unknown"
+    safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in name)[:200]
+    return tenant_dir / f"{meta['id']}_{safe_name}"
+
+
+def _plan_download(meta: Dict[str, Any], existing: Optional[Any], tenant_dir: Path) -> Optional[str]:
+    """Duong dan can tai ve cho file (cung quyet dinh voi _ingest_file), None neu khong can tai."""
+    ok, _, _ = validate_file(meta)
+    if not ok:
+        return None
+    if existing is None:
+        return str(_local_dest(tenant_dir, meta))
+    if _is_local_file_valid(existing) and not _is_failed_status(existing):
+        return None
+    return existing.local_path or str(_local_dest(tenant_dir, meta))
+
+
+async def _download_many(
+    targets: Dict[str, Tuple[str, Optional[str]]],
+    counts: Optional[Dict[str, int]] = None,
+) -> Dict[str, Tuple[str, Optional[str], Optional[Exception]]]:
+    """
+    targets: file_id -> (dest_path, sha256Checksum Drive neu co).
+    Tai song song toi da GDRIVE_DOWNLOAD_CONCURRENCY file (moi file 1 thread, khong chan event loop);
+    noi dung da co trong kho theo hash thi chi hardlink.
+    Tra file_id -> (dest_path, sha256 hoac None, loi hoac None). Log tong bytes + bytes/sec cua ca lo;
+    counts["bytes_downloaded"] (neu truyen) cong dan theo tung file tai xong.
     """
-    Quet READY folders, ingest idempotent.
+    if not targets:
+        return {}
+    settings = get_settings()
+    sem = asyncio.Semaphore(max(1, settings.gdrive_download_concurrency))
+    reused: List[str] = []
+    batch = {"bytes": 0}
 
-    Return:
-    - count_ingested: so row moi cached + so row retry thanh cong ve cached
-    - count_invalid: so file invalid
-    - count_skipped: so file skip do duplicate/existing
+    async def _one(file_id: str, dest: str, expected_sha: Optional[str]):
+        async with sem:
+            try:
+                sha256, downloaded = await asyncio.to_thread(fetch_file, file_id, dest, expected_sha)
+            except Exception as e:
+                logger.warning("gdrive_dropzone.download_failed file_id=%s error=%s", file_id, e)
+                return file_id, (dest, None, e)
+            if not downloaded:
+                reused.append(file_id)
+            elif os.path.isfile(dest):
+                size = os.path.getsize(dest)
+                batch["bytes"] += size
+                if counts is not None:
+                    counts["bytes_downloaded"] = counts.get("bytes_downloaded", 0) + size
+            return file_id, (dest, sha256, None)
+
+    start = time.perf_counter()
+    results = dict(await asyncio.gather(*(_one(f, d, sha) for f, (d, sha) in targets.items())))
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    total_bytes = batch["bytes"]
+    logger.info(
+        "gdrive_dropzone.download_batch files=%s reused=%s failed=%s bytes=%s seconds=%.2f bytes_per_sec=%.0f",
+        len(results),
+        len(reused),
+        sum(1 for _, _, err in results.values() if err is not None),
+        total_bytes,
+        elapsed,
+        total_bytes / elapsed,
+    )
+    return results
+
+
+async def _ready_files_full(folder_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """folder_id -> toan bo file; folder list loi thi bo qua (log)."""
+    files_by_folder: Dict[str, List[Dict[str, Any]]] = {}
+    for folder_id in folder_ids:
+        try:
+            files_by_folder[folder_id] = await asyncio.to_thread(list_files, folder_id)
+        except Exception as e:
+            logger.warning("gdrive_dropzone.list_files_failed folder_id=%s error=%s", folder_id, e)
+    return files_by_folder
+
+
+async def _ready_files_incremental(
+    db: AsyncSession,
+    tenant_id: uuid.UUID,
+    folder_ids: List[str],
+) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
     """
+    Tra ve (folder_id -> file thay doi nam trong folder, folder_id -> token moi can luu).
+    Cac folder cung token dung chung 1 lan changes.list (thay doi tinh cho ca Drive, loc theo parents).
+    Folder chua co token hoac token loi -> lay token truoc roi full list (khong lo thay doi trong luc list).
+    """
+    tokens = await _load_sync_tokens(db, tenant_id, folder_ids)
+    files_by_folder: Dict[str, List[Dict[str, Any]]] = {}
+    new_tokens: Dict[str, str] = {}
+    need_full = [f for f in folder_ids if f not in tokens]
+
+    folders_by_token: Dict[str, List[str]] = defaultdict(list)
+    for folder_id, token in tokens.items():
+        folders_by_token[token].append(folder_id)
+    for token, folders in folders_by_token.items():
+        try:
+            changed, new_token = await asyncio.to_thread(list_changes, token)
+        except Exception as e:
+            logger.warning("gdrive_dropzone.list_changes_failed tenant_id=%s error=%s", tenant_id, e)
+            need_full.extend(folders)
+            continue
+        for folder_id in folders:
+            files_by_folder[folder_id] = [m for m in changed if folder_id in (m.get("parents") or [])]
+            if new_token != token:
+                new_tokens[folder_id] = new_token
+
+    if need_full:
+        try:
+            start_token = await asyncio.to_thread(get_start_page_token)
+        except Exception as e:
+            logger.warning("gdrive_dropzone.start_page_token_failed tenant_id=%s error=%s", tenant_id, e)
+            return files_by_folder, new_tokens
+        listed = await _ready_files_full(need_full)
+        files_by_folder.update(listed)
+        new_tokens.update({folder_id: start_token for folder_id in listed})
+    return files_by_folder, new_tokens
+
+
+def resolve_ingest_mode(mode: Optional[str] = None) -> str:
+    """Kiem tra cau hinh GDRIVE_* (ValueError neu thieu) va tra mode ingest (mac dinh GDRIVE_SYNC_MODE)."""
     settings = get_settings()
     if not settings.gdrive_sa_json_path or not settings.gdrive_ready_images_folder_id:
         raise ValueError("GDRIVE_SA_JSON_PATH va GDRIVE_READY_IMAGES_FOLDER_ID bat buoc")
     if not settings.gdrive_processed_folder_id or not settings.gdrive_rejected_folder_id:
         raise ValueError("GDRIVE_PROCESSED_FOLDER_ID va GDRIVE_REJECTED_FOLDER_ID bat buoc")
+    mode = mode or settings.gdrive_sync_mode
+    if mode not in SYNC_MODES:
+        raise ValueError("invalid_gdrive_sync_mode")
+    return mode
+
+
+async def ingest_ready_assets(
+    db: AsyncSession,
+    tenant_id: uuid.UUID,
+    mode: Optional[str] = None,
+    progress: Optional[IngestProgress] = None,
+) -> Tuple[int, int, int]:
+    """
+    Quet READY folders, ingest idempotent. mode: full | incremental (mac dinh GDRIVE_SYNC_MODE).
+    progress: goi sau moi file (checkpoint=False) va sau moi trang (checkpoint=True); job nen commit
+    o checkpoint nen loi giua chung chi mat trang dang do (lan sau skip file da ingest).
+
+    Return:
+    - count_ingested: so row moi cached + so row retry thanh cong ve cached
+    - count_invalid: so file invalid
+    - count_skipped: so file skip do duplicate/existing
+    """
+    settings = get_settings()
+    mode = resolve_ingest_mode(mode)
 
     base_dir = Path(settings.local_media_dir)
     base_dir.mkdir(parents=True, exist_ok=True)
     tenant_dir = base_dir / str(tenant_id)
     tenant_dir.mkdir(parents=True, exist_ok=True)
 
-    count_ingested = 0
-    count_invalid = 0
-    count_skipped = 0
+    counts = {
+        "ingested": 0,
+        "invalid": 0,
+        "skipped": 0,
+        "rollbacks": 0,
+        "download_failed": 0,
+        "files_total": 0,
+        "files_done": 0,
+        "bytes_downloaded": 0,
+    }
 
     ready_folders: List[Tuple[str, str]] = []
     if settings.gdrive_ready_images_folder_id:
         ready_folders.append((settings.gdrive_ready_images_folder_id, ASSET_TYPE_IMAGE))
     if settings.gdrive_ready_videos_folder_id:
         ready_folders.append((settings.gdrive_ready_videos_folder_id, ASSET_TYPE_VIDEO))
+    folder_ids = [folder_id for folder_id, _ in ready_folders]
 
-    for folder_id, expected_type in ready_folders:
-        try:
-            files = list_files(folder_id)
-        except Exception as e:
-            logger.warning("gdrive_dropzone.list_files_failed folder_id=%s error=%s", folder_id, e)
-            continue
-
-        for meta in files:
-            file_id = meta.get("id")
-            if not file_id:
-                continue
-
-            name = meta.get("name") or "unknown"
-            mime = meta.get("mimeType") or ""
-            size_raw = meta.get("size")
-            size_bytes = int(size_raw) if size_raw is not None else None
-            ok, asset_type, error_reason = validate_file(meta)
-
-            safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in name)[:200]
-            local_name = f"{file_id}_{safe_name}"
-            default_dest_path = tenant_dir / local_name
-
-            existing = await _get_existing_asset(db, tenant_id, file_id)
-            if existing is not None:
-                local_valid = _is_local_file_valid(existing)
-                failed_status = _is_failed_status(existing)
-
-                # Skip: row da co + local file hop le + khong phai failed status
-                if local_valid and not failed_status:
-                    count_skipped += 1
-                    logger.info(
-                        "gdrive_dropzone.skip_existing tenant_id=%s drive_file_id=%s",
-                        tenant_id,
-                        file_id,
-                    )
-                    continue
-
-                # Retry: file local thieu/0 bytes, hoac status failed
-                reason = "failed_status" if failed_status else "local_missing_or_invalid"
-                logger.info(
-                    "gdrive_dropzone.retry_existing tenant_id=%s drive_file_id=%s reason=%s",
-                    tenant_id,
-                    file_id,
-                    reason,
-                )
-
-                # Neu file khong hop le theo policy hien tai -> giu invalid va bo qua
-                if not ok:
-                    existing.status = STATUS_INVALID
-                    existing.error_reason = error_reason
-                    existing.file_name = name
-                    existing.mime_type = mime or None
-                    existing.size_bytes = size_bytes
-                    existing.storage_url = _storage_url(file_id)
-                    db.add(existing)
-                    inserted = await _flush_with_duplicate_guard(
-                        db,
-                        tenant_id=tenant_id,
-                        drive_file_id=file_id,
-                    )
-                    if inserted:
-                        count_invalid += 1
-                    else:
-                        count_skipped += 1
-                    continue
-
-                # Retry download vao cung target path neu co, fallback theo ten mac dinh
-                retry_dest = existing.local_path or str(default_dest_path)
-                try:
-                    download_file(file_id, retry_dest)
-                    existing.file_name = name
-                    existing.mime_type = mime or None
-                    existing.size_bytes = size_bytes
-                    existing.local_path = retry_dest
-                    existing.storage_url = _storage_url(file_id)
-                    existing.status = STATUS_CACHED
-                    existing.error_reason = None
-                    if asset_type:
-                        existing.asset_type = asset_type
-                    db.add(existing)
-                    inserted = await _flush_with_duplicate_guard(
-                        db,
-                        tenant_id=tenant_id,
-                        drive_file_id=file_id,
-                    )
-                    if inserted:
-                        count_ingested += 1
-                    else:
-                        count_skipped += 1
-                except Exception as e:
-                    existing.status = STATUS_INVALID
-                    existing.error_reason = f"download_failed:{e}"
-                    existing.storage_url = _storage_url(file_id)
-                    db.add(existing)
-                    inserted = await _flush_with_duplicate_guard(
-                        db,
-                        tenant_id=tenant_id,
-                        drive_file_id=file_id,
-                    )
-                    if inserted:
-                        count_invalid += 1
-                    else:
-                        count_skipped += 1
-                continue
-
-            # Chua ton tai -> xu ly moi
-            if not ok:
-                count_invalid += 1
-                try:
-                    move_file(file_id, settings.gdrive_rejected_folder_id)
-                except Exception as e:
-                    logger.warning("gdrive_dropzone.move_rejected_failed file_id=%s error=%s", file_id, e)
+    new_tokens: Dict[str, str] = {}
+    if mode == SYNC_MODE_INCREMENTAL:
+        files_by_folder, new_tokens = await _ready_files_incremental(db, tenant_id, folder_ids)
+    else:
+        files_by_folder = await _ready_files_full(folder_ids)
 
-                asset = ContentAsset(
-                    tenant_id=tenant_id,
-                    content_id=None,
-                    asset_type=asset_type or expected_type,
-                    drive_file_id=file_id,
-                    file_name=name,
-                    mime_type=mime or None,
-                    size_bytes=size_bytes,
-                    storage_url=_storage_url(file_id),
-                    local_path=None,
-                    status=STATUS_INVALID,
-                    error_reason=error_reason,
-                )
-                db.add(asset)
-                inserted = await _flush_with_duplicate_guard(
+    files_by_type = [
+        ([meta for meta in files_by_folder.get(folder_id, []) if meta.get("id")], expected_type)
+        for folder_id, expected_type in ready_folders
+    ]
+    counts["files_total"] = sum(len(files) for files, _ in files_by_type)
+    if progress is not None:
+        await progress(counts, False)
+
+    held_folders: List[str] = []
+    for (folder_id, _), (files, expected_type) in zip(ready_folders, files_by_type):
+        failed_before = counts["download_failed"]
+        for page in _batches(files, DRIVE_PAGE_SIZE):
+            existing_by_id = await _get_existing_assets(db, tenant_id, [meta["id"] for meta in page])
+            # Tai song song ca trang truoc, roi ghi DB tuan tu (AsyncSession khong dung chung giua task)
+            targets = {}
+            for meta in page:
+                dest = _plan_download(meta, existing_by_id.get(meta["id"]), tenant_dir)
+                if dest is not None:
+                    targets[meta["id"]] = (dest, (meta.get("sha256Checksum") or "").lower() or None)
+            downloads = await _download_many(targets, counts)
+            for meta in page:
+                await _ingest_file(
                     db,
                     tenant_id=tenant_id,
-                    drive_file_id=file_id,
+                    meta=meta,
+                    existing=existing_by_id.get(meta["id"]),
+                    expected_type=expected_type,
+                    tenant_dir=tenant_dir,
+                    download=downloads.get(meta["id"]),
+                    counts=counts,
                 )
-                if not inserted:
-                    count_skipped += 1
-                    continue
-                continue
+                counts["files_done"] += 1
+                if progress is not None:
+                    await progress(counts, False)
+            if progress is not None:
+                await progress(counts, True)
+        if counts["download_failed"] > failed_before:
+            held_folders.append(folder_id)
+
+    # Luu token sau khi da xu ly file: loi giua chung -> lan sau doc lai cung thay doi.
+    # Duplicate guard da rollback (mat cac row flush truoc do) -> giu token cu de lan sau xu ly lai.
+    # File tai loi (con o READY, row download_failed) -> giu token cu cua folder do de lan sau tai lai.
+    if counts["rollbacks"]:
+        logger.warning("gdrive_dropzone.sync_token_not_saved tenant_id=%s rollbacks=%s", tenant_id, counts["rollbacks"])
+    else:
+        if held_folders:
+            logger.warning(
+                "gdrive_dropzone.sync_token_held tenant_id=%s folders=%s download_failed=%s",
+                tenant_id,
+                held_folders,
+                counts["download_failed"],
+            )
+        await _save_sync_tokens(
+            db, tenant_id, {f: t for f, t in new_tokens.items() if f not in held_folders}
+        )
+
+    logger.info(
+        "gdrive_dropzone.ingest_done tenant_id=%s mode=%s count_ingested=%s count_invalid=%s count_skipped=%s",
+        tenant_id,
+        mode,
+        counts["ingested"],
+        counts["invalid"],
+        counts["skipped"],
+    )
+    return counts["ingested"], counts["invalid"], counts["skipped"]
 
-            # File moi hop le -> download + insert cached
-            try:
-                download_file(file_id, str(default_dest_path))
-            except Exception as e:
-                count_invalid += 1
-                try:
-                    move_file(file_id, settings.gdrive_rejected_folder_id)
-                except Exception as e2:
-                    logger.warning(
-                        "gdrive_dropzone.move_rejected_after_download_failed file_id=%s error=%s",
-                        file_id,
-                        e2,
-                    )
-
-                asset = ContentAsset(
-                    tenant_id=tenant_id,
-                    content_id=None,
-                    asset_type=asset_type,
-                    drive_file_id=file_id,
-                    file_name=name,
-                    mime_type=mime or None,
-                    size_bytes=size_bytes,
-                    storage_url=_storage_url(file_id),
-                    local_path=None,
-                    status=STATUS_INVALID,
-                    error_reason=f"download_failed:{e}",
-                )
-                db.add(asset)
-                inserted = await _flush_with_duplicate_guard(
-                    db,
-                    tenant_id=tenant_id,
-                    drive_file_id=file_id,
-                )
-                if not inserted:
-                    count_skipped += 1
-                    continue
-                continue
 
-            asset = ContentAsset(
-                tenant_id=tenant_id,
-                content_id=None,
-                asset_type=asset_type,
-                drive_file_id=file_id,
-                file_name=name,
-                mime_type=mime or None,
-                size_bytes=size_bytes,
-                storage_url=_storage_url(file_id),
-                local_path=str(default_dest_path),
-                status=STATUS_CACHED,
-                error_reason=None,
+async def _ingest_file(
+    db: AsyncSession,
+    *,
+    tenant_id: uuid.UUID,
+    meta: Dict[str, Any],
+    existing: Optional[Any],
+    expected_type: str,
+    tenant_dir: Path,
+    download: Optional[Tuple[str, Optional[str], Optional[Exception]]],
+    counts: Dict[str, int],
+) -> None:
+    """
+    Ghi DB cho 1 file Drive (existing = row tu _get_existing_assets hoac None), cap nhat counts.
+    download = (dest_path, sha256, loi) tu _download_many neu _plan_download quyet dinh tai file nay.
+    """
+    settings = get_settings()
+    file_id = meta["id"]
+    name = meta.get("name") or "unknown"
+    mime = meta.get("mimeType") or ""
+    size_raw = meta.get("size")
+    size_bytes = int(size_raw) if size_raw is not None else None
+    ok, asset_type, error_reason = validate_file(meta)
+
+    dest_path, content_sha256, download_error = download or (str(_local_dest(tenant_dir, meta)), None, None)
+
+    async def _flush() -> bool:
+        inserted = await _flush_with_duplicate_guard(db, tenant_id=tenant_id, drive_file_id=file_id)
+        if not inserted:
+            counts["rollbacks"] += 1
+        return inserted
+
+    if existing is not None:
+        local_valid = _is_local_file_valid(existing)
+        failed_status = _is_failed_status(existing)
+
+        # Skip: row da co + local file hop le + khong phai failed status
+        if local_valid and not failed_status:
+            counts["skipped"] += 1
+            logger.info(
+                "gdrive_dropzone.skip_existing tenant_id=%s drive_file_id=%s",
+                tenant_id,
+                file_id,
             )
+            return
+
+        # Retry: file local thieu/0 bytes, hoac status failed
+        reason = "failed_status" if failed_status else "local_missing_or_invalid"
+        logger.info(
+            "gdrive_dropzone.retry_existing tenant_id=%s drive_file_id=%s reason=%s",
+            tenant_id,
+            file_id,
+            reason,
+        )
+        asset = await db.get(ContentAsset, existing.id)
+        if asset is None:
+            counts["skipped"] += 1
+            return
+
+        # Neu file khong hop le theo policy hien tai -> giu invalid va bo qua
+        if not ok:
+            asset.status = STATUS_INVALID
+            asset.error_reason = error_reason
+            asset.file_name = name
+            asset.mime_type = mime or None
+            asset.size_bytes = size_bytes
+            asset.storage_url = _storage_url(file_id)
             db.add(asset)
-            inserted = await _flush_with_duplicate_guard(
-                db,
-                tenant_id=tenant_id,
-                drive_file_id=file_id,
-            )
-            if inserted:
-                count_ingested += 1
-                logger.info(
-                    "gdrive_dropzone.ingested tenant_id=%s drive_file_id=%s",
-                    tenant_id,
-                    file_id,
-                )
-            else:
-                count_skipped += 1
-                continue
+            inserted = await _flush()
+            counts["invalid" if inserted else "skipped"] += 1
+            return
+
+        # Retry download vao cung target path neu co, fallback theo ten mac dinh (da tai o _download_many)
+        if download_error is None:
+            asset.file_name = name
+            asset.mime_type = mime or None
+            asset.size_bytes = size_bytes
+            asset.local_path = dest_path
+            asset.content_sha256 = content_sha256
+            asset.storage_url = _storage_url(file_id)
+            asset.status = STATUS_CACHED
+            asset.error_reason = None
+            if asset_type:
+                asset.asset_type = asset_type
+            db.add(asset)
+            inserted = await _flush()
+            counts["ingested" if inserted else "skipped"] += 1
+        else:
+            counts["download_failed"] += 1
+            asset.status = STATUS_INVALID
+            asset.error_reason = f"download_failed:{download_error}"
+            asset.storage_url = _storage_url(file_id)
+            db.add(asset)
+            inserted = await _flush()
+            counts["invalid" if inserted else "skipped"] += 1
+        return
 
-    logger.info(
-        "gdrive_dropzone.ingest_done tenant_id=%s count_ingested=%s count_invalid=%s count_skipped=%s",
-        tenant_id,
-        count_ingested,
-        count_invalid,
-        count_skipped,
+    # Chua ton tai -> xu ly moi
+    if not ok:
+        counts["invalid"] += 1
+        try:
+            await asyncio.to_thread(move_file, file_id, settings.gdrive_rejected_folder_id)
+        except Exception as e:
+            logger.warning("gdrive_dropzone.move_rejected_failed file_id=%s error=%s", file_id, e)
+
+        asset = ContentAsset(
+            tenant_id=tenant_id,
+            content_id=None,
+            asset_type=asset_type or expected_type,
+            drive_file_id=file_id,
+            file_name=name,
+            mime_type=mime or None,
+            size_bytes=size_bytes,
+            storage_url=_storage_url(file_id),
+            local_path=None,
+            status=STATUS_INVALID,
+            error_reason=error_reason,
+        )
+        db.add(asset)
+        inserted = await _flush()
+        if not inserted:
+            counts["skipped"] += 1
+        return
+
+    # File moi hop le -> (da download o _download_many) insert cached
+    if download_error is not None:
+        # Loi tai (mang / Drive tam thoi): file giu o READY, row download_failed duoc tai lai o lan ingest sau
+        counts["invalid"] += 1
+        counts["download_failed"] += 1
+        asset = ContentAsset(
+            tenant_id=tenant_id,
+            content_id=None,
+            asset_type=asset_type,
+            drive_file_id=file_id,
+            file_name=name,
+            mime_type=mime or None,
+            size_bytes=size_bytes,
+            storage_url=_storage_url(file_id),
+            local_path=None,
+            status=STATUS_INVALID,
+            error_reason=f"download_failed:{download_error}",
+        )
+        db.add(asset)
+        inserted = await _flush()
+        if not inserted:
+            counts["skipped"] += 1
+        return
+
+    asset = ContentAsset(
+        tenant_id=tenant_id,
+        content_id=None,
+        asset_type=asset_type,
+        drive_file_id=file_id,
+        file_name=name,
+        mime_type=mime or None,
+        size_bytes=size_bytes,
+        storage_url=_storage_url(file_id),
+        local_path=dest_path,
+        status=STATUS_CACHED,
+        error_reason=None,
+        content_sha256=content_sha256,
     )
-    return count_ingested, count_invalid, count_skipped
+    db.add(asset)
+    inserted = await _flush()
+    if inserted:
+        counts["ingested"] += 1
+        logger.info(
+            "gdrive_dropzone.ingested tenant_id=%s drive_file_id=%s",
+            tenant_id,
+            file_id,
+        )
+    else:
+        counts["skipped"] += 1
@@ -0,0 +1,343 @@
+"""
+Job ingest Google Drive chạy nền cho POST /api/gdrive/ingest (request không giữ kết nối trong lúc quét/tải/ghi DB).
+- Enqueue: INSERT ... ON CONFLICT DO NOTHING trên partial unique index (tenant_id) WHERE status queued/running
+  -> ingest thứ 2 của cùng tenant gộp vào job đang chạy (kể cả job do replica khác chạy).
+- Worker: task asyncio trong process nhận request, session riêng. ingest_ready_assets(progress=...) commit sau
+  mỗi trang file (checkpoint) và ghi tiến độ (số file, bytes) vào job tối đa mỗi PROGRESS_INTERVAL_SECONDS.
+- Lease: locked_until gia hạn mỗi lease/3 giây; process chết -> job hết lease bị đóng failed ở lần enqueue sau,
+  lần chạy lại skip các file đã checkpoint. Mọi UPDATE job lọc locked_by = WORKER_ID: worker mất lease
+  (heartbeat / checkpoint cập nhật 0 dòng) tự dừng, không ghi đè job đã bị đóng.
+- Tiến độ: iter_job_progress poll job (hoặc chờ task local) và yield snapshot mỗi khi thay đổi, tới khi job xong.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.db import async_session_factory
+from app.logging_config import get_logger
+from app.models import GdriveIngestJob
+from app.schemas.gdrive_assets import GdriveIngestJobOut
+from app.services.gdrive_dropzone import ingest_ready_assets
+
+logger = get_logger(__name__)
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+ACTIVE_JOB_STATUSES = (JOB_STATUS_QUEUED, JOB_STATUS_RUNNING)
+
+PROGRESS_INTERVAL_SECONDS = 1.0  # Ghi tiến độ job tối đa 1 lần / giây (checkpoint luôn ghi)
+STREAM_POLL_SECONDS = 1.0
+ENQUEUE_ATTEMPTS = 3
+
+# Định danh worker (ghi vào locked_by): host:pid:random
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Job đang chạy trong process này: job_id -> task
+_running: Dict[UUID, "asyncio.Task[None]"] = {}
+
+
+def _enqueue_stmt(tenant_id: UUID, mode: str, now: datetime) -> Any:
+    """INSERT job mới; tenant đã có job queued/running -> không insert (RETURNING rỗng)."""
+    lease = timedelta(seconds=get_settings().gdrive_ingest_job_lease_seconds)
+    return (
+        pg_insert(GdriveIngestJob)
+        .values(
+            id=uuid.uuid4(),
+            tenant_id=tenant_id,
+            mode=mode,
+            status=JOB_STATUS_QUEUED,
+            locked_by=WORKER_ID,
+            locked_until=now + lease,
+        )
+        .on_conflict_do_nothing(
+            index_elements=[GdriveIngestJob.tenant_id],
+            # Literal (không bind param): Postgres phải suy ra partial index ux_gdrive_ingest_jobs_tenant_active
+            index_where=text("status IN ('queued', 'running')"),
+        )
+        .returning(GdriveIngestJob.id)
+    )
+
+
+async def enqueue_ingest_job(db: AsyncSession, tenant_id: UUID, mode: str) -> Tuple[GdriveIngestJob, bool]:
+    """
+    Tạo job ingest cho tenant và chạy nền, hoặc trả job đang chạy của tenant (coalesced=True).
+    Commit ngay để task worker (session riêng) thấy job. Return (job, coalesced).
+    """
+    for _ in range(ENQUEUE_ATTEMPTS):
+        now = datetime.now(timezone.utc)
+        # Job của process đã chết (hết lease) không được chặn ingest mới
+        await db.execute(
+            update(GdriveIngestJob)
+            .where(
+                GdriveIngestJob.tenant_id == tenant_id,
+                GdriveIngestJob.status.in_(ACTIVE_JOB_STATUSES),
+                GdriveIngestJob.locked_until < now,
+            )
+            .values(
+                status=JOB_STATUS_FAILED,
+                error="lease_expired",
+                finished_at=now,
+                updated_at=now,
+                locked_by=None,
+                locked_until=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        job_id = (await db.execute(_enqueue_stmt(tenant_id, mode, now))).scalar_one_or_none()
+        if job_id is not None:
+            job = await db.get(GdriveIngestJob, job_id)
+            await db.commit()
+            _running[job.id] = asyncio.create_task(_run_job(job.id, tenant_id, mode))
+            _running[job.id].add_done_callback(lambda _t, jid=job.id: _running.pop(jid, None))
+            logger.info("gdrive_ingest_job.enqueued", job_id=str(job.id), tenant_id=str(tenant_id), mode=mode)
+            return job, False
+        r = await db.execute(
+            select(GdriveIngestJob).where(
+                GdriveIngestJob.tenant_id == tenant_id,
+                GdriveIngestJob.status.in_(ACTIVE_JOB_STATUSES),
+            )
+        )
+        job = r.scalar_one_or_none()
+        await db.commit()
+        if job is not None:
+            logger.info("gdrive_ingest_job.coalesced", job_id=str(job.id), tenant_id=str(tenant_id))
+            return job, True
+        # Job đang chạy vừa kết thúc giữa INSERT và SELECT -> thử lại
+    raise RuntimeError("gdrive_ingest_enqueue_failed")
+
+
+async def get_job(db: AsyncSession, tenant_id: UUID, job_id: UUID) -> Optional[GdriveIngestJob]:
+    r = await db.execute(
+        select(GdriveIngestJob).where(GdriveIngestJob.id == job_id, GdriveIngestJob.tenant_id == tenant_id)
+    )
+    return r.scalar_one_or_none()
+
+
+def job_to_out(job: GdriveIngestJob, coalesced: bool = False) -> GdriveIngestJobOut:
+    """Snapshot job + thông lượng (bytes/giây, file/giây tính từ started_at)."""
+    elapsed = 0.0
+    if job.started_at is not None:
+        end = job.finished_at or datetime.now(timezone.utc)
+        elapsed = max((end - job.started_at).total_seconds(), 0.0)
+    return GdriveIngestJobOut(
+        job_id=job.id,
+        tenant_id=job.tenant_id,
+        mode=job.mode,
+        status=job.status,
+        coalesced=coalesced,
+        files_total=job.files_total or 0,
+        files_done=job.files_done or 0,
+        count_ingested=job.count_ingested or 0,
+        count_invalid=job.count_invalid or 0,
+        count_skipped=job.count_skipped or 0,
+        bytes_downloaded=job.bytes_downloaded or 0,
+        elapsed_seconds=round(elapsed, 3),
+        bytes_per_sec=round((job.bytes_downloaded or 0) / elapsed, 1) if elapsed else 0.0,
+        files_per_sec=round((job.files_done or 0) / elapsed, 3) if elapsed else 0.0,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _progress_values(counts: Dict[str, int]) -> Dict[str, int]:
+    return {
+        "files_total": counts.get("files_total", 0),
+        "files_done": counts.get("files_done", 0),
+        "count_ingested": counts.get("ingested", 0),
+        "count_invalid": counts.get("invalid", 0),
+        "count_skipped": counts.get("skipped", 0),
+        "bytes_downloaded": counts.get("bytes_downloaded", 0),
+    }
+
+
+class _LeaseLost(Exception):
+    """Job không còn do worker này giữ (hết lease, đã bị đóng / worker khác chạy): dừng, không ghi gì thêm."""
+
+
+async def _update_job(job_id: UUID, **values: Any) -> Optional[bool]:
+    """
+    Ghi job bằng session ngắn riêng (không lẫn với session ingest, có thể bị rollback), chỉ khi job còn
+    queued/running và locked_by = WORKER_ID. True: đã ghi; False: mất lease (0 dòng); None: lỗi DB (đã log).
+    """
+    async with async_session_factory() as db:
+        try:
+            r = await db.execute(
+                update(GdriveIngestJob)
+                .where(
+                    GdriveIngestJob.id == job_id,
+                    GdriveIngestJob.status.in_(ACTIVE_JOB_STATUSES),
+                    GdriveIngestJob.locked_by == WORKER_ID,
+                )
+                .values(updated_at=datetime.now(timezone.utc), **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return (r.rowcount or 0) > 0
+        except Exception as e:
+            await db.rollback()
+            logger.warning("gdrive_ingest_job.update_error", job_id=str(job_id), error=str(e))
+            return None
+
+
+async def _update_owned_job(job_id: UUID, **values: Any) -> None:
+    """_update_job; mất lease -> raise _LeaseLost (lỗi DB tạm thời thì bỏ qua, heartbeat sẽ kiểm tra lại)."""
+    if await _update_job(job_id, **values) is False:
+        raise _LeaseLost()
+
+
+class _JobProgress:
+    """
+    progress cho ingest_ready_assets: tiến độ ghi vào job có throttle; checkpoint -> ghi tiến độ (kiểm tra
+    còn giữ lease) rồi mới commit session ingest, job đã bị đóng thì trang đang dở bị rollback.
+    """
+
+    def __init__(self, job_id: UUID, db: AsyncSession) -> None:
+        self.job_id = job_id
+        self.db = db
+        self.counts: Dict[str, int] = {}
+        self._last_write: Optional[float] = None
+
+    async def __call__(self, counts: Dict[str, int], checkpoint: bool) -> None:
+        self.counts = dict(counts)
+        now = time.monotonic()
+        if checkpoint or self._last_write is None or now - self._last_write >= PROGRESS_INTERVAL_SECONDS:
+            self._last_write = now
+            await _update_owned_job(self.job_id, **_progress_values(self.counts))
+        if checkpoint:
+            await self.db.commit()
+
+
+async def _heartbeat(job_id: UUID) -> None:
+    """
+    Gia hạn lease job mỗi GDRIVE_INGEST_JOB_LEASE_SECONDS/3 giây (kể cả khi đang tải 1 file lớn).
+    Gia hạn 0 dòng (job đã bị đóng vì hết lease) -> huỷ task job, tránh 2 worker cùng ingest 1 tenant.
+    """
+    lease_seconds = get_settings().gdrive_ingest_job_lease_seconds
+    while True:
+        await asyncio.sleep(max(1, lease_seconds // 3))
+        renewed = await _update_job(
+            job_id, locked_until=datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        )
+        if renewed is False:
+            logger.warning("gdrive_ingest_job.lease_lost", job_id=str(job_id), worker_id=WORKER_ID)
+            task = _running.get(job_id)
+            if task is not None:
+                task.cancel()
+            return
+
+
+async def _finish_job(job_id: UUID, status: str, counts: Dict[str, int], error: Optional[str] = None) -> None:
+    finished = await _update_job(
+        job_id,
+        status=status,
+        error=error,
+        finished_at=datetime.now(timezone.utc),
+        locked_by=None,
+        locked_until=None,
+        **_progress_values(counts),
+    )
+    if finished is False:
+        # Job đã bị đóng (hết lease): không ghi đè status của lần đóng đó
+        logger.warning("gdrive_ingest_job.lease_lost", job_id=str(job_id), status=status, worker_id=WORKER_ID)
+        return
+    logger.info(
+        "gdrive_ingest_job.finished",
+        job_id=str(job_id),
+        status=status,
+        error=error,
+        **_progress_values(counts),
+    )
+
+
+async def _run_job(job_id: UUID, tenant_id: UUID, mode: str) -> None:
+    """
+    Chạy ingest của job trong session riêng; lỗi / bị huỷ -> failed (phần đã checkpoint vẫn giữ).
+    Mất lease giữa chừng -> rollback phần chưa checkpoint, dừng, không ghi status.
+    """
+    if await _update_job(job_id, status=JOB_STATUS_RUNNING, started_at=datetime.now(timezone.utc)) is False:
+        logger.warning("gdrive_ingest_job.lease_lost", job_id=str(job_id), worker_id=WORKER_ID)
+        return
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    async with async_session_factory() as db:
+        progress = _JobProgress(job_id, db)
+        try:
+            await ingest_ready_assets(db, tenant_id=tenant_id, mode=mode, progress=progress)
+            await _update_owned_job(job_id, **_progress_values(progress.counts))
+            await db.commit()
+        except _LeaseLost:
+            await db.rollback()
+            logger.warning("gdrive_ingest_job.lease_lost", job_id=str(job_id), worker_id=WORKER_ID)
+            return
+        except asyncio.CancelledError:
+            await db.rollback()
+            await _finish_job(job_id, JOB_STATUS_FAILED, progress.counts, error="cancelled")
+            raise
+        except Exception as e:
+            await db.rollback()
+            logger.warning("gdrive_ingest_job.error", job_id=str(job_id), tenant_id=str(tenant_id), error=str(e))
+            await _finish_job(job_id, JOB_STATUS_FAILED, progress.counts, error=str(e)[:1000])
+            return
+        finally:
+            heartbeat.cancel()
+    await _finish_job(job_id, JOB_STATUS_SUCCEEDED, progress.counts)
+
+
+async def iter_job_progress(
+    tenant_id: UUID,
+    job_id: UUID,
+    poll_seconds: float = STREAM_POLL_SECONDS,
+) -> AsyncIterator[GdriveIngestJobOut]:
+    """Yield snapshot job mỗi khi tiến độ / status đổi; dừng sau snapshot succeeded/failed (hoặc job không tồn tại)."""
+    last: Optional[Dict[str, Any]] = None
+    while True:
+        async with async_session_factory() as db:
+            job = await get_job(db, tenant_id, job_id)
+        if job is None:
+            return
+        out = job_to_out(job)
+        key = out.model_dump(exclude={"elapsed_seconds", "bytes_per_sec", "files_per_sec"})
+        if key != last:
+            last = key
+            yield out
+        if job.status not in ACTIVE_JOB_STATUSES:
+            return
+        task = _running.get(job_id)
+        if task is not None:
+            await asyncio.wait({task}, timeout=poll_seconds)
+        else:
+            await asyncio.sleep(poll_seconds)
+
+
+async def wait_for_job(tenant_id: UUID, job_id: UUID) -> Optional[GdriveIngestJobOut]:
+    """Chờ job kết thúc, trả snapshot cuối."""
+    out = None
+    async for out in iter_job_progress(tenant_id, job_id):
+        pass
+    return out
+
+
+async def stop_ingest_jobs() -> None:
+    """Huỷ các job đang chạy trong process (gọi từ lifespan shutdown); job bị đóng failed, chạy lại sẽ skip file đã xong."""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _running.clear()
@@ -0,0 +1,123 @@
+"""
+Parse upload KB dạng stream (POST /kb/items/bulk với body NDJSON hoặc CSV), không đọc cả body vào RAM.
+- NDJSON (application/x-ndjson): mỗi dòng 1 object {"title", "content", "tags"}; dòng trống bỏ qua.
+- CSV (text/csv): dòng đầu là header, cần cột title + content, tags tuỳ chọn (phân tách bằng "|").
+  Field có xuống dòng phải nằm trong dấu nháy kép (chuẩn CSV).
+Mỗi dòng validate theo KbBulkItem; lỗi -> ValueError("invalid_kb_row:<số dòng>").
+"""
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.schemas.kb import KbBulkItem
+
+KB_IMPORT_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+# Chặn 1 dòng / 1 record quá lớn (không có newline) làm phình bộ nhớ
+KB_IMPORT_MAX_LINE_BYTES = 1024 * 1024
+KB_IMPORT_MAX_ROWS = 100_000
+CSV_TAG_SEPARATOR = "|"
+
+
+def import_format_for(content_type: Optional[str]) -> Optional[str]:
+    """Content-Type -> "ndjson" | "csv" | None (None = JSON body thường)."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return KB_IMPORT_FORMATS.get(media_type)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Byte stream -> từng dòng (đã bỏ \\r\\n), decode UTF-8, bỏ BOM đầu file."""
+    buf = b""
+    first = True
+    async for chunk in chunks:
+        buf += chunk
+        if b"\n" not in buf:
+            if len(buf) > KB_IMPORT_MAX_LINE_BYTES:
+                raise ValueError("kb_import_line_too_long")
+            continue
+        *lines, buf = buf.split(b"\n")
+        for raw in lines:
+            line = raw.decode("utf-8").rstrip("\r")
+            if first:
+                line, first = line.lstrip("\ufeff"), False
+            yield line
+    if buf:
+        line = buf.decode("utf-8").rstrip("\r")
+        yield line.lstrip("\ufeff") if first else line
+
+
+def _validate_row(data: object, line_no: int) -> Dict:
+    try:
+        item = KbBulkItem.model_validate(data)
+    except ValidationError:
+        raise ValueError(f"invalid_kb_row:{line_no}")
+    return {"title": item.title, "content": item.content, "tags": item.tags}
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Dict]:
+    line_no = 0
+    count = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            raise ValueError(f"invalid_kb_row:{line_no}")
+        count += 1
+        if count > KB_IMPORT_MAX_ROWS:
+            raise ValueError("kb_import_too_many_rows")
+        yield _validate_row(data, line_no)
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, List[str]]]:
+    """Gom dòng thành record CSV (record chưa đóng nháy kép thì nối dòng tiếp theo). Trả (số dòng bắt đầu, fields)."""
+    pending: List[str] = []
+    start_line = 0
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not pending:
+            start_line = line_no
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            if len(text) > KB_IMPORT_MAX_LINE_BYTES:
+                raise ValueError("kb_import_line_too_long")
+            continue
+        pending = []
+        if text.strip():
+            yield start_line, next(csv.reader([text]))
+    if pending:
+        raise ValueError(f"invalid_kb_row:{start_line}")
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[Dict]:
+    header: Optional[List[str]] = None
+    count = 0
+    async for line_no, fields in _csv_records(lines):
+        if header is None:
+            header = [h.strip().lower() for h in fields]
+            if "title" not in header or "content" not in header:
+                raise ValueError("kb_import_csv_header_required")
+            continue
+        data = dict(zip(header, fields))
+        tags_raw = data.get("tags") or ""
+        data["tags"] = [t.strip() for t in tags_raw.split(CSV_TAG_SEPARATOR) if t.strip()]
+        count += 1
+        if count > KB_IMPORT_MAX_ROWS:
+            raise ValueError("kb_import_too_many_rows")
+        yield _validate_row(data, line_no)
+
+
+def parse_kb_upload(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Dict]:
+    """Byte stream upload -> async iterator rows {"title", "content", "tags"} theo format ("ndjson" | "csv")."""
+    lines = iter_lines(chunks)
+    return parse_csv(lines) if fmt == "csv" else parse_ndjson(lines)
@@ -1,14 +1,40 @@
-"""KB service: CRUD + ILIKE search cho content generator."""
-from typing import List, Optional, Tuple
+"""
+KB service: CRUD + tìm kiếm xếp hạng cho content generator.
+Bulk ingest: INSERT nhiều dòng / statement theo chunk (list hoặc stream NDJSON / CSV qua kb_import).
+search_kb: full-text (tsvector generated + GIN, ts_rank_cd) kết hợp trigram trên title, bỏ dấu tiếng Việt
+qua kb_unaccent (migration 020). Nhiều term: OR giữa các term, các từ trong 1 term AND với nhau.
+semantic_search_kb: cosine trên embedding hashing TF-IDF tính trong process (kb_vector_index), không gọi API.
+retrieve_kb: chọn mode theo KB_RETRIEVAL_MODE (fulltext | semantic | hybrid = gộp 2 bảng xếp hạng bằng RRF).
+"""
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
 from uuid import UUID
 
-from sqlalchemy import or_, select
+import numpy as np
+from sqlalchemy import func, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import get_settings
+from app.db import async_session_factory
+from app.infrastructure import kb_vector_index
+from app.logging_config import get_logger
 from app.models import KbItem
 
+logger = get_logger(__name__)
+
 # Giới hạn độ dài KB context inject vào prompt (ký tự)
 KB_CONTEXT_MAX_CHARS = 2000
+# Số dòng mỗi INSERT khi bulk ingest (giới hạn bộ nhớ + kích thước statement)
+KB_BULK_CHUNK_SIZE = 1000
+# Số term tối đa mỗi query (mỗi term thêm 1 nhánh OR trong tsquery + 1 điều kiện trigram)
+KB_SEARCH_MAX_TERMS = 20
+# Trọng số điểm trigram (similarity title) cộng vào ts_rank_cd
+KB_TRGM_WEIGHT = 0.5
+KB_RETRIEVAL_MODES = ("fulltext", "semantic", "hybrid")
+# Hằng số k của Reciprocal Rank Fusion (score = sum 1 / (k + rank))
+KB_RRF_K = 60
+# Số id mỗi lần load embedding khi đồng bộ index quá TTL (giới hạn số bind param của IN)
+KB_INDEX_REFRESH_CHUNK = 5000
 
 
 async def create_kb_item(
@@ -19,17 +45,53 @@ async def create_kb_item(
     tags: Optional[List[str]] = None,
 ) -> KbItem:
     """Tạo một mục KB. Caller commit session."""
+    vec = kb_vector_index.embed_kb_item(title, content)
     item = KbItem(
         tenant_id=tenant_id,
         title=title,
         content=content,
         tags=tags or [],
+        embedding=kb_vector_index.vector_to_bytes(vec),
     )
     db.add(item)
     await db.flush()
+    kb_vector_index.add_vectors(tenant_id, [item.id], [vec])
     return item
 
 
+def _kb_insert_params(tenant_id: UUID, rows: Sequence[dict]) -> Tuple[List[dict], list]:
+    """Chuẩn hoá rows + tính embedding (CPU) -> (params cho insert, vectors cùng thứ tự)."""
+    params: List[dict] = []
+    vectors = []
+    for row in rows:
+        title = row.get("title") or ""
+        content = row.get("content") or ""
+        vec = kb_vector_index.embed_kb_item(title, content)
+        params.append(
+            {
+                "tenant_id": tenant_id,
+                "title": title,
+                "content": content,
+                "tags": row.get("tags") if isinstance(row.get("tags"), list) else [],
+                "embedding": kb_vector_index.vector_to_bytes(vec),
+            }
+        )
+        vectors.append(vec)
+    return params, vectors
+
+
+async def _insert_kb_chunk(db: AsyncSession, tenant_id: UUID, rows: Sequence[dict]) -> List[UUID]:
+    """1 chunk = 1 INSERT ... VALUES (...), (...) RETURNING id (insertmanyvalues), không flush từng dòng."""
+    if not rows:
+        return []
+    # Embedding chạy trong thread để chunk lớn không chặn event loop
+    params, vectors = await asyncio.to_thread(_kb_insert_params, tenant_id, rows)
+    r = await db.execute(insert(KbItem).returning(KbItem.id, sort_by_parameter_order=True), params)
+    ids = list(r.scalars().all())
+    kb_vector_index.add_vectors(tenant_id, ids, vectors)
+    return ids
+
+
 async def bulk_create_kb_items(
     db: AsyncSession,
     tenant_id: UUID,
@@ -37,19 +99,32 @@ async def bulk_create_kb_items(
 ) -> List[UUID]:
     """
     Bulk tạo nhiều mục KB. items: list of {"title", "content", "tags"}.
-    Trả về list id đã tạo.
+    Insert theo chunk KB_BULK_CHUNK_SIZE dòng / statement. Trả về list id đã tạo (cùng thứ tự items). Caller commit.
     """
     ids: List[UUID] = []
-    for row in items:
-        item = KbItem(
-            tenant_id=tenant_id,
-            title=row.get("title") or "",
-            content=row.get("content") or "",
-            tags=row.get("tags") if isinstance(row.get("tags"), list) else [],
-        )
-        db.add(item)
-        await db.flush()
-        ids.append(item.id)
+    for start in range(0, len(items), KB_BULK_CHUNK_SIZE):
+        ids.extend(await _insert_kb_chunk(db, tenant_id, items[start : start + KB_BULK_CHUNK_SIZE]))
+    return ids
+
+
+async def bulk_create_kb_items_stream(
+    db: AsyncSession,
+    tenant_id: UUID,
+    rows: AsyncIterator[dict],
+) -> List[UUID]:
+    """
+    Bulk tạo KB từ stream rows (upload NDJSON / CSV): gom KB_BULK_CHUNK_SIZE dòng rồi insert,
+    bộ nhớ giữ tối đa 1 chunk. Lỗi giữa chừng -> caller rollback toàn bộ.
+    """
+    ids: List[UUID] = []
+    chunk: List[dict] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= KB_BULK_CHUNK_SIZE:
+            ids.extend(await _insert_kb_chunk(db, tenant_id, chunk))
+            chunk = []
+    ids.extend(await _insert_kb_chunk(db, tenant_id, chunk))
+    logger.info("kb.bulk_stream_inserted", tenant_id=str(tenant_id), created=len(ids))
     return ids
 
 
@@ -67,34 +142,227 @@ async def list_kb_items(
     return list(r.scalars().all())
 
 
-async def query_kb_ilike(
+def normalize_kb_terms(terms: Union[str, Sequence[str]]) -> List[str]:
+    """Chuẩn hoá danh sách term: trim, gộp khoảng trắng, bỏ rỗng/trùng (giữ thứ tự), tối đa KB_SEARCH_MAX_TERMS."""
+    if isinstance(terms, str):
+        terms = [terms]
+    out: List[str] = []
+    seen = set()
+    for t in terms:
+        term = " ".join(str(t or "").split())[:200]
+        key = term.lower()
+        if term and key not in seen:
+            seen.add(key)
+            out.append(term)
+    return out[:KB_SEARCH_MAX_TERMS]
+
+
+async def search_kb(
     db: AsyncSession,
     tenant_id: UUID,
-    query: str,
+    terms: Union[str, Sequence[str]],
     top_k: int = 10,
 ) -> List[KbItem]:
     """
-    Tìm KB items theo query: ILIKE trên title và content.
-    Trả về tối đa top_k bản ghi (không sắp xếp relevance).
+    Tìm KB items theo một hoặc nhiều term, xếp theo relevance.
+    Match: search_tsv @@ (plainto_tsquery(term1) || plainto_tsquery(term2) ...) hoặc title gần giống term (pg_trgm %).
+    Điểm: ts_rank_cd + KB_TRGM_WEIGHT * similarity(title, term) lớn nhất. Không dấu / có dấu đều khớp.
     """
-    pattern = f"%{query.strip()}%"
+    norm = normalize_kb_terms(terms)
+    if not norm:
+        return []
+    unaccented_title = func.kb_unaccent(KbItem.title)
+    tsq = None
+    for term in norm:
+        part = func.plainto_tsquery("simple", func.kb_unaccent(term))
+        tsq = part if tsq is None else tsq.op("||")(part)
+    trgm_match = [unaccented_title.op("%")(func.kb_unaccent(term)) for term in norm]
+    trgm_score = (
+        func.similarity(unaccented_title, func.kb_unaccent(norm[0]))
+        if len(norm) == 1
+        else func.greatest(*[func.similarity(unaccented_title, func.kb_unaccent(term)) for term in norm])
+    )
+    rank = func.ts_rank_cd(KbItem.search_tsv, tsq) + KB_TRGM_WEIGHT * trgm_score
     q = (
         select(KbItem)
         .where(KbItem.tenant_id == tenant_id)
-        .where(or_(KbItem.title.ilike(pattern), KbItem.content.ilike(pattern)))
-        .order_by(KbItem.created_at)
+        .where(or_(KbItem.search_tsv.op("@@")(tsq), *trgm_match))
+        .order_by(rank.desc(), KbItem.created_at.desc())
         .limit(top_k)
     )
     r = await db.execute(q)
     return list(r.scalars().all())
 
 
+async def _read_vectors(
+    db: AsyncSession,
+    tenant_id: UUID,
+    item_ids: Optional[Sequence[UUID]] = None,
+) -> Tuple[List[UUID], List[np.ndarray], int]:
+    """
+    Embedding của mọi item tenant (hoặc chỉ item_ids). Item chưa có embedding (tạo trước migration 021)
+    được tính tại chỗ, ghi lại bằng session riêng. Returns (ids, vectors, số item tính bù).
+    """
+    q = select(KbItem.id, KbItem.embedding).where(KbItem.tenant_id == tenant_id)
+    if item_ids is not None:
+        q = q.where(KbItem.id.in_(item_ids))
+    r = await db.execute(q.order_by(KbItem.created_at))
+    ids: List[UUID] = []
+    vectors: List[np.ndarray] = []
+    missing: List[UUID] = []
+    for item_id, raw in r.all():
+        vec = kb_vector_index.vector_from_bytes(raw)
+        if vec is None:
+            missing.append(item_id)
+        else:
+            ids.append(item_id)
+            vectors.append(vec)
+    if missing:
+        r = await db.execute(select(KbItem.id, KbItem.title, KbItem.content).where(KbItem.id.in_(missing)))
+        backfill = []
+        for item_id, title, content in r.all():
+            vec = kb_vector_index.embed_kb_item(title, content)
+            ids.append(item_id)
+            vectors.append(vec)
+            backfill.append({"id": item_id, "embedding": kb_vector_index.vector_to_bytes(vec)})
+        if backfill:
+            await _backfill_embeddings(tenant_id, backfill)
+    return ids, vectors, len(missing)
+
+
+async def _refresh_vector_index(
+    db: AsyncSession,
+    tenant_id: UUID,
+    index: kb_vector_index.TenantVectorIndex,
+) -> bool:
+    """
+    Đồng bộ index quá TTL với DB: chỉ đọc id, load embedding của item mới (theo lô KB_INDEX_REFRESH_CHUNK).
+    Có item trong index đã bị xoá khỏi DB -> False (caller build lại từ đầu).
+    """
+    r = await db.execute(select(KbItem.id).where(KbItem.tenant_id == tenant_id))
+    db_ids = {row[0] for row in r.all()}
+    if len(db_ids) < len(index) or not db_ids.issuperset(index.ids):
+        return False
+    new_ids = [item_id for item_id in db_ids if item_id not in index]
+    backfilled = 0
+    for i in range(0, len(new_ids), KB_INDEX_REFRESH_CHUNK):
+        ids, vectors, missing = await _read_vectors(db, tenant_id, new_ids[i : i + KB_INDEX_REFRESH_CHUNK])
+        index.add(ids, vectors)
+        backfilled += missing
+    index.mark_synced()
+    logger.info(
+        "kb.vector_index_refreshed",
+        tenant_id=str(tenant_id),
+        vectors=len(index),
+        added=len(new_ids),
+        backfilled=backfilled,
+    )
+    return True
+
+
+async def _load_vector_index(db: AsyncSession, tenant_id: UUID) -> kb_vector_index.TenantVectorIndex:
+    """
+    Index của tenant (RAM); chưa có thì load embedding từ DB, quá TTL thì chỉ bổ sung item mới
+    (session của caller chỉ đọc; embedding tính bù ghi bằng session riêng).
+    """
+    ttl = get_settings().kb_vector_index_ttl_seconds
+    index = kb_vector_index.get_index(tenant_id)
+    if index is not None and not index.is_stale(ttl):
+        return index
+    async with kb_vector_index.build_lock(tenant_id):
+        index = kb_vector_index.get_index(tenant_id)
+        if index is not None and not index.is_stale(ttl):
+            return index
+        if index is not None and await _refresh_vector_index(db, tenant_id, index):
+            kb_vector_index.put_index(tenant_id, index)
+            return index
+        index = kb_vector_index.TenantVectorIndex()
+        ids, vectors, backfilled = await _read_vectors(db, tenant_id)
+        index.add(ids, vectors)
+        kb_vector_index.put_index(tenant_id, index)
+        logger.info("kb.vector_index_loaded", tenant_id=str(tenant_id), vectors=len(index), backfilled=backfilled)
+        return index
+
+
+async def _backfill_embeddings(tenant_id: UUID, backfill: List[Dict]) -> None:
+    """
+    Ghi embedding tính bù trong transaction ngắn riêng: request đọc (retrieve_kb) không giữ row lock,
+    kết quả không phụ thuộc caller commit / rollback. Lỗi chỉ log (index RAM vẫn dùng được, lần load sau tính lại).
+    """
+    async with async_session_factory() as db:
+        try:
+            await db.execute(update(KbItem), backfill)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("kb.embedding_backfill_failed", tenant_id=str(tenant_id), rows=len(backfill), error=str(e))
+
+
+async def _fetch_kb_items_ordered(db: AsyncSession, tenant_id: UUID, ids: List[UUID]) -> List[KbItem]:
+    """Load KbItem theo danh sách id, giữ đúng thứ tự; id không còn trong DB (rollback / đã xoá) bị bỏ."""
+    if not ids:
+        return []
+    r = await db.execute(select(KbItem).where(KbItem.tenant_id == tenant_id, KbItem.id.in_(ids)))
+    by_id = {item.id: item for item in r.scalars().all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def semantic_search_kb(
+    db: AsyncSession,
+    tenant_id: UUID,
+    terms: Union[str, Sequence[str]],
+    top_k: int = 10,
+) -> List[KbItem]:
+    """Top-k KB items theo cosine giữa embedding query (các term ghép lại) và embedding từng item."""
+    norm = normalize_kb_terms(terms)
+    if not norm:
+        return []
+    index = await _load_vector_index(db, tenant_id)
+    hits = index.search(kb_vector_index.embed_text(" ".join(norm)), top_k)
+    return await _fetch_kb_items_ordered(db, tenant_id, [item_id for item_id, _score in hits])
+
+
+def _rrf_merge(rankings: Sequence[List[KbItem]], top_k: int) -> List[KbItem]:
+    """Reciprocal Rank Fusion: gộp nhiều bảng xếp hạng, không cần chuẩn hoá thang điểm giữa các mode."""
+    scores: Dict[UUID, float] = {}
+    items: Dict[UUID, KbItem] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item.id] = scores.get(item.id, 0.0) + 1.0 / (KB_RRF_K + rank + 1)
+            items.setdefault(item.id, item)
+    ordered = sorted(scores, key=lambda i: scores[i], reverse=True)
+    return [items[i] for i in ordered[:top_k]]
+
+
+async def retrieve_kb(
+    db: AsyncSession,
+    tenant_id: UUID,
+    terms: Union[str, Sequence[str]],
+    top_k: int = 10,
+    mode: Optional[str] = None,
+) -> List[KbItem]:
+    """
+    KB items liên quan nhất cho terms, theo mode (mặc định KB_RETRIEVAL_MODE).
+    hybrid: full-text bắt đúng từ khoá, semantic bắt item chỉ gần nghĩa (khác từ, thiếu dấu); gộp bằng RRF.
+    """
+    mode = mode or get_settings().kb_retrieval_mode
+    if mode not in KB_RETRIEVAL_MODES:
+        raise ValueError("invalid_kb_retrieval_mode")
+    if mode == "fulltext":
+        return await search_kb(db, tenant_id, terms, top_k)
+    if mode == "semantic":
+        return await semantic_search_kb(db, tenant_id, terms, top_k)
+    fulltext = await search_kb(db, tenant_id, terms, top_k)
+    semantic = await semantic_search_kb(db, tenant_id, terms, top_k)
+    return _rrf_merge([fulltext, semantic], top_k)
+
+
 def build_kb_context_string(
     items: List[KbItem],
     max_chars: int = KB_CONTEXT_MAX_CHARS,
 ) -> Tuple[str, int, int]:
     """
-    Ghép nội dung KB thành một chuỗi để inject vào prompt.
+    Ghép nội dung KB thành một chuỗi để inject vào prompt, theo thứ tự items (retrieve_kb: liên quan nhất trước).
     Returns (context_string, kb_hit_count, kb_chars_used).
     """
     if not items:
@@ -94,19 +94,16 @@ Chỉ trả về JSON, không giải thích. Ví dụ: {{"intent_label": "inquir
 
     async def _call_llm() -> ClassifyResult:
         import json
-        client = llm._get_client()
-        if not client:
+        if not llm._get_client():
             return fallback
 
-        def _sync_create():
-            return client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=150,
-            )
-
-        resp = await asyncio.to_thread(_sync_create)
+        resp = await llm.create_chat_completion(
+            "lead_classify",
+            model=settings.openai_model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            max_tokens=150,
+        )
         content = (resp.choices[0].message.content or "").strip()
         if content.startswith("```"):
             content = re.sub(r"^```\w*\n?", "", content).rstrip("`")
@@ -4,7 +4,7 @@ AI Lead System: xử lý webhook Facebook -> lead_signals, classify, audit, n8n
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.logging_config import get_logger
@@ -13,6 +13,7 @@ from app.schemas.leads import LeadSignalOut, LeadListResponse
 from app.services.approval_service import log_audit_event
 from app.services.lead_classify_service import classify_intent
 from app.services.n8n_webhook_service import notify_n8n_lead_follow_up
+from app.utils.pagination import DEFAULT_PAGE_LIMIT, keyset_page, split_page
 
 logger = get_logger(__name__)
 
@@ -217,60 +218,41 @@ async def process_facebook_webhook(
     return created_ids
 
 
-def _lead_to_out(lead: LeadSignal) -> LeadSignalOut:
-    """Map ORM LeadSignal -> LeadSignalOut."""
-    return LeadSignalOut(
-        id=lead.id,
-        tenant_id=lead.tenant_id,
-        platform=lead.platform,
-        source_type=lead.source_type,
-        source_subtype=lead.source_subtype,
-        content_id=lead.content_id,
-        publish_log_id=lead.publish_log_id,
-        external_post_id=lead.external_post_id,
-        external_thread_id=lead.external_thread_id,
-        external_message_id=lead.external_message_id,
-        author_name=lead.author_name,
-        author_id=lead.author_id,
-        content_text=lead.content_text,
-        intent_label=lead.intent_label,
-        priority=lead.priority,
-        confidence_score=lead.confidence_score,
-        status=lead.status,
-        assignee=lead.assignee,
-        follow_up_at=lead.follow_up_at,
-        last_contact_at=lead.last_contact_at,
-        meta=lead.meta or {},
-        created_at=lead.created_at,
-        updated_at=lead.updated_at,
-    )
+# Projection cho GET /api/leads: đúng các cột của LeadSignalOut
+_LEAD_LIST_COLUMNS = [getattr(LeadSignal, name) for name in LeadSignalOut.model_fields]
 
 
 async def list_leads(
     db: AsyncSession,
     tenant_id: UUID,
     status: Optional[str] = None,
-    limit: int = 50,
+    limit: int = DEFAULT_PAGE_LIMIT,
     offset: int = 0,
+    cursor: Optional[str] = None,
 ) -> LeadListResponse:
-    """Lấy danh sách lead signals của tenant (GET /api/leads)."""
-    q = select(LeadSignal).where(LeadSignal.tenant_id == tenant_id)
+    """
+    Lấy danh sách lead signals của tenant (GET /api/leads), mới nhất trước.
+    Phân trang keyset bằng cursor (next_cursor); total chỉ đếm ở trang đầu (không cursor).
+    offset giữ cho client cũ (bị bỏ qua khi có cursor). Cursor sai -> ValueError("invalid_cursor").
+    """
+    q = select(*_LEAD_LIST_COLUMNS).where(LeadSignal.tenant_id == tenant_id)
     if status:
         q = q.where(LeadSignal.status == status)
-    q = q.order_by(LeadSignal.created_at.desc())
 
-    # Count total
-    from sqlalchemy import func
-    count_q = select(func.count(LeadSignal.id)).where(LeadSignal.tenant_id == tenant_id)
-    if status:
-        count_q = count_q.where(LeadSignal.status == status)
-    r_count = await db.execute(count_q)
-    total = r_count.scalar_one_or_none() or 0
+    total: Optional[int] = None
+    if cursor is None:
+        count_q = select(func.count(LeadSignal.id)).where(LeadSignal.tenant_id == tenant_id)
+        if status:
+            count_q = count_q.where(LeadSignal.status == status)
+        total = (await db.execute(count_q)).scalar_one_or_none() or 0
 
-    r = await db.execute(q.offset(offset).limit(limit))
-    leads = list(r.scalars().all())
+    q = keyset_page(q, LeadSignal.created_at, LeadSignal.id, cursor, limit)
+    if cursor is None and offset:
+        q = q.offset(offset)
+    rows, next_cursor = split_page((await db.execute(q)).all(), limit)
     return LeadListResponse(
         tenant_id=tenant_id,
-        leads=[_lead_to_out(lead) for lead in leads],
+        leads=[LeadSignalOut(**row._mapping) for row in rows],
         total=total,
+        next_cursor=next_cursor,
     )
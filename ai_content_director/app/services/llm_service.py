@@ -2,14 +2,16 @@
 OpenAI LLM service: planner and sample posts generation.
 Tất cả gọi GPT nằm trong module này. Output chỉ JSON, có validate cấu trúc.
 """
-import asyncio
 import json
 import time
 from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
 
-UsageInfo = Dict[str, int]  # prompt_tokens, completion_tokens, total_tokens
+UsageInfo = Dict[str, int]  # prompt_tokens, completion_tokens, total_tokens (+ cache_hit, tokens_saved)
 
 from app.config import Settings
+from app.infrastructure import llm_cache
+from app.infrastructure.openai_client import create_chat_completion, get_async_openai
 from app.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -32,26 +34,22 @@ SAMPLES_SCHEMA = {
 class LLMService:
     """Dịch vụ OpenAI: sinh kế hoạch nội dung và bài mẫu. Chỉ gọi GPT tại đây."""
 
-    def __init__(self, settings: Settings) -> None:
-        """Khởi tạo từ app config (OPENAI_*)."""
+    def __init__(self, settings: Settings, tenant_id: Optional[UUID] = None) -> None:
+        """Khởi tạo từ app config (OPENAI_*). tenant_id dùng cho giới hạn concurrency theo tenant."""
         self.api_key = settings.openai_api_key
         self.model = settings.openai_model
         self.timeout_seconds = settings.openai_timeout_seconds
         self.max_retries = settings.openai_max_retries
         self.temperature = settings.openai_temperature
-        self._client: Any = None
+        self.tenant_id = tenant_id
 
     def _get_client(self):  # noqa: ANN201
-        """Lazy init OpenAI client (avoids import if key missing)."""
-        if self._client is not None:
-            return self._client
-        try:
-            from openai import OpenAI
-            self._client = OpenAI(api_key=self.api_key or "", timeout=float(self.timeout_seconds), max_retries=self.max_retries)
-            return self._client
-        except Exception as e:
-            logger.warning("llm.openai_client_init_failed", error=str(e))
-            return None
+        """AsyncOpenAI dùng chung cả process (pool keep-alive); None nếu chưa cấu hình."""
+        return get_async_openai()
+
+    async def create_chat_completion(self, operation: str, **kwargs: Any) -> Any:
+        """Gọi chat.completions.create (async, trong slot concurrency global + tenant, đo latency)."""
+        return await create_chat_completion(operation, tenant_id=self.tenant_id, **kwargs)
 
     def _extract_usage(self, resp: Any) -> UsageInfo:
         """Lấy prompt_tokens, completion_tokens, total_tokens từ response OpenAI."""
@@ -64,6 +62,48 @@ class LLMService:
             "total_tokens": getattr(usage, "total_tokens", 0) or 0,
         }
 
+    async def _complete(
+        self, operation: str, messages: List[Dict[str, Any]]
+    ) -> Tuple[str, UsageInfo, Optional[str]]:
+        """
+        Gọi LLM (hoặc lấy từ cache nếu LLM_CACHE_ENABLED). Trả (content thô, usage_info, cache_key).
+        Cache hit: usage 0 token (không tính vào budget), cache_hit=1, tokens_saved = total_tokens lúc gọi thật.
+        cache_key != None nghĩa là miss có cache bật: caller gọi _cache_store sau khi output hợp lệ.
+        """
+        cache_key: Optional[str] = None
+        if llm_cache.is_enabled():
+            cache_key = llm_cache.build_cache_key(self.model, messages, temperature=self.temperature)
+            cached = await llm_cache.lookup(cache_key)
+            if cached is not None:
+                tokens_saved = int((cached.get("usage") or {}).get("total_tokens", 0) or 0)
+                logger.info("llm.cache_hit", operation=operation, model=self.model, tokens_saved=tokens_saved)
+                usage_info: UsageInfo = {
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                    "cache_hit": 1,
+                    "tokens_saved": tokens_saved,
+                }
+                return (cached["content"], usage_info, None)
+            logger.info("llm.cache_miss", operation=operation, model=self.model)
+        resp = await self.create_chat_completion(
+            operation,
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+        )
+        content = (resp.choices[0].message.content or "").strip()
+        return (content, self._extract_usage(resp), cache_key)
+
+    async def _cache_store(self, cache_key: Optional[str], content: str, usage_info: UsageInfo) -> None:
+        """Lưu response đã validate vào cache (no-op khi cache tắt hoặc response lấy từ cache)."""
+        if cache_key is None:
+            return
+        try:
+            await llm_cache.store(cache_key, content, usage_info, self.model)
+        except Exception as e:
+            logger.warning("llm.cache_store_failed", model=self.model, error=str(e))
+
     async def generate_planner(self, brand_context: Dict[str, Any], days: int) -> Tuple[List[Dict[str, Any]], UsageInfo]:
         """
         Call OpenAI to generate a content plan (days 1..days).
@@ -98,14 +138,12 @@ class LLMService:
         )
         start = time.perf_counter()
         try:
-            resp = await asyncio.to_thread(
-                client.chat.completions.create,
-                model=self.model,
-                messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-                temperature=self.temperature,
+            raw_content, usage_info, cache_key = await self._complete(
+                "planner",
+                [{"role": "system", "content": system}, {"role": "user", "content": user}],
             )
             latency_ms = (time.perf_counter() - start) * 1000
-            content = (resp.choices[0].message.content or "").strip()
+            content = raw_content
             # Strip markdown code block if present
             if content.startswith("```"):
                 lines = content.split("\n")
@@ -129,7 +167,7 @@ class LLMService:
                 out.append({"day_number": dn, "topic": topic, "content_angle": angle})
             if len(out) != days:
                 raise ValueError("invalid_planner_output")
-            usage_info = self._extract_usage(resp)
+            await self._cache_store(cache_key, raw_content, usage_info)
             logger.info("llm.planner_success", model=self.model, latency_ms=round(latency_ms), days=days)
             return (out, usage_info)
         except json.JSONDecodeError as e:
@@ -190,14 +228,12 @@ class LLMService:
         )
         start = time.perf_counter()
         try:
-            resp = await asyncio.to_thread(
-                client.chat.completions.create,
-                model=self.model,
-                messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-                temperature=self.temperature,
+            raw_content, usage_info, cache_key = await self._complete(
+                "samples",
+                [{"role": "system", "content": system}, {"role": "user", "content": user}],
             )
             latency_ms = (time.perf_counter() - start) * 1000
-            content = (resp.choices[0].message.content or "").strip()
+            content = raw_content
             if content.startswith("```"):
                 lines = content.split("\n")
                 content = "\n".join(lines[1:-1] if lines[-1].strip() == "```" else lines[1:])
@@ -223,7 +259,7 @@ class LLMService:
                 else:
                     conf = 0.75
                 out.append({"title": title, "caption": caption, "hashtags": hashtags, "confidence_score": conf})
-            usage_info = self._extract_usage(resp)
+            await self._cache_store(cache_key, raw_content, usage_info)
             logger.info("llm.samples_success", model=self.model, latency_ms=round(latency_ms), count=count)
             return (out, usage_info)
         except json.JSONDecodeError as e:
@@ -265,14 +301,12 @@ class LLMService:
         )
         start = time.perf_counter()
         try:
-            resp = await asyncio.to_thread(
-                client.chat.completions.create,
-                model=self.model,
-                messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-                temperature=self.temperature,
+            raw_content, usage_info, cache_key = await self._complete(
+                "single_content",
+                [{"role": "system", "content": system}, {"role": "user", "content": user}],
             )
             latency_ms = (time.perf_counter() - start) * 1000
-            content = (resp.choices[0].message.content or "").strip()
+            content = raw_content
             if content.startswith("```"):
                 lines = content.split("\n")
                 content = "\n".join(lines[1:-1] if lines[-1].strip() == "```" else lines[1:])
@@ -297,7 +331,7 @@ class LLMService:
                     conf = 0.75
             else:
                 conf = 0.75
-            usage_info = self._extract_usage(resp)
+            await self._cache_store(cache_key, raw_content, usage_info)
             logger.info("llm.single_content_success", model=self.model, latency_ms=round(latency_ms))
             return (
                 {
@@ -5,9 +5,8 @@ Timeout 3–5s (ENV N8N_WEBHOOK_TIMEOUT_SECONDS), retry 1. Log lỗi, không fai
 from typing import Any, Dict
 from uuid import UUID
 
-import httpx
-
 from app.config import get_settings
+from app.infrastructure.http_clients import UPSTREAM_N8N, get_http_client
 from app.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -39,24 +38,24 @@ async def notify_n8n_lead_follow_up(
         **payload,
     }
     last_error: str | None = None
+    client = get_http_client(UPSTREAM_N8N)
     for attempt in range(N8N_WEBHOOK_RETRIES + 1):
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                resp = await client.post(url, json=body)
-                if resp.status_code >= 400:
-                    last_error = f"status={resp.status_code} body={resp.text[:300]}"
-                    logger.warning(
-                        "n8n_webhook.failed",
-                        lead_id=str(lead_id),
-                        attempt=attempt + 1,
-                        status=resp.status_code,
-                        body=resp.text[:500],
-                    )
-                    if attempt < N8N_WEBHOOK_RETRIES:
-                        continue
-                    return False
-                logger.info("n8n_webhook.sent", lead_id=str(lead_id), status=resp.status_code)
-                return True
+            resp = await client.post(url, json=body, timeout=timeout)
+            if resp.status_code >= 400:
+                last_error = f"status={resp.status_code} body={resp.text[:300]}"
+                logger.warning(
+                    "n8n_webhook.failed",
+                    lead_id=str(lead_id),
+                    attempt=attempt + 1,
+                    status=resp.status_code,
+                    body=resp.text[:500],
+                )
+                if attempt < N8N_WEBHOOK_RETRIES:
+                    continue
+                return False
+            logger.info("n8n_webhook.sent", lead_id=str(lead_id), status=resp.status_code)
+            return True
         except Exception as e:
             last_error = str(e)
             logger.warning(
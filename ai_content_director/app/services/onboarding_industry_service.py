@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import IndustryProfile, Tenant
 
 from app.schemas.revenue_mv1 import OnboardingIndustryRequest
+from app.services.profile_cache_service import invalidate_tenant_cache
 
 
 async def upsert_industry_profile(
@@ -16,6 +17,7 @@ async def upsert_industry_profile(
     """
     Create or update industry_profile for the given tenant_id.
     If a profile exists for tenant_id, update it; otherwise create one.
+    Commits before invalidating the profile cache, so a concurrent reader cannot refill it with the old row.
     """
     result = await db.execute(
         select(IndustryProfile).where(IndustryProfile.tenant_id == payload.tenant_id)
@@ -25,8 +27,9 @@ async def upsert_industry_profile(
     if existing:
         existing.name = payload.name
         existing.description = payload.description
-        await db.flush()
+        await db.commit()
         await db.refresh(existing)
+        await invalidate_tenant_cache(payload.tenant_id)
         return existing
 
     # Verify tenant exists
@@ -40,8 +43,9 @@ async def upsert_industry_profile(
         description=payload.description,
     )
     db.add(profile)
-    await db.flush()
+    await db.commit()
     await db.refresh(profile)
+    await invalidate_tenant_cache(payload.tenant_id)
     return profile
 
 
@@ -1,21 +1,23 @@
 """
 Revenue MVP Module 1: Generate 30-day plan, strict JSON schema, HITL, ai_usage_logs.
 """
+import uuid
 from datetime import date, timedelta
 from typing import Any, Dict, List
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
 from app.logging_config import get_logger
-from app.models import ContentItem, ContentPlan, GeneratedPlan, Tenant
+from app.models import ContentItem, ContentPlan, GeneratedPlan
 from app.schemas.revenue_mv1 import PlanJsonSchema, PlanDayItem
 
 from app.services.ai_usage_service import log_usage
 from app.services.llm_service import LLMService
-from app.services.onboarding_industry_service import get_industry_profile_by_tenant
+from app.services.profile_cache_service import get_industry_profile_snapshot, get_tenant_snapshot
 
 logger = get_logger(__name__)
 
@@ -34,11 +36,11 @@ def approval_status_from_confidence(confidence: float) -> str:
 
 
 def _build_brand_context(
-    tenant: Tenant, industry_name: str, industry_description: Any
+    industry: str, industry_name: str, industry_description: Any
 ) -> Dict[str, Any]:
-    """Build context dict for LLM from tenant + industry_profile."""
+    """Build context dict for LLM from tenant industry + industry_profile."""
     return {
-        "industry": tenant.industry,
+        "industry": industry,
         "industry_profile_name": industry_name,
         "industry_profile_description": industry_description or "",
         "main_services": [],
@@ -72,31 +74,34 @@ async def generate_plan(
         start_date = date.today()
     end_date = start_date + timedelta(days=29)
 
-    result = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
-    tenant = result.scalar_one_or_none()
+    tenant = await get_tenant_snapshot(db, tenant_id)
     if not tenant:
         raise ValueError("tenant_not_found")
 
-    profile = await get_industry_profile_by_tenant(db, tenant_id)
-    industry_name = profile.name if profile else tenant.industry
-    industry_description = profile.description if profile else None
-    brand_context = _build_brand_context(tenant, industry_name, industry_description or "")
+    profile = await get_industry_profile_snapshot(db, tenant_id)
+    industry_name = profile["name"] if profile else tenant["industry"]
+    industry_description = profile["description"] if profile else None
+    brand_context = _build_brand_context(tenant["industry"], industry_name, industry_description or "")
 
     plan_json_dict: Dict[str, Any]
     prompt_tokens = 0
     completion_tokens = 0
     total_tokens = 0
+    cache_hit = False
+    tokens_saved = 0
     model_used: str | None = None
     confidence = 0.80  # default placeholder
 
     settings = get_settings()
-    llm = LLMService(settings)
+    llm = LLMService(settings, tenant_id=tenant_id)
 
     try:
         days_list, usage_info = await llm.generate_planner(brand_context, 30)
         prompt_tokens = usage_info.get("prompt_tokens", 0)
         completion_tokens = usage_info.get("completion_tokens", 0)
         total_tokens = usage_info.get("total_tokens", 0)
+        cache_hit = bool(usage_info.get("cache_hit"))
+        tokens_saved = usage_info.get("tokens_saved", 0)
         model_used = settings.openai_model
         # Convert day_number -> day for our schema
         days_for_schema = [
@@ -136,6 +141,8 @@ async def generate_plan(
         prompt_tokens=prompt_tokens,
         completion_tokens=completion_tokens,
         total_tokens=total_tokens,
+        cache_hit=cache_hit,
+        tokens_saved=tokens_saved,
     )
 
     logger.info(
@@ -175,6 +182,7 @@ async def materialize_plan(
     """
     Load GeneratedPlan by id+tenant_id from generated_plans. Create content_plans (one per day)
     and content_items (one per day) from plan_json.days. Return summary JSON.
+    2 statement bất kể số ngày; idempotent: gọi lại không tạo trùng (ngày đã có -> content_plans_skipped).
     """
     plan = await get_plan_by_id_and_tenant(db, plan_id, tenant_id)
     if not plan:
@@ -188,36 +196,51 @@ async def materialize_plan(
             "content_items_created": 0,
         }
 
-    content_plans_created = 0
-    content_items_created = 0
-
+    # Dựng sẵn 2 tập dòng (id sinh ở client); ngày trùng trong plan_json lấy bản đầu
+    plan_rows: Dict[int, Dict[str, Any]] = {}
+    item_rows: Dict[uuid.UUID, Dict[str, Any]] = {}
     for day_item in days:
         day = day_item.get("day", 0)
+        if day in plan_rows:
+            continue
         topic = (day_item.get("topic") or "").strip() or f"Day {day}"
         content_angle = (day_item.get("content_angle") or "").strip() or ""
+        cp_id = uuid.uuid4()
+        plan_rows[day] = {
+            "id": cp_id,
+            "tenant_id": tenant_id,
+            "generated_plan_id": plan_id,
+            "day_number": day,
+            "topic": topic,
+            "content_angle": content_angle or None,
+            "status": "planned",
+        }
+        item_rows[cp_id] = {
+            "id": uuid.uuid4(),
+            "tenant_id": tenant_id,
+            "plan_id": cp_id,
+            "title": topic,
+            "caption": content_angle or None,
+            "hashtags": None,
+            "status": "draft",
+        }
 
-        cp = ContentPlan(
-            tenant_id=tenant_id,
-            day_number=day,
-            topic=topic,
-            content_angle=content_angle or None,
-            status="planned",
-        )
-        db.add(cp)
-        await db.flush()
-        content_plans_created += 1
-
-        ci = ContentItem(
-            tenant_id=tenant_id,
-            plan_id=cp.id,
-            title=topic,
-            caption=content_angle or None,
-            hashtags=None,
-            status="draft",
-        )
-        db.add(ci)
-        await db.flush()
-        content_items_created += 1
+    # 1 statement content_plans: ngày đã materialize (unique generated_plan_id + day_number) bị bỏ qua,
+    # RETURNING chỉ trả dòng mới -> chỉ tạo content_items cho các ngày đó (statement thứ 2).
+    stmt = (
+        pg_insert(ContentPlan)
+        .values(list(plan_rows.values()))
+        .on_conflict_do_nothing(index_elements=[ContentPlan.generated_plan_id, ContentPlan.day_number])
+        .returning(ContentPlan.id)
+    )
+    created_plan_ids = list((await db.execute(stmt)).scalars().all())
+    new_items = [item_rows[cp_id] for cp_id in created_plan_ids]
+    if new_items:
+        await db.execute(insert(ContentItem), new_items)
+
+    content_plans_created = len(created_plan_ids)
+    content_items_created = len(new_items)
+    content_plans_skipped = len(plan_rows) - content_plans_created
 
     logger.info(
         "plan_mv1.materialized",
@@ -225,9 +248,11 @@ async def materialize_plan(
         tenant_id=str(tenant_id),
         content_plans_created=content_plans_created,
         content_items_created=content_items_created,
+        content_plans_skipped=content_plans_skipped,
     )
     return {
         "plan_id": str(plan_id),
         "content_plans_created": content_plans_created,
         "content_items_created": content_items_created,
+        "content_plans_skipped": content_plans_skipped,
     }
@@ -10,7 +10,7 @@ from app.config import get_settings
 from app.logging_config import get_logger
 from app.models import ContentPlan, Tenant, BrandProfile
 from app.schemas.planner import PlanItemOut, PlannerGenerateRequest
-from app.services.ai_usage_service import is_over_budget, log_usage
+from app.services.ai_usage_service import log_usage, release_budget, reserve_budget
 from app.services.approval_service import log_audit_event
 from app.services.llm_service import LLMService
 
@@ -131,10 +131,11 @@ async def generate_30_day_plan(
     topics: List[Tuple[int, str, str]] = []
 
     if use_ai is True and settings.openai_api_key:
+        reservation = None
         try:
-            if await is_over_budget(db, tenant_id):
-                raise ValueError("budget_exceeded")
-            llm = LLMService(settings)
+            # Giữ chỗ chi phí ước tính (atomic trên Redis); quyết toán ở log_usage, lỗi thì release ở finally
+            reservation = await reserve_budget(db, tenant_id)
+            llm = LLMService(settings, tenant_id=tenant_id)
             brand_context = _brand_context(tenant, profile)
             raw, usage_info = await llm.generate_planner(brand_context, days)
             if len(raw) == days and len(set(r["day_number"] for r in raw)) == days:
@@ -146,6 +147,9 @@ async def generate_30_day_plan(
                     prompt_tokens=usage_info.get("prompt_tokens", 0),
                     completion_tokens=usage_info.get("completion_tokens", 0),
                     total_tokens=usage_info.get("total_tokens", 0),
+                    cache_hit=bool(usage_info.get("cache_hit")),
+                    tokens_saved=usage_info.get("tokens_saved", 0),
+                    reservation=reservation,
                 )
                 raw_sorted = sorted(raw, key=lambda x: x["day_number"])
                 topics = [(r["day_number"], r["topic"], r.get("content_angle") or "") for r in raw_sorted]
@@ -164,6 +168,8 @@ async def generate_30_day_plan(
             logger.info("planner.llm_fallback", reason=str(e))
             used_fallback = True
             topics = _build_plan_topics(industry, main_services_list, brand_tone, days)
+        finally:
+            await release_budget(reservation)
     elif use_ai is True and not settings.openai_api_key:
         used_fallback = True
         topics = _build_plan_topics(industry, main_services_list, brand_tone, days)
@@ -0,0 +1,105 @@
+"""
+Cache đọc tenant / brand_profile / industry_profile (dữ liệu ít thay đổi, đọc trước mọi lần generate).
+Lưu snapshot dạng dict (JSON) qua app.infrastructure.redis_cache: tầng local trong process + Redis.
+Ghi (onboarding, upsert industry profile) phải gọi invalidate_tenant_cache sau commit để xóa snapshot cũ
+(xóa trước commit -> request đọc song song có thể nạp lại dòng cũ vào cache).
+"""
+import json
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infrastructure.redis_cache import cache_delete, cache_get, cache_set
+from app.logging_config import get_logger
+from app.models import BrandProfile, IndustryProfile, Tenant
+
+logger = get_logger(__name__)
+
+PROFILE_CACHE_TTL_SECONDS = 600
+
+
+def _tenant_key(tenant_id: UUID) -> str:
+    return f"tenant:{tenant_id}"
+
+
+def _brand_profile_key(tenant_id: UUID) -> str:
+    return f"brand_profile:{tenant_id}"
+
+
+def _industry_profile_key(tenant_id: UUID) -> str:
+    return f"industry_profile:{tenant_id}"
+
+
+async def _get_json(key: str) -> Optional[Dict[str, Any]]:
+    """Đọc snapshot JSON từ cache; value hỏng thì coi như miss."""
+    raw = await cache_get(key)
+    if raw is None:
+        return None
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def _set_json(key: str, data: Dict[str, Any]) -> None:
+    await cache_set(key, json.dumps(data, ensure_ascii=False), PROFILE_CACHE_TTL_SECONDS)
+
+
+async def get_tenant_snapshot(db: AsyncSession, tenant_id: UUID) -> Optional[Dict[str, Any]]:
+    """Tenant dạng dict {id, name, industry}. None nếu không tồn tại (không cache kết quả None)."""
+    key = _tenant_key(tenant_id)
+    cached = await _get_json(key)
+    if cached is not None:
+        return cached
+    r = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
+    tenant = r.scalar_one_or_none()
+    if not tenant:
+        return None
+    data = {"id": str(tenant.id), "name": tenant.name, "industry": tenant.industry or ""}
+    await _set_json(key, data)
+    return data
+
+
+async def get_brand_profile_snapshot(db: AsyncSession, tenant_id: UUID) -> Optional[Dict[str, Any]]:
+    """Brand profile dạng dict {brand_tone, main_services (JSON string), target_customer, cta_style}."""
+    key = _brand_profile_key(tenant_id)
+    cached = await _get_json(key)
+    if cached is not None:
+        return cached
+    r = await db.execute(select(BrandProfile).where(BrandProfile.tenant_id == tenant_id))
+    profile = r.scalar_one_or_none()
+    if not profile:
+        return None
+    data = {
+        "brand_tone": profile.brand_tone or "",
+        "main_services": profile.main_services or "",
+        "target_customer": profile.target_customer or "",
+        "cta_style": profile.cta_style or "",
+    }
+    await _set_json(key, data)
+    return data
+
+
+async def get_industry_profile_snapshot(db: AsyncSession, tenant_id: UUID) -> Optional[Dict[str, Any]]:
+    """Industry profile dạng dict {name, description}."""
+    key = _industry_profile_key(tenant_id)
+    cached = await _get_json(key)
+    if cached is not None:
+        return cached
+    r = await db.execute(select(IndustryProfile).where(IndustryProfile.tenant_id == tenant_id))
+    profile = r.scalar_one_or_none()
+    if not profile:
+        return None
+    data = {"name": profile.name, "description": profile.description or ""}
+    await _set_json(key, data)
+    return data
+
+
+async def invalidate_tenant_cache(tenant_id: UUID) -> None:
+    """Xóa snapshot tenant + profiles (gọi sau khi commit)."""
+    for key in (_tenant_key(tenant_id), _brand_profile_key(tenant_id), _industry_profile_key(tenant_id)):
+        await cache_delete(key)
+    logger.info("profile_cache.invalidated", tenant_id=str(tenant_id))
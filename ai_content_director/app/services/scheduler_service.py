@@ -1,47 +1,84 @@
 """
 Scheduler auto-publish: đăng nội dung đã approved theo scheduled_at.
-Chạy trong process FastAPI (single instance, laptop). Mỗi 60s tìm item due và gọi Facebook publish.
-Tránh double publish: SELECT FOR UPDATE SKIP LOCKED.
+Chạy trong process FastAPI; nhiều replica chạy cùng lúc an toàn nhờ claim theo lease:
+- Claim: UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) đặt schedule_status=publishing,
+  locked_until = now + SCHEDULER_LEASE_SECONDS, locked_by = worker id. Item publishing có lease hết hạn
+  (process chết giữa chừng) hoặc locked_until NULL (dữ liệu cũ) được coi là đến hạn và claim lại tự động.
+- Worker pool: mỗi item chạy trong task riêng, giới hạn SCHEDULER_CONCURRENCY (global) và
+  SCHEDULER_CONCURRENCY_PER_TENANT; một video upload chậm chỉ chiếm 1 slot, không chặn tenant khác.
+- Fairness: page Facebook gắn theo tenant, nên mỗi lần claim tối đa N item / tenant (row_number theo tenant),
+  các tenant xen kẽ nhau thay vì 1 tenant backlog lớn chiếm hết batch.
+- Heartbeat: gia hạn locked_until cho các item đang giữ mỗi lease/3 giây.
+- Kết quả publish (thành công / thất bại, kể cả lỗi ngoài dự kiến) chỉ ghi khi worker còn giữ lease;
+  mọi lỗi đều tăng publish_attempts -> backoff hoặc failed, không claim lại vô hạn.
+- Shutdown: ngừng claim, chờ publish đang chạy xong tối đa SCHEDULER_SHUTDOWN_DRAIN_SECONDS (heartbeat vẫn
+  gia hạn lease); item chưa bắt đầu publish được trả về scheduled ngay, phần còn lại mới bị huỷ.
+- Đánh thức theo sự kiện: ngủ đến scheduled_at sớm nhất (tối đa INTERVAL_SECONDS); schedule/unschedule
+  gửi pg_notify(SCHEDULER_NOTIFY_CHANNEL) -> mọi replica đang LISTEN thức dậy ngay, không poll 60s.
+  Connection LISTEN rớt -> log warning, tạm poll INTERVAL_SECONDS và kết nối lại với backoff.
 """
 import asyncio
+import os
+import socket
 import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import func, select
+from sqlalchemy import and_, func, or_, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import async_session_factory
+from app.config import get_settings
+from app.db import async_session_factory, engine
+from app.infrastructure.keyed_semaphore import KeyedSemaphore
 from app.logging_config import get_logger
 from app.models import ContentItem
 from app.services.approval_service import log_audit_event
 from app.services.facebook_publish_service import publish_post
-from app.services.facebook_metrics_service import fetch_and_store_metrics, get_recent_success_publish_logs
+from app.services.facebook_metrics_service import collect_metrics, get_recent_success_publish_logs
 
 logger = get_logger(__name__)
 
-INTERVAL_SECONDS = 60
+INTERVAL_SECONDS = 60  # Ngủ tối đa giữa 2 lần kiểm tra (lưới an toàn khi mất NOTIFY)
+IDLE_RETRY_SECONDS = 5  # Có item due nhưng không claim được (replica khác đang giữ lock)
+SCHEDULER_NOTIFY_CHANNEL = "scheduler_wakeup"
+LISTEN_RECONNECT_BACKOFF_SECONDS = 1.0
+LISTEN_RECONNECT_BACKOFF_MAX_SECONDS = 60.0
+LISTEN_PING_TIMEOUT_SECONDS = 5.0
 MAX_PUBLISH_ATTEMPTS = 3
 RETRY_BACKOFF_MINUTES = 10
 METRICS_INTERVAL_MINUTES = 360  # 6 giờ
 METRICS_LOOKBACK_DAYS = 7
 
-# Trạng thái scheduler (in-memory, single instance)
+# Định danh worker (ghi vào locked_by): host:pid:random
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Trạng thái scheduler (in-memory, theo process)
 _scheduler_task: Optional[asyncio.Task[None]] = None
 _metrics_task: Optional[asyncio.Task[None]] = None
+_heartbeat_task: Optional[asyncio.Task[None]] = None
 _stop_event: Optional[asyncio.Event] = None
 _last_tick_at: Optional[datetime] = None
 _enabled = False
+# Item đang giữ lease trong process này: content_id -> task publish
+_inflight: Dict[UUID, "asyncio.Task[None]"] = {}
+_global_slots: Optional[asyncio.Semaphore] = None
+_tenant_slots = KeyedSemaphore()  # semaphore tenant bỏ khi tenant không còn item giữ / chờ slot
+_wake_event: Optional[asyncio.Event] = None
+_listen_conn: Any = None
+_listener_task: Optional[asyncio.Task[None]] = None
 
 
 def get_scheduler_status() -> dict:
-    """Trả về enabled, interval_seconds, last_tick_at. pending_count cần db."""
+    """Trả về enabled, interval_seconds, last_tick_at, worker_id, inflight_count, listen_connected. pending_count cần db."""
     return {
         "enabled": _enabled,
         "interval_seconds": INTERVAL_SECONDS,
         "last_tick_at": _last_tick_at.isoformat() if _last_tick_at else None,
         "pending_count": None,
+        "worker_id": WORKER_ID,
+        "inflight_count": len(_inflight),
+        "listen_connected": _listen_conn is not None,
     }
 
 
@@ -55,39 +92,434 @@ async def _pending_count(db: AsyncSession) -> int:
     return r.scalar() or 0
 
 
-async def _tick() -> None:
-    """Một vòng scheduler: lấy item due, lock, publish, cập nhật trạng thái."""
+def _claimable(now: datetime):  # noqa: ANN202
+    """Điều kiện claim: item due (scheduled) hoặc publishing có lease đã hết hạn."""
+    return and_(
+        ContentItem.status == "approved",
+        or_(
+            and_(ContentItem.schedule_status == "scheduled", ContentItem.scheduled_at <= now),
+            and_(
+                ContentItem.schedule_status == "publishing",
+                or_(ContentItem.locked_until.is_(None), ContentItem.locked_until < now),
+            ),
+        ),
+    )
+
+
+async def _claim_due_items(db: AsyncSession, limit: int, per_tenant: int) -> List[Tuple[UUID, UUID]]:
+    """
+    Claim tối đa limit item (mỗi tenant tối đa per_tenant), xen kẽ tenant theo thứ tự scheduled_at.
+    Một câu UPDATE ... RETURNING; row đang bị replica khác lock thì bỏ qua (SKIP LOCKED).
+    Returns [(content_id, tenant_id)]. Caller commit.
+    """
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    ranked = (
+        select(
+            ContentItem.id.label("id"),
+            ContentItem.scheduled_at.label("scheduled_at"),
+            func.row_number()
+            .over(partition_by=ContentItem.tenant_id, order_by=ContentItem.scheduled_at)
+            .label("rn"),
+        )
+        .where(_claimable(now))
+        .subquery()
+    )
+    candidate_ids = (
+        select(ranked.c.id)
+        .where(ranked.c.rn <= per_tenant)
+        .order_by(ranked.c.rn, ranked.c.scheduled_at)
+        .limit(limit)
+    )
+    lockable = (
+        select(ContentItem.id)
+        .where(ContentItem.id.in_(candidate_ids), _claimable(now))
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(ContentItem)
+        .where(ContentItem.id.in_(lockable))
+        .values(
+            schedule_status="publishing",
+            locked_until=now + timedelta(seconds=settings.scheduler_lease_seconds),
+            locked_by=WORKER_ID,
+        )
+        .returning(ContentItem.id, ContentItem.tenant_id)
+        .execution_options(synchronize_session=False)
+    )
+    r = await db.execute(stmt)
+    return [(row[0], row[1]) for row in r.all()]
+
+
+def _get_global_slots() -> asyncio.Semaphore:
+    """Semaphore global cho worker pool."""
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(max(1, get_settings().scheduler_concurrency))
+    return _global_slots
+
+
+async def _run_publish(content_id: UUID, tenant_id: UUID) -> None:
+    """Chờ slot (tenant trước, rồi global) rồi publish; luôn gỡ khỏi _inflight khi xong."""
+    try:
+        async with _tenant_slots.slot(tenant_id, get_settings().scheduler_concurrency_per_tenant):
+            async with _get_global_slots():
+                if _stop_event is not None and _stop_event.is_set():
+                    # Đang shutdown: chưa gọi Graph -> trả item cho replica khác ngay, không chờ lease hết hạn
+                    await _release_unstarted(content_id)
+                    return
+                await _publish_one(content_id, tenant_id)
+    finally:
+        _inflight.pop(content_id, None)
+        # Slot vừa trống: cho vòng lặp claim tiếp nếu còn item due
+        wake_scheduler()
+
+
+def _pool_capacity() -> int:
+    """Số item còn claim được: (SCHEDULER_CONCURRENCY x2) - số item đang giữ."""
+    return max(1, get_settings().scheduler_concurrency) * 2 - len(_inflight)
+
+
+async def _tick() -> int:
+    """
+    Một vòng scheduler: claim item due theo lease (tối đa số slot còn trống x2), giao cho worker pool.
+    Không chờ publish xong: item chậm vẫn giữ slot, vòng sau claim tiếp phần còn trống.
+    Returns số item claim được.
+    """
     global _last_tick_at
     _last_tick_at = datetime.now(timezone.utc)
+    settings = get_settings()
+    capacity = _pool_capacity()
+    if capacity <= 0:
+        logger.info("scheduler.tick", eligible_count=0, inflight_count=len(_inflight), skipped="pool_full")
+        return 0
     async with async_session_factory() as db:
         try:
-            now = _last_tick_at
-            q = (
-                select(ContentItem)
+            claimed = await _claim_due_items(
+                db,
+                limit=capacity,
+                per_tenant=max(1, settings.scheduler_concurrency_per_tenant) * 2,
+            )
+            await db.commit()
+        except Exception as e:
+            logger.warning("scheduler.tick_error", error=str(e))
+            await db.rollback()
+            return 0
+    logger.info("scheduler.tick", eligible_count=len(claimed), inflight_count=len(_inflight), worker_id=WORKER_ID)
+    for content_id, tenant_id in claimed:
+        if content_id in _inflight:
+            continue
+        _inflight[content_id] = asyncio.create_task(_run_publish(content_id, tenant_id))
+    return len(claimed)
+
+
+async def _seconds_until_next_due() -> float:
+    """
+    Số giây tới mốc sớm nhất cần xử lý: scheduled_at của item scheduled (partial index
+    ix_content_items_due) hoặc locked_until của item publishing (lease hết hạn -> claim lại;
+    locked_until NULL = đến hạn ngay, cùng điều kiện với _claimable).
+    Không có gì -> INTERVAL_SECONDS. Kết quả trong [0, INTERVAL_SECONDS].
+    """
+    async with async_session_factory() as db:
+        r = await db.execute(
+            select(
+                select(func.min(ContentItem.scheduled_at))
+                .where(ContentItem.status == "approved", ContentItem.schedule_status == "scheduled")
+                .scalar_subquery(),
+                select(func.min(func.coalesce(ContentItem.locked_until, func.now())))
+                .where(ContentItem.status == "approved", ContentItem.schedule_status == "publishing")
+                .scalar_subquery(),
+            )
+        )
+        next_scheduled, next_lease_expiry = r.one()
+    candidates = [t for t in (next_scheduled, next_lease_expiry) if t is not None]
+    if not candidates:
+        return float(INTERVAL_SECONDS)
+    delay = (min(candidates) - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, min(float(INTERVAL_SECONDS), delay))
+
+
+def wake_scheduler() -> None:
+    """Đánh thức vòng lặp scheduler trong process này (vd vừa schedule item hoặc vừa trống slot)."""
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+async def notify_scheduler(db: AsyncSession) -> None:
+    """
+    Gửi pg_notify trong transaction hiện tại: Postgres chỉ phát khi commit, nên replica khác
+    không thức dậy trước khi thay đổi lịch hiển thị. Đồng thời đánh thức scheduler trong process.
+    """
+    await db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": SCHEDULER_NOTIFY_CHANNEL})
+    wake_scheduler()
+
+
+def _on_notify(*_args: Any) -> None:
+    """Callback asyncpg LISTEN (connection, pid, channel, payload)."""
+    wake_scheduler()
+
+
+async def _open_listener(lost: asyncio.Event) -> Tuple[Any, Any]:
+    """Mở connection riêng và LISTEN; connection bị đóng (server / mạng) -> set lost. Returns (conn, asyncpg conn)."""
+    conn = await engine.connect()
+    try:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        await driver.add_listener(SCHEDULER_NOTIFY_CHANNEL, _on_notify)
+        driver.add_termination_listener(lambda *_args: lost.set())
+    except Exception:
+        await conn.close()
+        raise
+    return conn, driver
+
+
+async def _listener_alive(driver: Any) -> bool:
+    """Kiểm tra connection LISTEN còn sống (mạng rớt im lặng không gọi termination listener)."""
+    try:
+        await asyncio.wait_for(driver.execute("SELECT 1"), timeout=LISTEN_PING_TIMEOUT_SECONDS)
+        return True
+    except Exception:
+        return False
+
+
+async def _close_listener() -> None:
+    global _listen_conn
+    conn, _listen_conn = _listen_conn, None
+    if conn is None:
+        return
+    try:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.remove_listener(SCHEDULER_NOTIFY_CHANNEL, _on_notify)
+    except Exception:
+        pass  # connection đã chết: chỉ cần đóng
+    try:
+        await conn.close()
+    except Exception as e:
+        logger.warning("scheduler.listen_close_error", error=str(e))
+
+
+async def _listener_loop() -> None:
+    """
+    Giữ LISTEN SCHEDULER_NOTIFY_CHANNEL trên 1 connection riêng suốt vòng đời scheduler.
+    Kết nối lỗi / rớt -> log warning (scheduler chỉ còn poll tối đa INTERVAL_SECONDS) và kết nối lại
+    với backoff LISTEN_RECONNECT_BACKOFF_SECONDS x2 (tối đa LISTEN_RECONNECT_BACKOFF_MAX_SECONDS).
+    """
+    global _listen_conn
+    backoff = LISTEN_RECONNECT_BACKOFF_SECONDS
+    while True:
+        lost = asyncio.Event()
+        try:
+            _listen_conn, driver = await _open_listener(lost)
+        except Exception as e:
+            logger.warning(
+                "scheduler.listen_failed",
+                channel=SCHEDULER_NOTIFY_CHANNEL,
+                error=str(e),
+                fallback_poll_seconds=INTERVAL_SECONDS,
+                retry_in_seconds=backoff,
+            )
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, LISTEN_RECONNECT_BACKOFF_MAX_SECONDS)
+            continue
+        logger.info("scheduler.listen_started", channel=SCHEDULER_NOTIFY_CHANNEL)
+        backoff = LISTEN_RECONNECT_BACKOFF_SECONDS
+        # NOTIFY phát trong lúc mất kết nối đã bị lỡ -> kiểm tra lịch ngay
+        wake_scheduler()
+        while not lost.is_set():
+            try:
+                await asyncio.wait_for(lost.wait(), timeout=INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                if not await _listener_alive(driver):
+                    break
+        logger.warning(
+            "scheduler.listen_lost",
+            channel=SCHEDULER_NOTIFY_CHANNEL,
+            fallback_poll_seconds=INTERVAL_SECONDS,
+            retry_in_seconds=backoff,
+        )
+        await _close_listener()
+        await asyncio.sleep(backoff)
+
+
+async def _stop_listener() -> None:
+    global _listener_task
+    task, _listener_task = _listener_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await _close_listener()
+
+
+async def _wait_for_wake(timeout: float) -> None:
+    """Ngủ tối đa timeout giây hoặc đến khi được đánh thức (NOTIFY / slot trống / stop)."""
+    if _wake_event is None:
+        await asyncio.sleep(timeout)
+        return
+    try:
+        await asyncio.wait_for(_wake_event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    _wake_event.clear()
+
+
+async def _renew_leases() -> int:
+    """Gia hạn locked_until cho item process này đang giữ (chỉ row còn locked_by = WORKER_ID)."""
+    if not _inflight:
+        return 0
+    settings = get_settings()
+    async with async_session_factory() as db:
+        try:
+            r = await db.execute(
+                update(ContentItem)
                 .where(
-                    ContentItem.status == "approved",
-                    ContentItem.schedule_status == "scheduled",
-                    ContentItem.scheduled_at <= now,
+                    ContentItem.id.in_(list(_inflight.keys())),
+                    ContentItem.schedule_status == "publishing",
+                    ContentItem.locked_by == WORKER_ID,
+                )
+                .values(
+                    locked_until=datetime.now(timezone.utc) + timedelta(seconds=settings.scheduler_lease_seconds)
                 )
+                .execution_options(synchronize_session=False)
             )
-            # PostgreSQL: FOR UPDATE SKIP LOCKED để chỉ một worker lấy được row
-            q = q.with_for_update(skip_locked=True)
-            r = await db.execute(q)
-            due_items = list(r.scalars().all())
-            eligible_count = len(due_items)
-            logger.info("scheduler.tick", eligible_count=eligible_count)
-            if not due_items:
-                await db.commit()
-                return
-            for item in due_items:
-                item.schedule_status = "publishing"
-                await db.flush()
             await db.commit()
+            return r.rowcount or 0
+        except Exception as e:
+            logger.warning("scheduler.heartbeat_error", error=str(e))
+            await db.rollback()
+            return 0
+
+
+async def _heartbeat_loop() -> None:
+    """Heartbeat lease: mỗi SCHEDULER_LEASE_SECONDS/3 giây, tới khi bị huỷ (sau khi drain lúc shutdown)."""
+    interval = max(1, get_settings().scheduler_lease_seconds // 3)
+    while True:
+        await asyncio.sleep(interval)
+        renewed = await _renew_leases()
+        if renewed:
+            logger.debug("scheduler.heartbeat", renewed=renewed, worker_id=WORKER_ID)
+
 
-            for item in due_items:
-                await _publish_one(item.id, item.tenant_id)
+async def _set_item_state(db: AsyncSession, content_id: UUID, **values: Any) -> bool:
+    """
+    Ghi trạng thái cuối + nhả lease, chỉ khi item vẫn do worker này giữ (publishing, locked_by = WORKER_ID).
+    Lease đã hết và worker khác claim lại -> không ghi đè kết quả của worker đó (trả False).
+    """
+    r = await db.execute(
+        update(ContentItem)
+        .where(
+            ContentItem.id == content_id,
+            ContentItem.schedule_status == "publishing",
+            ContentItem.locked_by == WORKER_ID,
+        )
+        .values(locked_until=None, locked_by=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return (r.rowcount or 0) > 0
+
+
+async def _release_unstarted(content_id: UUID) -> None:
+    """Trả item đã claim nhưng chưa publish về scheduled (nhả lease) để replica khác claim ngay."""
+    async with async_session_factory() as db:
+        try:
+            await _set_item_state(db, content_id, schedule_status="scheduled")
+            await db.commit()
         except Exception as e:
-            logger.warning("scheduler.tick_error", error=str(e))
+            logger.warning("scheduler.release_error", content_id=str(content_id), error=str(e))
+            await db.rollback()
+
+
+async def _record_publish_failure(
+    db: AsyncSession,
+    content_id: UUID,
+    tenant_id: UUID,
+    attempts_before: int,
+    error_message: Optional[str],
+    correlation_id: str,
+) -> None:
+    """Thất bại: tăng publish_attempts, retry với backoff hoặc failed khi đủ MAX_PUBLISH_ATTEMPTS (caller commit)."""
+    now = datetime.now(timezone.utc)
+    attempts = attempts_before + 1
+    values: Dict[str, Any] = {
+        "publish_attempts": attempts,
+        "last_publish_error": error_message,
+        "last_publish_at": now,
+    }
+    failed = attempts >= MAX_PUBLISH_ATTEMPTS
+    if failed:
+        values["schedule_status"] = "failed"
+    else:
+        # Retry: đặt lại scheduled_at = now + (attempts * 10 phút)
+        values["schedule_status"] = "scheduled"
+        values["scheduled_at"] = now + timedelta(minutes=attempts * RETRY_BACKOFF_MINUTES)
+    if not await _set_item_state(db, content_id, **values):
+        logger.warning("scheduler.lease_lost", content_id=str(content_id), correlation_id=correlation_id)
+        return
+    if failed:
+        await log_audit_event(
+            db,
+            tenant_id=tenant_id,
+            content_id=content_id,
+            event_type="PUBLISH_FAIL",
+            actor="SYSTEM",
+            metadata_={"reason": "scheduler_max_attempts", "error": error_message},
+            background=True,
+        )
+        logger.warning(
+            "scheduler.publish_result",
+            endpoint="facebook_publish_post",
+            status="fail",
+            content_id=str(content_id),
+            error_message=error_message,
+            correlation_id=correlation_id,
+        )
+    else:
+        logger.info(
+            "scheduler.publish_result",
+            endpoint="facebook_publish_post",
+            status="retry_scheduled",
+            content_id=str(content_id),
+            error_message=error_message,
+            attempt=attempts,
+            next_at=values["scheduled_at"].isoformat(),
+            correlation_id=correlation_id,
+        )
+
+
+async def _record_unexpected_failure(
+    content_id: UUID,
+    tenant_id: UUID,
+    error_message: str,
+    correlation_id: str,
+) -> None:
+    """
+    Lỗi ngoài dự kiến (DB lỗi sau khi Graph đã nhận, lỗi lạ trong publish_post): tính như 1 lần thất bại
+    bằng session mới, để item không bị claim lại sau mỗi lease mà không giới hạn (mỗi lần có thể là 1 post trùng).
+    """
+    async with async_session_factory() as db:
+        try:
+            r = await db.execute(
+                select(ContentItem.publish_attempts).where(
+                    ContentItem.id == content_id,
+                    ContentItem.tenant_id == tenant_id,
+                    ContentItem.schedule_status == "publishing",
+                    ContentItem.locked_by == WORKER_ID,
+                )
+            )
+            attempts_before = r.scalar_one_or_none()
+            if attempts_before is None:
+                return
+            await _record_publish_failure(db, content_id, tenant_id, attempts_before, error_message, correlation_id)
+            await db.commit()
+        except Exception as e:
+            logger.warning(
+                "scheduler.record_failure_error",
+                content_id=str(content_id),
+                error=str(e),
+                correlation_id=correlation_id,
+            )
             await db.rollback()
 
 
@@ -108,8 +540,10 @@ async def _publish_one(content_id: UUID, tenant_id: UUID) -> None:
                 )
             )
             item = r.scalar_one_or_none()
-            if not item or item.schedule_status != "publishing":
+            if not item or item.schedule_status != "publishing" or item.locked_by != WORKER_ID:
+                # Lease đã hết hạn và bị worker khác claim lại: không publish trùng
                 return
+            attempts_before = item.publish_attempts or 0
             try:
                 log, error_message = await publish_post(
                     db,
@@ -121,12 +555,16 @@ async def _publish_one(content_id: UUID, tenant_id: UUID) -> None:
             except ValueError as e:
                 error_message = str(e)
                 log = None
-            now = datetime.now(timezone.utc)
             if error_message is None and log and log.status == "success":
-                item.status = "published"
-                item.schedule_status = "published"
-                item.last_publish_at = now
-                item.last_publish_error = None
+                if not await _set_item_state(
+                    db,
+                    content_id,
+                    status="published",
+                    schedule_status="published",
+                    last_publish_at=datetime.now(timezone.utc),
+                    last_publish_error=None,
+                ):
+                    logger.warning("scheduler.lease_lost", content_id=str(content_id), correlation_id=correlation_id)
                 await db.commit()
                 logger.info(
                     "scheduler.publish_result",
@@ -137,45 +575,8 @@ async def _publish_one(content_id: UUID, tenant_id: UUID) -> None:
                     correlation_id=correlation_id,
                 )
                 return
-            # Thất bại: tăng attempts, backoff hoặc failed
-            item.publish_attempts = (item.publish_attempts or 0) + 1
-            item.last_publish_error = error_message
-            item.last_publish_at = now
-            if item.publish_attempts >= MAX_PUBLISH_ATTEMPTS:
-                item.schedule_status = "failed"
-                await log_audit_event(
-                    db,
-                    tenant_id=tenant_id,
-                    content_id=content_id,
-                    event_type="PUBLISH_FAIL",
-                    actor="SYSTEM",
-                    metadata_={"reason": "scheduler_max_attempts", "error": error_message},
-                )
-                await db.commit()
-                logger.warning(
-                    "scheduler.publish_result",
-                    endpoint="facebook_publish_post",
-                    status="fail",
-                    content_id=str(content_id),
-                    error_message=error_message,
-                    correlation_id=correlation_id,
-                )
-            else:
-                # Retry: đặt lại scheduled_at = now + (attempts * 10 phút)
-                delta_minutes = item.publish_attempts * RETRY_BACKOFF_MINUTES
-                item.scheduled_at = now + timedelta(minutes=delta_minutes)
-                item.schedule_status = "scheduled"
-                await db.commit()
-                logger.info(
-                    "scheduler.publish_result",
-                    endpoint="facebook_publish_post",
-                    status="retry_scheduled",
-                    content_id=str(content_id),
-                    error_message=error_message,
-                    attempt=item.publish_attempts,
-                    next_at=item.scheduled_at.isoformat(),
-                    correlation_id=correlation_id,
-                )
+            await _record_publish_failure(db, content_id, tenant_id, attempts_before, error_message, correlation_id)
+            await db.commit()
         except Exception as e:
             logger.warning(
                 "scheduler.publish_one_error",
@@ -184,26 +585,15 @@ async def _publish_one(content_id: UUID, tenant_id: UUID) -> None:
                 correlation_id=correlation_id,
             )
             await db.rollback()
+            await _record_unexpected_failure(content_id, tenant_id, str(e) or type(e).__name__, correlation_id)
 
 
 async def _metrics_tick() -> None:
-    """Một vòng thu thập metrics: lấy publish_logs success trong 7 ngày, gọi Graph API và lưu post_metrics."""
+    """Một vòng thu thập metrics: lấy publish_logs success trong 7 ngày, gọi Graph API (batch) và lưu post_metrics."""
     async with async_session_factory() as db:
         try:
             rows = await get_recent_success_publish_logs(db, within_days=METRICS_LOOKBACK_DAYS)
-            for tenant_id, content_id, publish_log_id, post_id in rows:
-                try:
-                    await fetch_and_store_metrics(
-                        db,
-                        tenant_id=tenant_id,
-                        content_id=content_id,
-                        publish_log_id=publish_log_id,
-                        post_id=post_id,
-                    )
-                    await db.commit()
-                except Exception as e:
-                    logger.warning("scheduler.metrics_one_error", post_id=post_id, error=str(e))
-                    await db.rollback()
+            await collect_metrics(db, rows)
         except Exception as e:
             logger.warning("scheduler.metrics_tick_error", error=str(e))
             await db.rollback()
@@ -222,43 +612,88 @@ async def _metrics_loop() -> None:
 
 
 async def _scheduler_loop() -> None:
-    """Vòng lặp chính: mỗi INTERVAL_SECONDS gọi _tick()."""
-    global _stop_event
+    """
+    Vòng lặp chính: ngủ đến mốc due sớm nhất (tối đa INTERVAL_SECONDS) hoặc đến khi được đánh thức,
+    rồi _tick(). Không có item due thì chỉ chạy 1 query min() trên partial index.
+    """
+    global _stop_event, _wake_event, _listener_task
     _stop_event = asyncio.Event()
+    _wake_event = asyncio.Event()
+    _listener_task = asyncio.create_task(_listener_loop())
     while not _stop_event.is_set():
+        delay = float(INTERVAL_SECONDS)
         try:
-            await _tick()
+            if _pool_capacity() > 0:
+                delay = await _seconds_until_next_due()
+                if delay <= 0:
+                    if await _tick():
+                        continue
+                    delay = IDLE_RETRY_SECONDS
         except Exception as e:
             logger.warning("scheduler.loop_error", error=str(e))
-        await asyncio.sleep(INTERVAL_SECONDS)
+        await _wait_for_wake(delay)
 
 
 async def start_scheduler(app: object) -> None:
-    """Khởi động scheduler + metrics worker (gọi từ lifespan startup)."""
-    global _scheduler_task, _metrics_task, _enabled
+    """Khởi động scheduler + heartbeat lease + metrics worker (gọi từ lifespan startup)."""
+    global _scheduler_task, _metrics_task, _heartbeat_task, _enabled
     if _scheduler_task is not None:
         return
     _enabled = True
-    _stop_event = asyncio.Event()
+    settings = get_settings()
     _scheduler_task = asyncio.create_task(_scheduler_loop())
+    _heartbeat_task = asyncio.create_task(_heartbeat_loop())
     _metrics_task = asyncio.create_task(_metrics_loop())
-    logger.info("scheduler.started", interval_seconds=INTERVAL_SECONDS, metrics_interval_minutes=METRICS_INTERVAL_MINUTES)
+    logger.info(
+        "scheduler.started",
+        interval_seconds=INTERVAL_SECONDS,
+        metrics_interval_minutes=METRICS_INTERVAL_MINUTES,
+        worker_id=WORKER_ID,
+        concurrency=settings.scheduler_concurrency,
+        concurrency_per_tenant=settings.scheduler_concurrency_per_tenant,
+        lease_seconds=settings.scheduler_lease_seconds,
+    )
 
 
-async def stop_scheduler() -> None:
-    """Dừng scheduler và metrics worker (gọi từ lifespan shutdown)."""
-    global _scheduler_task, _metrics_task, _stop_event, _enabled
-    _enabled = False
-    if _stop_event:
-        _stop_event.set()
-    for task in (_scheduler_task, _metrics_task):
+async def _cancel_tasks(*tasks: Optional["asyncio.Task[None]"]) -> None:
+    for task in tasks:
         if task:
             task.cancel()
             try:
                 await task
             except asyncio.CancelledError:
                 pass
+
+
+async def _drain_inflight(timeout: float) -> None:
+    """Chờ các task publish đang chạy xong, tối đa timeout giây (heartbeat vẫn gia hạn lease trong lúc chờ)."""
+    pending = list(_inflight.values())
+    if not pending or timeout <= 0:
+        return
+    logger.info("scheduler.draining", inflight_count=len(pending), timeout_seconds=timeout)
+    _done, not_done = await asyncio.wait(pending, timeout=timeout)
+    if not_done:
+        logger.warning("scheduler.drain_timeout", cancelled_count=len(not_done), timeout_seconds=timeout)
+
+
+async def stop_scheduler() -> None:
+    """
+    Dừng scheduler (gọi từ lifespan shutdown): ngừng claim + metrics, chờ publish đang chạy xong tối đa
+    SCHEDULER_SHUTDOWN_DRAIN_SECONDS, rồi huỷ phần còn lại và heartbeat.
+    Item bị huỷ giữa chừng sẽ được replica khác (hoặc lần chạy sau) claim lại khi lease hết hạn.
+    """
+    global _scheduler_task, _metrics_task, _heartbeat_task, _stop_event, _enabled
+    _enabled = False
+    if _stop_event:
+        _stop_event.set()
+    wake_scheduler()
+    await _stop_listener()
+    await _cancel_tasks(_scheduler_task, _metrics_task)
+    await _drain_inflight(get_settings().scheduler_shutdown_drain_seconds)
+    await _cancel_tasks(*_inflight.values(), _heartbeat_task)
+    _inflight.clear()
     _scheduler_task = None
+    _heartbeat_task = None
     _metrics_task = None
     logger.info("scheduler.stopped")
 
@@ -0,0 +1,51 @@
+"""
+Phân trang keyset (cursor) theo (created_at, id), mới nhất trước.
+Cursor = base64url của "<created_at ISO>|<id>" (opaque với client). Trang sau lọc
+(created_at, id) < cursor nên đi sâu bao nhiêu trang vẫn chỉ là 1 index range scan
+trên (tenant_id, created_at, id), không OFFSET / COUNT(*).
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import Select, tuple_
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Cursor -> (created_at, id). Sai định dạng -> ValueError("invalid_cursor")."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_raw, id_raw = raw.split("|", 1)
+        return datetime.fromisoformat(created_raw), UUID(id_raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("invalid_cursor")
+
+
+def keyset_page(q: Select, created_col: Any, id_col: Any, cursor: Optional[str], limit: int) -> Select:
+    """
+    Áp ORDER BY created_at DESC, id DESC + điều kiện sau cursor + LIMIT limit+1
+    (dòng thừa dùng để biết còn trang sau).
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        q = q.where(tuple_(created_col, id_col) < (created_at, row_id))
+    return q.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Rows (limit+1 dòng, có .created_at và .id) -> (rows trang này, next_cursor hoặc None)."""
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    last = page[-1]
+    return page, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,90 @@
+"""
+Benchmark chi phí dựng Drive client mỗi call (không gọi mạng):
+- legacy (trước): đọc JSON Service Account + build("drive", "v3", cache_discovery=False) mỗi lần.
+- cached (sau): app.infrastructure.gdrive_client.get_drive_service (dựng 1 lần, discovery tĩnh).
+Mỗi lần đo gồm dựng client + tạo request files().list (chưa execute). In p50/p99 (ms).
+Dùng key Service Account sinh tạm nên không cần GDRIVE_SA_JSON_PATH. Chạy (từ ai_content_director/):
+    python scripts/bench_gdrive_client.py [--runs 200]
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from google.oauth2 import service_account  # noqa: E402
+from googleapiclient.discovery import build  # noqa: E402
+
+from app.infrastructure.gdrive_client import DRIVE_SCOPES, get_drive_service  # noqa: E402
+
+
+def _write_fake_service_account(path: Path) -> str:
+    """JSON Service Account với key RSA sinh tạm (đủ để dựng credentials, không dùng được để gọi API)."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    path.write_text(
+        json.dumps(
+            {
+                "type": "service_account",
+                "project_id": "bench",
+                "private_key_id": "k1",
+                "private_key": pem,
+                "client_email": "sa@bench.iam.gserviceaccount.com",
+                "client_id": "1",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            }
+        )
+    )
+    return str(path)
+
+
+def _legacy(path: str):
+    creds = service_account.Credentials.from_service_account_file(path, scopes=DRIVE_SCOPES)
+    return build("drive", "v3", credentials=creds, cache_discovery=False)
+
+
+def _measure(get_service: Callable, path: str, runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        get_service(path).files().list(q="'folder' in parents and trashed = false", pageSize=1000)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = _write_fake_service_account(Path(tmpdir) / "sa.json")
+        get_drive_service(path)  # warm-up: lần dựng đầu tiên
+        print(f"{'variant':<8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'mean (ms)':>11}")
+        for variant, fn in (("legacy", _legacy), ("cached", get_drive_service)):
+            timings = _measure(fn, path, args.runs)
+            print(
+                f"{variant:<8}{_percentile(timings, 50):>10.3f}{_percentile(timings, 99):>10.3f}"
+                f"{statistics.mean(timings):>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark bước ghi DB của generate_sample_posts (20 bài + audit HITL), không gọi LLM:
+- loop (trước): add + flush từng ContentItem, log_audit_event (flush) từng item, flush lại.
+- bulk (sau): content_service._insert_samples_with_audit - 1 INSERT ... RETURNING items + 1 INSERT events.
+In p50/p99 (ms) và số statement gửi tới Postgres mỗi lần. Mỗi lần chạy trong transaction rồi rollback (không để lại dữ liệu).
+Cần Postgres đã migrate (DATABASE_URL). Chạy (từ ai_content_director/):
+    python scripts/bench_generate_samples.py [--runs 50] [--count 20]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import event  # noqa: E402
+
+from app.db import async_session_factory, engine  # noqa: E402
+from app.models import ContentItem, Tenant  # noqa: E402
+from app.services.approval_service import log_audit_event, review_state_from_confidence  # noqa: E402
+from app.services.content_service import HITL_EVENT_BY_REVIEW_STATE, _insert_samples_with_audit  # noqa: E402
+
+_statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*_args) -> None:
+    global _statements
+    _statements += 1
+
+
+async def _legacy_loop(db, tenant_id: uuid.UUID, posts_data: List[Tuple]) -> int:
+    """Logic vòng lặp cũ (flush từng item + từng event)."""
+    now_utc = datetime.now(timezone.utc)
+    for plan_id, _day, title, caption, hashtags, confidence in posts_data:
+        item = ContentItem(
+            tenant_id=tenant_id,
+            plan_id=plan_id,
+            title=title,
+            caption=caption,
+            hashtags=hashtags,
+            status="draft",
+            confidence_score=confidence,
+        )
+        db.add(item)
+        await db.flush()
+        review_state = review_state_from_confidence(confidence)
+        item.review_state = review_state
+        if review_state == "auto_approved":
+            item.status = "approved"
+            item.approved_at = now_utc
+        await log_audit_event(
+            db,
+            tenant_id=tenant_id,
+            content_id=item.id,
+            event_type=HITL_EVENT_BY_REVIEW_STATE[review_state],
+            actor="SYSTEM",
+            metadata_={"confidence_score": confidence},
+        )
+        await db.flush()
+    await log_audit_event(db, tenant_id=tenant_id, event_type="GENERATE_CONTENT", actor="SYSTEM", metadata_={})
+    return len(posts_data)
+
+
+def _posts(count: int) -> List[Tuple[Optional[uuid.UUID], int, str, str, str, float]]:
+    confidences = (0.9, 0.75, 0.6)
+    return [
+        (None, i + 1, f"Bench {i}", "caption " * 40, "#bench #content", confidences[i % 3])
+        for i in range(count)
+    ]
+
+
+async def _run(variant: str, runs: int, count: int) -> Tuple[List[float], float]:
+    global _statements
+    timings: List[float] = []
+    statements: List[int] = []
+    posts = _posts(count)
+    for _ in range(runs):
+        async with async_session_factory() as db:
+            tenant = Tenant(name="bench", industry="bench")
+            db.add(tenant)
+            await db.flush()
+            _statements = 0
+            start = time.perf_counter()
+            if variant == "loop":
+                await _legacy_loop(db, tenant.id, posts)
+            else:
+                await _insert_samples_with_audit(db, tenant.id, posts, model_used=None, used_fallback=True)
+            timings.append((time.perf_counter() - start) * 1000)
+            statements.append(_statements)
+            await db.rollback()
+    return timings, statistics.mean(statements)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'variant':<8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'mean (ms)':>11}{'statements':>12}")
+    for variant in ("loop", "bulk"):
+        timings, stmts = await _run(variant, args.runs, args.count)
+        print(
+            f"{variant:<8}{_percentile(timings, 50):>10.2f}{_percentile(timings, 99):>10.2f}"
+            f"{statistics.mean(timings):>11.2f}{stmts:>12.0f}"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark overhead middleware trên /api/healthz (in-process, httpx ASGITransport, không cần DB/Redis).
+So sánh p50/p99 mỗi request:
+- no_middleware: chỉ router health.
+- base_http (trước): CorrelationId + RateLimit kiểu BaseHTTPMiddleware (logic tương đương bản cũ).
+- pure_asgi (sau): app.middleware.CorrelationIdMiddleware + RateLimitMiddleware hiện tại.
+Chạy (từ ai_content_director/): python scripts/bench_middleware.py [--requests 5000]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+import structlog.contextvars  # noqa: E402
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.middleware.correlation_id import HEADER_CORRELATION_ID, CorrelationIdMiddleware  # noqa: E402
+from app.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.routers import api_health_router  # noqa: E402
+
+
+class LegacyCorrelationIdMiddleware(BaseHTTPMiddleware):
+    """Bản cũ (BaseHTTPMiddleware) để so sánh."""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        correlation_id = request.headers.get(HEADER_CORRELATION_ID, "").strip() or str(uuid.uuid4())
+        structlog.contextvars.clear_contextvars()
+        structlog.contextvars.bind_contextvars(correlation_id=correlation_id)
+        response = await call_next(request)
+        response.headers[HEADER_CORRELATION_ID] = correlation_id
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Bản cũ (BaseHTTPMiddleware); không có REDIS_URL nên chỉ pass-through như bản cũ."""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        return await call_next(request)
+
+
+def _build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_health_router)
+    if variant == "base_http":
+        app.add_middleware(LegacyRateLimitMiddleware)
+        app.add_middleware(LegacyCorrelationIdMiddleware)
+    elif variant == "pure_asgi":
+        app.add_middleware(RateLimitMiddleware)
+        app.add_middleware(CorrelationIdMiddleware)
+    return app
+
+
+async def _run(variant: str, n: int, warmup: int) -> List[float]:
+    app = _build_app(variant)
+    transport = httpx.ASGITransport(app=app)
+    timings: List[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(n + warmup):
+            start = time.perf_counter()
+            resp = await client.get("/api/healthz", headers={"X-Tenant-ID": "bench"})
+            elapsed_us = (time.perf_counter() - start) * 1_000_000
+            if resp.status_code != 200:
+                raise RuntimeError(f"{variant}: HTTP {resp.status_code}")
+            if i >= warmup:
+                timings.append(elapsed_us)
+    return timings
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=300)
+    args = parser.parse_args()
+
+    baseline_p50 = None
+    print(f"{'variant':<14}{'p50 (us)':>10}{'p99 (us)':>10}{'mean (us)':>11}{'overhead p50':>14}")
+    for variant in ("no_middleware", "base_http", "pure_asgi"):
+        timings = await _run(variant, args.requests, args.warmup)
+        p50 = _percentile(timings, 50)
+        p99 = _percentile(timings, 99)
+        if baseline_p50 is None:
+            baseline_p50 = p50
+        print(
+            f"{variant:<14}{p50:>10.1f}{p99:>10.1f}{statistics.mean(timings):>11.1f}"
+            f"{p50 - baseline_p50:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
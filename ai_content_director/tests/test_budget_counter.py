@@ -0,0 +1,180 @@
+"""
+Tests cho counter budget ngày (ai_usage_service): giữ chỗ atomic ở key riêng, quyết toán theo cost thật sau commit,
+dựng lại từ DB. Không cần Redis/Postgres: Redis giả thực hiện đúng các Lua script của module, SUM DB được patch.
+"""
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.config import Settings
+from app.services import ai_usage_service as svc
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict = {}
+        self.zsets: dict = {}
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def _held(self, key, now) -> Decimal:
+        return sum((Decimal(m.rsplit(":", 1)[1]) for m, exp in self.zsets.get(key, {}).items() if exp >= now), Decimal(0))
+
+    async def eval(self, script, numkeys, spend_key, reserved_key, *args):
+        cur = self.data.get(spend_key)
+        zset = self.zsets.setdefault(reserved_key, {})
+        if script == svc._SPEND_LUA:
+            return None if cur is None else str(Decimal(cur) + self._held(reserved_key, int(args[0])))
+        if script == svc._SETTLE_LUA:
+            member, cost = args
+            zset.pop(member, None)
+            if Decimal(cost) != 0 and cur is not None:
+                self.data[spend_key] = str(Decimal(cur) + Decimal(cost))
+            return None
+        amount, limit, member, now, ttl = args
+        if cur is None:
+            return -1
+        for m in [m for m, exp in zset.items() if exp <= int(now)]:
+            del zset[m]
+        if Decimal(cur) + self._held(reserved_key, int(now)) + Decimal(amount) > Decimal(limit):
+            return 0
+        zset[member] = int(now) + int(ttl)
+        return 1
+
+
+def _db() -> AsyncMock:
+    """AsyncSession giả: add/flush no-op, sync_session là Session thật để after_commit / after_rollback chạy."""
+    db = AsyncMock()
+    db.add = lambda obj: None
+    db.sync_session = Session()
+    return db
+
+
+async def _commit(db) -> None:
+    db.sync_session.commit()
+    await asyncio.gather(*svc._settle_tasks)
+
+
+def test_counter_ttl_ends_at_utc_midnight() -> None:
+    now = datetime(2024, 5, 1, 23, 59, 30, tzinfo=timezone.utc)
+    assert svc._counter_ttl_seconds(now) == 30
+    assert svc._counter_ttl_seconds(now.replace(hour=1)) == svc.BUDGET_COUNTER_RESYNC_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_reserve_rebuilds_from_db_then_blocks_second_reservation() -> None:
+    """Counter dựng từ SUM DB (1 lần); chỉ còn budget cho 1 reservation -> lần 2 budget_exceeded; release trả lại."""
+    redis = _FakeRedis()
+    tenant_id = uuid4()
+    db_sum = AsyncMock(return_value=Decimal("0.5"))
+    with (
+        patch.object(svc, "get_settings", return_value=Settings(DAILY_BUDGET_USD=1.0)),
+        patch.object(svc, "get_redis_if_available", return_value=redis),
+        patch.object(svc, "get_daily_total_usd", db_sum),
+    ):
+        first = await svc.reserve_budget(None, tenant_id, estimated_usd=Decimal("0.4"))
+        with pytest.raises(ValueError, match="budget_exceeded"):
+            await svc.reserve_budget(None, tenant_id, estimated_usd=Decimal("0.4"))
+        assert first.counted is True
+        assert await svc.get_daily_spend_usd(None, tenant_id) == Decimal("0.9")
+        await svc.release_budget(first)
+        await svc.release_budget(first)
+        assert await svc.get_daily_spend_usd(None, tenant_id) == Decimal("0.5")
+        assert await svc.is_over_budget(None, tenant_id) is False
+    assert db_sum.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_log_usage_settles_reservation_with_actual_cost_after_commit() -> None:
+    redis = _FakeRedis()
+    tenant_id = uuid4()
+    db = _db()
+    with (
+        patch.object(svc, "get_settings", return_value=Settings(DAILY_BUDGET_USD=1.0)),
+        patch.object(svc, "get_redis_if_available", return_value=redis),
+        patch.object(svc, "get_daily_total_usd", AsyncMock(return_value=Decimal("0"))),
+        patch.object(svc, "compute_cost_usd", return_value=Decimal("0.1")),
+    ):
+        reservation = await svc.reserve_budget(db, tenant_id, estimated_usd=Decimal("0.3"))
+        await svc.log_usage(db, tenant_id, "planner", "m", 10, 10, 20, reservation=reservation)
+        await svc.release_budget(reservation)
+        # Chưa commit: counter spend chưa đổi, reservation vẫn giữ chỗ
+        assert await svc.get_daily_spend_usd(db, tenant_id) == Decimal("0.3")
+        await _commit(db)
+        assert await svc.get_daily_spend_usd(db, tenant_id) == Decimal("0.1")
+        assert redis.data[svc._budget_key(tenant_id, reservation.day)] == "0.1"
+
+
+@pytest.mark.asyncio
+async def test_rollback_releases_reservation_without_counting_cost() -> None:
+    redis = _FakeRedis()
+    tenant_id = uuid4()
+    db = _db()
+    with (
+        patch.object(svc, "get_settings", return_value=Settings(DAILY_BUDGET_USD=1.0)),
+        patch.object(svc, "get_redis_if_available", return_value=redis),
+        patch.object(svc, "get_daily_total_usd", AsyncMock(return_value=Decimal("0.2"))),
+        patch.object(svc, "compute_cost_usd", return_value=Decimal("0.1")),
+    ):
+        reservation = await svc.reserve_budget(db, tenant_id, estimated_usd=Decimal("0.3"))
+        db.sync_session.begin()
+        await svc.log_usage(db, tenant_id, "planner", "m", 10, 10, 20, reservation=reservation)
+        db.sync_session.rollback()
+        await asyncio.gather(*svc._settle_tasks)
+        assert await svc.get_daily_spend_usd(db, tenant_id) == Decimal("0.2")
+
+
+@pytest.mark.asyncio
+async def test_counter_rebuild_during_reservation_keeps_inflight_amount() -> None:
+    """Counter spend mất (Redis evict / hết hạn resync) giữa reserve và log_usage: dựng lại từ SUM DB
+    không làm mất reservation, quyết toán sau commit cộng đủ cost (không đếm thiếu)."""
+    redis = _FakeRedis()
+    tenant_id = uuid4()
+    db = _db()
+    db_sum = AsyncMock(return_value=Decimal("0.5"))
+    with (
+        patch.object(svc, "get_settings", return_value=Settings(DAILY_BUDGET_USD=1.0)),
+        patch.object(svc, "get_redis_if_available", return_value=redis),
+        patch.object(svc, "get_daily_total_usd", db_sum),
+        patch.object(svc, "compute_cost_usd", return_value=Decimal("0.25")),
+    ):
+        reservation = await svc.reserve_budget(db, tenant_id, estimated_usd=Decimal("0.3"))
+        del redis.data[svc._budget_key(tenant_id, reservation.day)]
+        # Dựng lại: SUM DB chưa có call đang chạy, phần giữ chỗ vẫn tính -> chỉ còn 0.2 budget
+        assert await svc.get_daily_spend_usd(db, tenant_id) == Decimal("0.8")
+        with pytest.raises(ValueError, match="budget_exceeded"):
+            await svc.reserve_budget(db, tenant_id, estimated_usd=Decimal("0.3"))
+        await svc.log_usage(db, tenant_id, "planner", "m", 10, 10, 20, reservation=reservation)
+        await _commit(db)
+        assert await svc.get_daily_spend_usd(db, tenant_id) == Decimal("0.75")
+    assert db_sum.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_reservation_no_longer_counts() -> None:
+    redis = _FakeRedis()
+    tenant_id = uuid4()
+    with (
+        patch.object(svc, "get_settings", return_value=Settings(DAILY_BUDGET_USD=1.0)),
+        patch.object(svc, "get_redis_if_available", return_value=redis),
+        patch.object(svc, "get_daily_total_usd", AsyncMock(return_value=Decimal("0"))),
+    ):
+        await svc.reserve_budget(None, tenant_id, estimated_usd=Decimal("0.9"))
+        with patch.object(svc.time, "time", return_value=svc.time.time() + svc.BUDGET_RESERVATION_TTL_SECONDS + 1):
+            assert await svc.get_daily_spend_usd(None, tenant_id) == Decimal("0")
+            await svc.reserve_budget(None, tenant_id, estimated_usd=Decimal("0.9"))
@@ -0,0 +1,47 @@
+"""
+Tests cho Graph batch request thu thập metrics (fetch_metrics_batch).
+Không gọi Graph thật: httpx.MockTransport trả response batch giả.
+"""
+import json
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.services import facebook_metrics_service
+
+
+@pytest.mark.asyncio
+async def test_fetch_metrics_batch_one_request_per_50_posts() -> None:
+    """1 POST batch cho nhiều post; sub-request lỗi / null map đúng post_id."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = parse_qs(request.content.decode())
+        batch = json.loads(form["batch"][0])
+        calls.append(batch)
+        body = [
+            {"code": 200, "body": json.dumps({"id": "p1", "comments": {"summary": {"total_count": 3}}})},
+            {"code": 400, "body": json.dumps({"error": {"message": "permission denied"}})},
+            None,
+        ]
+        return httpx.Response(200, json=body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    settings = Settings(FACEBOOK_ACCESS_TOKEN="tok")
+    with (
+        patch.object(facebook_metrics_service, "get_settings", return_value=settings),
+        patch.object(facebook_metrics_service, "get_http_client", return_value=client),
+    ):
+        out = await facebook_metrics_service.fetch_metrics_batch(["p1", "p2", "p3"])
+    await client.aclose()
+
+    assert len(calls) == 1
+    assert [c["relative_url"].split("?")[0] for c in calls[0]] == ["p1", "p2", "p3"]
+    data, err = out["p1"]
+    assert err is None
+    assert facebook_metrics_service._parse_metrics_from_response(data)["comments"] == 3
+    assert out["p2"][1] == "permission denied"
+    assert out["p3"] == (None, "batch_item_timeout")
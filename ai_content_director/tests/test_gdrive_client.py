@@ -0,0 +1,71 @@
+"""
+Test app.infrastructure.gdrive_client: service Drive dựng 1 lần (discovery tĩnh), tạo lại khi file SA đổi,
+mỗi thread có AuthorizedHttp riêng. Không gọi mạng (key Service Account sinh tạm).
+"""
+import json
+import os
+import threading
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.infrastructure import gdrive_client
+
+
+def _write_fake_service_account(path) -> str:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    path.write_text(
+        json.dumps(
+            {
+                "type": "service_account",
+                "project_id": "test",
+                "private_key_id": "k1",
+                "private_key": pem,
+                "client_email": "sa@test.iam.gserviceaccount.com",
+                "client_id": "1",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            }
+        )
+    )
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def _reset_client():
+    gdrive_client.reset_drive_service()
+    yield
+    gdrive_client.reset_drive_service()
+
+
+def test_service_cached_and_rebuilt_when_sa_file_changes(tmp_path) -> None:
+    path = _write_fake_service_account(tmp_path / "sa.json")
+    builds = gdrive_client.get_drive_client_stats()["builds"]
+
+    first = gdrive_client.get_drive_service(path)
+    assert gdrive_client.get_drive_service(path) is first
+    assert first.files() is first.files()
+    assert gdrive_client.get_drive_client_stats()["builds"] == builds + 1
+
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+    assert gdrive_client.get_drive_service(path) is not first
+    assert gdrive_client.get_drive_client_stats()["builds"] == builds + 2
+
+
+def test_requests_use_per_thread_http(tmp_path) -> None:
+    service = gdrive_client.get_drive_service(_write_fake_service_account(tmp_path / "sa.json"))
+    main_http = [service.files().list(q="x").http, service.files().get_media(fileId="f").http]
+    assert main_http[0] is main_http[1]
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(service.files().list(q="x").http))
+    t.start()
+    t.join()
+    assert other[0] is not main_http[0]
+    assert other[0].credentials is main_http[0].credentials
@@ -0,0 +1,176 @@
+"""
+Test GDrive ingest: list_files theo hết trang, list_changes (Changes API), chế độ incremental
+(folder có file tải lỗi giữ token cũ).
+Không cần DB / Drive thật (Drive service giả, patch các hàm DB).
+"""
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from app.services import gdrive_dropzone
+from app.services.gdrive_dropzone import list_changes, list_files
+
+
+class _FakeRequest:
+    def __init__(self, result):
+        self._result = result
+
+    def execute(self):
+        return self._result
+
+
+class _FakeResource:
+    """files() / changes(): list(pageToken=...) trả trang theo token."""
+
+    def __init__(self, pages, start_token="start-1"):
+        self.pages = pages
+        self.start_token = start_token
+        self.calls = []
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        return _FakeRequest(self.pages[kwargs.get("pageToken")])
+
+    def getStartPageToken(self):
+        return _FakeRequest({"startPageToken": self.start_token})
+
+
+class _FakeDrive:
+    def __init__(self, files_pages=None, changes_pages=None):
+        self._files = _FakeResource(files_pages or {})
+        self._changes = _FakeResource(changes_pages or {})
+
+    def files(self):
+        return self._files
+
+    def changes(self):
+        return self._changes
+
+
+def _meta(file_id, parent="folder_images"):
+    return {"id": file_id, "name": f"{file_id}.jpg", "mimeType": "image/jpeg", "size": "10", "parents": [parent]}
+
+
+def test_list_files_follows_all_pages() -> None:
+    drive = _FakeDrive(
+        files_pages={
+            None: {"files": [_meta("a"), _meta("b")], "nextPageToken": "p2"},
+            "p2": {"files": [_meta("c")], "nextPageToken": "p3"},
+            "p3": {"files": [_meta("d")]},
+        }
+    )
+    with patch.object(gdrive_dropzone, "_get_drive_service", return_value=drive):
+        files = list_files("folder_images")
+    assert [f["id"] for f in files] == ["a", "b", "c", "d"]
+    assert len(drive.files().calls) == 3
+    assert all("nextPageToken" in c["fields"] for c in drive.files().calls)
+
+
+def test_list_changes_pages_and_drops_removed() -> None:
+    drive = _FakeDrive(
+        changes_pages={
+            "tok1": {
+                "changes": [
+                    {"fileId": "a", "file": _meta("a")},
+                    {"fileId": "b", "file": {**_meta("b"), "trashed": True}},
+                ],
+                "nextPageToken": "tok1b",
+            },
+            "tok1b": {
+                "changes": [{"fileId": "c", "file": _meta("c")}, {"fileId": "a", "removed": True}],
+                "newStartPageToken": "tok2",
+            },
+        }
+    )
+    with patch.object(gdrive_dropzone, "_get_drive_service", return_value=drive):
+        files, new_token = list_changes("tok1")
+    assert [f["id"] for f in files] == ["c"]
+    assert new_token == "tok2"
+
+
+def _settings(tmp_path):
+    s = type("Settings", (), {})()
+    s.gdrive_sa_json_path = os.devnull
+    s.gdrive_ready_images_folder_id = "folder_images"
+    s.gdrive_ready_videos_folder_id = "folder_videos"
+    s.gdrive_processed_folder_id = "folder_processed"
+    s.gdrive_rejected_folder_id = "folder_rejected"
+    s.local_media_dir = str(tmp_path)
+    s.asset_max_image_mb = 10
+    s.asset_max_video_mb = 200
+    s.gdrive_sync_mode = "incremental"
+    s.gdrive_download_concurrency = 4
+    return s
+
+
+class _NoDb:
+    """Session giả: mọi query đều là lỗi (incremental không thay đổi không được chạm content_assets)."""
+
+    async def execute(self, *_args, **_kwargs):
+        raise AssertionError("unexpected DB query")
+
+
+@pytest.mark.asyncio
+async def test_incremental_no_changes_one_api_call_no_db(tmp_path) -> None:
+    calls = []
+
+    def fake_list_changes(token):
+        calls.append(token)
+        return [], token
+
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_settings(tmp_path)),
+        patch.object(gdrive_dropzone, "_load_sync_tokens", AsyncMock(return_value={"folder_images": "t1", "folder_videos": "t1"})),
+        patch.object(gdrive_dropzone, "list_changes", side_effect=fake_list_changes),
+        patch.object(gdrive_dropzone, "list_files", side_effect=AssertionError("no full listing")),
+    ):
+        result = await gdrive_dropzone.ingest_ready_assets(_NoDb(), tenant_id="tenant-1")
+    assert result == (0, 0, 0)
+    assert calls == ["t1"]
+
+
+@pytest.mark.asyncio
+async def test_incremental_splits_changes_by_folder_and_bootstraps_missing_token() -> None:
+    changed = [_meta("img1"), _meta("vid1", parent="folder_videos"), _meta("other", parent="folder_processed")]
+    with (
+        patch.object(gdrive_dropzone, "_load_sync_tokens", AsyncMock(return_value={"folder_images": "t1"})),
+        patch.object(gdrive_dropzone, "list_changes", return_value=(changed, "t2")),
+        patch.object(gdrive_dropzone, "get_start_page_token", return_value="s1"),
+        patch.object(gdrive_dropzone, "list_files", return_value=[_meta("vid0", parent="folder_videos")]),
+    ):
+        files_by_folder, new_tokens = await gdrive_dropzone._ready_files_incremental(
+            None, "tenant-1", ["folder_images", "folder_videos"]
+        )
+    assert [m["id"] for m in files_by_folder["folder_images"]] == ["img1"]
+    # folder videos chưa có token -> full list + token lấy trước khi list
+    assert [m["id"] for m in files_by_folder["folder_videos"]] == ["vid0"]
+    assert new_tokens == {"folder_images": "t2", "folder_videos": "s1"}
+
+
+@pytest.mark.asyncio
+async def test_incremental_keeps_old_token_for_folder_with_download_failure(tmp_path) -> None:
+    """Ảnh tải lỗi -> token folder ảnh không tiến (lần sau đọc lại thay đổi, tải lại); file không bị chuyển REJECTED."""
+    changed = [_meta("img1"), _meta("vid1", parent="folder_videos")]
+    downloads = {
+        "img1": (str(tmp_path / "img1.jpg"), None, OSError("timeout")),
+        "vid1": (str(tmp_path / "vid1.jpg"), "ab" * 32, None),
+    }
+    save_tokens = AsyncMock()
+    move_file = Mock()
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_settings(tmp_path)),
+        patch.object(gdrive_dropzone, "_load_sync_tokens", AsyncMock(return_value={"folder_images": "t1", "folder_videos": "t1"})),
+        patch.object(gdrive_dropzone, "list_changes", return_value=(changed, "t2")),
+        patch.object(gdrive_dropzone, "_get_existing_assets", AsyncMock(return_value={})),
+        patch.object(gdrive_dropzone, "_download_many", AsyncMock(return_value=downloads)),
+        patch.object(gdrive_dropzone, "_flush_with_duplicate_guard", AsyncMock(return_value=True)),
+        patch.object(gdrive_dropzone, "_save_sync_tokens", save_tokens),
+        patch.object(gdrive_dropzone, "move_file", move_file),
+    ):
+        result = await gdrive_dropzone.ingest_ready_assets(SimpleNamespace(add=lambda obj: None), tenant_id="tenant-1")
+
+    assert result == (1, 1, 0)
+    assert save_tokens.await_args.args[2] == {"folder_videos": "t2"}
+    move_file.assert_not_called()
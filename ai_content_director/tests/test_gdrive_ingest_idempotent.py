@@ -5,6 +5,7 @@ Regression test: GDrive ingest idempotent – gọi ingest 2 lần thì số lư
 Cần DB đã chạy migration 014 (ux_content_assets_tenant_drive_file).
 Chạy: pytest tests/test_gdrive_ingest_idempotent.py -v
 """
+import hashlib
 import os
 import tempfile
 import uuid
@@ -52,6 +53,8 @@ async def test_gdrive_ingest_idempotent_double_run() -> None:
         mock_settings.local_media_dir = str(media_dir)
         mock_settings.asset_max_image_mb = 10
         mock_settings.asset_max_video_mb = 200
+        mock_settings.gdrive_sync_mode = "full"
+        mock_settings.gdrive_download_concurrency = 4
 
         def fake_list_files(folder_id: str):
             return MOCK_FILES.copy()
@@ -59,7 +62,7 @@ async def test_gdrive_ingest_idempotent_double_run() -> None:
         def fake_download_file(file_id: str, dest_path: str) -> str:
             Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
             Path(dest_path).write_bytes(b"fake image content")
-            return dest_path
+            return hashlib.sha256(b"fake image content").hexdigest()
 
         def fake_move_file(file_id: str, target_folder_id: str) -> None:
             pass
@@ -118,7 +121,7 @@ async def test_gdrive_ingest_idempotent_double_run() -> None:
 @pytest.mark.asyncio
 async def test_gdrive_ingest_endpoint_double_call_returns_200() -> None:
     """
-    Endpoint test: POST /api/gdrive/ingest gọi 2 lần liên tiếp phải luôn 200,
+    Endpoint test: POST /api/gdrive/ingest?wait=true (chờ job nền xong) gọi 2 lần liên tiếp phải luôn 200,
     lần 2 count_skipped >= 1 và tổng row content_assets không tăng.
     """
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -134,6 +137,8 @@ async def test_gdrive_ingest_endpoint_double_call_returns_200() -> None:
         mock_settings.local_media_dir = str(media_dir)
         mock_settings.asset_max_image_mb = 10
         mock_settings.asset_max_video_mb = 200
+        mock_settings.gdrive_sync_mode = "full"
+        mock_settings.gdrive_download_concurrency = 4
 
         def fake_list_files(folder_id: str):
             return MOCK_FILES.copy()
@@ -141,7 +146,7 @@ async def test_gdrive_ingest_endpoint_double_call_returns_200() -> None:
         def fake_download_file(file_id: str, dest_path: str) -> str:
             Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
             Path(dest_path).write_bytes(b"fake image content")
-            return dest_path
+            return hashlib.sha256(b"fake image content").hexdigest()
 
         def fake_move_file(file_id: str, target_folder_id: str) -> None:
             return None
@@ -169,12 +174,13 @@ async def test_gdrive_ingest_endpoint_double_call_returns_200() -> None:
             async with AsyncClient(transport=transport, base_url="http://test") as client:
                 payload = {"tenant_id": str(tenant_id)}
 
-                resp1 = await client.post("/api/gdrive/ingest", json=payload)
+                resp1 = await client.post("/api/gdrive/ingest", params={"wait": "true"}, json=payload)
                 assert resp1.status_code == 200, resp1.text
                 data1 = resp1.json()
+                assert data1["status"] == "succeeded", data1
                 assert data1.get("count_ingested", 0) >= 1
 
-                resp2 = await client.post("/api/gdrive/ingest", json=payload)
+                resp2 = await client.post("/api/gdrive/ingest", params={"wait": "true"}, json=payload)
                 assert resp2.status_code == 200, resp2.text
                 data2 = resp2.json()
                 assert data2.get("count_ingested", -1) == 0
@@ -0,0 +1,178 @@
+"""
+Test job ingest Drive chạy nền: progress/checkpoint theo trang, ghi tiến độ có throttle,
+INSERT coalesce theo partial unique index, stream tiến độ tới khi job xong,
+UPDATE job chỉ khi còn giữ lease (mất lease -> dừng). Không cần DB / Drive thật.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import gdrive_dropzone, gdrive_ingest_jobs
+from tests.test_gdrive_incremental_sync import _meta, _settings
+
+
+@pytest.mark.asyncio
+async def test_ingest_reports_per_file_progress_and_checkpoints_per_page(tmp_path) -> None:
+    settings = _settings(tmp_path)
+    settings.gdrive_sync_mode = "full"
+    calls = []
+
+    async def progress(counts, checkpoint):
+        calls.append((dict(counts), checkpoint))
+
+    async def fake_ingest_file(db, *, counts, **_kwargs):
+        counts["ingested"] += 1
+
+    async def fake_download_many(targets, counts=None):
+        counts["bytes_downloaded"] += 10 * len(targets)
+        return {}
+
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=settings),
+        patch.object(gdrive_dropzone, "DRIVE_PAGE_SIZE", 2),
+        patch.object(
+            gdrive_dropzone,
+            "list_files",
+            side_effect=lambda folder_id: [_meta("a"), _meta("b"), _meta("c")] if folder_id == "folder_images" else [],
+        ),
+        patch.object(gdrive_dropzone, "_get_existing_assets", AsyncMock(return_value={})),
+        patch.object(gdrive_dropzone, "_download_many", side_effect=fake_download_many),
+        patch.object(gdrive_dropzone, "_ingest_file", side_effect=fake_ingest_file),
+    ):
+        result = await gdrive_dropzone.ingest_ready_assets(None, tenant_id=uuid.uuid4(), progress=progress)
+
+    assert result == (3, 0, 0)
+    # 1 lần sau khi quét + 1 lần mỗi file + 1 checkpoint mỗi trang (2 trang)
+    assert [c[1] for c in calls] == [False, False, False, True, False, True]
+    assert calls[0][0]["files_total"] == 3 and calls[0][0]["files_done"] == 0
+    assert calls[-1][0]["files_done"] == 3
+    assert calls[-1][0]["bytes_downloaded"] == 30
+
+
+@pytest.mark.asyncio
+async def test_job_progress_throttles_writes_and_commits_on_checkpoint() -> None:
+    db = SimpleNamespace(commit=AsyncMock())
+    job_id = uuid.uuid4()
+    reporter = gdrive_ingest_jobs._JobProgress(job_id, db)
+    with patch.object(gdrive_ingest_jobs, "_update_job", AsyncMock()) as update_job:
+        for i in range(5):
+            await reporter({"files_done": i, "ingested": i}, False)
+        assert update_job.await_count == 1
+        db.commit.assert_not_awaited()
+
+        await reporter({"files_done": 5, "ingested": 5, "bytes_downloaded": 50}, True)
+    db.commit.assert_awaited_once()
+    assert update_job.await_count == 2
+    assert update_job.await_args.args == (job_id,)
+    assert update_job.await_args.kwargs["files_done"] == 5
+    assert update_job.await_args.kwargs["bytes_downloaded"] == 50
+
+
+def test_enqueue_insert_coalesces_on_active_tenant_job() -> None:
+    stmt = gdrive_ingest_jobs._enqueue_stmt(uuid.uuid4(), "full", datetime.now(timezone.utc))
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (tenant_id) WHERE status IN ('queued', 'running') DO NOTHING" in sql
+    assert "RETURNING gdrive_ingest_jobs.id" in sql
+
+
+JOB_ID = uuid.uuid4()
+TENANT_ID = uuid.uuid4()
+
+
+def _job(status, files_done, bytes_downloaded, started_at, finished_at=None):
+    return SimpleNamespace(
+        id=JOB_ID,
+        tenant_id=TENANT_ID,
+        mode="full",
+        status=status,
+        files_total=4,
+        files_done=files_done,
+        count_ingested=files_done,
+        count_invalid=0,
+        count_skipped=0,
+        bytes_downloaded=bytes_downloaded,
+        error=None,
+        created_at=started_at,
+        started_at=started_at,
+        finished_at=finished_at,
+    )
+
+
+@pytest.mark.asyncio
+async def test_iter_job_progress_yields_changes_until_finished() -> None:
+    started = datetime.now(timezone.utc) - timedelta(seconds=10)
+    snapshots = [
+        _job("running", 1, 100, started),
+        _job("running", 1, 100, started),  # không đổi -> không yield
+        _job("running", 3, 300, started),
+        _job("succeeded", 4, 400, started, finished_at=started + timedelta(seconds=4)),
+    ]
+    with patch.object(gdrive_ingest_jobs, "get_job", AsyncMock(side_effect=snapshots)):
+        outs = [out async for out in gdrive_ingest_jobs.iter_job_progress(TENANT_ID, JOB_ID, poll_seconds=0)]
+
+    assert [(o.status, o.files_done) for o in outs] == [("running", 1), ("running", 3), ("succeeded", 4)]
+    assert outs[-1].elapsed_seconds == 4.0
+    assert outs[-1].bytes_per_sec == 100.0
+    assert outs[-1].files_per_sec == 1.0
+
+
+class _UpdateSession:
+    """Session giả cho _update_job: ghi lại UPDATE, rowcount cấu hình được."""
+
+    def __init__(self, rowcount: int) -> None:
+        self.rowcount = rowcount
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc) -> bool:
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return SimpleNamespace(rowcount=self.rowcount)
+
+    async def commit(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_update_job_only_touches_rows_owned_by_this_worker() -> None:
+    session = _UpdateSession(rowcount=0)
+    with patch.object(gdrive_ingest_jobs, "async_session_factory", return_value=session):
+        updated = await gdrive_ingest_jobs._update_job(JOB_ID, status="succeeded")
+    assert updated is False
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "gdrive_ingest_jobs.locked_by = " in sql
+    assert "gdrive_ingest_jobs.status IN " in sql
+    assert gdrive_ingest_jobs.WORKER_ID in session.statements[0].compile().params.values()
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_not_committed_after_lease_lost() -> None:
+    db = SimpleNamespace(commit=AsyncMock())
+    reporter = gdrive_ingest_jobs._JobProgress(JOB_ID, db)
+    with patch.object(gdrive_ingest_jobs, "_update_job", AsyncMock(return_value=False)):
+        with pytest.raises(gdrive_ingest_jobs._LeaseLost):
+            await reporter({"files_done": 2}, True)
+    db.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_cancels_job_when_lease_lost() -> None:
+    job_task = asyncio.create_task(asyncio.Event().wait())
+    with (
+        patch.dict(gdrive_ingest_jobs._running, {JOB_ID: job_task}),
+        patch.object(gdrive_ingest_jobs, "_update_job", AsyncMock(side_effect=[True, None, False])) as update_job,
+        patch.object(gdrive_ingest_jobs.asyncio, "sleep", AsyncMock()),
+    ):
+        await gdrive_ingest_jobs._heartbeat(JOB_ID)
+    assert update_job.await_count == 3  # None (lỗi DB tạm thời) không huỷ; False (0 dòng) mới huỷ
+    with pytest.raises(asyncio.CancelledError):
+        await job_task
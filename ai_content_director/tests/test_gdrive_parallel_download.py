@@ -0,0 +1,109 @@
+"""
+Test tải Drive: download_file ghi file tạm + rename (không để file dở), SHA-256 + kho blob theo hash,
+_download_many tải song song có giới hạn và không chặn event loop. Không cần Drive thật.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.services import gdrive_dropzone
+
+
+class _Settings:
+    gdrive_download_concurrency = 4
+    gdrive_download_chunk_mb = 1
+
+    def __init__(self, media_dir) -> None:
+        self.local_media_dir = str(media_dir)
+
+
+class _FakeDrive:
+    def files(self):
+        return self
+
+    def get_media(self, fileId):
+        return fileId
+
+
+def _fake_downloader(chunks, fail_after=None):
+    class _Downloader:
+        def __init__(self, fd, request, chunksize):
+            assert chunksize == 1024 * 1024
+            self.fd = fd
+            self.i = 0
+
+        def next_chunk(self):
+            if fail_after is not None and self.i == fail_after:
+                raise RuntimeError("network down")
+            self.fd.write(chunks[self.i])
+            self.i += 1
+            return None, self.i == len(chunks)
+
+    return _Downloader
+
+
+@pytest.mark.parametrize("fail_after", [None, 1])
+def test_download_file_atomic_rename(tmp_path, fail_after) -> None:
+    dest = tmp_path / "tenant" / "f1_photo.jpg"
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_Settings(tmp_path)),
+        patch.object(gdrive_dropzone, "_get_drive_service", return_value=_FakeDrive()),
+        patch.object(gdrive_dropzone, "MediaIoBaseDownload", _fake_downloader([b"ab", b"cd"], fail_after)),
+    ):
+        if fail_after is None:
+            assert gdrive_dropzone.download_file("f1", str(dest)) == hashlib.sha256(b"abcd").hexdigest()
+            assert dest.read_bytes() == b"abcd"
+        else:
+            with pytest.raises(RuntimeError):
+                gdrive_dropzone.download_file("f1", str(dest))
+            assert not dest.exists()
+    assert [p.name for p in dest.parent.iterdir() if p.name.endswith(".part")] == []
+
+
+@pytest.mark.asyncio
+async def test_download_many_bounded_parallel_and_loop_stays_free(tmp_path) -> None:
+    lock = threading.Lock()
+    state = {"in_flight": 0, "max_in_flight": 0}
+
+    def slow_download(file_id: str, dest_path: str) -> str:
+        with lock:
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        time.sleep(0.1)
+        with lock:
+            state["in_flight"] -= 1
+        if file_id == "bad":
+            raise RuntimeError("boom")
+        with open(dest_path, "wb") as f:
+            f.write(b"x" * 10)
+        return "sha-" + file_id
+
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    targets = {f"f{i}": (str(tmp_path / f"f{i}"), None) for i in range(7)}
+    targets["bad"] = (str(tmp_path / "bad"), None)
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_Settings(tmp_path)),
+        patch.object(gdrive_dropzone, "download_file", side_effect=slow_download),
+    ):
+        tick_task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        results = await gdrive_dropzone._download_many(targets)
+        elapsed = time.perf_counter() - start
+        tick_task.cancel()
+
+    assert state["max_in_flight"] == 4
+    assert elapsed < 0.8 * 0.5  # 8 file x 0.1s tuần tự = 0.8s; song song 4 -> ~0.2s
+    assert ticks >= 5  # event loop vẫn chạy trong lúc tải
+    assert results["f0"] == (targets["f0"][0], "sha-f0", None)
+    assert isinstance(results["bad"][2], RuntimeError)
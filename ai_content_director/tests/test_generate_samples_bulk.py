@@ -0,0 +1,44 @@
+"""generate_sample_posts: items + audit HITL ghi bằng 2 statement (id sinh ở client), không flush từng dòng."""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+
+from app.services.content_service import _insert_samples_with_audit
+
+
+@pytest.mark.asyncio
+async def test_items_and_hitl_events_inserted_in_two_statements() -> None:
+    captured = {}
+
+    defaults = {
+        "rejected_at": None,
+        "scheduled_at": None,
+        "schedule_status": None,
+        "publish_attempts": 0,
+        "last_publish_error": None,
+        "last_publish_at": None,
+    }
+
+    async def fake_scalars(stmt, rows):
+        captured["items"] = rows
+        return SimpleNamespace(all=lambda: [SimpleNamespace(**defaults, **r) for r in rows])
+
+    db = SimpleNamespace(scalars=fake_scalars, execute=AsyncMock(), flush=AsyncMock())
+    posts = [
+        (None, 1, "A", "c", "#a", 0.9),
+        (None, 2, "B", "c", "#b", 0.75),
+        (None, 3, "C", "c", "#c", 0.5),
+    ]
+    out = await _insert_samples_with_audit(db, uuid4(), posts, model_used="m", used_fallback=False)
+
+    assert db.flush.await_count == 0
+    assert db.execute.await_count == 1
+    events = db.execute.await_args.args[1]
+    item_ids = [r["id"] for r in captured["items"]]
+    assert [e["event_type"] for e in events] == ["AUTO_APPROVED", "NEEDS_REVIEW", "ESCALATED", "GENERATE_CONTENT"]
+    assert [e["content_id"] for e in events[:3]] == item_ids
+    assert [o.id for o in out] == item_ids
+    assert [o.status for o in out] == ["approved", "draft", "draft"]
+    assert out[0].approved_at is not None and out[1].approved_at is None
@@ -0,0 +1,28 @@
+"""
+Tests cho httpx client dùng chung theo upstream (app.infrastructure.http_clients).
+Không gọi mạng: chỉ kiểm tra reuse client + số liệu pool + đóng client.
+"""
+import pytest
+
+from app.infrastructure import http_clients
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reused_and_pool_stats() -> None:
+    """Cùng upstream -> cùng client; stats có connections/idle/active; close xoá registry."""
+    await http_clients.close_http_clients()
+    http_clients.init_http_clients()
+    client = http_clients.get_http_client(http_clients.UPSTREAM_GRAPH)
+    assert http_clients.get_http_client(http_clients.UPSTREAM_GRAPH) is client
+    assert http_clients.get_http_client(http_clients.UPSTREAM_N8N) is not client
+
+    stats = http_clients.get_http_pool_stats()
+    assert set(stats) == {http_clients.UPSTREAM_GRAPH, http_clients.UPSTREAM_N8N}
+    graph = stats[http_clients.UPSTREAM_GRAPH]
+    assert graph["connections"] == 0
+    assert graph["idle"] == 0
+    assert graph["requests_in_flight"] == 0
+
+    await http_clients.close_http_clients()
+    assert client.is_closed
+    assert http_clients.get_http_pool_stats() == {}
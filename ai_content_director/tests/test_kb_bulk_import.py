@@ -0,0 +1,65 @@
+"""KB bulk ingest: parse upload NDJSON / CSV dạng stream + insert theo chunk (1 statement / chunk)."""
+from uuid import uuid4
+
+import pytest
+
+from app.services import kb_service
+from app.services.kb_import import import_format_for, parse_kb_upload
+
+
+async def _stream(*chunks: bytes):
+    for c in chunks:
+        yield c
+
+
+async def _collect(aiter):
+    return [row async for row in aiter]
+
+
+async def test_parse_ndjson_across_chunk_boundaries() -> None:
+    body = '{"title": "Bảo hành", "content": "12 tháng"}\n\n{"title": "CNC", "content": "Phay", "tags": ["a"]}'
+    raw = body.encode("utf-8")
+    rows = await _collect(parse_kb_upload(_stream(raw[:17], raw[17:40], raw[40:]), "ndjson"))
+    assert rows == [
+        {"title": "Bảo hành", "content": "12 tháng", "tags": []},
+        {"title": "CNC", "content": "Phay", "tags": ["a"]},
+    ]
+    with pytest.raises(ValueError, match="invalid_kb_row:2"):
+        await _collect(parse_kb_upload(_stream(b'{"title": "x", "content": "y"}\n{"title": ""}\n'), "ndjson"))
+
+
+async def test_parse_csv_with_bom_multiline_field_and_tags() -> None:
+    body = '\ufefftitle,content,tags\r\nKhuôn,"dòng 1\ndòng 2",cơ khí|dập\r\nCNC,Phay,\r\n'
+    rows = await _collect(parse_kb_upload(_stream(body.encode("utf-8")), "csv"))
+    assert rows[0] == {"title": "Khuôn", "content": "dòng 1\ndòng 2", "tags": ["cơ khí", "dập"]}
+    assert rows[1] == {"title": "CNC", "content": "Phay", "tags": []}
+    assert import_format_for("text/csv; charset=utf-8") == "csv"
+    assert import_format_for("application/json") is None
+
+
+async def test_bulk_stream_inserts_one_statement_per_chunk(monkeypatch) -> None:
+    monkeypatch.setattr(kb_service, "KB_BULK_CHUNK_SIZE", 2)
+    statements = []
+
+    class _Result:
+        def __init__(self, n: int) -> None:
+            self._ids = [uuid4() for _ in range(n)]
+
+        def scalars(self):
+            return self
+
+        def all(self):
+            return self._ids
+
+    class _DB:
+        async def execute(self, stmt, params=None):
+            statements.append(len(params))
+            return _Result(len(params))
+
+    async def rows():
+        for i in range(5):
+            yield {"title": f"t{i}", "content": "c", "tags": []}
+
+    ids = await kb_service.bulk_create_kb_items_stream(_DB(), uuid4(), rows())
+    assert len(ids) == 5
+    assert statements == [2, 2, 1]
@@ -0,0 +1,37 @@
+"""KB search: chuẩn hoá term + SQL full-text / trigram (không cần DB)."""
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.kb_service import KB_SEARCH_MAX_TERMS, normalize_kb_terms, search_kb
+
+
+def test_normalize_kb_terms_dedup_and_cap() -> None:
+    assert normalize_kb_terms("  khuôn   dập ") == ["khuôn dập"]
+    assert normalize_kb_terms(["CNC", "cnc", "", None, "Khuôn"]) == ["CNC", "Khuôn"]
+    assert len(normalize_kb_terms([f"t{i}" for i in range(50)])) == KB_SEARCH_MAX_TERMS
+
+
+async def test_search_kb_builds_ranked_fts_query() -> None:
+    captured = {}
+
+    class _Result:
+        def scalars(self):
+            return self
+
+        def all(self):
+            return []
+
+    class _DB:
+        async def execute(self, q):
+            captured["sql"] = str(q.compile(dialect=postgresql.dialect()))
+            return _Result()
+
+    assert await search_kb(_DB(), uuid4(), []) == []
+    assert "sql" not in captured
+    await search_kb(_DB(), uuid4(), ["khuôn dập", "CNC"], top_k=5)
+    sql = captured["sql"]
+    assert "search_tsv @@" in sql
+    assert "ts_rank_cd" in sql and "similarity" in sql
+    assert "kb_unaccent(kb_items.title) %%" in sql
+    assert "ILIKE" not in sql.upper()
@@ -0,0 +1,152 @@
+"""
+Vector index KB in-process: embedding hashing (bỏ dấu), top-k cosine, IDF áp lúc search, thêm incremental,
+đồng bộ khi quá TTL chỉ load item mới, LRU theo tổng bộ nhớ, backfill ngoài session đọc.
+"""
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from app.config import Settings
+from app.infrastructure import kb_vector_index
+from app.infrastructure.kb_vector_index import (
+    TenantVectorIndex,
+    embed_kb_item,
+    embed_text,
+    vector_from_bytes,
+    vector_to_bytes,
+)
+from app.services import kb_service
+
+
+def test_embedding_is_accent_insensitive_and_roundtrips_bytes() -> None:
+    a = embed_text("Khuôn dập kim loại")
+    b = embed_text("khuon dap kim loai")
+    assert float(a @ b) > 0.999
+    restored = vector_from_bytes(vector_to_bytes(a))
+    assert restored is not None and float(restored @ a) > 0.999
+    assert vector_from_bytes(b"\x00" * 12) is None
+
+
+def test_search_ranks_relevant_items_and_supports_incremental_add() -> None:
+    index = TenantVectorIndex()
+    docs = {
+        uuid4(): ("Gia công CNC", "Phay tiện CNC chính xác cho chi tiết cơ khí"),
+        uuid4(): ("Chính sách bảo hành", "Bảo hành 12 tháng, đổi trả trong 7 ngày"),
+        uuid4(): ("Khuôn dập", "Thiết kế và chế tạo khuôn dập kim loại tấm"),
+    }
+    index.add(list(docs), [embed_kb_item(*d) for d in docs.values()])
+    hits = index.search(embed_text("bao hanh doi tra"), top_k=2)
+    assert docs[hits[0][0]][0] == "Chính sách bảo hành"
+
+    new_id = uuid4()
+    index.add([new_id], [embed_kb_item("Sơn tĩnh điện", "Dịch vụ sơn tĩnh điện cho khung thép")])
+    assert len(index) == 4
+    assert index.search(embed_text("sơn tĩnh điện"), top_k=1)[0][0] == new_id
+    assert index.search(embed_text("xyz không liên quan"), top_k=3) == []
+
+
+class _ReadOnlySession:
+    """Session giả của request: chỉ cho SELECT (backfill phải đi session riêng)."""
+
+    def __init__(self, results) -> None:
+        self.results = list(results)
+
+    async def execute(self, stmt, *_args):
+        assert stmt.is_select, "request session must stay read-only"
+        rows = self.results.pop(0)
+        return type("Result", (), {"all": lambda _self: rows})()
+
+
+@pytest.mark.asyncio
+async def test_load_index_backfills_missing_embeddings_in_own_session() -> None:
+    tenant_id, with_vec, without_vec = uuid4(), uuid4(), uuid4()
+    db = _ReadOnlySession(
+        [
+            [(with_vec, vector_to_bytes(embed_kb_item("CNC", "Phay CNC"))), (without_vec, None)],
+            [(without_vec, "Bảo hành", "Bảo hành 12 tháng")],
+        ]
+    )
+    kb_vector_index.invalidate(tenant_id)
+    with patch.object(kb_service, "_backfill_embeddings", AsyncMock()) as backfill:
+        index = await kb_service._load_vector_index(db, tenant_id)
+    kb_vector_index.invalidate(tenant_id)
+
+    assert len(index) == 2
+    [(called_tenant, rows)] = [call.args for call in backfill.await_args_list]
+    assert called_tenant == tenant_id
+    assert [row["id"] for row in rows] == [without_vec]
+
+
+def test_query_time_idf_matches_full_reweighting_after_incremental_adds() -> None:
+    """df cập nhật incremental (kể cả thay vector cùng id) cho cùng điểm với cách nhân IDF + chuẩn hoá toàn bộ ma trận."""
+    texts = ["gia công cnc", "bảo hành 12 tháng", "khuôn dập kim loại", "sơn tĩnh điện khung thép", "cnc kim loại"]
+    ids = [uuid4() for _ in texts]
+    index = TenantVectorIndex()
+    for item_id, text in zip(ids, texts):
+        index.add([item_id], [embed_text(text)])
+    index.add([ids[1]], [embed_text("bảo hành đổi trả")])  # thay vector: df trừ bản cũ
+    final = [embed_text(t) for t in texts]
+    final[1] = embed_text("bảo hành đổi trả")
+
+    matrix = np.stack(final)
+    df = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1.0 + len(ids)) / (1.0 + df)) + 1.0
+    weighted = matrix * idf
+    weighted /= np.linalg.norm(weighted, axis=1, keepdims=True)
+    query = embed_text("kim loại cnc")
+    expected = weighted @ (query * idf / np.linalg.norm(query * idf))
+
+    hits = dict(index.search(query, top_k=len(ids)))
+    for item_id, score in zip(ids, expected):
+        assert hits.get(item_id, 0.0) == pytest.approx(max(float(score), 0.0), abs=1e-5)
+
+
+@pytest.mark.asyncio
+async def test_stale_index_loads_only_new_items() -> None:
+    """Index quá TTL: đọc id của tenant rồi chỉ load embedding item mới, không load lại toàn bộ."""
+    tenant_id, old_id, new_id = uuid4(), uuid4(), uuid4()
+    index = TenantVectorIndex()
+    index.add([old_id], [embed_kb_item("CNC", "Phay CNC")])
+    index.loaded_at -= 10_000
+    db = _ReadOnlySession([[(old_id,), (new_id,)], [(new_id, vector_to_bytes(embed_kb_item("Bảo hành", "12 tháng")))]])
+    kb_vector_index.put_index(tenant_id, index)
+    try:
+        loaded = await kb_service._load_vector_index(db, tenant_id)
+    finally:
+        kb_vector_index.invalidate(tenant_id)
+
+    assert loaded is index and len(index) == 2 and new_id in index
+    assert not index.is_stale(kb_vector_index.get_settings().kb_vector_index_ttl_seconds)
+    assert db.results == []
+
+
+def test_indexes_evicted_lru_by_total_memory() -> None:
+    """Vượt KB_VECTOR_INDEX_MAX_MB thì bỏ tenant ít dùng nhất; tenant vừa dùng luôn được giữ."""
+
+    def index_of(rows: int) -> TenantVectorIndex:
+        index = TenantVectorIndex()
+        index.add([uuid4() for _ in range(rows)], [embed_text(f"item {i}") for i in range(rows)])
+        return index
+
+    a, b, c = uuid4(), uuid4(), uuid4()
+    # 200 dòng -> capacity 256 dòng x 1024 float32 = 1 MB (+ df); 3 index vượt trần 3 MB
+    settings = Settings(KB_VECTOR_INDEX_MAX_MB=3, KB_VECTOR_INDEX_MAX_TENANTS=200)
+    kb_vector_index.invalidate()
+    try:
+        with patch.object(kb_vector_index, "get_settings", return_value=settings):
+            kb_vector_index.put_index(a, index_of(200))
+            kb_vector_index.put_index(b, index_of(200))
+            assert kb_vector_index.get_index(a) is not None  # a thành tenant dùng gần nhất
+            kb_vector_index.put_index(c, index_of(200))
+            assert kb_vector_index.get_index(b) is None
+            assert kb_vector_index.get_index(a) is not None and kb_vector_index.get_index(c) is not None
+
+            big = uuid4()
+            kb_vector_index.put_index(big, index_of(600))  # 1 tenant lớn hơn trần: giữ, bỏ hết tenant khác
+            assert list(kb_vector_index._indexes) == [big]
+            stats = kb_vector_index.get_vector_index_stats()
+            assert stats["memory_bytes"] > stats["max_bytes"]
+    finally:
+        kb_vector_index.invalidate()
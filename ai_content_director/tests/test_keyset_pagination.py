@@ -0,0 +1,53 @@
+"""
+Test phân trang keyset (app.utils.pagination): cursor encode/decode, câu SQL sau cursor, split_page.
+Không cần DB.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.models import LeadSignal
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_page, split_page
+
+
+def test_cursor_roundtrip_and_invalid() -> None:
+    created_at = datetime(2026, 3, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(created_at, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, row_id)
+    for bad in ("", "not-a-cursor", encode_cursor(created_at, row_id)[:-4]):
+        with pytest.raises(ValueError, match="invalid_cursor"):
+            decode_cursor(bad)
+
+
+def test_keyset_page_sql() -> None:
+    q = select(LeadSignal.id, LeadSignal.created_at).where(LeadSignal.tenant_id == uuid.uuid4())
+    first = keyset_page(q, LeadSignal.created_at, LeadSignal.id, None, 10)
+    sql = str(first.compile(dialect=postgresql.dialect()))
+    assert "ORDER BY lead_signals.created_at DESC, lead_signals.id DESC" in sql
+    assert "OFFSET" not in sql
+    assert "(lead_signals.created_at, lead_signals.id) <" not in sql
+
+    cursor = encode_cursor(datetime.now(timezone.utc), uuid.uuid4())
+    nxt = keyset_page(q, LeadSignal.created_at, LeadSignal.id, cursor, 10)
+    compiled = nxt.compile(dialect=postgresql.dialect())
+    assert "(lead_signals.created_at, lead_signals.id) <" in str(compiled)
+    assert 11 in compiled.params.values()
+
+
+def test_split_page_next_cursor() -> None:
+    base = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(id=uuid.uuid4(), created_at=base - timedelta(minutes=i)) for i in range(4)]
+
+    page, next_cursor = split_page(rows, 3)
+    assert page == rows[:3]
+    assert decode_cursor(next_cursor) == (rows[2].created_at, rows[2].id)
+
+    page, next_cursor = split_page(rows[:3], 3)
+    assert len(page) == 3 and next_cursor is None
+    assert split_page([], 3) == ([], None)
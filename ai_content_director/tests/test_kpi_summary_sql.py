@@ -0,0 +1,60 @@
+"""
+Test get_kpi_summary: chọn snapshot mới nhất + cộng tổng trong SQL (DISTINCT ON + SUM OVER), không đọc raw.
+Không cần DB (session giả trả sẵn rows).
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.facebook_metrics_service import KPI_METRIC_FIELDS, _kpi_summary_query, get_kpi_summary
+
+
+def test_kpi_summary_query_sql() -> None:
+    sql = str(_kpi_summary_query(uuid.uuid4(), datetime.now(timezone.utc)).compile(dialect=postgresql.dialect()))
+    assert "DISTINCT ON (post_metrics.publish_log_id)" in sql
+    assert "ORDER BY post_metrics.publish_log_id, post_metrics.fetched_at DESC" in sql
+    assert "sum(latest.reach) OVER ()" in sql
+    assert "raw" not in sql
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    async def execute(self, _stmt):
+        self.calls += 1
+        return _FakeResult(self.rows)
+
+
+@pytest.mark.asyncio
+async def test_get_kpi_summary_maps_rows() -> None:
+    now = datetime.now(timezone.utc)
+    totals = {f"total_{f}": 10 for f in KPI_METRIC_FIELDS}
+    rows = [
+        {"post_id": "p1", "fetched_at": now, "reach": 7, "impressions": 7, "reactions": 7, "comments": 7, "shares": 7, **totals},
+        {"post_id": "p2", "fetched_at": now - timedelta(hours=6), "reach": 3, "impressions": 3, "reactions": 3,
+         "comments": 3, "shares": None, **totals},
+    ]
+    db = _FakeSession(rows)
+    out_totals, posts = await get_kpi_summary(db, tenant_id=uuid.uuid4(), days=7)
+    assert db.calls == 1
+    assert out_totals == {f: 10 for f in KPI_METRIC_FIELDS}
+    assert [p["post_id"] for p in posts] == ["p1", "p2"]
+    assert posts[1]["shares"] is None and posts[0]["fetched_at"] == now.isoformat()
+
+    empty_totals, empty_posts = await get_kpi_summary(_FakeSession([]), tenant_id=uuid.uuid4())
+    assert empty_totals == {f: 0 for f in KPI_METRIC_FIELDS} and empty_posts == []
@@ -0,0 +1,51 @@
+"""
+Tests cho cache response LLM (app.infrastructure.llm_cache + LLMService._complete).
+Không cần Redis/OpenAI: cache chỉ dùng tầng local, client OpenAI giả.
+"""
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.config import Settings
+from app.infrastructure import llm_cache
+from app.infrastructure.redis_cache import LocalLRUCache
+from app.services.llm_service import LLMService
+
+
+def test_cache_key_normalizes_whitespace_and_params() -> None:
+    """Khác whitespace -> cùng key; khác temperature/model -> key khác."""
+    a = llm_cache.build_cache_key("m", [{"role": "user", "content": "Xin  chào\n thế giới"}], temperature=0.7)
+    b = llm_cache.build_cache_key("m", [{"role": "User", "content": " Xin chào thế giới "}], temperature=0.7)
+    assert a == b
+    assert a != llm_cache.build_cache_key("m", [{"role": "user", "content": "Xin chào thế giới"}], temperature=0.2)
+    assert a != llm_cache.build_cache_key("m2", [{"role": "user", "content": "Xin chào thế giới"}], temperature=0.7)
+
+
+@pytest.mark.asyncio
+async def test_single_content_second_call_hits_cache() -> None:
+    """Lần 2 cùng prompt: không gọi OpenAI, usage 0 token, cache_hit=1, tokens_saved = token lần đầu."""
+    settings = Settings(OPENAI_API_KEY="sk-test", LLM_CACHE_ENABLED=True)
+    body = {"content_type": "POST", "title": "T", "caption": "C", "hashtags": ["#a", "#b", "#c", "#d", "#e"], "confidence_score": 0.9}
+    resp = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(body)))],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150),
+    )
+    fake_create = AsyncMock(return_value=resp)
+    with (
+        patch.object(llm_cache, "get_settings", return_value=settings),
+        patch("app.infrastructure.redis_cache.get_redis", return_value=None),
+        patch("app.infrastructure.redis_cache._local_cache", LocalLRUCache(max_items=16, ttl_seconds=60)),
+        patch("app.services.llm_service.get_async_openai", return_value=object()),
+        patch("app.services.llm_service.create_chat_completion", fake_create),
+    ):
+        llm = LLMService(settings)
+        out1, usage1 = await llm.generate_single_content({"industry": "cơ khí"}, "Khuôn dập", "thép C45")
+        out2, usage2 = await llm.generate_single_content({"industry": "cơ khí"}, "Khuôn dập", "thép C45")
+    assert fake_create.await_count == 1
+    assert out1 == out2
+    assert usage1["total_tokens"] == 150
+    assert usage2["total_tokens"] == 0
+    assert usage2["cache_hit"] == 1
+    assert usage2["tokens_saved"] == 150
@@ -0,0 +1,77 @@
+"""
+Test dedup nội dung media: 2 drive_file_id cùng nội dung -> 1 blob trong kho (hardlink), Drive đã cho
+sha256Checksum có sẵn trong kho -> không tải lại. Không cần Drive thật / DB.
+"""
+import hashlib
+from unittest.mock import patch
+
+from app.services import gdrive_dropzone
+
+
+class _Settings:
+    gdrive_download_chunk_mb = 1
+
+    def __init__(self, media_dir) -> None:
+        self.local_media_dir = str(media_dir)
+
+
+class _FakeDrive:
+    def files(self):
+        return self
+
+    def get_media(self, fileId):
+        return fileId
+
+
+class _Downloader:
+    """MediaIoBaseDownload giả: 1 chunk, nội dung cố định."""
+
+    content = b"same photo bytes"
+
+    def __init__(self, fd, request, chunksize):
+        self.fd = fd
+
+    def next_chunk(self):
+        self.fd.write(self.content)
+        return None, True
+
+
+def test_same_content_under_new_file_id_shares_one_blob(tmp_path) -> None:
+    sha = hashlib.sha256(_Downloader.content).hexdigest()
+    first = tmp_path / "t1" / "fileA_photo.jpg"
+    second = tmp_path / "t1" / "fileB_photo_copy.jpg"
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_Settings(tmp_path)),
+        patch.object(gdrive_dropzone, "_get_drive_service", return_value=_FakeDrive()),
+        patch.object(gdrive_dropzone, "MediaIoBaseDownload", _Downloader),
+    ):
+        assert gdrive_dropzone.download_file("fileA", str(first)) == sha
+        assert gdrive_dropzone.download_file("fileB", str(second)) == sha
+
+    blob = tmp_path / gdrive_dropzone.BLOB_DIR_NAME / sha[:2] / sha
+    assert blob.read_bytes() == _Downloader.content
+    assert first.stat().st_ino == blob.stat().st_ino == second.stat().st_ino
+    assert [p.name for p in first.parent.iterdir() if p.name.startswith(".")] == []
+
+
+def test_fetch_file_skips_download_when_checksum_in_store(tmp_path) -> None:
+    content = b"video bytes"
+    sha = hashlib.sha256(content).hexdigest()
+    blob = tmp_path / gdrive_dropzone.BLOB_DIR_NAME / sha[:2] / sha
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(content)
+    dest = tmp_path / "t1" / "fileC_clip.mp4"
+
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_Settings(tmp_path)),
+        patch.object(gdrive_dropzone, "download_file", side_effect=AssertionError("must not download")),
+    ):
+        assert gdrive_dropzone.fetch_file("fileC", str(dest), sha) == (sha, False)
+    assert dest.read_bytes() == content and dest.stat().st_ino == blob.stat().st_ino
+
+    with (
+        patch.object(gdrive_dropzone, "get_settings", return_value=_Settings(tmp_path)),
+        patch.object(gdrive_dropzone, "download_file", return_value="other-sha") as download,
+    ):
+        assert gdrive_dropzone.fetch_file("fileD", str(tmp_path / "t1" / "d.mp4"), "f" * 64) == ("other-sha", True)
+    download.assert_called_once()
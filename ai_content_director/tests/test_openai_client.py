@@ -0,0 +1,59 @@
+"""
+Tests cho client OpenAI dùng chung: giới hạn concurrency theo tenant + histogram latency.
+Không gọi OpenAI thật (client giả).
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.config import Settings
+from app.infrastructure import openai_client
+from app.infrastructure.keyed_semaphore import KeyedSemaphore
+from app.infrastructure.metrics import HistogramRegistry
+
+
+class _FakeCompletions:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return SimpleNamespace(model=kwargs.get("model"))
+
+
+@pytest.mark.asyncio
+async def test_create_chat_completion_limits_per_tenant_and_records_latency() -> None:
+    """10 call cùng tenant chạy tối đa OPENAI_MAX_CONCURRENCY_PER_TENANT cùng lúc; mỗi call ghi histogram."""
+    completions = _FakeCompletions()
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    settings = Settings(OPENAI_MAX_CONCURRENCY=10, OPENAI_MAX_CONCURRENCY_PER_TENANT=2)
+    registry = HistogramRegistry()
+    with (
+        patch.object(openai_client, "get_settings", return_value=settings),
+        patch.object(openai_client, "get_async_openai", return_value=fake_client),
+        patch.object(openai_client, "latency_histograms", registry),
+        patch.object(openai_client, "_global_semaphore", None),
+        patch.object(openai_client, "_tenant_semaphores", KeyedSemaphore()),
+    ):
+        await asyncio.gather(
+            *[openai_client.create_chat_completion("samples", tenant_id="t1", model="m") for _ in range(10)]
+        )
+        assert len(openai_client._tenant_semaphores) == 0  # semaphore tenant bỏ khi không còn call
+    assert completions.max_in_flight == 2
+    snap = registry.snapshot()["llm.samples"]
+    assert snap["count"] == 10
+    assert snap["errors"] == 0
+
+
+@pytest.mark.asyncio
+async def test_create_chat_completion_not_configured() -> None:
+    """Chưa có OPENAI_API_KEY -> ValueError('openai_not_configured') để caller fallback template."""
+    with patch.object(openai_client, "get_async_openai", return_value=None):
+        with pytest.raises(ValueError, match="openai_not_configured"):
+            await openai_client.create_chat_completion("planner", model="m")
@@ -3,14 +3,16 @@ Test POST /api/plans/{plan_id}/materialize: plan from generated_plans is found a
 - Create tenant -> POST /api/plans/generate -> POST /api/plans/{plan_id}/materialize -> assert 200 and content_items count.
 """
 import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql.dml import OnConflictDoNothing
 
 from app.db import async_session_factory
-from app.models import ContentItem, GeneratedPlan, Tenant
+from app.models import ContentItem, ContentPlan, Tenant
 
 
 @pytest.mark.asyncio
@@ -63,6 +65,15 @@ async def test_plan_generate_then_materialize() -> None:
         )
         assert mat_data["content_plans_created"] == expected_count
 
+        # 2b) Materialize lại: idempotent, không tạo trùng
+        again = await client.post(
+            f"/api/plans/{plan_id}/materialize",
+            json={"tenant_id": str(tenant_id)},
+        )
+        assert again.status_code == 200, again.text
+        assert again.json()["content_items_created"] == 0
+        assert again.json()["content_plans_skipped"] == expected_count
+
     # 3) Verify DB: content_items for this tenant count
     async with async_session_factory() as session:
         r = await session.execute(
@@ -96,3 +107,46 @@ async def test_plan_materialize_404_when_plan_not_found() -> None:
         )
         assert resp.status_code == 404
         assert "not found" in resp.json().get("detail", "").lower()
+
+
+@pytest.mark.asyncio
+async def test_materialize_uses_two_statements_regardless_of_plan_length() -> None:
+    """30 ngày -> 1 INSERT content_plans (ON CONFLICT DO NOTHING) + 1 INSERT content_items, không flush.
+    content_items chỉ tạo cho các content_plans mới (RETURNING); ngày đã có -> skipped."""
+    from app.services import plan_service_mv1
+
+    days = [{"day": d, "topic": f"T{d}", "content_angle": "a"} for d in range(1, 31)]
+    plan = SimpleNamespace(plan_json={"days": days})
+    plan_id = uuid.uuid4()
+    statements = []
+    plan_rows = []
+
+    async def fake_execute(stmt, params=None):
+        statements.append((stmt, params))
+        if params is None:
+            plan_rows.extend({col.key: v for col, v in row.items()} for row in stmt._multi_values[0])
+            # Giả lập 10 ngày đầu đã materialize trước đó: RETURNING chỉ trả 20 dòng mới
+            new_ids = [row["id"] for row in plan_rows if row["day_number"] > 10]
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: new_ids))
+        return None
+
+    db = SimpleNamespace(execute=fake_execute, flush=AsyncMock())
+    with patch.object(plan_service_mv1, "get_plan_by_id_and_tenant", AsyncMock(return_value=plan)):
+        summary = await plan_service_mv1.materialize_plan(db, plan_id=plan_id, tenant_id=uuid.uuid4())
+    assert len(statements) == 2
+    on_conflict = statements[0][0]._post_values_clause
+    assert isinstance(on_conflict, OnConflictDoNothing)
+    assert [c.key for c in on_conflict.inferred_target_elements] == [
+        ContentPlan.generated_plan_id.key,
+        ContentPlan.day_number.key,
+    ]
+    assert [row["day_number"] for row in plan_rows] == list(range(1, 31))
+    assert {row["generated_plan_id"] for row in plan_rows} == {plan_id}
+    item_rows = statements[1][1]
+    by_id = {row["id"]: row for row in plan_rows}
+    assert [by_id[row["plan_id"]]["day_number"] for row in item_rows] == list(range(11, 31))
+    assert [row["title"] for row in item_rows] == [f"T{d}" for d in range(11, 31)]
+    assert summary["content_plans_created"] == 20
+    assert summary["content_items_created"] == 20
+    assert summary["content_plans_skipped"] == 10
+    assert db.flush.await_count == 0
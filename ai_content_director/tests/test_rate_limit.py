@@ -0,0 +1,51 @@
+"""
+Tests cho rate limit: chọn limit theo route/tenant override và token bucket local (fallback khi Redis lỗi).
+Không cần Redis.
+"""
+from unittest.mock import patch
+
+from app.config import Settings
+from app.middleware.rate_limit import LocalTokenBucket, resolve_limit
+
+
+def _settings(**kwargs) -> Settings:
+    base = {
+        "RATE_LIMIT_PER_MIN": 60,
+        "RATE_LIMIT_ROUTE_OVERRIDES": "/webhooks/facebook=600,/content/generate-samples=10,/content=30",
+        "RATE_LIMIT_TENANT_OVERRIDES": "t-big=300",
+    }
+    base.update(kwargs)
+    return Settings(**base)
+
+
+def test_resolve_limit_route_and_tenant_overrides() -> None:
+    """Route override (prefix dài nhất) có bucket riêng; tenant override áp cho bucket mặc định."""
+    with patch("app.middleware.rate_limit.get_settings", return_value=_settings()):
+        assert resolve_limit("/webhooks/facebook", "tenant:t1") == (600, "tenant:t1:/webhooks/facebook")
+        assert resolve_limit("/content/generate-samples", "tenant:t1") == (
+            10,
+            "tenant:t1:/content/generate-samples",
+        )
+        assert resolve_limit("/content/list", "tenant:t1") == (30, "tenant:t1:/content")
+        assert resolve_limit("/kb/items", "tenant:t-big") == (300, "tenant:t-big")
+        assert resolve_limit("/kb/items", "tenant:t1") == (60, "tenant:t1")
+        assert resolve_limit("/kb/items", "key:abc") == (60, "key:abc")
+
+
+def test_local_token_bucket_blocks_then_refills() -> None:
+    """Hết token thì chặn; sau thời gian refill thì cho qua lại."""
+    bucket = LocalTokenBucket(max_buckets=10)
+    with patch("app.middleware.rate_limit.time.monotonic", return_value=1000.0):
+        results = [bucket.take("tenant:x", capacity=3, rate=3 / 60)[0] for _ in range(4)]
+    assert results == [True, True, True, False]
+    with patch("app.middleware.rate_limit.time.monotonic", return_value=1020.0):
+        assert bucket.take("tenant:x", capacity=3, rate=3 / 60)[0] is True
+        assert bucket.take("tenant:x", capacity=3, rate=3 / 60)[0] is False
+
+
+def test_local_token_bucket_bounded_memory() -> None:
+    """Giữ tối đa max_buckets key (LRU)."""
+    bucket = LocalTokenBucket(max_buckets=2)
+    for key in ("a", "b", "c"):
+        bucket.take(key, capacity=5, rate=1.0)
+    assert list(bucket._buckets) == ["b", "c"]
@@ -0,0 +1,108 @@
+"""
+Tests cho cache 2 tầng (app.infrastructure.redis_cache): LRU/TTL local + counter hit/miss.
+Không cần Redis: REDIS_URL không set thì chỉ dùng tầng local.
+"""
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.infrastructure import redis_cache
+from app.infrastructure.redis_cache import LocalLRUCache
+from app.schemas.revenue_mv1 import OnboardingIndustryRequest
+from app.services import onboarding_industry_service
+
+
+def test_local_lru_evicts_least_recently_used() -> None:
+    """Vượt max_items thì loại key ít dùng nhất; get() làm mới thứ tự."""
+    cache = LocalLRUCache(max_items=2, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_local_lru_ttl_expiry() -> None:
+    """Key hết hạn TTL thì get() trả None và bị xóa."""
+    cache = LocalLRUCache(max_items=10, ttl_seconds=5)
+    with patch("app.infrastructure.redis_cache.time.monotonic", return_value=100.0):
+        cache.set("k", "v")
+    with patch("app.infrastructure.redis_cache.time.monotonic", return_value=104.0):
+        assert cache.get("k") == "v"
+    with patch("app.infrastructure.redis_cache.time.monotonic", return_value=106.0):
+        assert cache.get("k") is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_get_set_delete_local_only_without_redis() -> None:
+    """Không có Redis: set/get/delete vẫn chạy trên tầng local, set trả False."""
+    with (
+        patch.object(redis_cache, "_local_cache", LocalLRUCache(max_items=10, ttl_seconds=60)),
+        patch.object(redis_cache, "get_redis", return_value=None),
+    ):
+        assert await redis_cache.cache_set("tenant:1", '{"id": "1"}') is False
+        assert await redis_cache.cache_get("tenant:1") == '{"id": "1"}'
+        await redis_cache.cache_delete("tenant:1")
+        assert await redis_cache.cache_get("tenant:1") is None
+        assert redis_cache.get_cache_stats()["local"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_upsert_industry_profile_invalidates_cache_after_commit() -> None:
+    """Xóa cache profile sau commit: xóa trước thì request đọc song song nạp lại dòng cũ."""
+    events = []
+    existing = SimpleNamespace(name="old", description=None)
+    db = SimpleNamespace(
+        execute=AsyncMock(return_value=SimpleNamespace(scalar_one_or_none=lambda: existing)),
+        commit=AsyncMock(side_effect=lambda: events.append("commit")),
+        refresh=AsyncMock(),
+    )
+    payload = OnboardingIndustryRequest(tenant_id=uuid.uuid4(), name="Spa", description="d")
+    with patch.object(
+        onboarding_industry_service,
+        "invalidate_tenant_cache",
+        AsyncMock(side_effect=lambda _tid: events.append("invalidate")),
+    ):
+        await onboarding_industry_service.upsert_industry_profile(db, payload)
+    assert existing.name == "Spa"
+    assert events == ["commit", "invalidate"]
+
+
+class _DownRedis:
+    """Redis giả luôn lỗi, đếm số lần bị gọi."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def get(self, _key):
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_cache_get_skips_redis_while_circuit_open() -> None:
+    """Redis lỗi 1 lần -> các lookup kế tiếp bỏ qua Redis tới hết REDIS_CIRCUIT_OPEN_SECONDS rồi mới thử lại."""
+    client = _DownRedis()
+    with (
+        patch.object(redis_cache, "_local_cache", LocalLRUCache(max_items=10, ttl_seconds=60)),
+        patch.object(redis_cache, "_circuit_open_until", 0.0),
+        patch.object(redis_cache, "get_redis", return_value=client),
+        patch.object(redis_cache.time, "monotonic", return_value=100.0),
+    ):
+        assert await redis_cache.cache_get("tenant:1") is None
+        assert await redis_cache.cache_get("tenant:1") is None
+        assert client.calls == 1
+        assert redis_cache.get_cache_stats()["redis_circuit_open"] is True
+        redis_cache.time.monotonic.return_value = 100.0 + redis_cache.get_settings().redis_circuit_open_seconds + 0.1
+        assert await redis_cache.cache_get("tenant:1") is None
+        assert client.calls == 2
@@ -1,18 +1,19 @@
 """
 Tests for Revenue MVP Module 2 schema validation.
-Day bounds 1..30, hashtags 5..30, approval_status_from_confidence.
-No OpenAI network calls.
+Day bounds 1..30, hashtags 5..30, approval_status_from_confidence,
+batch generation fallback per day. No OpenAI network calls.
 """
 import pytest
 from pydantic import ValidationError
 
 from app.schemas.revenue_mv2 import (
+    ContentGenerateBatchRequest,
     ContentGenerateRequest,
     ContentItemOut,
     ContentTypeEnum,
     ApprovalStatusEnum,
 )
-from app.services.content_service_mv2 import approval_status_from_confidence
+from app.services.content_service_mv2 import _normalize_output, approval_status_from_confidence
 
 
 def test_content_generate_request_day_bounds() -> None:
@@ -47,6 +48,41 @@ def test_content_generate_request_day_invalid() -> None:
         )
 
 
+def test_content_generate_batch_request_range() -> None:
+    """ContentGenerateBatchRequest: day_from..day_to trong 1..30, day_to >= day_from."""
+    req = ContentGenerateBatchRequest(
+        tenant_id="11111111-1111-1111-1111-111111111111",
+        plan_id="22222222-2222-2222-2222-222222222222",
+        day_from=1,
+        day_to=30,
+    )
+    assert (req.day_from, req.day_to) == (1, 30)
+    with pytest.raises(ValidationError):
+        ContentGenerateBatchRequest(
+            tenant_id="11111111-1111-1111-1111-111111111111",
+            plan_id="22222222-2222-2222-2222-222222222222",
+            day_from=10,
+            day_to=5,
+        )
+    with pytest.raises(ValidationError):
+        ContentGenerateBatchRequest(
+            tenant_id="11111111-1111-1111-1111-111111111111",
+            plan_id="22222222-2222-2222-2222-222222222222",
+            day_from=1,
+            day_to=31,
+        )
+
+
+def test_normalize_output_pads_hashtags_and_clamps() -> None:
+    """_normalize_output: hashtags bù đủ 5, confidence clamp 0..1, content_type lạ -> POST."""
+    fields = _normalize_output({"content_type": "story", "hashtags": ["#a"], "confidence_score": 1.4})
+    assert fields["content_type"] == "POST"
+    assert len(fields["hashtags"]) == 5
+    assert fields["confidence_score"] == 1.0
+    assert fields["approval_status"] == "APPROVED"
+    assert fields["title"] == "Untitled"
+
+
 def test_content_item_out_hashtags_bounds() -> None:
     """ContentItemOut hashtags: 5..30 items."""
     from datetime import datetime, timezone
@@ -158,3 +194,61 @@ def test_approval_status_enum() -> None:
     assert ApprovalStatusEnum.APPROVED.value == "APPROVED"
     assert ApprovalStatusEnum.DRAFT.value == "DRAFT"
     assert ApprovalStatusEnum.ESCALATE.value == "ESCALATE"
+
+
+@pytest.mark.asyncio
+async def test_generate_content_batch_falls_back_per_missing_or_malformed_day() -> None:
+    """LLM trả thiếu / sai JSON cho vài ngày -> chỉ các ngày đó dùng template, vẫn đủ item cho cả dải ngày."""
+    import json
+    import uuid
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, patch
+
+    from app.config import Settings
+    from app.services import content_service_mv2
+    from app.services.llm_service import LLMService
+
+    tenant_id, plan_id = uuid.uuid4(), uuid.uuid4()
+    plan = SimpleNamespace(
+        tenant_id=tenant_id,
+        plan_json={"days": [{"day": d, "topic": f"Topic {d}", "content_angle": f"Angle {d}"} for d in range(1, 5)]},
+    )
+    usage = {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+
+    async def fake_complete(_operation, messages):
+        user = messages[-1]["content"]
+        if "Topic 2" in user:
+            return "{\"title\": \"thiếu ngoặc\"", usage, None  # JSON hỏng
+        if "Topic 3" in user:
+            raise TimeoutError("no response")  # ngày bị thiếu
+        body = {"content_type": "REEL", "title": "AI title", "caption": "AI caption", "hashtags": ["#a"] * 6}
+        return json.dumps(body), usage, None
+
+    written = []
+
+    async def fake_scalars(_stmt, rows):
+        written.extend(rows)
+        return SimpleNamespace(all=lambda: [SimpleNamespace(**r) for r in rows])
+
+    db = SimpleNamespace(
+        execute=AsyncMock(return_value=SimpleNamespace(scalar_one_or_none=lambda: plan)),
+        scalars=fake_scalars,
+    )
+    with (
+        patch.object(content_service_mv2, "get_settings", return_value=Settings(OPENAI_API_KEY="sk-test")),
+        patch.object(content_service_mv2, "get_tenant_snapshot", AsyncMock(return_value={"industry": "spa"})),
+        patch.object(content_service_mv2, "get_industry_profile_snapshot", AsyncMock(return_value=None)),
+        patch.object(content_service_mv2, "log_usage", AsyncMock()) as log_usage,
+        patch.object(LLMService, "_get_client", return_value=object()),
+        patch.object(LLMService, "_complete", side_effect=fake_complete),
+        patch.object(LLMService, "_cache_store", AsyncMock()),
+    ):
+        items, fallback_days = await content_service_mv2.generate_content_batch(db, tenant_id, plan_id, 1, 4)
+
+    assert fallback_days == [2, 3]
+    assert [item.day for item in items] == [1, 2, 3, 4]
+    assert [row["title"] for row in written] == ["AI title", "Bai viet: Topic 2", "Bai viet: Topic 3", "AI title"]
+    assert written[1]["caption"] == "Angle 2" and written[1]["content_type"] == "POST"
+    assert written[0]["content_type"] == "REEL"
+    # usage chỉ cộng các ngày LLM thành công
+    assert log_usage.await_args.kwargs["total_tokens"] == 60
@@ -0,0 +1,243 @@
+"""
+Tests cho worker pool scheduler: giới hạn concurrency global + per-tenant, xử lý lỗi publish theo lease,
+claim lại item lease NULL, drain khi shutdown, LISTEN kết nối lại.
+Không cần DB: _publish_one / session được thay bằng hàm giả.
+"""
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.config import Settings
+from app.infrastructure.keyed_semaphore import KeyedSemaphore
+from app.services import scheduler_service
+
+
+@pytest.mark.asyncio
+async def test_slow_tenant_does_not_block_other_tenants() -> None:
+    """Tenant A có nhiều item chậm chỉ chiếm 1 slot (per-tenant=1); item tenant B vẫn chạy ngay."""
+    tenant_a, tenant_b = uuid4(), uuid4()
+    order: list = []
+    in_flight = {"n": 0, "max": 0}
+
+    async def fake_publish(content_id, tenant_id) -> None:
+        in_flight["n"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["n"])
+        await asyncio.sleep(0.05 if tenant_id == tenant_a else 0.001)
+        in_flight["n"] -= 1
+        order.append(tenant_id)
+
+    settings = Settings(SCHEDULER_CONCURRENCY=2, SCHEDULER_CONCURRENCY_PER_TENANT=1)
+    items = [(uuid4(), tenant_a) for _ in range(3)] + [(uuid4(), tenant_b)]
+    with (
+        patch.object(scheduler_service, "get_settings", return_value=settings),
+        patch.object(scheduler_service, "_publish_one", fake_publish),
+        patch.object(scheduler_service, "_global_slots", None),
+        patch.object(scheduler_service, "_tenant_slots", KeyedSemaphore()),
+        patch.object(scheduler_service, "_inflight", {}),
+    ):
+        for content_id, tenant_id in items:
+            scheduler_service._inflight[content_id] = asyncio.create_task(
+                scheduler_service._run_publish(content_id, tenant_id)
+            )
+        await asyncio.gather(*list(scheduler_service._inflight.values()))
+        assert scheduler_service._inflight == {}
+        assert len(scheduler_service._tenant_slots) == 0
+    assert order[0] == tenant_b
+    assert in_flight["max"] == 2
+
+
+@pytest.mark.asyncio
+async def test_wake_scheduler_interrupts_sleep() -> None:
+    """wake_scheduler() (NOTIFY / schedule_content) cắt ngang thời gian ngủ tới mốc due."""
+    with patch.object(scheduler_service, "_wake_event", asyncio.Event()):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        loop.call_later(0.01, scheduler_service.wake_scheduler)
+        await scheduler_service._wait_for_wake(5)
+        assert loop.time() - start < 1
+        assert not scheduler_service._wake_event.is_set()
+
+
+class _FakeResult:
+    def __init__(self, value=None) -> None:
+        self.value = value
+        self.rowcount = 1
+
+    def scalar_one_or_none(self):
+        return self.value
+
+
+class _FakeSession:
+    """Session giả: SELECT trả value, UPDATE ghi lại statement (rowcount=1)."""
+
+    def __init__(self, value) -> None:
+        self.value = value
+        self.updates: list = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc) -> bool:
+        return False
+
+    async def execute(self, stmt):
+        if stmt.is_update:
+            self.updates.append(stmt)
+        return _FakeResult(self.value)
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+    async def rollback(self) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("attempts_before,expected_status", [(0, "scheduled"), (2, "failed")])
+async def test_unexpected_publish_error_counts_attempt_under_lease(attempts_before, expected_status) -> None:
+    """Lỗi ngoài ValueError (vd DB lỗi sau Graph POST): session mới tăng attempts, backoff / failed, chỉ khi còn lease."""
+    content_id, tenant_id = uuid4(), uuid4()
+    item = SimpleNamespace(
+        schedule_status="publishing",
+        locked_by=scheduler_service.WORKER_ID,
+        publish_attempts=attempts_before,
+    )
+    sessions = [_FakeSession(item), _FakeSession(attempts_before)]
+    audit = AsyncMock()
+    with (
+        patch.object(scheduler_service, "async_session_factory", side_effect=sessions),
+        patch.object(scheduler_service, "publish_post", AsyncMock(side_effect=RuntimeError("db down"))),
+        patch.object(scheduler_service, "log_audit_event", audit),
+    ):
+        await scheduler_service._publish_one(content_id, tenant_id)
+
+    assert sessions[0].updates == []
+    [stmt] = sessions[1].updates
+    params = stmt.compile().params
+    assert params["publish_attempts"] == attempts_before + 1
+    assert params["schedule_status"] == expected_status
+    assert params["last_publish_error"] == "db down"
+    assert scheduler_service.WORKER_ID in params.values()  # WHERE locked_by = WORKER_ID
+    assert sessions[1].commits == 1
+    assert audit.await_count == (1 if expected_status == "failed" else 0)
+
+
+@pytest.mark.asyncio
+async def test_claim_and_next_due_treat_null_lease_as_expired() -> None:
+    """Item publishing có locked_until NULL (dữ liệu cũ): claim được và tính là đến hạn ngay khi tính giờ thức dậy."""
+    sql = str(scheduler_service._claimable(datetime.now(timezone.utc)).compile(dialect=postgresql.dialect()))
+    assert "content_items.locked_until IS NULL" in sql
+
+    session = _FakeSession(None)
+    session.execute = AsyncMock(return_value=SimpleNamespace(one=lambda: (None, None)))
+    with patch.object(scheduler_service, "async_session_factory", return_value=session):
+        assert await scheduler_service._seconds_until_next_due() == scheduler_service.INTERVAL_SECONDS
+    next_due_sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "min(coalesce(content_items.locked_until, now()))" in next_due_sql
+
+
+@pytest.mark.asyncio
+async def test_stop_scheduler_drains_inflight_then_cancels_slow_publish() -> None:
+    """Shutdown: publish xong trong thời gian drain thì chạy trọn; quá hạn mới bị huỷ; item chưa bắt đầu được nhả."""
+    fast_id, slow_id, queued_id, tenant_id = uuid4(), uuid4(), uuid4(), uuid4()
+    finished, cancelled = [], []
+
+    async def fake_publish(content_id, _tenant_id) -> None:
+        try:
+            await asyncio.sleep(0.02 if content_id == fast_id else 10)
+            finished.append(content_id)
+        except asyncio.CancelledError:
+            cancelled.append(content_id)
+            raise
+
+    settings = Settings(
+        SCHEDULER_CONCURRENCY=2,
+        SCHEDULER_CONCURRENCY_PER_TENANT=2,
+        SCHEDULER_SHUTDOWN_DRAIN_SECONDS=0.2,
+    )
+    release = AsyncMock()
+    with (
+        patch.object(scheduler_service, "get_settings", return_value=settings),
+        patch.object(scheduler_service, "_publish_one", fake_publish),
+        patch.object(scheduler_service, "_release_unstarted", release),
+        patch.object(scheduler_service, "_stop_listener", AsyncMock()),
+        patch.object(scheduler_service, "_global_slots", None),
+        patch.object(scheduler_service, "_tenant_slots", KeyedSemaphore()),
+        patch.object(scheduler_service, "_inflight", {}),
+        patch.object(scheduler_service, "_stop_event", asyncio.Event()),
+        patch.object(scheduler_service, "_heartbeat_task", asyncio.create_task(asyncio.Event().wait())),
+    ):
+        for content_id in (fast_id, slow_id, queued_id):
+            scheduler_service._inflight[content_id] = asyncio.create_task(
+                scheduler_service._run_publish(content_id, tenant_id)
+            )
+        await asyncio.sleep(0)
+        await scheduler_service.stop_scheduler()
+        assert scheduler_service._inflight == {}
+
+    assert finished == [fast_id]
+    assert cancelled == [slow_id]
+    release.assert_awaited_once_with(queued_id)
+
+
+class _FakeDriver:
+    """asyncpg connection giả: LISTEN + termination listener."""
+
+    def __init__(self) -> None:
+        self.on_terminate = None
+
+    async def add_listener(self, _channel, _callback) -> None:
+        pass
+
+    async def remove_listener(self, _channel, _callback) -> None:
+        pass
+
+    def add_termination_listener(self, callback) -> None:
+        self.on_terminate = callback
+
+
+class _FakeListenConn:
+    def __init__(self) -> None:
+        self.driver = _FakeDriver()
+        self.closed = False
+
+    async def get_raw_connection(self):
+        return SimpleNamespace(driver_connection=self.driver)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_listener_reconnects_with_backoff_after_connection_lost() -> None:
+    """Mở LISTEN lỗi -> thử lại; connection đang LISTEN bị đóng -> log listen_lost, kết nối lại và thức scheduler."""
+    first, second = _FakeListenConn(), _FakeListenConn()
+    engine = SimpleNamespace(connect=AsyncMock(side_effect=[OSError("db down"), first, second]))
+    logger = Mock()
+    with (
+        patch.object(scheduler_service, "engine", engine),
+        patch.object(scheduler_service, "logger", logger),
+        patch.object(scheduler_service, "LISTEN_RECONNECT_BACKOFF_SECONDS", 0.001),
+        patch.object(scheduler_service, "_listen_conn", None),
+        patch.object(scheduler_service, "_wake_event", asyncio.Event()),
+    ):
+        task = asyncio.create_task(scheduler_service._listener_loop())
+        while scheduler_service._listen_conn is not first:
+            await asyncio.sleep(0.001)
+        assert scheduler_service.get_scheduler_status()["listen_connected"] is True
+        assert scheduler_service._wake_event.is_set()
+        first.driver.on_terminate(first.driver)
+        while scheduler_service._listen_conn is not second:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert first.closed and not second.closed
+    assert [c.args[0] for c in logger.warning.call_args_list] == ["scheduler.listen_failed", "scheduler.listen_lost"]
@@ -0,0 +1,140 @@
+"""
+Tests cho resumable video upload (_publish_video): start / transfer / finish theo chunk, resume từ offset đã lưu,
+session lưu trong DB đã hết hạn thì upload lại, trả post_id của page.
+Không gọi Graph thật (httpx.MockTransport), không cần DB (_save_upload_progress được thay).
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+
+import httpx
+import pytest
+
+from app.config import Settings
+from app.services import facebook_publish_service
+
+MB = 1024 * 1024
+
+
+def _graph_handler(file_size: int, calls: list, expired_sessions=()):  # noqa: ANN202
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            calls.append(("post_id", request.url.path.rsplit("/", 1)[-1]))
+            return httpx.Response(200, json={"post_id": "page_vid1", "id": "vid1"})
+        body = request.content
+        if b'name="upload_phase"\r\n\r\ntransfer' in body or b"upload_phase=transfer" in body:
+            session = body.split(b'name="upload_session_id"\r\n\r\n')[1].split(b"\r\n")[0].decode()
+            start = int(body.split(b'name="start_offset"\r\n\r\n')[1].split(b"\r\n")[0])
+            chunk_len = len(body.split(b'name="video_file_chunk"')[1].split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n--", 1)[0])
+            calls.append(("transfer", start, chunk_len))
+            if session in expired_sessions:
+                return httpx.Response(400, json={"error": {"message": "upload session expired"}})
+            nxt = start + chunk_len
+            return httpx.Response(200, json={"start_offset": str(nxt), "end_offset": str(min(file_size, nxt + MB))})
+        if b"upload_phase=start" in body:
+            calls.append(("start",))
+            return httpx.Response(200, json={"upload_session_id": "sess1", "video_id": "vid1", "start_offset": "0", "end_offset": str(MB)})
+        calls.append(("finish",))
+        return httpx.Response(200, json={"success": True})
+
+    return handler
+
+
+async def _fake_save(asset, session_id, video_id, offset) -> None:
+    asset.fb_upload_session_id, asset.fb_upload_video_id, asset.fb_upload_offset = session_id, video_id, offset
+    asset.saved.append(offset)
+
+
+def _asset(path, **kw):  # noqa: ANN202
+    base = dict(
+        id=uuid4(),
+        local_path=str(path),
+        file_name="v.mp4",
+        fb_upload_session_id=None,
+        fb_upload_video_id=None,
+        fb_upload_offset=0,
+        fb_video_id=None,
+        saved=[],
+    )
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+async def _upload(asset, file_size: int, calls: list, expired_sessions=()):  # noqa: ANN202
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_graph_handler(file_size, calls, expired_sessions)))
+    with (
+        patch.object(facebook_publish_service, "get_settings", return_value=Settings(FACEBOOK_VIDEO_CHUNK_MB=1)),
+        patch.object(facebook_publish_service, "get_http_client", return_value=client),
+        patch.object(facebook_publish_service, "_save_upload_progress", _fake_save),
+    ):
+        try:
+            return await facebook_publish_service._publish_video("page", "tok", "v20.0", asset, "msg")
+        finally:
+            await client.aclose()
+
+
+def _video(tmp_path, file_size: int):  # noqa: ANN202
+    video = tmp_path / "v.mp4"
+    video.write_bytes(b"x" * file_size)
+    return video
+
+
+@pytest.mark.asyncio
+async def test_resumable_upload_chunks_and_returns_page_post_id(tmp_path) -> None:
+    """File 2.5MB, chunk 1MB: start + 3 transfer + finish, rồi lấy post_id của page (video id giữ ở asset)."""
+    file_size = int(2.5 * MB)
+    asset = _asset(_video(tmp_path, file_size))
+    calls: list = []
+    post_id, err, status = await _upload(asset, file_size, calls)
+    assert (post_id, err, status) == ("page_vid1", None, 200)
+    assert asset.fb_video_id == "vid1"
+    assert [c[0] for c in calls] == ["start", "transfer", "transfer", "transfer", "finish", "post_id"]
+    assert calls[-1] == ("post_id", "vid1")
+    assert [c[2] for c in calls if c[0] == "transfer"] == [MB, MB, file_size - 2 * MB]
+    assert asset.saved[-1] == 0 and asset.fb_upload_session_id is None
+
+
+@pytest.mark.asyncio
+async def test_resume_from_saved_offset_sends_only_remaining_bytes(tmp_path) -> None:
+    """Session + offset 2MB đã lưu: chỉ gửi phần còn lại trên session cũ, không start lại."""
+    file_size = int(2.5 * MB)
+    asset = _asset(
+        _video(tmp_path, file_size),
+        fb_upload_session_id="sess0",
+        fb_upload_video_id="vid1",
+        fb_upload_offset=2 * MB,
+    )
+    calls: list = []
+    post_id, err, _ = await _upload(asset, file_size, calls)
+    assert (post_id, err) == ("page_vid1", None)
+    assert calls == [("transfer", 2 * MB, file_size - 2 * MB), ("finish",), ("post_id", "vid1")]
+
+
+@pytest.mark.asyncio
+async def test_expired_stored_session_at_offset_zero_restarts(tmp_path) -> None:
+    """Crash ngay sau start (session lưu ở offset 0) và session đã hết hạn: xoá session cũ, upload lại từ đầu."""
+    file_size = int(1.5 * MB)
+    asset = _asset(
+        _video(tmp_path, file_size),
+        fb_upload_session_id="stale",
+        fb_upload_video_id="old_vid",
+        fb_upload_offset=0,
+    )
+    calls: list = []
+    post_id, err, status = await _upload(asset, file_size, calls, expired_sessions={"stale"})
+    assert (post_id, err, status) == ("page_vid1", None, 200)
+    assert [c[0] for c in calls] == ["transfer", "start", "transfer", "transfer", "finish", "post_id"]
+    # session cũ bị xoá trước khi start mới -> retry sau này không kẹt ở session hết hạn
+    assert asset.saved[0] == 0 and asset.saved[1] == 0
+    assert asset.fb_upload_session_id is None and asset.fb_video_id == "vid1"
+
+
+@pytest.mark.asyncio
+async def test_new_session_rejected_is_an_error_without_restart(tmp_path) -> None:
+    """Session vừa start mà transfer bị từ chối: trả lỗi Graph, không start vòng 2."""
+    file_size = MB
+    asset = _asset(_video(tmp_path, file_size))
+    calls: list = []
+    post_id, err, status = await _upload(asset, file_size, calls, expired_sessions={"sess1"})
+    assert (post_id, err, status) == (None, "upload session expired", 400)
+    assert [c[0] for c in calls] == ["start", "transfer"]
@@ -0,0 +1,157 @@
+"""
+Tests cho write-behind audit / usage log (app.infrastructure.write_behind).
+Không cần Postgres: session giả đếm flush, factory session giả ghi lại các INSERT theo lô.
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.config import Settings
+from app.infrastructure import write_behind
+from app.models import AiUsageLog, ApprovalEvent
+from app.services import ai_usage_service
+from app.services.approval_service import log_audit_event
+
+
+def _fake_session():
+    db = SimpleNamespace(sync_session=SimpleNamespace(info={}), flush=AsyncMock(), add=lambda obj: None)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_audit_and_usage_rows_buffered_without_flush() -> None:
+    db = _fake_session()
+    tenant_id = uuid4()
+    settings = Settings(WRITE_BEHIND_ENABLED=True)
+    with (
+        patch.object(write_behind, "get_settings", return_value=settings),
+        patch.object(ai_usage_service, "get_redis_if_available", return_value=None),
+    ):
+        for i in range(3):
+            ev = await log_audit_event(db, tenant_id, "GENERATE_CONTENT", "SYSTEM", metadata_={"i": i})
+            assert ev.id is not None
+        await ai_usage_service.log_usage(db, tenant_id, "content_samples", "m", 10, 5, 15)
+    assert db.flush.await_count == 0
+    rows = db.sync_session.info["write_behind_rows"]
+    assert [m for m, _ in rows] == [ApprovalEvent, ApprovalEvent, ApprovalEvent, AiUsageLog]
+    assert write_behind.get_session_stats(db)["write_behind_pending"] == 4
+
+
+@pytest.mark.asyncio
+async def test_background_batcher_writes_in_batches_and_rejects_when_full() -> None:
+    """Nhiều event SYSTEM -> 1 INSERT nhiều dòng; queue đầy -> submit False (caller ghi inline)."""
+    executed = []
+
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt, params):
+            executed.append(len(params))
+
+        async def commit(self):
+            pass
+
+    settings = Settings(
+        WRITE_BEHIND_ENABLED=True,
+        WRITE_BEHIND_QUEUE_MAX=5,
+        WRITE_BEHIND_BATCH_SIZE=100,
+        WRITE_BEHIND_FLUSH_INTERVAL_SECONDS=0.05,
+    )
+    batcher = write_behind.BackgroundBatcher()
+    with (
+        patch.object(write_behind, "get_settings", return_value=settings),
+        patch("app.db.async_session_factory", _Session),
+    ):
+        batcher.start()
+        accepted = [batcher.submit(ApprovalEvent, {"id": uuid4()}) for _ in range(7)]
+        await asyncio.sleep(0.2)
+        await batcher.stop()
+    assert accepted.count(True) == 5
+    assert batcher.rejected == 2
+    assert executed == [5]
+    assert batcher.written == 5
+
+
+def _batcher_settings() -> Settings:
+    return Settings(
+        WRITE_BEHIND_ENABLED=True,
+        WRITE_BEHIND_QUEUE_MAX=100,
+        WRITE_BEHIND_BATCH_SIZE=3,
+        WRITE_BEHIND_FLUSH_INTERVAL_SECONDS=0.05,
+    )
+
+
+def _session_factory(execute):
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt, params):
+            await execute(params)
+
+        async def commit(self):
+            pass
+
+    return _Session
+
+
+@pytest.mark.asyncio
+async def test_stop_finishes_in_flight_batch_and_queue() -> None:
+    """stop() khi lô đang ghi: lô đó + phần còn trong queue vẫn được ghi, không mất dòng."""
+    written = []
+
+    async def slow_execute(params):
+        await asyncio.sleep(0.1)
+        written.extend(p["id"] for p in params)
+
+    batcher = write_behind.BackgroundBatcher()
+    with (
+        patch.object(write_behind, "get_settings", return_value=_batcher_settings()),
+        patch("app.db.async_session_factory", _session_factory(slow_execute)),
+    ):
+        batcher.start()
+        ids = [uuid4() for _ in range(7)]
+        for row_id in ids:
+            assert batcher.submit(ApprovalEvent, {"id": row_id})
+        await asyncio.sleep(0.02)  # lô đầu đang ghi
+        await batcher.stop()
+        assert not batcher.submit(ApprovalEvent, {"id": uuid4()})
+    assert sorted(written) == sorted(ids)
+    assert batcher.written == 7 and batcher.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_write_retries_transient_errors_and_drops_only_bad_rows() -> None:
+    """Lỗi kết nối -> retry cả lô (không bỏ dòng); IntegrityError -> ghi từng dòng, chỉ bỏ dòng lỗi."""
+    bad_id = uuid4()
+    calls = {"n": 0}
+    written = []
+
+    async def flaky_execute(params):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise OperationalError("INSERT", {}, ConnectionError("db down"))
+        if any(p["id"] == bad_id for p in params):
+            raise IntegrityError("INSERT", {}, ValueError("fk"))
+        written.extend(p["id"] for p in params)
+
+    batcher = write_behind.BackgroundBatcher()
+    good = [uuid4(), uuid4()]
+    with (
+        patch.object(write_behind, "RETRY_BACKOFF_SECONDS", 0.001),
+        patch("app.db.async_session_factory", _session_factory(flaky_execute)),
+    ):
+        await batcher._write([(ApprovalEvent, {"id": row_id}) for row_id in (good[0], bad_id, good[1])])
+    assert written == good
+    assert batcher.written == 2 and batcher.dropped == 1